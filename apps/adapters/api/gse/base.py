@@ -15,7 +15,7 @@ from collections import ChainMap
 
 from apps.core.concurrent import controller
 from apps.node_man import constants, models
-from apps.utils import concurrent
+from apps.utils import basic, concurrent
 from common.api import GseApi
 
 InfoDict = typing.Dict[str, typing.Any]
@@ -199,6 +199,47 @@ class GseApiBaseHelper(abc.ABC):
         )
         return dict(ChainMap(*agent_id__agent_state_info_map_list))
 
+    def list_proc_states(
+        self,
+        namespace: str,
+        proc_names: typing.List[str],
+        host_info_list: InfoDictList,
+        extra_meta_data: InfoDict,
+        **options,
+    ) -> typing.Dict[str, AgentIdInfoMap]:
+        """
+        获取多个进程的状态信息，所有进程名称 × 主机分片的请求一次性提交到 gse 共享执行器并发执行
+        并发上限即执行器大小（GSE_QUERY_CONCURRENT_NUMBER），请求上下文及语言由 batch_call 传递
+        :param namespace: 命名空间
+        :param proc_names: 进程名称列表
+        :param host_info_list: 主机信息列表
+        :param extra_meta_data: 额外的元数据
+        :param options: 其他可能需要的参数
+        :return: 进程名称 - AgentId - 进程状态信息映射关系
+        """
+
+        def _list_proc_state_chunk(_proc_name: str, _host_info_list: InfoDictList) -> typing.Tuple[str, AgentIdInfoMap]:
+            return _proc_name, self._list_proc_state(
+                namespace, _proc_name, {"proc_name": _proc_name}, _host_info_list, extra_meta_data, **options
+            )
+
+        results: typing.List[typing.Tuple[str, AgentIdInfoMap]] = concurrent.batch_call(
+            func=_list_proc_state_chunk,
+            params_list=[
+                {"_proc_name": proc_name, "_host_info_list": host_info_chunk}
+                for proc_name in proc_names
+                for host_info_chunk in basic.chunk_lists(host_info_list, constants.QUERY_PROC_STATUS_HOST_LENS)
+            ],
+            executor_name="gse",
+        )
+
+        proc_name__agent_id__proc_status_info_map: typing.Dict[str, AgentIdInfoMap] = {
+            proc_name: {} for proc_name in proc_names
+        }
+        for proc_name, agent_id__proc_status_info_map in results:
+            proc_name__agent_id__proc_status_info_map[proc_name].update(agent_id__proc_status_info_map)
+        return proc_name__agent_id__proc_status_info_map
+
     def operate_proc_multi(self, proc_operate_req: InfoDictList, **options) -> str:
         """
         批量进程操作
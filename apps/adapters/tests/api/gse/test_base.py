@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+TencentBlueKing is pleased to support the open source community by making 蓝鲸智云-节点管理(BlueKing-BK-NODEMAN) available.
+Copyright (C) 2017-2022 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at https://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+import threading
+import typing
+from unittest import mock
+
+from django.utils import translation
+
+from apps.mock_data.api_mkd.gse.unit import GSE_PROCESS_NAME
+from apps.mock_data.api_mkd.gse.utils import GseApiMockClient, get_gse_api_helper
+from apps.mock_data.common_unit.host import DEFAULT_IP
+from apps.node_man import constants
+from apps.utils.unittest.testcase import CustomBaseTestCase
+from env.constants import GseVersion
+
+
+class TestGseApiBaseHelper(CustomBaseTestCase):
+    PROC_NAMES = [GSE_PROCESS_NAME, "another_process"]
+
+    def setUp(self):
+        self.host_info_list = [{"ip": DEFAULT_IP, "bk_cloud_id": constants.DEFAULT_CLOUD, "bk_agent_id": ""}]
+        super().setUp()
+
+    def test_list_proc_states(self):
+        for gse_version in [GseVersion.V1.value, GseVersion.V2.value]:
+            gse_api_helper = get_gse_api_helper(gse_version, GseApiMockClient())(gse_version)
+            proc_name__agent_id__proc_status_map = gse_api_helper.list_proc_states(
+                namespace=constants.GSE_NAMESPACE,
+                proc_names=self.PROC_NAMES,
+                host_info_list=self.host_info_list,
+                extra_meta_data={},
+            )
+            self.assertEqual(set(proc_name__agent_id__proc_status_map.keys()), set(self.PROC_NAMES))
+            for proc_name in self.PROC_NAMES:
+                # 通过 batch_call 在共享的 "gse" 执行器上并发查询，结果与逐个进程查询保持一致
+                self.assertDictEqual(
+                    proc_name__agent_id__proc_status_map[proc_name],
+                    gse_api_helper.list_proc_state(
+                        namespace=constants.GSE_NAMESPACE,
+                        proc_name=proc_name,
+                        labels={"proc_name": proc_name},
+                        host_info_list=self.host_info_list,
+                        extra_meta_data={},
+                    ),
+                )
+
+    def test_list_proc_states__propagate_language(self):
+        gse_version = GseVersion.V2.value
+        gse_api_helper = get_gse_api_helper(gse_version, GseApiMockClient())(gse_version)
+        call_infos: typing.List[typing.Tuple[str, str]] = []
+        list_proc_state = gse_api_helper._list_proc_state
+
+        def _list_proc_state(*args, **kwargs):
+            call_infos.append((threading.current_thread().name, translation.get_language()))
+            return list_proc_state(*args, **kwargs)
+
+        with mock.patch.object(gse_api_helper, "_list_proc_state", _list_proc_state), translation.override("en"):
+            gse_api_helper.list_proc_states(
+                namespace=constants.GSE_NAMESPACE,
+                proc_names=self.PROC_NAMES,
+                host_info_list=self.host_info_list,
+                extra_meta_data={},
+            )
+
+        # 各进程的请求在 gse 共享执行器中并发执行，并沿用调用方的语言
+        self.assertEqual(len(call_infos), len(self.PROC_NAMES))
+        for thread_name, language in call_infos:
+            self.assertTrue(thread_name.startswith("gse"))
+            self.assertEqual(language, "en")
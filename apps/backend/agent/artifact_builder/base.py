@@ -10,6 +10,7 @@ specific language governing permissions and limitations under the License.
 """
 
 import abc
+import json
 import logging
 import os
 import shutil
@@ -17,6 +18,7 @@ import tarfile
 import typing
 
 from django.conf import settings
+from django.core.files.base import ContentFile
 from django.utils.translation import ugettext_lazy as _
 
 from apps.backend import exceptions
@@ -26,11 +28,29 @@ from apps.core.files.storage import get_storage
 from apps.core.tag.constants import AGENT_NAME_TARGET_ID_MAP, TargetType
 from apps.core.tag.handlers import TagHandler
 from apps.node_man import constants, models
-from apps.utils import cache, files
+from apps.utils import cache, concurrent, files
+from apps.utils.md5 import count_md5
 
 logger = logging.getLogger("app")
 
 
+def make_package(pkg_absolute_path: str, arcname: str, package_tmp_path: str) -> typing.Dict[str, typing.Any]:
+    """
+    将目录打包为 .tgz，压缩的同时计算 md5 及包大小，无需打包后重新读取
+    定义为模块级函数，以便在进程池中执行
+    :param pkg_absolute_path: 待打包目录
+    :param arcname: 包内根路径
+    :param package_tmp_path: 包保存路径
+    :return:
+    """
+    os.makedirs(os.path.dirname(package_tmp_path), exist_ok=True)
+    with open(package_tmp_path, mode="wb") as fs:
+        md5_writer: files.MD5Writer = files.MD5Writer(fs)
+        with tarfile.open(fileobj=md5_writer, mode="w:gz") as tf:
+            tf.add(pkg_absolute_path, arcname=arcname)
+    return {"md5": md5_writer.hexdigest(), "pkg_size": md5_writer.size}
+
+
 class BaseArtifactBuilder(abc.ABC):
 
     # 最终的制品名称
@@ -317,11 +337,48 @@ class BaseArtifactBuilder(abc.ABC):
 
         return package_dir_infos
 
-    def make_and_upload_package(
-        self, package_dir_info: typing.Dict[str, typing.Any], artifact_meta_info: typing.Dict[str, typing.Any]
-    ) -> typing.Dict[str, typing.Any]:
+    def get_package_target_path(self, package_dir_info: typing.Dict[str, typing.Any], pkg_name: str) -> str:
+        return os.path.join(
+            self.download_path, self.BASE_STORAGE_DIR, package_dir_info["os"], package_dir_info["cpu_arch"], pkg_name
+        )
+
+    @staticmethod
+    def get_package_manifest_path(package_target_path: str) -> str:
+        """安装包清单路径，记录包内容摘要及包信息，用于跳过内容未变更的安装包"""
+        dir_name, pkg_name = os.path.split(package_target_path)
+        return os.path.join(dir_name, f".{pkg_name}.manifest")
+
+    def get_package_manifest(self, package_target_path: str) -> typing.Optional[typing.Dict[str, typing.Any]]:
         """
-        制作并上传安装包
+        获取已上传安装包的清单，安装包或清单不存在时返回 None
+        :param package_target_path: 安装包存储路径
+        :return:
+        """
+        manifest_path: str = self.get_package_manifest_path(package_target_path)
+        try:
+            if not (self.storage.exists(package_target_path) and self.storage.exists(manifest_path)):
+                return None
+            with self.storage.open(manifest_path, mode="rb") as fs:
+                return json.loads(fs.read())
+        except Exception:
+            logger.exception(f"get package manifest -> {manifest_path} failed, package will be rebuilt")
+            return None
+
+    def save_package_manifest(self, package_target_path: str, manifest: typing.Dict[str, typing.Any]):
+        self.storage.save(
+            self.get_package_manifest_path(package_target_path), ContentFile(json.dumps(manifest).encode())
+        )
+
+    def make_and_upload_packages(
+        self,
+        package_dir_infos: typing.List[typing.Dict[str, typing.Any]],
+        artifact_meta_info: typing.Dict[str, typing.Any],
+    ) -> typing.List[typing.Dict[str, typing.Any]]:
+        """
+        批量制作并上传安装包
+        - 按包目录内容摘要与已上传的安装包清单比对，内容未变更的安装包跳过制作及上传
+        - 各机型安装包在进程池中并行制作，压缩时同步计算 md5
+        - 覆盖版本的副本通过存储侧复制生成，不再重复上传
 
         上传到文件源的标准结构示例：
         agent
@@ -338,39 +395,98 @@ class BaseArtifactBuilder(abc.ABC):
         - pkg - path（md5），pkg - path1（md5）
         - 证书区分：证书路径放到接入点维护
 
-        :param package_dir_info: 安装包信息
+        :param package_dir_infos: 安装包信息列表
         :param artifact_meta_info: 基础信息
-        :return:
+        :return: 与 package_dir_infos 一一对应的上传信息
         """
         name: str = artifact_meta_info["name"]
-        os_str: str = package_dir_info["os"]
-        cpu_arch: str = package_dir_info["cpu_arch"]
         version_str: str = artifact_meta_info["version"]
         pkg_name: str = f"{name}-{version_str}.tgz"
 
-        package_tmp_path = os.path.join(self.apply_tmp_dir(), self.BASE_STORAGE_DIR, os_str, cpu_arch, pkg_name)
-        os.makedirs(os.path.dirname(package_tmp_path), exist_ok=True)
+        if not package_dir_infos:
+            return []
+
+        # 包内根路径同样影响包内容，一并纳入摘要
+        content_md5s: typing.List[str] = [
+            count_md5(f"{self.PKG_DIR}:{dir_content_md5}")
+            for dir_content_md5 in concurrent.batch_call_multi_proc(
+                files.dir_content_md5,
+                params_list=[{"path": package_dir_info["pkg_absolute_path"]} for package_dir_info in package_dir_infos],
+            )
+        ]
+
+        package_manifests: typing.List[typing.Optional[typing.Dict[str, typing.Any]]] = []
+        to_be_made_indexes: typing.List[int] = []
+        for index, (package_dir_info, content_md5) in enumerate(zip(package_dir_infos, content_md5s)):
+            package_target_path: str = self.get_package_target_path(package_dir_info, pkg_name)
+            manifest: typing.Optional[typing.Dict[str, typing.Any]] = self.get_package_manifest(package_target_path)
+            if manifest and manifest.get("content_md5") == content_md5:
+                logger.info(f"package -> {package_target_path} content not changed, skip make and upload")
+            else:
+                manifest = None
+                to_be_made_indexes.append(index)
+            package_manifests.append(manifest)
+
+        package_tmp_paths: typing.Dict[int, str] = {
+            index: os.path.join(
+                self.apply_tmp_dir(),
+                self.BASE_STORAGE_DIR,
+                package_dir_infos[index]["os"],
+                package_dir_infos[index]["cpu_arch"],
+                pkg_name,
+            )
+            for index in to_be_made_indexes
+        }
+        made_package_infos: typing.List[typing.Dict[str, typing.Any]] = []
+        if to_be_made_indexes:
+            made_package_infos = concurrent.batch_call_multi_proc(
+                make_package,
+                params_list=[
+                    {
+                        "pkg_absolute_path": package_dir_infos[index]["pkg_absolute_path"],
+                        "arcname": f"{self.PKG_DIR}/",
+                        "package_tmp_path": package_tmp_paths[index],
+                    }
+                    for index in to_be_made_indexes
+                ],
+            )
 
-        with tarfile.open(package_tmp_path, "w:gz") as tf:
-            tf.add(package_dir_info["pkg_absolute_path"], arcname=f"{self.PKG_DIR}/")
+        for index, made_package_info in zip(to_be_made_indexes, made_package_infos):
             logger.info(
                 "project -> {project} version -> {version} "
                 "now is pack to package_tmp_path -> {package_tmp_path}".format(
-                    project=name, version=version_str, package_tmp_path=package_tmp_path
+                    project=name, version=version_str, package_tmp_path=package_tmp_paths[index]
+                )
+            )
+            package_target_path: str = self.get_package_target_path(package_dir_infos[index], pkg_name)
+            # 将 Agent 包上传到存储系统
+            with open(package_tmp_paths[index], mode="rb") as tf:
+                # 采用同名覆盖策略，保证同版本 Agent 包仅保存一份
+                storage_path = self.storage.save(package_target_path, tf)
+            if storage_path != package_target_path:
+                raise exceptions.CreatePackageRecordError(
+                    _("Agent 包保存错误，期望保存到 -> {package_target_path}, 实际保存到 -> {storage_path}").format(
+                        package_target_path=package_target_path, storage_path=storage_path
+                    )
+                )
+            logger.info(
+                "package -> {pkg_name} upload to package_target_path -> {package_target_path} success".format(
+                    pkg_name=pkg_name, package_target_path=package_target_path
                 )
             )
 
-        # 将 Agent 包上传到存储系统
-        package_target_path = os.path.join(self.download_path, self.BASE_STORAGE_DIR, os_str, cpu_arch, pkg_name)
-        with open(package_tmp_path, mode="rb") as tf:
-            # 采用同名覆盖策略，保证同版本 Agent 包仅保存一份
-            storage_path = self.storage.save(package_target_path, tf)
+            package_manifests[index] = {"content_md5": content_md5s[index], **made_package_info}
+            self.save_package_manifest(package_target_path, package_manifests[index])
+
+        package_upload_infos: typing.List[typing.Dict[str, typing.Any]] = []
+        for package_dir_info, manifest in zip(package_dir_infos, package_manifests):
+            package_target_path: str = self.get_package_target_path(package_dir_info, pkg_name)
             # 如果采用覆盖版本（标签），并且真实版本号和覆盖版本号不一样，保存一份副本
             if self.overwrite_version and version_str != self.overwrite_version:
-                package_overwrite_target_path = os.path.join(
-                    self.download_path, self.BASE_STORAGE_DIR, os_str, cpu_arch, f"{name}-{self.overwrite_version}.tgz"
+                package_overwrite_target_path: str = self.get_package_target_path(
+                    package_dir_info, f"{name}-{self.overwrite_version}.tgz"
                 )
-                self.storage.save(package_overwrite_target_path, tf)
+                self.storage.copy(package_target_path, package_overwrite_target_path)
                 logger.info(
                     "[overwrite] package -> {pkg_name} upload to package_target_path"
                     " -> {package_target_path} success".format(
@@ -378,25 +494,26 @@ class BaseArtifactBuilder(abc.ABC):
                     )
                 )
 
-            if storage_path != package_target_path:
-                raise exceptions.CreatePackageRecordError(
-                    _("Agent 包保存错误，期望保存到 -> {package_target_path}, 实际保存到 -> {storage_path}").format(
-                        package_target_path=package_target_path, storage_path=storage_path
-                    )
-                )
-
-        logger.info(
-            "package -> {pkg_name} upload to package_target_path -> {package_target_path} success".format(
-                pkg_name=pkg_name, package_target_path=package_target_path
+            package_upload_infos.append(
+                {
+                    "pkg_name": pkg_name,
+                    "md5": manifest["md5"],
+                    "pkg_size": manifest["pkg_size"],
+                    "pkg_path": os.path.dirname(package_target_path),
+                }
             )
-        )
+        return package_upload_infos
 
-        return {
-            "pkg_name": pkg_name,
-            "md5": files.md5sum(name=package_tmp_path),
-            "pkg_size": os.path.getsize(package_tmp_path),
-            "pkg_path": os.path.dirname(package_target_path),
-        }
+    def make_and_upload_package(
+        self, package_dir_info: typing.Dict[str, typing.Any], artifact_meta_info: typing.Dict[str, typing.Any]
+    ) -> typing.Dict[str, typing.Any]:
+        """
+        制作并上传安装包
+        :param package_dir_info: 安装包信息
+        :param artifact_meta_info: 基础信息
+        :return:
+        """
+        return self.make_and_upload_packages([package_dir_info], artifact_meta_info)[0]
 
     def apply_tmp_dir(self) -> str:
         """
@@ -570,16 +687,19 @@ class BaseArtifactBuilder(abc.ABC):
         extract_dir, package_dir_infos = self.list_package_dir_infos()
         artifact_meta_info: typing.Dict[str, typing.Any] = self.get_artifact_meta_info(extract_dir)
 
+        selected_package_dir_infos: typing.List[typing.Dict] = []
         for package_dir_info in package_dir_infos:
             if not (
                 select_pkg_relative_paths is None or package_dir_info["pkg_relative_path"] in select_pkg_relative_paths
             ):
                 logger.info("path -> {path} not selected, jump it".format(path=package_dir_info["pkg_relative_path"]))
                 continue
+            selected_package_dir_infos.append(package_dir_info)
 
-            package_upload_info: typing.Dict[str, typing.Any] = self.make_and_upload_package(
-                package_dir_info, artifact_meta_info
-            )
+        package_upload_infos: typing.List[typing.Dict[str, typing.Any]] = self.make_and_upload_packages(
+            selected_package_dir_infos, artifact_meta_info
+        )
+        for package_dir_info, package_upload_info in zip(selected_package_dir_infos, package_upload_infos):
             package_infos.append(
                 {
                     "artifact_meta_info": artifact_meta_info,
@@ -771,16 +771,45 @@ class InstallService(base.AgentBaseService, remote.RemoteServiceMixin):
                     cmd = content.text
                     command_converter[cmd] = self.convert_shell_to_powershell(cmd)
 
-    def handle_report_data(self, host: models.Host, sub_inst_id: int, success_callback_step: str) -> Dict:
-        """处理上报数据"""
-        name = REDIS_INSTALL_CALLBACK_KEY_TPL.format(sub_inst_id=sub_inst_id)
+    @staticmethod
+    def drain_report_data(sub_inst_ids: List[int]) -> Dict[int, List[bytes]]:
+        """
+        批量取出订阅实例的上报数据，无论实例数多少，仅需两次 Redis 往返
+        :param sub_inst_ids: 订阅实例ID列表
+        :return: 订阅实例ID - 按上报顺序排列的上报数据
+        """
+        names: List[str] = [
+            REDIS_INSTALL_CALLBACK_KEY_TPL.format(sub_inst_id=sub_inst_id) for sub_inst_id in sub_inst_ids
+        ]
         # 先计算出要从redis取数据的长度
-        report_data_len = REDIS_INST.llen(name)
-        # 从redis中取出对应长度的数据
-        report_data = REDIS_INST.lrange(name, -report_data_len, -1)
-        # 后使用ltrim保留剩下的，可以保证report_log中新push的值不会丢失
-        REDIS_INST.ltrim(name, 0, -report_data_len - 1)
-        report_data.reverse()
+        pipeline: Pipeline = REDIS_INST.pipeline(transaction=False)
+        for name in names:
+            pipeline.llen(name)
+        report_data_lens: List[int] = pipeline.execute()
+
+        drain_sub_inst_ids: List[int] = []
+        pipeline = REDIS_INST.pipeline(transaction=False)
+        for sub_inst_id, name, report_data_len in zip(sub_inst_ids, names, report_data_lens):
+            if not report_data_len:
+                continue
+            drain_sub_inst_ids.append(sub_inst_id)
+            # 从redis中取出对应长度的数据
+            pipeline.lrange(name, -report_data_len, -1)
+            # 后使用ltrim保留剩下的，可以保证report_log中新push的值不会丢失
+            pipeline.ltrim(name, 0, -report_data_len - 1)
+        # 结果依次为 lrange、ltrim 的返回值，仅取 lrange 部分
+        results: List[Any] = pipeline.execute() if drain_sub_inst_ids else []
+
+        sub_inst_id__report_data_map: Dict[int, List[bytes]] = {}
+        for sub_inst_id, report_data in zip(drain_sub_inst_ids, results[::2]):
+            report_data.reverse()
+            sub_inst_id__report_data_map[sub_inst_id] = report_data
+        return sub_inst_id__report_data_map
+
+    def parse_report_data(
+        self, host: models.Host, sub_inst_id: int, report_data: List[bytes], success_callback_step: str
+    ) -> Dict:
+        """解析上报数据，日志及失败实例由调用方批量处理"""
         cpu_arch = None
         os_version = None
         agent_id = None
@@ -869,6 +898,7 @@ class InstallService(base.AgentBaseService, remote.RemoteServiceMixin):
             # 只要匹配到成功返回步骤完成，则认为是执行完成了
             if step == success_callback_step and status == "DONE":
                 is_finished = True
+        log_content: str = ""
         # 并非每次调度都能取到日志，所以仅在非空情况下打印日志
         if logs:
             # 多行日志批量打印时，非起始日志需要补充时间等前缀，提升美观度
@@ -877,17 +907,47 @@ class InstallService(base.AgentBaseService, remote.RemoteServiceMixin):
                 for log in logs[1:]
                 if len(log.strip())
             ]
-            self.log_info(sub_inst_ids=sub_inst_id, log_content="\n".join(logs))
-        if error_log:
-            self.move_insts_to_failed([sub_inst_id], log_content=error_log)
+            log_content = "\n".join(logs)
         return {
             "sub_inst_id": sub_inst_id,
             "is_finished": is_finished,
             "cpu_arch": cpu_arch,
             "os_version": os_version,
             "agent_id": agent_id,
+            "log_content": log_content,
+            "error_log": error_log,
         }
 
+    def handle_report_data(
+        self, sub_inst_id__host_map: Dict[int, models.Host], success_callback_step: str
+    ) -> List[Dict]:
+        """
+        批量处理上报数据：一次性取出所有实例的上报数据，解析后合并写入日志及失败实例
+        :param sub_inst_id__host_map: 订阅实例ID - 主机 映射
+        :param success_callback_step: 成功回调步骤
+        :return: 各实例的解析结果
+        """
+        sub_inst_id__report_data_map: Dict[int, List[bytes]] = self.drain_report_data(
+            list(sub_inst_id__host_map.keys())
+        )
+        results: List[Dict] = [
+            self.parse_report_data(
+                host=host,
+                sub_inst_id=sub_inst_id,
+                report_data=sub_inst_id__report_data_map.get(sub_inst_id, []),
+                success_callback_step=success_callback_step,
+            )
+            for sub_inst_id, host in sub_inst_id__host_map.items()
+        ]
+        self.bulk_log_base(
+            {result["sub_inst_id"]: result["log_content"] for result in results if result["log_content"]},
+            level=LogLevel.INFO,
+        )
+        self.bulk_move_insts_to_failed(
+            {result["sub_inst_id"]: result["error_log"] for result in results if result["error_log"]}
+        )
+        return results
+
     def _schedule(self, data, parent_data, callback_data=None):
         """通过轮询redis的方式来处理，避免使用callback的方式频繁调用schedule"""
         common_data = self.get_common_data(data)
@@ -900,25 +960,18 @@ class InstallService(base.AgentBaseService, remote.RemoteServiceMixin):
             self.finish_schedule()
             return
 
-        params_list = []
+        sub_inst_id__host_map: Dict[int, models.Host] = {}
         for sub_inst_id in scheduling_sub_inst_ids:
             host: Optional[models.Host] = self.get_host(common_data, common_data.sub_inst_id__host_id_map[sub_inst_id])
             if not host:
                 continue
-
-            params_list.append(
-                {
-                    "host": host,
-                    "sub_inst_id": sub_inst_id,
-                    "success_callback_step": success_callback_step,
-                }
-            )
+            sub_inst_id__host_map[sub_inst_id] = host
 
         host_id__sub_inst_map: Dict[int, models.SubscriptionInstanceRecord] = {
             common_data.sub_inst_id__host_id_map[sub_inst.id]: sub_inst
             for sub_inst in common_data.subscription_instances
         }
-        results = concurrent.batch_call(func=self.handle_report_data, params_list=params_list)
+        results = self.handle_report_data(sub_inst_id__host_map, success_callback_step=success_callback_step)
         left_scheduling_sub_inst_ids = []
         host_info_list = []
         os_version__host_id_map = defaultdict(list)
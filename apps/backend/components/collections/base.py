@@ -10,13 +10,15 @@ specific language governing permissions and limitations under the License.
 """
 import logging
 import os
+import time
 import traceback
 import typing
-from collections import defaultdict
+from collections import defaultdict, deque
 from dataclasses import dataclass
 from typing import (
     Any,
     Callable,
+    Deque,
     Dict,
     Iterable,
     List,
@@ -28,8 +30,6 @@ from typing import (
 )
 
 from django.conf import settings
-from django.db.models import Value
-from django.db.models.functions import Concat
 from django.utils import timezone
 from django.utils.translation import ugettext as _
 
@@ -44,6 +44,7 @@ from apps.node_man.periodic_tasks.sync_cmdb_host import bulk_differential_sync_b
 from apps.prometheus import metrics
 from apps.prometheus.helper import SetupObserve
 from apps.utils import cache, time_handler, translation
+from apps.utils.basic import chunk_lists
 from apps.utils.exc import ExceptionHandler
 from pipeline.core.flow import Service
 
@@ -112,6 +113,7 @@ def service_run_exc_handler(
 
     # traceback日志进行折叠
     instance.log_debug(sub_inst_ids=sub_inst_ids, log_content=traceback.format_exc(), fold=True)
+    instance.flush_log_buffer()
 
     if instance.schedule == wrapped:
         instance.finish_schedule()
@@ -134,6 +136,16 @@ def get_labels_func(
     return {"code": instance.__class__.__name__}
 
 
+# 批量写入日志分块时，单条 INSERT 语句包含的分块数
+BULK_LOG_BATCH_SIZE = 100
+
+# 日志缓冲区的最大行数，超出后立即落库
+LOG_FLUSH_MAX_LINES = 500
+
+# 日志缓冲区的最长停留时间（秒），超出后立即落库，保证长时间执行的原子也能实时展示进度
+LOG_FLUSH_INTERVAL = 2
+
+
 class LogMixin:
 
     # 日志类
@@ -142,27 +154,102 @@ class LogMixin:
     def get_log_maker(self):
         return self.log_maker_class()
 
+    # 缓冲中的日志：(订阅实例ID, 日志内容) 队列，deque 的 append / popleft 线程安全，原子内多线程记录日志无需加锁
+    _log_buffer: Optional[Deque[Tuple[int, str]]] = None
+    # 缓冲区中最早一行日志的写入时间
+    _log_buffer_begin_at: Optional[float] = None
+
+    def get_log_buffer(self) -> Deque[Tuple[int, str]]:
+        # 服务实例会被 pipeline 序列化，旧快照反序列化后不经过 __init__，此处懒加载
+        if self._log_buffer is None:
+            self._log_buffer = deque()
+        return self._log_buffer
+
+    def buffer_log(self, sub_inst_id__log_content_map: Dict[int, str]):
+        """
+        将已格式化的日志追加到缓冲区，缓冲行数或停留时间超出阈值时落库
+        :param sub_inst_id__log_content_map: 订阅实例ID - 日志内容 映射
+        :return:
+        """
+        log_buffer: Deque[Tuple[int, str]] = self.get_log_buffer()
+        if self._log_buffer_begin_at is None:
+            self._log_buffer_begin_at = time.monotonic()
+        log_buffer.extend(sub_inst_id__log_content_map.items())
+        if (
+            len(log_buffer) >= LOG_FLUSH_MAX_LINES
+            or time.monotonic() - (self._log_buffer_begin_at or 0) >= LOG_FLUSH_INTERVAL
+        ):
+            self.flush_log_buffer()
+
+    def flush_log_buffer(self):
+        """
+        将缓冲区的日志作为分块追加落库，同一实例的多行日志合并为一个分块
+        日志仅追加写入 SubscriptionInstanceStatusDetailLog，不再改写 SubscriptionInstanceStatusDetail.log
+        :return:
+        """
+        log_buffer: Deque[Tuple[int, str]] = self.get_log_buffer()
+        self._log_buffer_begin_at = None
+        sub_inst_id__log_contents_map: Dict[int, List[str]] = defaultdict(list)
+        while True:
+            try:
+                sub_inst_id, log_content = log_buffer.popleft()
+            except IndexError:
+                break
+            sub_inst_id__log_contents_map[sub_inst_id].append(log_content)
+        if not sub_inst_id__log_contents_map:
+            return
+
+        models.SubscriptionInstanceStatusDetailLog.objects.bulk_create(
+            [
+                models.SubscriptionInstanceStatusDetailLog(
+                    subscription_instance_record_id=sub_inst_id,
+                    node_id=self.id,
+                    log="".join(f"\n{log_content}" for log_content in log_contents),
+                )
+                for sub_inst_id, log_contents in sub_inst_id__log_contents_map.items()
+            ],
+            batch_size=BULK_LOG_BATCH_SIZE,
+        )
+        # 仅刷新更新时间，表明实例仍在执行
+        for sub_inst_ids in chunk_lists(list(sub_inst_id__log_contents_map.keys()), BULK_LOG_BATCH_SIZE):
+            models.SubscriptionInstanceStatusDetail.objects.filter(
+                node_id=self.id, subscription_instance_record_id__in=sub_inst_ids
+            ).update(update_time=timezone.now())
+
     def log_base(
         self, sub_inst_ids: Union[int, List[int], None] = None, log_content: str = None, level: int = LogLevel.INFO
     ):
         """
-        记录日志
+        记录日志，日志先写入缓冲区，由 flush_log_buffer 批量落库
         :param sub_inst_ids:
         :param log_content:
         :param level:
         :return:
         """
-        filters = {"node_id": self.id}
+        log_content = self.log_maker.get_log_content(level, log_content)
         if sub_inst_ids is None:
-            pass
+            # 未指定实例时记录到节点下的全部实例
+            sub_inst_ids = list(
+                models.SubscriptionInstanceStatusDetail.objects.filter(node_id=self.id).values_list(
+                    "subscription_instance_record_id", flat=True
+                )
+            )
         elif isinstance(sub_inst_ids, int):
-            filters["subscription_instance_record_id"] = sub_inst_ids
-        else:
-            filters["subscription_instance_record_id__in"] = sub_inst_ids
+            sub_inst_ids = [sub_inst_ids]
+        self.buffer_log({sub_inst_id: log_content for sub_inst_id in sub_inst_ids})
 
-        models.SubscriptionInstanceStatusDetail.objects.filter(**filters).update(
-            log=Concat("log", Value(f"\n{self.log_maker.get_log_content(level, log_content)}")),
-            update_time=timezone.now(),
+    def bulk_log_base(self, sub_inst_id__log_content_map: Dict[int, str], level: int = LogLevel.INFO):
+        """
+        批量记录各实例不同内容的日志
+        :param sub_inst_id__log_content_map: 订阅实例ID - 日志内容 映射
+        :param level:
+        :return:
+        """
+        self.buffer_log(
+            {
+                sub_inst_id: self.log_maker.get_log_content(level, log_content)
+                for sub_inst_id, log_content in sub_inst_id__log_content_map.items()
+            }
         )
 
     def log_info(self, sub_inst_ids: Union[int, Iterable[int], None] = None, log_content: str = None):
@@ -273,6 +360,7 @@ class BaseService(Service, LogMixin, DBHelperMixin, PollingTimeoutMixin):
     def __init__(self, *args, **kwargs):
         self.failed_subscription_instance_id_reason_map: Dict = {}
         self.log_maker = self.get_log_maker()
+        self._log_buffer = deque()
         super().__init__(*args, **kwargs)
 
     def move_insts_to_failed(self, sub_inst_ids: Union[List[int], Set[int]], log_content: str = None):
@@ -286,6 +374,16 @@ class BaseService(Service, LogMixin, DBHelperMixin, PollingTimeoutMixin):
         if log_content:
             self.log_error(sub_inst_ids=sub_inst_ids, log_content=log_content)
 
+    def bulk_move_insts_to_failed(self, sub_inst_id__log_content_map: Dict[int, str]):
+        """
+        批量将实例移动至failed_subscription_instance_id_reason_map，各实例异常日志不同时使用
+        :param sub_inst_id__log_content_map: 订阅实例ID - 异常日志 映射
+        """
+        self.failed_subscription_instance_id_reason_map.update(sub_inst_id__log_content_map)
+        self.bulk_log_base(
+            {sub_inst_id: log for sub_inst_id, log in sub_inst_id__log_content_map.items() if log}, level=LogLevel.ERROR
+        )
+
     def sub_inst_failed_handler(self, sub_inst_ids: Union[List[int], Set[int]]):
         """
         订阅实例失败处理器
@@ -334,12 +432,13 @@ class BaseService(Service, LogMixin, DBHelperMixin, PollingTimeoutMixin):
         """
         if not sub_inst_ids:
             return
-        update_fields = {"status": status}
         if common_log:
-            update_fields["log"] = Concat("log", Value(f"\n{common_log}"))
+            self.buffer_log({sub_inst_id: common_log for sub_inst_id in sub_inst_ids})
+        # 状态变更前落库缓冲区的日志，保证实例状态与日志一致
+        self.flush_log_buffer()
         models.SubscriptionInstanceStatusDetail.objects.filter(
             subscription_instance_record_id__in=sub_inst_ids, node_id=self.id
-        ).update(**{**update_fields, "update_time": timezone.now()})
+        ).update(status=status, update_time=timezone.now())
 
         # 失败的实例需要更新汇总状态
         if status in [constants.JobStatusType.FAILED]:
@@ -482,6 +581,15 @@ class BaseService(Service, LogMixin, DBHelperMixin, PollingTimeoutMixin):
         pass
 
     def run(self, service_func, data, parent_data, **kwargs) -> bool:
+        # 在进入可能的多线程逻辑前初始化日志缓冲区
+        self.get_log_buffer()
+        try:
+            return self._run(service_func, data, parent_data, **kwargs)
+        finally:
+            # 原子执行过程中的日志按阈值分块落库，结束（含异常）时落库剩余日志
+            self.flush_log_buffer()
+
+    def _run(self, service_func, data, parent_data, **kwargs) -> bool:
 
         subscription_instance_ids = BaseService.get_subscription_instance_ids(data)
         act_name = data.get_one_of_inputs("act_name")
@@ -40,9 +40,10 @@ from apps.backend.components.collections.job import (
 from apps.backend.subscription import errors
 from apps.backend.subscription.steps.adapter import PolicyStepAdapter
 from apps.backend.subscription.tools import (
+    SubscriptionStepsContextBuilder,
+    batch_render_config_files_by_config_templates,
     create_group_id,
-    get_all_subscription_steps_context,
-    render_config_files_by_config_templates,
+    get_config_render_fingerprint,
 )
 from apps.core.tag import targets
 from apps.core.tag.models import Tag
@@ -943,6 +944,68 @@ class RenderAndPushConfigService(PluginBaseService, JobV3BaseService):
     渲染配置文件并调用作业平台进行下发
     """
 
+    def save_and_append_config_job_params(
+        self,
+        process_status: models.ProcessStatus,
+        rendered_configs: List[Dict[str, Any]],
+        multi_job_params_map: Dict[str, Dict[str, Any]],
+        job_meta: Dict[str, Any],
+        common_data: PluginCommonData,
+    ):
+        """
+        保存渲染后的配置，并按文件合并下发作业的参数
+        :param process_status: 进程状态
+        :param rendered_configs: 渲染后的配置文件
+        :param multi_job_params_map: 下发作业参数，原地更新
+        :param job_meta: 作业元数据
+        :param common_data: 公共数据
+        :return:
+        """
+        process_status.configs = rendered_configs
+        process_status.save()
+
+        target_host = common_data.host_id_obj_map.get(process_status.bk_host_id)
+        subscription_instance = common_data.group_id_instance_map.get(process_status.group_id)
+        path_handler = PathHandler(target_host.os_type)
+        plugin_root = self.get_plugin_root_by_process_status(process_status, common_data)
+        for config in rendered_configs:
+            file_target_path = path_handler.join(plugin_root, config["file_path"])
+            file_name = config["name"]
+            file_content = config["content"]
+            file_md5 = self.get_md5(file_content)
+            key = f"{file_target_path}-{file_name}-{file_md5}"
+            # 路径、文件名、文件内容一致，则认为是同一个文件，合并到一个作业中，提高执行效率
+            if key in multi_job_params_map:
+                self.append_unique_key_params_info(
+                    multi_job_params_map=multi_job_params_map,
+                    unique_key=key,
+                    host_obj=target_host,
+                    sub_inst=subscription_instance,
+                )
+                multi_job_params_map[key]["job_params"]["meta"] = job_meta
+            else:
+                multi_job_params_map[key] = {
+                    "md5_key": key,
+                    "job_func": JobApi.push_config_file,
+                    "subscription_instance_id": [subscription_instance.id],
+                    "subscription_id": common_data.subscription.id,
+                    "job_params": {
+                        "os_type": target_host.os_type,
+                        "target_server": {
+                            "ip_list": [
+                                {
+                                    "bk_cloud_id": target_host.bk_cloud_id,
+                                    "ip": target_host.inner_ip,
+                                }
+                            ],
+                            "host_id_list": [target_host.bk_host_id],
+                        },
+                        "file_target_path": file_target_path,
+                        "file_list": [{"file_name": file_name, "content": process_parms(file_content)}],
+                        "meta": job_meta,
+                    },
+                }
+
     def _execute(self, data, parent_data, common_data: PluginCommonData):
         job_meta = self.get_job_meta(data)
         subscription_step_id = data.get_one_of_inputs("subscription_step_id")
@@ -953,75 +1016,63 @@ class RenderAndPushConfigService(PluginBaseService, JobV3BaseService):
 
         # 此处 subscription_step 一定有值，否则前置流程已出现异常
         subscription_step = models.SubscriptionStep.objects.get(id=subscription_step_id)
+        # 订阅及步骤级上下文仅计算一次，各主机的上下文在其上叠加
+        steps_context_builder = SubscriptionStepsContextBuilder(subscription_step, policy_step_adapter)
 
-        # 组装调用作业平台的参数
-        multi_job_params_map: Dict[str, Dict[str, Any]] = {}
+        # 获取订阅的上下文变量，按配置模板及插件包分组后批量渲染
+        render_params_gby_key: Dict[Tuple[str, str, Optional[int]], Dict[str, Any]] = {}
         for process_status in process_statuses:
             target_bk_host_id = process_status.bk_host_id
             subscription_instance = group_id_instance_map.get(process_status.group_id)
             target_host = host_id_obj_map.get(target_bk_host_id)
             package = self.get_package_by_process_status(process_status, common_data)
             agent_config = self.get_agent_config_by_process_status(process_status, common_data)
-            # 获取订阅的上下文变量
-            context = get_all_subscription_steps_context(
-                subscription_step,
-                subscription_instance.instance_info,
-                target_host,
-                process_status.name,
-                agent_config,
-                policy_step_adapter,
+            context = steps_context_builder.build(
+                subscription_instance.instance_info, target_host, process_status.name, agent_config
             )
 
-            # 根据配置模板和上下文变量渲染配置文件
-            rendered_configs = render_config_files_by_config_templates(
-                policy_step_adapter.get_matching_config_tmpl_objs(target_host.os_type, target_host.cpu_arch),
+            render_key = (target_host.os_type, target_host.cpu_arch, package.id if package else None)
+            if render_key not in render_params_gby_key:
+                render_params_gby_key[render_key] = {
+                    "config_templates": policy_step_adapter.get_matching_config_tmpl_objs(
+                        target_host.os_type, target_host.cpu_arch
+                    ),
+                    "package": package,
+                    "shared_context": steps_context_builder.get_shared_context(
+                        target_host.os_type, target_host.cpu_arch
+                    ),
+                    "process_statuses": [],
+                    "contexts": [],
+                }
+            render_params = render_params_gby_key[render_key]
+
+            # 渲染会修改上下文，需在渲染前计算指纹，供巡检时跳过未变更的渲染
+            config_fingerprint = get_config_render_fingerprint(
+                render_params["config_templates"],
                 {"group_id": process_status.group_id},
                 context,
                 package_obj=package,
+            )
+            process_status.config_fingerprint = config_fingerprint or ""
+            render_params["process_statuses"].append(process_status)
+            render_params["contexts"].append(context)
+
+        # 组装调用作业平台的参数
+        multi_job_params_map: Dict[str, Dict[str, Any]] = {}
+        for render_params in render_params_gby_key.values():
+            # 根据配置模板和上下文变量渲染配置文件
+            rendered_configs_list = batch_render_config_files_by_config_templates(
+                render_params["config_templates"],
+                [{"group_id": process_status.group_id} for process_status in render_params["process_statuses"]],
+                render_params["contexts"],
+                package_obj=render_params["package"],
                 source="engine",
+                shared_context=render_params["shared_context"],
             )
-            process_status.configs = rendered_configs
-            process_status.save()
-
-            path_handler = PathHandler(target_host.os_type)
-            plugin_root = self.get_plugin_root_by_process_status(process_status, common_data)
-            for config in rendered_configs:
-                file_target_path = path_handler.join(plugin_root, config["file_path"])
-                file_name = config["name"]
-                file_content = config["content"]
-                file_md5 = self.get_md5(file_content)
-                key = f"{file_target_path}-{file_name}-{file_md5}"
-                # 路径、文件名、文件内容一致，则认为是同一个文件，合并到一个作业中，提高执行效率
-                if key in multi_job_params_map:
-                    multi_job_params_map = self.append_unique_key_params_info(
-                        multi_job_params_map=multi_job_params_map,
-                        unique_key=key,
-                        host_obj=target_host,
-                        sub_inst=subscription_instance,
-                    )
-                    multi_job_params_map[key]["job_params"]["meta"] = job_meta
-                else:
-                    multi_job_params_map[key] = {
-                        "md5_key": key,
-                        "job_func": JobApi.push_config_file,
-                        "subscription_instance_id": [subscription_instance.id],
-                        "subscription_id": common_data.subscription.id,
-                        "job_params": {
-                            "os_type": target_host.os_type,
-                            "target_server": {
-                                "ip_list": [
-                                    {
-                                        "bk_cloud_id": target_host.bk_cloud_id,
-                                        "ip": target_host.inner_ip,
-                                    }
-                                ],
-                                "host_id_list": [target_host.bk_host_id],
-                            },
-                            "file_target_path": file_target_path,
-                            "file_list": [{"file_name": file_name, "content": process_parms(file_content)}],
-                            "meta": job_meta,
-                        },
-                    }
+            for process_status, rendered_configs in zip(render_params["process_statuses"], rendered_configs_list):
+                self.save_and_append_config_job_params(
+                    process_status, rendered_configs, multi_job_params_map, job_meta, common_data
+                )
 
         if not multi_job_params_map:
             subscription_instance_ids = common_data.subscription_instance_ids
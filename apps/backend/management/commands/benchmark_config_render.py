@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+TencentBlueKing is pleased to support the open source community by making 蓝鲸智云-节点管理(BlueKing-BK-NODEMAN) available.
+Copyright (C) 2017-2022 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at https://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+import os
+import typing
+
+from django.core.management.base import BaseCommand
+from prettytable import PrettyTable
+
+from apps.backend.utils import render_engine
+from apps.mock_data.backend_mkd.render_engine import (
+    SYNTHETIC_TEMPLATE_CONTENT,
+    build_synthetic_contexts,
+)
+from apps.node_man import models
+
+
+class Command(BaseCommand):
+    help = "对比插件配置模板渲染引擎的吞吐（renders/sec 及单核 renders/sec）"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host-num", type=int, default=2000, help="渲染的主机数")
+        parser.add_argument("-t", "--template-ids", type=int, nargs="*", default=[], help="配置模板 ID，为空时使用构造模板")
+        parser.add_argument("-p", "--processes", type=int, nargs="*", default=None, help="需对比的进程数，默认为 2 及 CPU 核数")
+        parser.add_argument("-r", "--rounds", type=int, default=3, help="重复轮数，取最小耗时")
+
+    def handle(self, *args, **options):
+        if options["template_ids"]:
+            sources: typing.List[render_engine.TemplateSource] = [
+                render_engine.TemplateSource.from_config_template(config_template)
+                for config_template in models.PluginConfigTemplate.objects.filter(id__in=options["template_ids"])
+            ]
+        else:
+            sources = [
+                render_engine.TemplateSource(
+                    id=0, content=SYNTHETIC_TEMPLATE_CONTENT, name="exporter_{{ task_id }}.conf"
+                )
+            ]
+
+        processes_list: typing.List[int] = options["processes"] or sorted({2, os.cpu_count() or 1})
+        results: typing.List[typing.Dict[str, typing.Any]] = render_engine.benchmark(
+            sources=sources,
+            contexts=build_synthetic_contexts(options["host_num"]),
+            processes_list=processes_list,
+            rounds=options["rounds"],
+        )
+
+        print(f"template count: {len(sources)}, host count: {options['host_num']}, cpu count: {os.cpu_count()}")
+        result_table = PrettyTable(["engine", "processes", "renders", "seconds", "renders/sec", "renders/sec/core"])
+        for result in results:
+            result_table.add_row(
+                [
+                    result["name"],
+                    result["processes"],
+                    result["renders"],
+                    f"{result['seconds']:.3f}",
+                    f"{result['renders_per_second']:.1f}",
+                    f"{result['renders_per_second_per_core']:.1f}",
+                ]
+            )
+        print(result_table)
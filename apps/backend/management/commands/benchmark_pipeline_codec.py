@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+TencentBlueKing is pleased to support the open source community by making 蓝鲸智云-节点管理(BlueKing-BK-NODEMAN) available.
+Copyright (C) 2017-2022 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at https://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+import pickle
+import typing
+import zlib
+
+from django.core.management.base import BaseCommand
+from prettytable import PrettyTable
+
+from pipeline.engine.models import Data
+from pipeline.utils import codec
+
+
+def build_synthetic_snapshots(host_num: int) -> typing.List[typing.Dict[str, typing.Any]]:
+    """
+    构造订阅实例的节点输入输出快照，用于无线上数据时的对比
+    :param host_num: 主机数量
+    :return:
+    """
+    snapshots: typing.List[typing.Dict[str, typing.Any]] = []
+    for index in range(host_num):
+        instance_info: typing.Dict[str, typing.Any] = {
+            "host": {
+                "bk_host_id": index + 1,
+                "bk_biz_id": 2,
+                "bk_cloud_id": 0,
+                "bk_host_innerip": f"10.0.{index // 256}.{index % 256}",
+                "bk_host_innerip_v6": "",
+                "bk_agent_id": f"0100005254000123{index:016d}",
+                "bk_host_name": f"host-{index}",
+                "bk_os_type": "1",
+                "os_type": "LINUX",
+                "bk_supplier_account": "0",
+                "module": [{"bk_module_id": 10 + index % 5, "bk_module_name": f"module-{index % 5}"}],
+                "set": [{"bk_set_id": 100 + index % 3, "bk_set_name": f"set-{index % 3}"}],
+            },
+            "scope": [{"bk_obj_id": "biz", "bk_inst_id": 2, "ip": f"10.0.{index // 256}.{index % 256}"}],
+            "process": {},
+        }
+        snapshots.append(
+            {
+                "_loop": 0,
+                "_inner_loop": 0,
+                "subscription_instance_ids": [index + 1],
+                "instance_info": instance_info,
+                "meta": {"GSE_VERSION": "V2", "STEPS": ["agent"]},
+            }
+        )
+    return snapshots
+
+
+class Command(BaseCommand):
+    help = "对比 pipeline 运行时数据各编解码器的 CPU 耗时及存储大小"
+
+    def add_arguments(self, parser):
+        parser.add_argument("-s", "--sample", type=int, default=1000, help="从节点数据表采样的记录数，为 0 时使用构造数据")
+        parser.add_argument("-r", "--rounds", type=int, default=3, help="重复轮数，取最小耗时")
+        parser.add_argument("-l", "--level", type=int, default=None, help="压缩级别，为空时使用编解码器的默认级别")
+        parser.add_argument("--dict-size", type=int, default=64 * 1024, help="zstd 训练字典大小")
+        parser.add_argument("--dict-output", type=str, default="", help="训练字典的保存路径")
+
+    def handle(self, *args, **options):
+        snapshots: typing.List[typing.Any] = []
+        if options["sample"]:
+            for data in Data.objects.order_by("-pk").only("inputs", "outputs")[: options["sample"]]:
+                snapshots.extend([data.inputs, data.outputs])
+        if not snapshots:
+            snapshots = build_synthetic_snapshots(max(options["sample"], 1000))
+
+        level_options: typing.Dict[str, typing.Any] = {} if options["level"] is None else {"level": options["level"]}
+        codecs: typing.Dict[str, codec.BaseCodec] = {
+            codec.PickleCodec.name: codec.PickleCodec(),
+            codec.ZlibCodec.name: codec.ZlibCodec(**level_options),
+        }
+
+        # 偶数位样本训练字典，其余样本参与对比，避免字典直接命中测试样本
+        train_snapshots, test_snapshots = snapshots[::2], snapshots[1::2] or snapshots
+        if codec.zstandard is not None:
+            codecs[codec.ZstdCodec.name] = codec.ZstdCodec(**level_options)
+            dict_data: bytes = codec.train_zstd_dict(train_snapshots, dict_size=options["dict_size"])
+            codecs[f"{codec.ZstdCodec.name}+dict"] = codec.ZstdCodec(dict_data=dict_data, **level_options)
+            if options["dict_output"]:
+                with open(options["dict_output"], "wb") as dict_file:
+                    dict_file.write(dict_data)
+        else:
+            print("zstandard is not installed, skip zstd codecs")
+
+        results: typing.List[typing.Dict[str, typing.Any]] = codec.benchmark(
+            objs=test_snapshots,
+            codecs=codecs,
+            legacy_dumps=lambda obj: zlib.compress(pickle.dumps(obj), 6),
+            legacy_loads=lambda data: pickle.loads(zlib.decompress(data)),
+            rounds=options["rounds"],
+        )
+
+        print(f"snapshot count: {len(test_snapshots)}")
+        result_table = PrettyTable(["codec", "bytes", "ratio", "encode(ms)", "decode(ms)"])
+        for result in results:
+            result_table.add_row(
+                [
+                    result["name"],
+                    result["bytes"],
+                    f"{result['ratio']:.2%}",
+                    f"{result['encode_seconds'] * 1000:.2f}",
+                    f"{result['decode_seconds'] * 1000:.2f}",
+                ]
+            )
+        print(result_table)
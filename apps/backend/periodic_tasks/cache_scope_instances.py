@@ -9,32 +9,108 @@ an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express o
 specific language governing permissions and limitations under the License.
 """
 import logging
+import time
+import typing
+from collections import defaultdict
 
 from celery.task import periodic_task, task
 from django.core.cache import caches
 
 from apps.backend.subscription import constants, tools
 from apps.node_man import models
+from apps.prometheus import metrics
 from apps.utils.md5 import count_md5
-from apps.utils.periodic_task import calculate_countdown
 
 logger = logging.getLogger("celery")
 cache = caches["db"]
 
+SCOPE_COST_CACHE_KEY_TPL = "cache_scope_instances:cost:{scope_md5}"
+
 
 @task(queue="default", ignore_result=True)
-def get_instances_by_scope_task(subscription_id):
-    subscription = models.Subscription.objects.get(id=subscription_id)
-    scope_md5 = count_md5(subscription.scope)
+def cache_distinct_scope_instances_task(scope: typing.Dict[str, typing.Any], subscription_ids: typing.List[int]):
+    """
+    计算一个去重后的订阅范围，相同范围的订阅共用同一份缓存
+    :param scope: 经过 with_info 检查的订阅范围
+    :param subscription_ids: 使用该范围的订阅 ID 列表
+    """
+    scope_md5: str = count_md5(scope)
     logger.info(
-        f"[cache_scope_instances] (subscription: {subscription_id}) start."
-        f" scope_md5: {scope_md5}, scope: {subscription.scope}"
+        f"[cache_scope_instances] (scope_md5: {scope_md5}) start. subscription_ids: {subscription_ids}, scope: {scope}"
     )
+    begin_at: float = time.perf_counter()
     # 查询后会进行缓存，详见 get_instances_by_scope 的装饰器 func_cache_decorator
-    tools.get_instances_by_scope_with_checker(
-        subscription.scope, subscription.steps, source="get_instances_by_scope_task"
+    tools.get_instances_by_scope(scope, source="get_instances_by_scope_task")
+    cost: float = time.perf_counter() - begin_at
+
+    cache.set(SCOPE_COST_CACHE_KEY_TPL.format(scope_md5=scope_md5), cost, constants.SUBSCRIPTION_SCOPE_COST_CACHE_TIME)
+    metrics.app_task_cache_scope_instances_duration_seconds.labels(
+        node_type=scope["node_type"], object_type=scope["object_type"]
+    ).observe(cost)
+    logger.info(f"[cache_scope_instances] (scope_md5: {scope_md5}) end. cost: {cost:.3f}s")
+
+
+def estimate_scope_cost(scope_md5: str, scope: typing.Dict[str, typing.Any]) -> float:
+    """
+    估算订阅范围的计算成本，优先使用上一轮的实际耗时，无记录时按节点数估算
+    :param scope_md5: 订阅范围 md5
+    :param scope: 订阅范围
+    :return: 估算耗时（秒）
+    """
+    cost: typing.Optional[float] = cache.get(SCOPE_COST_CACHE_KEY_TPL.format(scope_md5=scope_md5))
+    if cost is not None:
+        return max(float(cost), constants.SUBSCRIPTION_SCOPE_MIN_COST_ESTIMATE)
+    node_cost: float = constants.SUBSCRIPTION_SCOPE_NODE_COST_ESTIMATE.get(
+        scope["node_type"], constants.SUBSCRIPTION_SCOPE_MIN_COST_ESTIMATE
     )
-    logger.info(f"[cache_subscription_scope_instances] (subscription: {subscription_id}) end.")
+    return max(len(scope["nodes"]) * node_cost, constants.SUBSCRIPTION_SCOPE_MIN_COST_ESTIMATE)
+
+
+def calculate_countdowns_by_cost(costs: typing.List[float], duration: int) -> typing.List[int]:
+    """
+    按成本把任务分布到 duration 秒内执行：每个任务的倒计时与其之前任务的累计成本占比成正比，重任务不扎堆
+    :param costs: 各任务的估算成本，需按成本倒序排列，保证重任务尽早开始
+    :param duration: 平摊周期(s)
+    :return: 各任务的执行倒计时（s）
+    """
+    total_cost: float = sum(costs)
+    if len(costs) <= 1 or not total_cost:
+        return [0] * len(costs)
+
+    countdowns: typing.List[int] = []
+    accumulated_cost: float = 0
+    for cost in costs:
+        countdowns.append(min(int(duration * accumulated_cost / total_cost), duration - 1))
+        accumulated_cost += cost
+    return countdowns
+
+
+def group_subscriptions_by_scope(
+    subscriptions: typing.List[models.Subscription],
+) -> typing.Dict[str, typing.Dict[str, typing.Any]]:
+    """
+    按订阅范围 md5 聚合订阅
+    :param subscriptions: 订阅列表
+    :return: {scope_md5: {"scope": scope, "subscription_ids": [...]}}
+    """
+    subscription_id__steps_map: typing.Dict[int, typing.List[models.SubscriptionStep]] = defaultdict(list)
+    for step in models.SubscriptionStep.objects.filter(
+        subscription_id__in=[subscription.id for subscription in subscriptions]
+    ):
+        subscription_id__steps_map[step.subscription_id].append(step)
+
+    scope_md5__group_map: typing.Dict[str, typing.Dict[str, typing.Any]] = {}
+    for subscription in subscriptions:
+        # with_info 影响查询结果及缓存 key，需要在计算 md5 前确定
+        scope: typing.Dict[str, typing.Any] = tools.check_scope_with_info(
+            subscription.scope, subscription_id__steps_map[subscription.id]
+        )
+        scope_md5: str = count_md5(scope)
+        group: typing.Dict[str, typing.Any] = scope_md5__group_map.setdefault(
+            scope_md5, {"scope": scope, "subscription_ids": []}
+        )
+        group["subscription_ids"].append(subscription.id)
+    return scope_md5__group_map
 
 
 @periodic_task(
@@ -44,10 +120,36 @@ def get_instances_by_scope_task(subscription_id):
 )
 def cache_scope_instances():
     """定时缓存订阅范围实例，用于提高 instance_status、statistics 等接口的速度"""
-    subscriptions = models.Subscription.objects.filter(enable=True, is_deleted=False)
-    # TODO 可以再按 scope md5 聚合一次，避免重复缓存
-    count = subscriptions.count()
-    for index, subscription in enumerate(subscriptions):
-        countdown = calculate_countdown(count=count, index=index, duration=constants.SUBSCRIPTION_UPDATE_INTERVAL)
-        logger.info(f"[cache_scope_instances] ({subscription.id}) will be run after {countdown} seconds.")
-        get_instances_by_scope_task.apply_async((subscription.id,), countdown=countdown)
+    subscriptions: typing.List[models.Subscription] = list(
+        models.Subscription.objects.filter(enable=True, is_deleted=False)
+    )
+    scope_md5__group_map: typing.Dict[str, typing.Dict[str, typing.Any]] = group_subscriptions_by_scope(subscriptions)
+
+    subscription_count: int = len(subscriptions)
+    scope_count: int = len(scope_md5__group_map)
+    dedup_ratio: float = (0, 1 - scope_count / subscription_count)[bool(subscription_count)]
+    metrics.app_task_cache_scope_instances_total.labels(type="subscription").set(subscription_count)
+    metrics.app_task_cache_scope_instances_total.labels(type="scope").set(scope_count)
+    metrics.app_task_cache_scope_instances_dedup_ratio.set(dedup_ratio)
+    logger.info(
+        f"[cache_scope_instances] subscription_count: {subscription_count}, scope_count: {scope_count}, "
+        f"dedup_ratio: {dedup_ratio:.2%}"
+    )
+
+    scope_md5__cost_map: typing.Dict[str, float] = {
+        scope_md5: estimate_scope_cost(scope_md5, group["scope"]) for scope_md5, group in scope_md5__group_map.items()
+    }
+    scope_md5s: typing.List[str] = sorted(scope_md5__cost_map, key=lambda md5: scope_md5__cost_map[md5], reverse=True)
+    countdowns: typing.List[int] = calculate_countdowns_by_cost(
+        costs=[scope_md5__cost_map[scope_md5] for scope_md5 in scope_md5s],
+        duration=constants.SUBSCRIPTION_UPDATE_INTERVAL,
+    )
+    for scope_md5, countdown in zip(scope_md5s, countdowns):
+        group: typing.Dict[str, typing.Any] = scope_md5__group_map[scope_md5]
+        logger.info(
+            f"[cache_scope_instances] (scope_md5: {scope_md5}) subscription_ids: {group['subscription_ids']}, "
+            f"estimated cost: {scope_md5__cost_map[scope_md5]:.3f}s, will be run after {countdown} seconds."
+        )
+        cache_distinct_scope_instances_task.apply_async(
+            (group["scope"], group["subscription_ids"]), countdown=countdown
+        )
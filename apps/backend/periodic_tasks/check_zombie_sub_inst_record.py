@@ -13,8 +13,6 @@ import logging
 from datetime import timedelta
 
 from celery.task import periodic_task
-from django.db.models import Value
-from django.db.models.functions import Concat
 from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 
@@ -53,11 +51,24 @@ def check_zombie_sub_inst_record():
         **base_update_kwargs
     )
 
-    forced_failed_status_detail_num = models.SubscriptionInstanceStatusDetail.objects.filter(**query_kwargs).update(
-        **base_update_kwargs,
-        log=Concat(
-            "log", Value(_("\n[{time_str} ERROR] 任务长时间处在执行状态，已强制失败").format(time_str=strftime_local(timezone.now())))
-        ),
+    zombie_status_details = list(
+        models.SubscriptionInstanceStatusDetail.objects.filter(**query_kwargs).values_list(
+            "id", "subscription_instance_record_id", "node_id"
+        )
+    )
+    forced_failed_status_detail_num = models.SubscriptionInstanceStatusDetail.objects.filter(
+        id__in=[status_detail[0] for status_detail in zombie_status_details]
+    ).update(**base_update_kwargs)
+    # 日志以分块形式追加
+    forced_failed_log = _("\n[{time_str} ERROR] 任务长时间处在执行状态，已强制失败").format(time_str=strftime_local(timezone.now()))
+    models.SubscriptionInstanceStatusDetailLog.objects.bulk_create(
+        [
+            models.SubscriptionInstanceStatusDetailLog(
+                subscription_instance_record_id=sub_inst_id, node_id=node_id, log=forced_failed_log
+            )
+            for __, sub_inst_id, node_id in zombie_status_details
+        ],
+        batch_size=500,
     )
 
     logger.info(
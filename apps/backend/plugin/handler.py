@@ -76,10 +76,8 @@ class PluginHandler:
             # 创建临时存放下载插件的目录
             tmp_dir = files.mk_and_return_tmpdir()
             with open(file=os.path.join(tmp_dir, origin_file_name), mode="wb+") as fs:
-                # 下载文件并写入fs
-                files.download_file(url=download_url, file_obj=fs, closed=False)
-                # 计算下载文件的md5
-                local_md5 = files.md5sum(file_obj=fs, closed=False)
+                # 下载文件并写入fs，写入的同时计算下载文件的md5
+                local_md5 = files.download_file(url=download_url, file_obj=fs, closed=False)
                 if local_md5 != md5:
                     logger.error(
                         "failed to valid file md5 local->[{}] user->[{}] maybe network error".format(local_md5, md5)
@@ -32,3 +32,21 @@ TASK_HOST_LIMIT = 500
 
 # 订阅范围实例缓存时间，比自动下发周期多1小时
 SUBSCRIPTION_SCOPE_CACHE_TIME = SUBSCRIPTION_UPDATE_INTERVAL + constants.TimeUnit.HOUR
+
+# 订阅范围实例计算耗时记录的缓存时间，用于缓存预热时估算计算成本
+SUBSCRIPTION_SCOPE_COST_CACHE_TIME = 7 * constants.TimeUnit.DAY
+
+# 无历史耗时记录时，按节点数估算订阅范围的计算成本（秒 / 节点）
+SUBSCRIPTION_SCOPE_NODE_COST_ESTIMATE = {"TOPO": 0.5, "INSTANCE": 0.01}
+
+# 订阅范围计算成本的最小估算值（秒）
+SUBSCRIPTION_SCOPE_MIN_COST_ESTIMATE = 0.1
+
+# 配置渲染指纹版本，渲染逻辑变更导致相同输入的渲染结果不同时需递增，使历史指纹失效
+CONFIG_RENDER_FINGERPRINT_VERSION = 2
+
+# 渲染时注入的函数，结果依赖外部数据，引用这些变量的模板不计算渲染指纹
+CONFIG_RENDER_UNSTABLE_VARIABLES = {"get_hosts_by_node"}
+
+# 回写配置渲染指纹的批量大小
+CONFIG_RENDER_FINGERPRINT_UPDATE_BATCH_SIZE = 500
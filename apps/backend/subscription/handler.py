@@ -12,13 +12,14 @@ from __future__ import absolute_import, unicode_literals
 
 import logging
 import random
+import sys
 from collections import Counter, defaultdict
 from copy import deepcopy
-from typing import Any, Dict, List, Optional, Set
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 from django.conf import settings
 from django.core.cache import cache
-from django.db.models import Max, Q, QuerySet, Value
+from django.db.models import Count, Max, Q, QuerySet, Value
 from django.utils.translation import get_language
 from django.utils.translation import ugettext as _
 
@@ -461,6 +462,42 @@ class SubscriptionHandler(object):
 
         return {"task_id": subscription_task.id, "subscription_id": subscription.id}
 
+    @staticmethod
+    def get_group_plugin_versions(subscription_ids: Set[int]) -> Dict[str, List[Tuple[str, str, int]]]:
+        """
+        获取订阅下各插件组的插件版本计数，在 DB 侧按 (group_id, name, version) 聚合
+        :param subscription_ids: 订阅 ID 集合
+        :return: {group_id: [(name, version, count), ...]}
+        """
+        group_id__plugin_versions_map: Dict[str, List[Tuple[str, str, int]]] = defaultdict(list)
+        plugin_versions = (
+            models.ProcessStatus.objects.filter(
+                source_id__in=subscription_ids, source_type=models.ProcessStatus.SourceType.SUBSCRIPTION
+            )
+            .values_list("group_id", "name", "version")
+            .annotate(count=Count("id"))
+            .order_by()
+        )
+        for group_id, name, version, count in plugin_versions.iterator():
+            group_id__plugin_versions_map[group_id].append((name, version, count))
+        return group_id__plugin_versions_map
+
+    @staticmethod
+    def get_sub_instance_statuses(subscription_ids: Set[int]) -> Dict[int, Dict[str, str]]:
+        """
+        获取订阅下各实例最新记录的执行状态
+        :param subscription_ids: 订阅 ID 集合
+        :return: {subscription_id: {instance_id: status}}
+        """
+        sub_id__instance_status_map: Dict[int, Dict[str, str]] = defaultdict(dict)
+        sub_instances = models.SubscriptionInstanceRecord.objects.filter(
+            subscription_id__in=subscription_ids, is_latest=True
+        ).values_list("subscription_id", "instance_id", "status")
+        for subscription_id, instance_id, status in sub_instances.iterator():
+            # 状态取值有限，驻留后各实例共享同一字符串对象
+            sub_id__instance_status_map[subscription_id][instance_id] = sys.intern(status)
+        return sub_id__instance_status_map
+
     @staticmethod
     def statistic(subscription_id_list: List[int]) -> List[Dict]:
         """
@@ -488,24 +525,8 @@ class SubscriptionHandler(object):
         logger.info(f"miss_sub_ids -> {miss_sub_ids}")
         subscriptions = models.Subscription.objects.filter(id__in=miss_sub_ids)
 
-        host_statuses = models.ProcessStatus.objects.filter(
-            source_id__in=subscription_id_list, source_type=models.ProcessStatus.SourceType.SUBSCRIPTION
-        ).values("version", "group_id", "name", "id")
-
-        instance_host_statuses = defaultdict(dict)
-        for host_status in host_statuses:
-            instance_host_statuses[host_status["group_id"]][host_status["id"]] = host_status
-
-        subscription_instances = list(
-            models.SubscriptionInstanceRecord.objects.filter(
-                subscription_id__in=subscription_id_list, is_latest=True
-            ).values("subscription_id", "instance_id", "status")
-        )
-        subscription_instance_status_map = defaultdict(dict)
-        for sub_inst in subscription_instances:
-            subscription_instance_status_map[sub_inst["subscription_id"]][sub_inst["instance_id"]] = {
-                "status": sub_inst["status"]
-            }
+        group_id__plugin_versions_map = SubscriptionHandler.get_group_plugin_versions(miss_sub_ids)
+        sub_id__instance_status_map = SubscriptionHandler.get_sub_instance_statuses(miss_sub_ids)
 
         sub_statistic_list: List[Dict] = []
         for subscription in subscriptions:
@@ -514,11 +535,17 @@ class SubscriptionHandler(object):
                 subscription.scope, subscription.steps, get_cache=True, source="statistic"
             )
 
+            group_id_prefix: str = tools.create_group_id_prefix(subscription)
+            instance_status_map: Dict[str, str] = sub_id__instance_status_map.get(subscription.id, {})
             status_statistic = {"SUCCESS": 0, "PENDING": 0, "FAILED": 0, "RUNNING": 0}
             plugin_versions = defaultdict(lambda: defaultdict(int))
             for instance_id, instance_info in current_instances.items():
+                status: Optional[str] = instance_status_map.get(instance_id)
+                if status is None:
+                    continue
+
                 try:
-                    group_id = tools.create_group_id(subscription, instance_info)
+                    group_id = f"{group_id_prefix}{tools.get_group_instance_id(subscription, instance_info)}"
                 except KeyError:
                     # 在订阅变更 node_type & 缓存不一致时可能会发生，极小概率事件，记录堆栈并忽略
                     logger.exception(
@@ -526,20 +553,15 @@ class SubscriptionHandler(object):
                     )
                     continue
 
-                if group_id not in instance_host_statuses:
-                    continue
-
-                if instance_id not in subscription_instance_status_map.get(subscription.id, {}):
+                group_plugin_versions = group_id__plugin_versions_map.get(group_id)
+                if not group_plugin_versions:
                     continue
 
-                sub_instance_status = subscription_instance_status_map[subscription.id][instance_id]
-
                 # 订阅实例任务状态统计
-                status_statistic[sub_instance_status["status"]] += 1
+                status_statistic[status] += 1
                 # 版本统计
-                host_statuses = instance_host_statuses.get(group_id, {}).values()
-                for host_status in host_statuses:
-                    plugin_versions[host_status["name"]][host_status["version"]] += 1
+                for name, version, count in group_plugin_versions:
+                    plugin_versions[name][version] += count
 
             sub_statistic["versions"] = [
                 {"version": version, "count": count, "name": name}
@@ -23,13 +23,17 @@ from apps.backend import constants as backend_const
 from apps.backend.components.collections import plugin
 from apps.backend.plugin.manager import PluginManager, PluginServiceActivity
 from apps.backend.subscription import errors, tools
-from apps.backend.subscription.constants import MAX_RETRY_TIME
+from apps.backend.subscription.constants import (
+    CONFIG_RENDER_FINGERPRINT_UPDATE_BATCH_SIZE,
+    MAX_RETRY_TIME,
+)
 from apps.backend.subscription.steps import adapter
 from apps.backend.subscription.steps.base import Action, Step
 from apps.core.tag import targets
 from apps.core.tag.models import Tag
 from apps.node_man import constants, models
 from apps.node_man.exceptions import ApIDNotExistsError
+from apps.prometheus import metrics
 from apps.utils import concurrent
 from common.log import logger
 from pipeline.builder import Data, Var
@@ -38,7 +42,7 @@ from pipeline.builder import Data, Var
 class PluginStep(Step):
     STEP_TYPE = "PLUGIN"
 
-    # 进程配置缓存，用于 get_all_subscription_steps_context
+    # 进程配置缓存，用于 SubscriptionStepsContextBuilder
     group_id_host_id__last_proc_status_map: Dict[str, Dict[str, Any]] = None
 
     def __init__(self, subscription_step: models.SubscriptionStep):
@@ -244,9 +248,17 @@ class PluginStep(Step):
         ap_id_obj_map: Dict,
         process_status_list: List[Dict[str, Any]],
         proc_status_id__configs_map: Dict[int, List[Dict]],
-    ) -> Dict[str, Union[bool, str]]:
+        proc_status_id__fingerprint_map: Optional[Dict[int, str]] = None,
+        steps_context_builder: Optional[tools.SubscriptionStepsContextBuilder] = None,
+    ) -> Dict[str, Any]:
         """检测配置是否有变动"""
+        proc_status_id__fingerprint_map = proc_status_id__fingerprint_map or {}
+        # 经渲染确认配置无变动的进程 ID - 最新渲染指纹，回写后下次巡检可跳过渲染
+        config_fingerprints: Dict[int, str] = {}
         try:
+            steps_context_builder = steps_context_builder or tools.SubscriptionStepsContextBuilder(
+                subscription_step, self.policy_step_adapter
+            )
             for process_status in process_status_list:
                 # 渲染新配置
                 target_host = host_map[process_status["bk_host_id"]]
@@ -254,20 +266,28 @@ class PluginStep(Step):
                 if not ap:
                     raise ApIDNotExistsError()
                 agent_config = ap.agent_config[target_host.os_type.lower()]
-                context = tools.get_all_subscription_steps_context(
-                    subscription_step,
-                    instance_info,
-                    target_host,
-                    process_status["name"],
-                    agent_config,
-                    self.policy_step_adapter,
+                context = steps_context_builder.build(instance_info, target_host, process_status["name"], agent_config)
+
+                config_templates = self.get_matching_config_templates(target_host.os_type, target_host.cpu_arch)
+                package = self.get_matching_package(target_host.os_type, target_host.cpu_arch)
+                config_fingerprint = tools.get_config_render_fingerprint(
+                    config_templates, process_status, context, package_obj=package
                 )
+                if config_fingerprint and config_fingerprint == proc_status_id__fingerprint_map.get(
+                    process_status["id"]
+                ):
+                    # 渲染输入未变化，渲染结果与已下发配置一致，无需渲染
+                    metrics.app_plugin_config_fingerprint_total.labels(plugin_name=self.plugin_name, result="hit").inc()
+                    continue
+                metrics.app_plugin_config_fingerprint_total.labels(
+                    plugin_name=self.plugin_name, result="miss" if config_fingerprint else "unsupported"
+                ).inc()
 
                 rendered_configs = tools.render_config_files_by_config_templates(
-                    self.get_matching_config_templates(target_host.os_type, target_host.cpu_arch),
+                    config_templates,
                     process_status,
                     context,
-                    package_obj=self.get_matching_package(target_host.os_type, target_host.cpu_arch),
+                    package_obj=package,
                     source="migrate",
                 )
 
@@ -282,12 +302,15 @@ class PluginStep(Step):
                         # 如果在老配置中找不到新配置，则必须重新下发
                         return {"instance_id": instance_id, "is_config_change": True}
 
+                if config_fingerprint:
+                    config_fingerprints[process_status["id"]] = config_fingerprint
+
         except Exception as e:
 
             logger.exception("检测配置文件变动失败：%s" % e)
             # 遇到异常也被认为有改动
             return {"instance_id": instance_id, "is_config_change": True}
-        return {"instance_id": instance_id, "is_config_change": False}
+        return {"instance_id": instance_id, "is_config_change": False, "config_fingerprints": config_fingerprints}
 
     def check_version_change(self, host_map: Dict[int, models.Host], statuses: List[Dict[str, Any]]) -> Dict:
         """检查版本是否有变更，并返回当前版本及目标版本"""
@@ -544,12 +567,16 @@ class PluginStep(Step):
         proc_configs_list = (
             self.filter_related_process_statuses(auto_trigger=auto_trigger)
             .filter(bk_host_id__in=set(bk_host_ids))
-            .values("id", "configs")
+            .values("id", "configs", "config_fingerprint")
         )
-        proc_status_id__configs_map: Dict[int, List[Dict]] = {
-            proc_configs["id"]: proc_configs["configs"] for proc_configs in proc_configs_list
-        }
-
+        proc_status_id__configs_map: Dict[int, List[Dict]] = {}
+        proc_status_id__fingerprint_map: Dict[int, str] = {}
+        for proc_configs in proc_configs_list:
+            proc_status_id__configs_map[proc_configs["id"]] = proc_configs["configs"]
+            proc_status_id__fingerprint_map[proc_configs["id"]] = proc_configs["config_fingerprint"]
+
+        # 订阅及步骤级上下文在各实例间共享，仅计算一次
+        steps_context_builder = tools.SubscriptionStepsContextBuilder(self.subscription_step, self.policy_step_adapter)
         check_config_change_params_list: List[Dict] = []
         for instance_id in instance_ids:
             check_config_change_params_list.append(
@@ -561,6 +588,8 @@ class PluginStep(Step):
                     "ap_id_obj_map": ap_id_obj_map,
                     "process_status_list": instance_id__proc_statuses_map[instance_id],
                     "proc_status_id__configs_map": proc_status_id__configs_map,
+                    "proc_status_id__fingerprint_map": proc_status_id__fingerprint_map,
+                    "steps_context_builder": steps_context_builder,
                 }
             )
 
@@ -569,14 +598,29 @@ class PluginStep(Step):
             func=self.check_config_change, params_list=check_config_change_params_list
         )
 
+        # 配置无变动但指纹缺失或过期（如历史数据）的进程，回写指纹
+        refreshed_proc_statuses: List[models.ProcessStatus] = []
         for check_result in check_results:
             if not check_result["is_config_change"]:
+                refreshed_proc_statuses.extend(
+                    [
+                        models.ProcessStatus(id=proc_status_id, config_fingerprint=config_fingerprint)
+                        for proc_status_id, config_fingerprint in check_result.get("config_fingerprints", {}).items()
+                    ]
+                )
                 continue
             instance_actions[check_result["instance_id"]] = push_config_action
             push_migrate_reason_func(
                 _instance_id=check_result["instance_id"], migrate_type=backend_const.PluginMigrateType.CONFIG_CHANGE
             )
 
+        if refreshed_proc_statuses:
+            models.ProcessStatus.objects.bulk_update(
+                refreshed_proc_statuses,
+                fields=["config_fingerprint"],
+                batch_size=CONFIG_RENDER_FINGERPRINT_UPDATE_BATCH_SIZE,
+            )
+
     def handle_check_and_skip_instances(
         self,
         install_action: str,
@@ -90,6 +90,18 @@ class TaskResultTools:
 
         return status
 
+    @staticmethod
+    def join_status_detail_logs(node_id_inst_status_detail_map: Dict[str, Dict[str, Any]], sub_inst_ids: List[int]):
+        """
+        拼接完整日志，完整日志由状态详情中的日志及追加写入的日志分块拼接而成
+        :param node_id_inst_status_detail_map: f"{node_id}-{subscription_instance_record_id}" - 状态详情，原地修改 log
+        :param sub_inst_ids: 订阅实例ID列表
+        :return:
+        """
+        node_inst__log_map = models.SubscriptionInstanceStatusDetailLog.get_node_inst__log_map(sub_inst_ids)
+        for node_inst, status_detail in node_id_inst_status_detail_map.items():
+            status_detail["log"] += node_inst__log_map.get(node_inst, "")
+
     @classmethod
     def _list_subscription_task_instance_status(
         cls, instance_records: List[models.SubscriptionInstanceRecord], need_detail=False
@@ -114,12 +126,15 @@ class TaskResultTools:
         fields = ["id", "subscription_instance_record_id", "node_id", "status", "update_time", "create_time"]
         if need_detail:
             fields.append("log")
+        sub_inst_ids = set([inst_record.id for inst_record in instance_records])
         node_id_inst_status_detail_map = {
             f"{status_detail['node_id']}-{status_detail['subscription_instance_record_id']}": status_detail
             for status_detail in models.SubscriptionInstanceStatusDetail.objects.filter(
-                subscription_instance_record_id__in=set([inst_record.id for inst_record in instance_records])
+                subscription_instance_record_id__in=sub_inst_ids
             ).values(*fields)
         }
+        if need_detail:
+            cls.join_status_detail_logs(node_id_inst_status_detail_map, sub_inst_ids)
 
         instance_status_list = []
         for instance_record in instance_records:
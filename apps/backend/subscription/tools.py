@@ -18,7 +18,6 @@ import os
 import pprint
 import typing
 from collections import Counter, defaultdict
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from functools import wraps
 from itertools import groupby
 from typing import Any, Dict, List, Union
@@ -31,13 +30,26 @@ from apps.backend.components.collections import core
 from apps.backend.constants import FilterFieldName, InstNodeType
 from apps.backend.subscription import task_tools
 from apps.backend.subscription.commons import get_host_by_inst, list_biz_hosts
-from apps.backend.subscription.constants import SUBSCRIPTION_SCOPE_CACHE_TIME
+from apps.backend.subscription.constants import (
+    CONFIG_RENDER_FINGERPRINT_VERSION,
+    CONFIG_RENDER_UNSTABLE_VARIABLES,
+    SUBSCRIPTION_SCOPE_CACHE_TIME,
+)
 from apps.backend.subscription.errors import (
     ConfigRenderFailed,
     MultipleObjectError,
     PipelineTreeParseError,
 )
-from apps.backend.utils.data_renderer import nested_render_data
+from apps.backend.utils.data_renderer import (
+    get_context_variable_closure,
+    nested_render_data,
+)
+from apps.backend.utils.render_engine import (
+    CopyOnWriteContext,
+    TemplateRenderError,
+    TemplateSource,
+    config_render_engine,
+)
 from apps.component.esbclient import client_v2
 from apps.core.concurrent import controller
 from apps.core.concurrent.cache import FuncCacheDecorator
@@ -48,7 +60,11 @@ from apps.prometheus import metrics
 from apps.prometheus.helper import SetupObserve, get_call_resource_labels_func
 from apps.utils import concurrent
 from apps.utils.basic import chunk_lists, distinct_dict_list, order_dict
-from apps.utils.batch_request import batch_request, request_multi_thread
+from apps.utils.batch_request import (
+    batch_request,
+    iter_request_results,
+    request_multi_thread,
+)
 from apps.utils.concurrent import batch_call
 from apps.utils.time_handler import strftime_local
 from common.api import CCApi
@@ -73,18 +89,30 @@ def create_group_id(subscription: models.Subscription, instance: Dict) -> str:
                     }
     :return: sub_1234_host_1
     """
+    return f"{create_group_id_prefix(subscription)}{get_group_instance_id(subscription, instance)}"
+
+
+def create_group_id_prefix(subscription: models.Subscription) -> str:
+    """
+    创建插件组ID前缀，同一订阅下的插件组ID仅实例ID不同，批量创建时可复用
+    :param subscription: 订阅对象
+    :return: sub_1234_host_
+    """
+    return f"sub_{subscription.id}_{subscription.object_type.lower()}_"
+
+
+def get_group_instance_id(subscription: models.Subscription, instance: Dict) -> int:
+    """
+    获取插件组ID中的实例ID
+    :param subscription: 订阅对象
+    :param instance: CMDB实例（可能是主机实例或者服务实例）
+    :return: 服务实例ID 或 主机ID
+    """
     if subscription.object_type == subscription.ObjectType.SERVICE:
         # 服务实例
-        instance_id = instance["service"]["id"]
-    else:
-        # 主机实例
-        instance_id = instance["host"]["bk_host_id"]
-    group_id = "sub_{subscription_id}_{object_type}_{instance_id}".format(
-        subscription_id=subscription.id,
-        object_type=subscription.object_type.lower(),
-        instance_id=instance_id,
-    )
-    return group_id
+        return instance["service"]["id"]
+    # 主机实例
+    return instance["host"]["bk_host_id"]
 
 
 def parse_group_id(group_id: str) -> Dict:
@@ -270,13 +298,24 @@ def find_host_biz_relations(bk_host_ids: List[int]) -> List[Dict]:
     if not bk_host_ids:
         return []
 
+    host_biz_relations: List[Dict] = []
+    for host_biz_relations_chunk in iter_host_biz_relations(bk_host_ids):
+        host_biz_relations.extend(host_biz_relations_chunk)
+    return host_biz_relations
+
+
+def iter_host_biz_relations(bk_host_ids: List[int]) -> typing.Iterator[List[Dict]]:
+    """
+    分批流式查询主机所属拓扑关系，按批次顺序返回，处理已返回批次时后续批次仍在请求中
+    :param bk_host_ids: 主机ID列表 [1, 2, 3]
+    :return: 每批主机所属拓扑关系
+    """
     # CMDB 限制了单次查询数量，这里需分批并发请求查询
     param_list = [
         {"bk_host_id": bk_host_ids[count * constants.QUERY_CMDB_LIMIT : (count + 1) * constants.QUERY_CMDB_LIMIT]}
         for count in range(math.ceil(len(bk_host_ids) / constants.QUERY_CMDB_LIMIT))
     ]
-    host_biz_relations = request_multi_thread(client_v2.cc.find_host_biz_relations, param_list, get_data=lambda x: x)
-    return host_biz_relations
+    return iter_request_results(client_v2.cc.find_host_biz_relations, param_list)
 
 
 @controller.ConcurrentController(
@@ -733,6 +772,7 @@ def get_host_relation(bk_biz_id, nodes):
     data = []
     hosts = get_host_by_inst(bk_biz_id, nodes)
 
+    # 经 find_host_biz_relations 查询，保留按来源上报的调用指标
     host_biz_relations = find_host_biz_relations([_host["bk_host_id"] for _host in hosts], source="get_host_relation")
 
     relations = defaultdict(lambda: defaultdict(list))
@@ -823,10 +863,15 @@ def get_scope_labels_func(
     }
 
 
-def get_instances_by_scope_with_checker(
-    scope: Dict[str, Union[Dict, int, Any]], steps: List[models.SubscriptionStep], *args, **kwargs
-) -> Dict[str, Dict[str, Union[Dict, Any]]]:
-
+def check_scope_with_info(
+    scope: Dict[str, Union[Dict, int, Any]], steps: List[models.SubscriptionStep]
+) -> Dict[str, Union[Dict, int, Any]]:
+    """
+    根据订阅步骤是否引用进程信息，设置查询范围的 with_info
+    :param scope: 订阅范围
+    :param steps: 订阅步骤
+    :return: 设置 with_info 后的订阅范围
+    """
     if "with_info" in scope:
         scope["with_info"]["process"] = False
     else:
@@ -838,12 +883,18 @@ def get_instances_by_scope_with_checker(
             scope["with_info"]["process"] = True
             break
 
-    return get_instances_by_scope(scope, *args, **kwargs)
+    return scope
+
+
+def get_instances_by_scope_with_checker(
+    scope: Dict[str, Union[Dict, int, Any]], steps: List[models.SubscriptionStep], *args, **kwargs
+) -> Dict[str, Dict[str, Union[Dict, Any]]]:
+    return get_instances_by_scope(check_scope_with_info(scope, steps), *args, **kwargs)
 
 
 @support_multi_biz
 @SetupObserve(histogram=metrics.app_task_get_instances_by_scope_duration_seconds, get_labels_func=get_scope_labels_func)
-@FuncCacheDecorator(cache_time=SUBSCRIPTION_SCOPE_CACHE_TIME)
+@FuncCacheDecorator(cache_time=SUBSCRIPTION_SCOPE_CACHE_TIME, single_flight=True, early_refresh_beta=1)
 def get_instances_by_scope(scope: Dict[str, Union[Dict, int, Any]]) -> Dict[str, Dict[str, Union[Dict, Any]]]:
     """
     获取范围内的所有主机
@@ -894,6 +945,7 @@ def get_instances_by_scope(scope: Dict[str, Union[Dict, int, Any]]) -> Dict[str,
         return {}
 
     need_register = scope.get("need_register", False)
+    is_instances_selected: bool = False
     # 按照拓扑查询
     if scope["node_type"] == models.Subscription.NodeType.TOPO:
         if scope["object_type"] == models.Subscription.ObjectType.HOST:
@@ -943,14 +995,18 @@ def get_instances_by_scope(scope: Dict[str, Union[Dict, int, Any]]) -> Dict[str,
                     for inst in get_host_detail_by_template(list(bk_obj_id_set)[0], nodes, bk_biz_id=bk_biz_id)
                 ]
             )
+            # 先按筛选器过滤，避免为被过滤的主机查询业务关系
+            if instance_selector:
+                instances = select_instances(bk_biz_id, scope["object_type"], instances, instance_selector)
+                is_instances_selected = True
             bk_host_id_chunks = chunk_lists([instance["host"]["bk_host_id"] for instance in instances], 500)
-            with ThreadPoolExecutor(max_workers=settings.CONCURRENT_NUMBER) as ex:
-                tasks = [
-                    ex.submit(client_v2.cc.find_host_biz_relations, dict(bk_host_id=chunk, bk_biz_id=bk_biz_id))
-                    for chunk in bk_host_id_chunks
-                ]
-                for future in as_completed(tasks):
-                    host_biz_relations.extend(future.result())
+            host_biz_relations.extend(
+                batch_call(
+                    client_v2.cc.find_host_biz_relations,
+                    params_list=[{"bk_host_id": chunk, "bk_biz_id": bk_biz_id} for chunk in bk_host_id_chunks],
+                    extend_result=True,
+                )
+            )
 
             # 转化模板为节点
             nodes = set_template_scope_nodes(scope)
@@ -964,6 +1020,10 @@ def get_instances_by_scope(scope: Dict[str, Union[Dict, int, Any]]) -> Dict[str,
                 [{"service": inst} for inst in get_service_instance_by_inst(bk_biz_id, nodes, module_to_topo)]
             )
 
+    # 在补充主机、范围、进程等信息前过滤 instances，被过滤的实例无需额外查询
+    if instance_selector and not is_instances_selected:
+        instances = select_instances(bk_biz_id, scope["object_type"], instances, instance_selector)
+
     if not need_register:
         # 补充必要的主机或实例相关信息
 
@@ -979,35 +1039,60 @@ def get_instances_by_scope(scope: Dict[str, Union[Dict, int, Any]]) -> Dict[str,
         "node_type": models.Subscription.NodeType.INSTANCE,
     }
 
-    bk_host_ids = []
-
     for instance in instances:
         is_host = data["object_type"] == models.Subscription.ObjectType.HOST
         instance_data = instance["host"] if is_host else instance["service"]
 
         data.update(instance_data)
-        bk_host_ids.append(instance_data.get("bk_host_id"))
         instances_dict[create_node_id(data)] = instance
 
-    # 对 instances 进行二次过滤
-    if instance_selector and bk_host_ids:
-        instance_selector_host_ids = HostQuerySqlHelper.multiple_cond_sql(
-            params={"bk_host_id": bk_host_ids, "conditions": instance_selector},
+    return instances_dict
+
+
+def get_instance_selector_host_ids(
+    bk_biz_id: int, bk_host_ids: typing.Iterable[int], instance_selector: typing.List[typing.Dict]
+) -> typing.Set[int]:
+    """
+    查询满足筛选条件的主机 ID，物化为集合以便 O(1) 判断实例是否命中
+    :param bk_biz_id: 业务ID
+    :param bk_host_ids: 待筛选的主机 ID
+    :param instance_selector: 实例筛选器
+    :return: 满足筛选条件的主机 ID 集合
+    """
+    return set(
+        HostQuerySqlHelper.multiple_cond_sql(
+            params={"bk_host_id": list(bk_host_ids), "conditions": instance_selector},
             biz_scope=[bk_biz_id],
             return_all_node_type=True,
         ).values_list("bk_host_id", flat=True)
+    )
 
-        selector_instances_dict = {}
-        for node_id, instance in instances_dict.items():
-            is_host = data["object_type"] == models.Subscription.ObjectType.HOST
-            instance_data = instance["host"] if is_host else instance["service"]
-
-            if instance_data["bk_host_id"] in instance_selector_host_ids:
-                selector_instances_dict[node_id] = instance if is_host else instance["service"]
 
-        return selector_instances_dict
+def select_instances(
+    bk_biz_id: int, object_type: str, instances: List[Dict], instance_selector: typing.List[typing.Dict]
+) -> List[Dict]:
+    """
+    按实例筛选器过滤实例
+    :param bk_biz_id: 业务ID
+    :param object_type: 对象类型
+    :param instances: 实例列表
+    :param instance_selector: 实例筛选器
+    :return: 命中筛选器的实例列表
+    """
+    is_host: bool = object_type == models.Subscription.ObjectType.HOST
+    instance_host_ids: typing.List[typing.Optional[int]] = [
+        (instance["host"] if is_host else instance["service"]).get("bk_host_id") for instance in instances
+    ]
+    bk_host_ids: typing.Set[int] = {bk_host_id for bk_host_id in instance_host_ids if bk_host_id is not None}
+    if not bk_host_ids:
+        return instances
 
-    return instances_dict
+    selector_host_ids: typing.Set[int] = get_instance_selector_host_ids(bk_biz_id, bk_host_ids, instance_selector)
+    return [
+        instance
+        for instance, bk_host_id in zip(instances, instance_host_ids)
+        if bk_host_id is not None and bk_host_id in selector_host_ids
+    ]
 
 
 def add_host_info_to_instances(bk_biz_id: int, scope: Dict, instances: Dict):
@@ -1183,6 +1268,97 @@ def get_plugin_common_constants(plugin_name: str) -> Dict:
     return plugin_constants
 
 
+class SubscriptionStepsContextBuilder:
+    """
+    订阅步骤上下文构造器
+    订阅级（各步骤参数）及步骤级（匹配的步骤参数、插件公共常量）上下文仅计算一次，
+    主机级变量叠加在其上构成写时复制上下文，渲染时仅复制模板可访问的可变变量，无需逐台深拷贝整个上下文
+    """
+
+    def __init__(self, subscription_step: models.SubscriptionStep, policy_step_adapter):
+        """
+        :param subscription_step: 订阅步骤
+        :param PolicyStepAdapter policy_step_adapter: 策略步骤适配器
+        """
+        self.subscription_step = subscription_step
+        self.policy_step_adapter = policy_step_adapter
+        self.steps: List[models.SubscriptionStep] = subscription_step.subscription.steps
+        self.step_id__params_context_map: Dict[str, Dict] = {
+            step.step_id: order_dict(step.params.get("context") or {}) for step in self.steps
+        }
+        # (os_type, cpu_arch) - 共享上下文
+        self._os_key__shared_context_map: Dict[typing.Tuple[str, str], Dict] = {}
+        # 插件名称 - 插件配置公共常量
+        self._plugin_name__constants_map: Dict[str, Dict] = {}
+
+    def get_shared_context(self, os_type: str, cpu_arch: str) -> Dict:
+        """
+        获取同一操作系统及架构的主机共享的上下文，不可修改
+        :param os_type: 操作系统
+        :param cpu_arch: CPU 架构
+        :return:
+        """
+        os_key: typing.Tuple[str, str] = (os_type.lower(), cpu_arch)
+        shared_context: typing.Optional[Dict] = self._os_key__shared_context_map.get(os_key)
+        if shared_context is None:
+            # 将 step.params 中 context 提取到第一层，提供给模板渲染
+            step_params = self.policy_step_adapter.get_matching_step_params(os_key[0], cpu_arch)
+            shared_context = dict(step_params.get("context", {}))
+            shared_context.update(self.step_id__params_context_map[self.subscription_step.step_id])
+            self._os_key__shared_context_map[os_key] = shared_context
+        return shared_context
+
+    def get_plugin_common_constants(self, plugin_name: str) -> Dict:
+        if plugin_name not in self._plugin_name__constants_map:
+            self._plugin_name__constants_map[plugin_name] = get_plugin_common_constants(plugin_name)
+        return self._plugin_name__constants_map[plugin_name]
+
+    def build(
+        self, instance_info: Dict, target_host: models.Host, plugin_name: str, agent_config: Dict
+    ) -> CopyOnWriteContext:
+        """
+        构造主机的上下文，变量及顺序与逐项合并后深拷贝所得的字典一致
+        :param instance_info: 实例信息
+        :param target_host: 主机信息
+        :param plugin_name: 插件名称
+        :param agent_config: AGENT配置
+        :return:
+        """
+        from apps.backend.subscription.steps import StepFactory
+
+        # 当前步骤的参数已在共享层，主机层仅叠加步骤数据
+        host_context: Dict[str, Any] = {}
+        all_step_data: Dict[str, Dict] = {}
+        for step in self.steps:
+            # 步骤管理器缓存在步骤对象上，无需重复创建
+            step_data = StepFactory.get_step_manager(step).get_step_data(instance_info, target_host, agent_config)
+            if step.step_id == self.subscription_step.step_id:
+                host_context.update(step_data)
+            step_context = dict(self.step_id__params_context_map[step.step_id])
+            step_context.update(step_data)
+            all_step_data[step.step_id] = step_context
+
+        host_context.update(
+            cmdb_instance=instance_info,
+            step_data=all_step_data,
+            target=instance_info,
+            plugin_path=get_plugin_path(plugin_name, target_host, agent_config),
+            nodeman={
+                "host": {
+                    "bk_host_id": target_host.bk_host_id,
+                    "os_type": target_host.os_type,
+                    "cpu_arch": target_host.cpu_arch,
+                    "inner_ip": target_host.inner_ip,
+                    "outer_ip": target_host.outer_ip,
+                    "login_ip": target_host.login_ip,
+                },
+                # 获取插件配置公共常量
+                "constants": self.get_plugin_common_constants(plugin_name),
+            },
+        )
+        return CopyOnWriteContext(self.get_shared_context(target_host.os_type, target_host.cpu_arch), host_context)
+
+
 def get_all_subscription_steps_context(
     subscription_step: models.SubscriptionStep,
     instance_info: Dict,
@@ -1192,7 +1368,7 @@ def get_all_subscription_steps_context(
     policy_step_adapter,
 ) -> Dict:
     """
-    获取订阅步骤上下文数据
+    获取订阅步骤上下文数据，批量获取时使用 SubscriptionStepsContextBuilder，避免逐台计算及深拷贝
     :param agent_config:
     :param SubscriptionStep subscription_step:
     :param dict instance_info: 实例信息
@@ -1201,43 +1377,11 @@ def get_all_subscription_steps_context(
     :param PolicyStepAdapter policy_step_adapter: 策略步骤适配器
     :return:
     """
-    from apps.backend.subscription.steps import StepFactory
-
-    context = {}
-    all_step_data = {}
-    for step in subscription_step.subscription.steps:
-        step_context = order_dict(step.params.get("context") or {})
-        step_context.update(StepFactory.get_step_manager(step).get_step_data(instance_info, target_host, agent_config))
-        all_step_data[step.step_id] = step_context
-
-    plugin_path = get_plugin_path(plugin_name, target_host, agent_config)
-
-    # 将 step.params 中 context 提取到第一层，提供给模板渲染
-    step_params = policy_step_adapter.get_matching_step_params(target_host.os_type.lower(), target_host.cpu_arch)
-
-    context.update(step_params.get("context", {}))
-    context.update(all_step_data[subscription_step.step_id])
-    context.update(
-        cmdb_instance=instance_info,
-        step_data=all_step_data,
-        target=instance_info,
-        plugin_path=plugin_path,
-        nodeman={
-            "host": {
-                "bk_host_id": target_host.bk_host_id,
-                "os_type": target_host.os_type,
-                "cpu_arch": target_host.cpu_arch,
-                "inner_ip": target_host.inner_ip,
-                "outer_ip": target_host.outer_ip,
-                "login_ip": target_host.login_ip,
-            },
-            # 获取插件配置公共常量
-            "constants": get_plugin_common_constants(plugin_name),
-        },
+    context = SubscriptionStepsContextBuilder(subscription_step, policy_step_adapter).build(
+        instance_info, target_host, plugin_name, agent_config
     )
     # 深拷贝一份，避免原数据后续被污染
-    context = copy.deepcopy(context)
-    return context
+    return copy.deepcopy(dict(context))
 
 
 def render_config_files(
@@ -1294,6 +1438,59 @@ def render_config_files(
     return rendered_configs
 
 
+def make_rendered_config(
+    template: models.PluginConfigTemplate,
+    content: str,
+    rendered_name: str,
+    process_status_info: Dict[str, Any],
+    package_obj: models.Packages,
+    source: typing.Optional[str] = None,
+) -> typing.Optional[Dict[str, Any]]:
+    """
+    根据渲染结果组装配置文件信息
+    :param template: 配置文件模板
+    :param content: 渲染后的配置内容
+    :param rendered_name: 渲染后的模板名称
+    :param process_status_info: 主机进程信息
+    :param package_obj: 插件包对象
+    :param source: 调用来源
+    :return: 配置文件名称为空时返回 None
+    """
+    # 计算配置文件的MD5
+    md5 = hashlib.md5()
+    md5.update(content.encode())
+    md5sum = md5.hexdigest()
+
+    rendered_config = {"md5": md5sum, "content": content, "file_path": template.file_path}
+    if package_obj and package_obj.plugin_desc.is_official and not template.is_main:
+        # 官方插件的部署方式为单实例多配置，在配置模板的名称上追加 group id 即可对配置文件做唯一标识
+        filename, extension = os.path.splitext(template.name)
+        rendered_config["name"] = "{filename}_{group_id}{extension}".format(
+            filename=filename, group_id=process_status_info["group_id"], extension=extension
+        )
+    else:
+        # 非官方插件、官方插件中的主配置文件，无需追加 group id
+        # 适配模板名可渲染的形式
+        rendered_config["name"] = rendered_name
+
+    if not rendered_config["name"]:
+        return None
+
+    common_labels = {
+        "plugin_name": template.plugin_name,
+        "name": template.name,
+        "os": template.os,
+        "cpu_arch": template.cpu_arch,
+        "source": source or "default",
+    }
+    if md5sum == template.md5:
+        metrics.app_plugin_render_configs_total.labels(**common_labels, type="equal_to_template").inc()
+        logger.warning("[render_config_files_by_config_templates] render config equal to template -> %s", template)
+    else:
+        metrics.app_plugin_render_configs_total.labels(**common_labels, type="default").inc()
+    return rendered_config
+
+
 def render_config_files_by_config_templates(
     config_templates: List[models.PluginConfigTemplate],
     process_status_info: Dict[str, Any],
@@ -1325,41 +1522,114 @@ def render_config_files_by_config_templates(
         except Exception as e:
             raise ConfigRenderFailed({"name": template.name, "msg": e})
 
-        # 计算配置文件的MD5
-        md5 = hashlib.md5()
-        md5.update(content.encode())
-        md5sum = md5.hexdigest()
+        rendered_config = make_rendered_config(
+            template,
+            content,
+            nested_render_data(template.name, context),
+            process_status_info,
+            package_obj=package_obj,
+            source=source,
+        )
+        if rendered_config:
+            rendered_configs.append(rendered_config)
+    return rendered_configs
 
-        rendered_config = {"md5": md5sum, "content": content, "file_path": template.file_path}
-        if package_obj and package_obj.plugin_desc.is_official and not template.is_main:
-            # 官方插件的部署方式为单实例多配置，在配置模板的名称上追加 group id 即可对配置文件做唯一标识
-            filename, extension = os.path.splitext(template.name)
-            rendered_config["name"] = "{filename}_{group_id}{extension}".format(
-                filename=filename, group_id=process_status_info["group_id"], extension=extension
+
+def batch_render_config_files_by_config_templates(
+    config_templates: List[models.PluginConfigTemplate],
+    process_status_infos: List[Dict[str, Any]],
+    contexts: List[Dict],
+    package_obj: models.Packages,
+    source: typing.Optional[str] = None,
+    shared_context: typing.Optional[Dict] = None,
+) -> List[List[Dict[str, Any]]]:
+    """
+    批量渲染多台主机的配置模板，结果与逐台调用 render_config_files_by_config_templates 一致
+    主机数较多时通过渲染引擎的进程池并行渲染，模板引用了渲染时注入的函数时仍在当前进程逐台渲染
+    :param config_templates: 配置文件模板
+    :param process_status_infos: 各主机的进程信息
+    :param contexts: 各主机的上下文信息，与 process_status_infos 一一对应
+    :param package_obj: 插件包对象
+    :param source: 调用来源
+    :param shared_context: 各主机共享的步骤级上下文，叠加在其上的写时复制上下文分发到子进程时仅序列化主机层
+    :return: 与 contexts 顺序一致的渲染结果
+    """
+    template_sources: List[TemplateSource] = [
+        TemplateSource.from_config_template(template) for template in config_templates
+    ]
+    referenced_variables: typing.Set[str] = set()
+    for template_source in template_sources:
+        referenced_variables.update(config_render_engine.compile(template_source).variables)
+
+    if referenced_variables & CONFIG_RENDER_UNSTABLE_VARIABLES:
+        return [
+            render_config_files_by_config_templates(
+                config_templates, process_status_info, context, package_obj=package_obj, source=source
             )
-        else:
-            # 非官方插件、官方插件中的主配置文件，无需追加 group id
-            # 适配模板名可渲染的形式
-            rendered_config["name"] = nested_render_data(template.name, context)
-
-        common_labels = {
-            "plugin_name": template.plugin_name,
-            "name": template.name,
-            "os": template.os,
-            "cpu_arch": template.cpu_arch,
-            "source": source or "default",
-        }
+            for process_status_info, context in zip(process_status_infos, contexts)
+        ]
 
-        if rendered_config["name"]:
-            if md5sum == template.md5:
-                metrics.app_plugin_render_configs_total.labels(**common_labels, type="equal_to_template").inc()
-                logger.warning(
-                    "[render_config_files_by_config_templates] render config equal to template -> %s", template
-                )
-            else:
-                metrics.app_plugin_render_configs_total.labels(**common_labels, type="default").inc()
-            rendered_configs.append(rendered_config)
-    return rendered_configs
+    try:
+        render_results_list = config_render_engine.render_batch(
+            template_sources, contexts, shared_context=shared_context
+        )
+    except TemplateRenderError as e:
+        raise ConfigRenderFailed({"name": e.name, "msg": e.msg})
+
+    rendered_configs_list: List[List[Dict[str, Any]]] = []
+    for process_status_info, render_results in zip(process_status_infos, render_results_list):
+        rendered_configs: List[Dict[str, Any]] = []
+        for template, (content, rendered_name) in zip(config_templates, render_results):
+            rendered_config = make_rendered_config(
+                template, content, rendered_name, process_status_info, package_obj=package_obj, source=source
+            )
+            if rendered_config:
+                rendered_configs.append(rendered_config)
+        rendered_configs_list.append(rendered_configs)
+    return rendered_configs_list
+
+
+def get_config_render_fingerprint(
+    config_templates: List[models.PluginConfigTemplate],
+    process_status_info: Dict[str, Any],
+    context: Dict,
+    package_obj: models.Packages,
+) -> typing.Optional[str]:
+    """
+    计算配置渲染指纹，指纹一致时渲染结果一致，可跳过渲染
+    指纹覆盖影响 render_config_files_by_config_templates 结果的全部输入：
+    模板 ID / 版本 / 内容、文件名规则、group_id 以及模板（含上下文自渲染）实际引用的上下文变量
+    :param config_templates: 配置文件模板
+    :param process_status_info: 主机进程信息
+    :param context: 上下文信息，需在渲染前计算，渲染会修改上下文
+    :param package_obj: 插件包对象
+    :return: 指纹，模板引用了依赖外部数据的变量时返回 None
+    """
+    template_sources: List[TemplateSource] = [
+        TemplateSource.from_config_template(template) for template in config_templates
+    ]
+    referenced_variables: typing.Set[str] = set()
+    for template_source in template_sources:
+        referenced_variables.update(config_render_engine.compile(template_source).variables)
+    if referenced_variables & CONFIG_RENDER_UNSTABLE_VARIABLES:
+        return None
+
+    # 渲染前上下文会先渲染自身，被引用的变量又可能引用其他变量，需取闭包
+    closure: Dict[str, bool] = get_context_variable_closure(referenced_variables, context)
+
+    fingerprint_data: Dict[str, Any] = {
+        "version": CONFIG_RENDER_FINGERPRINT_VERSION,
+        # 模板对象上的 md5 为对象级缓存，使用按当前内容计算的摘要
+        "templates": [
+            [template.id, template.version, template_source.digest, template.is_main, template.file_path]
+            for template, template_source in zip(config_templates, template_sources)
+        ],
+        "group_id": process_status_info["group_id"],
+        "is_official": bool(package_obj and package_obj.plugin_desc.is_official),
+        # 保持上下文原有顺序，自渲染按顺序进行，顺序变化可能影响结果
+        "context": [[key, value] for key, value in context.items() if key in closure],
+    }
+    return hashlib.md5(json.dumps(fingerprint_data, default=str).encode()).hexdigest()
 
 
 def get_subscription_task_instance_status(instance_record, pipeline_parser, need_detail=False, need_log=False):
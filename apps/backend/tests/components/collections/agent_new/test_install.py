@@ -38,6 +38,7 @@ from apps.exceptions import ApiResultError
 from apps.mock_data import api_mkd, common_unit
 from apps.mock_data import utils as mock_data_utils
 from apps.node_man import constants, models
+from apps.utils.unittest.testcase import CustomBaseTestCase
 from env.constants import GseVersion
 from pipeline.component_framework.test import (
     ComponentTestCase,
@@ -1350,3 +1351,84 @@ class OpenJumpPolicyUsingChannelNotInDirect(InstallWindowsPagentTestCase):
 
         # windows batch方案(保持原有三步)
         self.assertEqual(len(batch_solutions.steps), 3)
+
+
+class HandleReportDataTestCase(CustomBaseTestCase):
+    NODE_ID = "install_node"
+    SUB_INST_IDS = [1, 2, 3]
+    SUCCESS_CALLBACK_STEP = "check_deploy_result"
+
+    def setUp(self):
+        super().setUp()
+        self.service = install.InstallService()
+        self.service.setup_runtime_attrs(id=self.NODE_ID)
+        self.host = models.Host(
+            inner_ip="127.0.0.1", os_type=constants.OsType.LINUX, node_type=constants.NodeType.AGENT
+        )
+        for sub_inst_id in self.SUB_INST_IDS:
+            models.SubscriptionInstanceStatusDetail.objects.create(
+                subscription_instance_record_id=sub_inst_id, node_id=self.NODE_ID, log=""
+            )
+            REDIS_INST.delete(REDIS_INSTALL_CALLBACK_KEY_TPL.format(sub_inst_id=sub_inst_id))
+
+    @staticmethod
+    def push_reports(sub_inst_id: int, reports: List[Dict[str, str]]):
+        for report in reports:
+            REDIS_INST.lpush(
+                REDIS_INSTALL_CALLBACK_KEY_TPL.format(sub_inst_id=sub_inst_id),
+                json.dumps({"timestamp": "1580870937", "level": "INFO", "status": "DONE", **report}),
+            )
+
+    def get_log(self, sub_inst_id: int) -> str:
+        status_detail_log: str = models.SubscriptionInstanceStatusDetail.objects.get(
+            subscription_instance_record_id=sub_inst_id, node_id=self.NODE_ID
+        ).log
+        node_inst__log_map = models.SubscriptionInstanceStatusDetailLog.get_node_inst__log_map([sub_inst_id])
+        return status_detail_log + node_inst__log_map.get(f"{self.NODE_ID}-{sub_inst_id}", "")
+
+    def test_drain_report_data(self):
+        self.push_reports(1, [{"step": "download_pkg", "log": "first"}, {"step": "download_pkg", "log": "second"}])
+        self.push_reports(3, [{"step": "download_pkg", "log": "only"}])
+
+        sub_inst_id__report_data_map = install.InstallService.drain_report_data(self.SUB_INST_IDS)
+
+        # 无上报数据的实例不返回，上报数据按上报顺序排列
+        self.assertEqual(set(sub_inst_id__report_data_map.keys()), {1, 3})
+        self.assertEqual([json.loads(data)["log"] for data in sub_inst_id__report_data_map[1]], ["first", "second"])
+        self.assertEqual([json.loads(data)["log"] for data in sub_inst_id__report_data_map[3]], ["only"])
+        # 取出的数据从 Redis 中移除
+        for sub_inst_id in self.SUB_INST_IDS:
+            self.assertEqual(REDIS_INST.llen(REDIS_INSTALL_CALLBACK_KEY_TPL.format(sub_inst_id=sub_inst_id)), 0)
+        self.assertEqual(install.InstallService.drain_report_data(self.SUB_INST_IDS), {})
+
+    def test_handle_report_data(self):
+        self.push_reports(
+            1,
+            [
+                {"step": "report_cpu_arch", "log": "x86_64"},
+                {"step": self.SUCCESS_CALLBACK_STEP, "log": "gse agent has been deployed successfully"},
+            ],
+        )
+        self.push_reports(2, [{"step": "download_pkg", "log": "download failed", "level": "ERROR", "status": "FAILED"}])
+
+        results = self.service.handle_report_data(
+            {sub_inst_id: self.host for sub_inst_id in self.SUB_INST_IDS},
+            success_callback_step=self.SUCCESS_CALLBACK_STEP,
+        )
+        self.service.flush_log_buffer()
+
+        sub_inst_id__result_map = {result["sub_inst_id"]: result for result in results}
+        self.assertTrue(sub_inst_id__result_map[1]["is_finished"])
+        self.assertEqual(sub_inst_id__result_map[1]["cpu_arch"], "x86_64")
+        self.assertTrue(sub_inst_id__result_map[2]["is_finished"])
+        self.assertFalse(sub_inst_id__result_map[3]["is_finished"])
+
+        # 仅上报失败的实例被移至失败实例，各实例日志互不影响
+        self.assertEqual(
+            self.service.failed_subscription_instance_id_reason_map, {2: "[script] [download_pkg] download failed"}
+        )
+        self.assertIn("[script] [report_cpu_arch] x86_64", self.get_log(1))
+        self.assertIn("gse agent has been deployed successfully", self.get_log(1))
+        self.assertNotIn("download failed", self.get_log(1))
+        self.assertIn("download failed", self.get_log(2))
+        self.assertEqual(self.get_log(3), "")
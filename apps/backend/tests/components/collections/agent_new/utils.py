@@ -28,6 +28,7 @@ from django.utils.translation import get_language
 import env
 from apps.backend.components.collections import agent_new
 from apps.backend.subscription import tools
+from apps.backend.subscription.task_tools import TaskResultTools
 from apps.core.concurrent.controller import ConcurrentController
 from apps.mock_data import common_unit, utils
 from apps.node_man import constants, models
@@ -595,21 +596,27 @@ class AgentServiceBaseTestCase(CustomAPITestCase, ComponentTestMixin, ABC):
         if not self.DEBUG:
             return
 
-        sub_inst_id__status_detail_obj_map: Dict[int, models.SubscriptionInstanceStatusDetail] = {}
-        sub_inst_status_detail_objs = models.SubscriptionInstanceStatusDetail.objects.filter(
-            subscription_instance_record_id__in=self.common_inputs["subscription_instance_ids"]
-        ).all()
-        for sub_inst_status_detail_obj in sub_inst_status_detail_objs:
-            sub_inst_id = sub_inst_status_detail_obj.subscription_instance_record_id
-            sub_inst_id__status_detail_obj_map[sub_inst_id] = sub_inst_status_detail_obj
+        sub_inst_ids: List[int] = self.common_inputs["subscription_instance_ids"]
+        node_id_inst_status_detail_map: Dict[str, Dict[str, Any]] = {
+            f"{status_detail['node_id']}-{status_detail['subscription_instance_record_id']}": status_detail
+            for status_detail in models.SubscriptionInstanceStatusDetail.objects.filter(
+                subscription_instance_record_id__in=sub_inst_ids
+            ).values("node_id", "subscription_instance_record_id", "log")
+        }
+        # 缓冲区中的日志以分块追加写入，需拼接后才是完整日志
+        TaskResultTools.join_status_detail_logs(node_id_inst_status_detail_map, sub_inst_ids)
+        sub_inst_id__status_detail_map: Dict[int, Dict[str, Any]] = {
+            status_detail["subscription_instance_record_id"]: status_detail
+            for status_detail in node_id_inst_status_detail_map.values()
+        }
 
         for sub_inst_obj in self.obj_factory.sub_inst_record_objs:
             print(f"sub_inst_id -> {sub_inst_obj.id} | ip -> {sub_inst_obj.instance_info['host']['bk_host_innerip']}")
-            sub_inst_status_detail_obj = sub_inst_id__status_detail_obj_map.get(sub_inst_obj.id)
-            if sub_inst_status_detail_obj is None:
+            sub_inst_status_detail = sub_inst_id__status_detail_map.get(sub_inst_obj.id)
+            if sub_inst_status_detail is None:
                 log = "There is no SubscriptionInstanceStatusDetail"
             else:
-                log = sub_inst_status_detail_obj.log
+                log = sub_inst_status_detail["log"]
             # 多行缩进，参考：https://stackoverflow.com/questions/8234274/
             print(textwrap.indent(log, 4 * " "))
 
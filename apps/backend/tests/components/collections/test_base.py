@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+TencentBlueKing is pleased to support the open source community by making 蓝鲸智云-节点管理(BlueKing-BK-NODEMAN) available.
+Copyright (C) 2017-2022 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at https://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+import threading
+from typing import List
+
+import mock
+
+from apps.backend.components.collections import base
+from apps.node_man import constants, models
+from apps.utils.unittest.testcase import CustomBaseTestCase
+
+
+class LogBufferTestCase(CustomBaseTestCase):
+    NODE_ID = "log_buffer_node"
+    SUB_INST_IDS = [1, 2]
+
+    def setUp(self):
+        super().setUp()
+        self.service = base.BaseService()
+        self.service.setup_runtime_attrs(id=self.NODE_ID)
+        for sub_inst_id in self.SUB_INST_IDS:
+            models.SubscriptionInstanceStatusDetail.objects.create(
+                subscription_instance_record_id=sub_inst_id, node_id=self.NODE_ID, log=""
+            )
+
+    def get_log_chunks(self, sub_inst_id: int) -> List[str]:
+        return list(
+            models.SubscriptionInstanceStatusDetailLog.objects.filter(
+                subscription_instance_record_id=sub_inst_id, node_id=self.NODE_ID
+            )
+            .order_by("id")
+            .values_list("log", flat=True)
+        )
+
+    def get_log(self, sub_inst_id: int) -> str:
+        node_inst__log_map = models.SubscriptionInstanceStatusDetailLog.get_node_inst__log_map([sub_inst_id])
+        return node_inst__log_map.get(f"{self.NODE_ID}-{sub_inst_id}", "")
+
+    @mock.patch.object(base, "LOG_FLUSH_INTERVAL", 3600)
+    @mock.patch.object(base, "LOG_FLUSH_MAX_LINES", 3)
+    def test_flush_on_max_lines(self):
+        self.service.log_info(1, "line 1")
+        self.service.log_info(1, "line 2")
+        # 未达到阈值时日志停留在缓冲区
+        self.assertEqual(self.get_log_chunks(1), [])
+
+        self.service.log_info(1, "line 3")
+        self.assertEqual(len(self.get_log_chunks(1)), 1)
+        self.assertEqual(len(self.service.get_log_buffer()), 0)
+
+    @mock.patch.object(base, "LOG_FLUSH_MAX_LINES", 3600)
+    def test_flush_on_interval(self):
+        with mock.patch.object(base.time, "monotonic", return_value=0):
+            self.service.log_info(1, "line 1")
+        self.assertEqual(self.get_log_chunks(1), [])
+
+        # 缓冲区中最早的日志停留超过阈值后落库
+        with mock.patch.object(base.time, "monotonic", return_value=base.LOG_FLUSH_INTERVAL):
+            self.service.log_info(1, "line 2")
+        self.assertEqual(len(self.get_log_chunks(1)), 1)
+        self.assertIn("line 1", self.get_log(1))
+        self.assertIn("line 2", self.get_log(1))
+
+    def test_chunks_append_in_order(self):
+        self.service.log_info(1, "first")
+        self.service.log_info(2, "other")
+        self.service.flush_log_buffer()
+        self.service.log_info(1, "second")
+        self.service.log_base(None, "to all")
+        self.service.flush_log_buffer()
+
+        # 日志仅追加到分块，不改写实例日志
+        self.assertEqual(
+            models.SubscriptionInstanceStatusDetail.objects.get(
+                subscription_instance_record_id=1, node_id=self.NODE_ID
+            ).log,
+            "",
+        )
+        self.assertEqual(len(self.get_log_chunks(1)), 2)
+        log: str = self.get_log(1)
+        self.assertTrue(log.index("first") < log.index("second") < log.index("to all"))
+        self.assertNotIn("other", log)
+        self.assertIn("to all", self.get_log(2))
+
+    def test_set_status_flush_log_buffer(self):
+        self.service.log_info(1, "before failed")
+        self.service.bulk_set_sub_inst_act_status(
+            data=None, sub_inst_ids=[1], status=constants.JobStatusType.RUNNING, common_log="common error"
+        )
+
+        self.assertEqual(len(self.service.get_log_buffer()), 0)
+        log: str = self.get_log(1)
+        self.assertTrue(log.index("before failed") < log.index("common error"))
+
+    @mock.patch.object(base, "LOG_FLUSH_INTERVAL", 3600)
+    @mock.patch.object(base, "LOG_FLUSH_MAX_LINES", 3600)
+    def test_buffer_log_concurrently(self):
+        thread_num: int = 10
+        line_num: int = 100
+
+        def _log(thread_index: int):
+            for line_index in range(line_num):
+                self.service.log_info(1, f"thread-{thread_index}-line-{line_index}")
+
+        threads: List[threading.Thread] = [threading.Thread(target=_log, args=(index,)) for index in range(thread_num)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.service.flush_log_buffer()
+
+        # 无全局锁时多线程写入的日志不丢失，且单个线程内的日志保持先后顺序
+        log: str = self.get_log(1)
+        self.assertEqual(log.count("\n"), thread_num * line_num)
+        for thread_index in range(thread_num):
+            self.assertLess(
+                log.index(f"thread-{thread_index}-line-0\n"), log.index(f"thread-{thread_index}-line-{line_num - 1}")
+            )
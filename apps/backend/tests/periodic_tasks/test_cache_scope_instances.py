@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+TencentBlueKing is pleased to support the open source community by making 蓝鲸智云-节点管理(BlueKing-BK-NODEMAN) available.
+Copyright (C) 2017-2022 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at https://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+from typing import List
+
+from apps.backend.periodic_tasks import cache_scope_instances
+from apps.backend.subscription import constants
+from apps.mock_data import common_unit
+from apps.node_man import models
+from apps.utils import basic
+from apps.utils.unittest.testcase import CustomBaseTestCase
+
+
+class TestCacheScopeInstances(CustomBaseTestCase):
+
+    init_sub_num: int = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        models.Subscription.objects.bulk_create(
+            [
+                models.Subscription(
+                    **basic.remove_keys_from_dict(origin_data=common_unit.subscription.POLICY_MODEL_DATA, keys=["id"])
+                )
+                for __ in range(cls.init_sub_num)
+            ]
+        )
+
+    def test_group_subscriptions_by_scope(self):
+        subscriptions: List[models.Subscription] = list(models.Subscription.objects.all())
+        scope_md5__group_map = cache_scope_instances.group_subscriptions_by_scope(subscriptions)
+        # 相同范围的订阅只计算一次
+        self.assertEqual(len(scope_md5__group_map), 1)
+        self.assertEqual(
+            sorted(list(scope_md5__group_map.values())[0]["subscription_ids"]),
+            sorted(subscription.id for subscription in subscriptions),
+        )
+
+    def test_calculate_countdowns_by_cost(self):
+        duration: int = constants.SUBSCRIPTION_UPDATE_INTERVAL
+        self.assertEqual(cache_scope_instances.calculate_countdowns_by_cost([10], duration), [0])
+        self.assertEqual(
+            cache_scope_instances.calculate_countdowns_by_cost([2, 1, 1], duration),
+            [0, duration // 2, duration * 3 // 4],
+        )
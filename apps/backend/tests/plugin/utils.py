@@ -516,6 +516,9 @@ class CustomBKRepoMockStorage(storage.CustomBKRepoStorage):
     def listdir(self, path):
         return self.mock_storage.listdir(path)
 
+    def copy(self, name, target_name):
+        return self.mock_storage.copy(name, target_name)
+
 
 OVERWRITE_OBJ__KV_MAP = {
     settings: {
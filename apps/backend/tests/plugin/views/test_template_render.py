@@ -14,15 +14,18 @@ from random import randint
 from typing import Dict, List, Optional
 
 from apps.backend.subscription.steps.adapter import PolicyStepAdapter
+from apps.backend.subscription.tools import (
+    SubscriptionStepsContextBuilder,
+    get_all_subscription_steps_context,
+)
 from apps.mock_data import common_unit
 from apps.mock_data.backend_mkd.subscription.unit import (
     GSE_PLUGIN_DESC_DATA,
     SUBSCRIPTION_DATA,
 )
 from apps.node_man import constants, models
-from apps.utils.unittest.testcase import CustomAPITestCase
 from apps.node_man.tests.utils import create_host
-from apps.backend.subscription.tools import get_all_subscription_steps_context
+from apps.utils.unittest.testcase import CustomAPITestCase
 
 PLATFORMS = ["linux_x86_64", "linux_x86", "windows_x86_64"]
 
@@ -375,10 +378,12 @@ class PackageTemplateRenderTest(CustomAPITestCase):
             config={
                 "plugin_name": common_unit.plugin.PLUGIN_NAME,
                 "plugin_version": common_unit.plugin.PACKAGE_VERSION,
-                "config_templates": [{
-                    "name": common_unit.plugin.GSE_PLUGIN_DESC_MODEL_DATA["config_file"],
-                    "version": common_unit.plugin.PACKAGE_VERSION
-                }]
+                "config_templates": [
+                    {
+                        "name": common_unit.plugin.GSE_PLUGIN_DESC_MODEL_DATA["config_file"],
+                        "version": common_unit.plugin.PACKAGE_VERSION,
+                    }
+                ],
             },
             params={"context": {"params_context": "test"}},
         )
@@ -409,6 +414,20 @@ class PackageTemplateRenderTest(CustomAPITestCase):
         # 验证 step.params.context 处于 context 根节点下
         self.assertTrue("params_context" in context.keys())
 
+        # 批量构造的上下文与逐台获取一致，订阅及步骤级上下文在主机间共享
+        steps_context_builder = SubscriptionStepsContextBuilder(subscription_step, policy_step_adapter)
+        instance_info = {"host": {"bk_host_id": target_host.bk_host_id}}
+        builder_context = steps_context_builder.build(
+            instance_info, target_host, common_unit.plugin.PLUGIN_NAME, target_host.agent_config
+        )
+        self.assertEqual(list(builder_context.items()), list(context.items()))
+        self.assertIs(
+            steps_context_builder.build(
+                instance_info, target_host, common_unit.plugin.PLUGIN_NAME, target_host.agent_config
+            ).shared,
+            builder_context.shared,
+        )
+
     # 当前没有指定具体插件模板版本好的需求 有需要再打开
 
     # def test_plugin_version__lower_tmpl_case(self):
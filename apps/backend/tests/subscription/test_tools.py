@@ -14,9 +14,12 @@ import mock
 from django.test import TestCase
 
 from apps.backend.subscription.tools import (
+    create_group_id,
+    create_group_id_prefix,
     get_instances_by_scope_with_checker,
     parse_group_id,
     parse_host_key,
+    select_instances,
 )
 from apps.backend.tests.subscription.test_performance import SubscriptionRunner
 from apps.backend.tests.subscription.utils import (
@@ -100,6 +103,16 @@ class TestTools(TestCase):
         assert res["object_type"] == "host"
         assert res["id"] == "1"
 
+    def test_create_group_id(self):
+        host_sub = models.Subscription(id=1, object_type=models.Subscription.ObjectType.HOST)
+        self.assertEqual(create_group_id_prefix(host_sub), "sub_1_host_")
+        self.assertEqual(create_group_id(host_sub, {"host": {"bk_host_id": 1}}), self.GROUP_ID)
+
+        service_sub = models.Subscription(id=2, object_type=models.Subscription.ObjectType.SERVICE)
+        group_id = create_group_id(service_sub, {"service": {"id": 3}, "host": {"bk_host_id": 1}})
+        self.assertEqual(group_id, "sub_2_service_3")
+        self.assertEqual(parse_group_id(group_id), {"subscription_id": "2", "object_type": "service", "id": "3"})
+
     def test_parse_host_key(self):
         res = parse_host_key(self.HOST_KEY)
         assert res["ip"] == "127.0.0.1"
@@ -238,6 +251,16 @@ class TestTools(TestCase):
         )
         self.assertEqual(len(list(instances.keys())), 0)
 
+    def test_select_service_instances(self):
+        instances = [{"service": {"id": service_id, "bk_host_id": service_id % 2}} for service_id in range(4)]
+        with mock.patch(
+            "apps.backend.subscription.tools.get_instance_selector_host_ids", mock.MagicMock(return_value={1})
+        ):
+            selected_instances = select_instances(
+                2, models.Subscription.ObjectType.SERVICE, instances, [{"key": "os_type", "value": ["LINUX"]}]
+            )
+        self.assertEqual([instance["service"]["id"] for instance in selected_instances], [1, 3])
+
     def test_sub_biz_priority(self):
         # 之前订阅优先使用 scope.bk_biz_id 作为整个订阅的业务范围，后面调整为优先使用 scope.nodes 内的业务范围
         instances = get_instances_by_scope_with_checker(
@@ -40,6 +40,7 @@ from apps.node_man.models import (
     ProcControl,
     ProcessStatus,
     Subscription,
+    SubscriptionInstanceRecord,
     SubscriptionStep,
     SubscriptionTask,
 )
@@ -518,3 +519,56 @@ class TestSubscription(TestCase):
         v6_ip_r = self.client.get(url, dict(request_params, **{"ip": host.inner_ipv6}))
         for resp in [host_innerip_r, v4_ip_r, v6_ip_r, host_id_r]:
             self.assertEqual(json.loads(str(resp.content, "utf-8"))["data"][0]["id"], proc.id)
+
+    def test_statistic(self):
+        subscription = Subscription.objects.create(
+            bk_biz_id=self.TEST_BIZ_ID,
+            object_type=Subscription.ObjectType.HOST,
+            node_type=Subscription.NodeType.INSTANCE,
+            nodes=[],
+            from_system="blueking",
+            creator="admin",
+        )
+        # 主机 1、2 有最新执行记录及插件进程，主机 3 无执行记录，主机 4 无插件进程，均不计入统计
+        current_instances = {
+            f"host|instance|host|{bk_host_id}": {"host": {"bk_host_id": bk_host_id}} for bk_host_id in range(1, 5)
+        }
+        for bk_host_id, status in [(1, "SUCCESS"), (2, "FAILED"), (4, "SUCCESS")]:
+            SubscriptionInstanceRecord.objects.create(
+                task_id=1,
+                subscription_id=subscription.id,
+                instance_id=f"host|instance|host|{bk_host_id}",
+                instance_info={},
+                steps=[],
+                status=status,
+            )
+        for bk_host_id, name, version in [
+            (1, "basereport", "1.0"),
+            (1, "processbeat", "2.0"),
+            (2, "basereport", "1.0"),
+            (3, "basereport", "1.1"),
+        ]:
+            ProcessStatus.objects.create(
+                bk_host_id=bk_host_id,
+                name=name,
+                version=version,
+                group_id=f"sub_{subscription.id}_host_{bk_host_id}",
+                source_type=ProcessStatus.SourceType.SUBSCRIPTION,
+                source_id=subscription.id,
+            )
+
+        with mock.patch(
+            "apps.backend.subscription.handler.tools.get_instances_by_scope_with_checker",
+            return_value=current_instances,
+        ):
+            sub_statistic = SubscriptionHandler.statistic([subscription.id])[0]
+
+        self.assertEqual(sub_statistic["instances"], 2)
+        self.assertEqual(
+            {item["status"]: item["count"] for item in sub_statistic["status"]},
+            {"SUCCESS": 1, "PENDING": 0, "FAILED": 1, "RUNNING": 0},
+        )
+        self.assertEqual(
+            sorted((item["name"], item["version"], item["count"]) for item in sub_statistic["versions"]),
+            [("basereport", "1.0", 2), ("processbeat", "2.0", 1)],
+        )
@@ -10,7 +10,15 @@ specific language governing permissions and limitations under the License.
 """
 from django.test import TestCase
 
-from apps.backend.utils.data_renderer import nested_render_data
+from apps.backend.subscription.tools import (
+    get_config_render_fingerprint,
+    render_config_files_by_config_templates,
+)
+from apps.backend.utils.data_renderer import (
+    get_referenced_variables,
+    nested_render_data,
+)
+from apps.node_man import models
 
 
 class TestDataRenderer(TestCase):
@@ -229,3 +237,67 @@ tasks:
       CMDB_LABEL_2: "anything"
     \n    """
         self.assertEqual(content, expect_content)
+
+    def test_get_referenced_variables(self):
+        data = {
+            "port": "{{ step_data.exporter.control_info.listen_port }}",
+            "labels": {"$for": "cmdb_instance.scope", "$item": "scope", "$body": {"id": "{{ scope.bk_inst_id }}"}},
+            "plain": "no variables {% if x %}",
+            "invalid": "{{ unclosed",
+            "values": ["{{ a }}-{{ b | default(c) }}", 1, None],
+        }
+        self.assertEqual(get_referenced_variables(data), {"step_data", "cmdb_instance", "scope", "a", "b", "c"})
+
+
+class TestConfigRenderFingerprint(TestCase):
+    def setUp(self):
+        self.config_template = models.PluginConfigTemplate(
+            id=1,
+            plugin_name="exporter",
+            name="exporter.conf",
+            version="1.0",
+            is_main=True,
+            file_path="etc",
+            content="port: {{ port }}\nip: {{ nodeman.host.inner_ip }}",
+        )
+        self.process_status_info = {"group_id": "sub_1_host_1"}
+
+    def get_context(self, **kwargs):
+        context = {
+            "port": "{{ control_info.listen_port }}",
+            "control_info": {"listen_port": 7000},
+            "nodeman": {"host": {"inner_ip": "127.0.0.1"}},
+            "cmdb_instance": {"host": {"bk_host_name": "host-1"}},
+        }
+        context.update(kwargs)
+        return context
+
+    def get_fingerprint(self, context):
+        return get_config_render_fingerprint(
+            [self.config_template], self.process_status_info, context, package_obj=None
+        )
+
+    def test_fingerprint(self):
+        fingerprint = self.get_fingerprint(self.get_context())
+        # 未被模板引用的变量不影响指纹
+        self.assertEqual(fingerprint, self.get_fingerprint(self.get_context(cmdb_instance={})))
+        # 自渲染间接引用的变量变化
+        self.assertNotEqual(fingerprint, self.get_fingerprint(self.get_context(control_info={"listen_port": 7001})))
+        self.assertNotEqual(
+            fingerprint, self.get_fingerprint(self.get_context(nodeman={"host": {"inner_ip": "127.0.0.2"}}))
+        )
+
+        # 渲染会修改上下文，指纹需在渲染前计算
+        context = self.get_context()
+        render_config_files_by_config_templates(
+            [self.config_template], self.process_status_info, context, package_obj=None
+        )
+        self.assertNotEqual(fingerprint, self.get_fingerprint(context))
+
+        # 模板内容变化
+        self.config_template.content = "port: {{ port }}"
+        self.assertNotEqual(fingerprint, self.get_fingerprint(self.get_context()))
+
+    def test_unstable_variables(self):
+        self.config_template.content = "hosts: {{ get_hosts_by_node(config_hosts) }}"
+        self.assertIsNone(self.get_fingerprint(self.get_context()))
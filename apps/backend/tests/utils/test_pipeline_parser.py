@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+TencentBlueKing is pleased to support the open source community by making 蓝鲸智云-节点管理(BlueKing-BK-NODEMAN) available.
+Copyright (C) 2017-2022 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at https://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+from django.test import TestCase
+
+from apps.backend.utils import pipeline_parser
+from apps.backend.utils.pipeline_parser import ActType
+
+
+def build_pipeline(pipeline_id: str):
+    """构造 start -> act1 -> parallel(act2, act3) -> converge -> end 的 pipeline 树"""
+    return {
+        "id": pipeline_id,
+        "start_event": {"id": "start", "outgoing": "f1"},
+        "end_event": {"id": "end", "incoming": "f7"},
+        "flows": {
+            "f1": {"source": "start", "target": "act1"},
+            "f2": {"source": "act1", "target": "pg"},
+            "f3": {"source": "pg", "target": "act2"},
+            "f4": {"source": "pg", "target": "act3"},
+            "f5": {"source": "act2", "target": "cg"},
+            "f6": {"source": "act3", "target": "cg"},
+            "f7": {"source": "cg", "target": "end"},
+        },
+        "activities": {
+            "act1": {"id": "act1", "type": ActType.SERVICE, "name": "act1", "outgoing": "f2"},
+            "act2": {"id": "act2", "type": ActType.SERVICE, "name": "act2", "outgoing": "f5"},
+            "act3": {"id": "act3", "type": ActType.SERVICE, "name": "act3", "outgoing": "f6"},
+        },
+        "gateways": {
+            "pg": {"id": "pg", "type": ActType.PARALLEL, "outgoing": ["f3", "f4"]},
+            "cg": {"id": "cg", "type": ActType.CONVERGE, "outgoing": "f7"},
+        },
+    }
+
+
+class TestPipelineParser(TestCase):
+    def setUp(self) -> None:
+        pipeline_parser.parsed_pipeline_tree_cache.clear()
+
+    def test_parse_pipeline(self):
+        children = pipeline_parser.parse_pipeline(build_pipeline("p1"))
+        self.assertEqual(list(children.keys()), ["act1", "pg"])
+        self.assertEqual(children["act1"]["index"], 0)
+        self.assertEqual(children["pg"]["index"], 1)
+        self.assertEqual(list(children["pg"]["children"].keys()), ["act2", "act3"])
+
+    def test_get_next(self):
+        pipeline = build_pipeline("p1")
+        self.assertEqual(pipeline_parser.get_next(pipeline, "f2")["id"], "pg")
+        self.assertIsNone(pipeline_parser.get_next(pipeline, None))
+
+    def test_parsed_pipeline_tree_cache(self):
+        cache = pipeline_parser.ParsedPipelineTreeCache(max_size=2)
+        cache.set_many({"p1": {"children": {}}, "p2": {"children": {}}})
+        # 访问 p1 后，p2 成为最久未使用的缓存
+        self.assertEqual(list(cache.get_many(["p1"]).keys()), ["p1"])
+        cache.set_many({"p3": {"children": {}}})
+        self.assertEqual(set(cache.get_many(["p1", "p2", "p3"]).keys()), {"p1", "p3"})
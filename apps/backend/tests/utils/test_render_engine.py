@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+TencentBlueKing is pleased to support the open source community by making 蓝鲸智云-节点管理(BlueKing-BK-NODEMAN) available.
+Copyright (C) 2017-2022 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at https://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+import copy
+import multiprocessing
+
+from django.test import TestCase
+from mock import patch
+
+from apps.backend.utils import render_engine
+from apps.backend.utils.data_renderer import nested_render_data
+from apps.backend.utils.render_engine import (
+    ConfigRenderEngine,
+    CopyOnWriteContext,
+    TemplateRenderError,
+    TemplateSource,
+)
+from apps.mock_data.backend_mkd.render_engine import (
+    SYNTHETIC_TEMPLATE_CONTENT,
+    build_synthetic_contexts,
+)
+
+
+class TestConfigRenderEngine(TestCase):
+    def setUp(self):
+        self.sources = [
+            TemplateSource(id=1, content=SYNTHETIC_TEMPLATE_CONTENT, name="exporter_{{ task_id }}.conf"),
+            TemplateSource(id=2, content="url: {{ metric_url }}\nconst: {{ 1 + 1 }}", name="main.conf"),
+        ]
+        self.contexts = build_synthetic_contexts(10)
+        self.engine = ConfigRenderEngine(maxsize=2, pool_min_batch_size=0)
+
+    def tearDown(self):
+        self.engine.discard_pool()
+
+    def legacy_render(self, context):
+        results = []
+        for source in self.sources:
+            context = nested_render_data(context, context)
+            results.append((nested_render_data(source.content, context), nested_render_data(source.name, context)))
+        return results
+
+    def test_render(self):
+        expected_results = [self.legacy_render(context) for context in copy.deepcopy(self.contexts)]
+        self.assertEqual(
+            self.engine.render_batch(self.sources, copy.deepcopy(self.contexts), processes=1), expected_results
+        )
+        self.assertEqual(
+            self.engine.render_batch(self.sources, copy.deepcopy(self.contexts), processes=2), expected_results
+        )
+        self.assertIn('hosts: ["10.0.0.0:7000/metrics"]', expected_results[0][0][0])
+
+        # 共享上下文与主机上下文合并后渲染
+        shared_context = {key: self.contexts[0][key] for key in ["dataid", "task_id", "period", "labels"]}
+        contexts = [
+            {key: value for key, value in context.items() if key not in shared_context}
+            for context in copy.deepcopy(self.contexts)
+        ]
+        self.assertEqual(
+            self.engine.render_batch(self.sources, contexts, shared_context=shared_context, processes=1),
+            expected_results,
+        )
+        # 叠加在共享上下文之上的写时复制上下文，分发到子进程时仅序列化主机层
+        cow_contexts = [CopyOnWriteContext(shared_context, context) for context in contexts]
+        self.assertEqual(
+            self.engine.render_batch(self.sources, cow_contexts, shared_context=shared_context, processes=2),
+            expected_results,
+        )
+        self.assertEqual(
+            self.engine.render_batch(self.sources, cow_contexts, shared_context=shared_context, processes=1),
+            expected_results,
+        )
+
+    def test_render_in_pool(self):
+        expected_results = self.engine.render_batch(self.sources, copy.deepcopy(self.contexts), processes=1)
+
+        # 进程池常驻，后续批次复用
+        pool = self.engine.get_pool(2)
+        self.assertIs(self.engine.get_pool(2), pool)
+        self.assertEqual(
+            self.engine.render_batch(self.sources, copy.deepcopy(self.contexts), processes=2), expected_results
+        )
+
+        # 等待超时后终止进程池，降级为当前进程渲染
+        with patch.object(pool, "imap") as imap:
+            imap.return_value.next.side_effect = multiprocessing.TimeoutError
+            self.assertEqual(
+                self.engine.render_batch(self.sources, copy.deepcopy(self.contexts), processes=2), expected_results
+            )
+        self.assertIsNot(self.engine.get_pool(2), pool)
+
+        # 渲染错误不降级
+        with self.assertRaises(TemplateRenderError):
+            self.engine.render_batch(
+                [TemplateSource(id=3, content="{{ labels }}", name="a.conf")],
+                [{"labels": {"$for": "not_exist.scope", "$item": "scope", "$body": {}}}],
+                processes=2,
+            )
+
+    def test_render_pool_unavailable(self):
+        expected_results = self.engine.render_batch(self.sources, copy.deepcopy(self.contexts), processes=1)
+        with patch.object(render_engine.multiprocessing, "get_context", side_effect=ValueError("unsupported")):
+            self.assertEqual(
+                self.engine.render_batch(self.sources, copy.deepcopy(self.contexts), processes=2), expected_results
+            )
+            self.assertIsNone(self.engine.get_pool(2))
+
+    def test_compile_cache(self):
+        compiled_template = self.engine.compile(self.sources[0])
+        self.assertIs(self.engine.compile(self.sources[0]), compiled_template)
+        self.assertEqual(
+            compiled_template.variables - {"timeout"},
+            {"dataid", "task_id", "bk_biz_id", "period", "metric_url", "config_name", "labels"},
+        )
+
+        # 按内容及文件名缓存，同一模板修改内容后重新编译
+        changed_compiled_template = self.engine.compile(self.sources[0]._replace(content="{{ task_id }}"))
+        self.assertEqual(changed_compiled_template.variables, {"task_id"})
+        self.assertIsNot(self.engine.compile(self.sources[0]._replace(name="a.conf")), compiled_template)
+
+        # 超出缓存上限时淘汰最近最少使用的模板
+        self.assertIsNot(self.engine.compile(self.sources[0]), compiled_template)
+
+    def test_render_error(self):
+        context = {"labels": {"$for": "not_exist.scope", "$item": "scope", "$body": {}}}
+        with self.assertRaises(TemplateRenderError):
+            self.engine.render([TemplateSource(id=3, content="{{ labels }}", name="a.conf")], context)
+
+
+class TestCopyOnWriteContext(TestCase):
+    def setUp(self):
+        self.contexts = build_synthetic_contexts(5)
+        # 步骤参数在前，主机变量在后
+        self.shared_context = {
+            key: self.contexts[0][key]
+            for key in ["dataid", "task_id", "bk_biz_id", "period", "config_name", "metric_url", "labels"]
+        }
+        self.sources = [
+            TemplateSource(id=1, content=SYNTHETIC_TEMPLATE_CONTENT, name="exporter_{{ task_id }}.conf"),
+            TemplateSource(id=2, content="{% set _ = plugin_path.update({'x': 1}) %}{{ plugin_path }}", name="b.conf"),
+            # 无法从模板内容中静态识别的原地修改
+            TemplateSource(
+                id=3,
+                content="{% set setitem = cmdb_instance.__setitem__ %}{{ setitem('scope', []) }}{{ target.scope }}",
+                name="c.conf",
+            ),
+        ]
+
+    def build_contexts(self):
+        return [
+            CopyOnWriteContext(
+                self.shared_context, {key: value for key, value in context.items() if key not in self.shared_context}
+            )
+            for context in self.contexts
+        ]
+
+    def test_mapping(self):
+        context = CopyOnWriteContext({"a": 1, "b": 2}, {"c": 3})
+        context["b"] = 4
+        del context["a"]
+        context["d"] = 5
+        self.assertEqual(list(context.items()), [("b", 4), ("c", 3), ("d", 5)])
+        self.assertNotIn("a", context)
+        self.assertEqual(context.shared, {"a": 1, "b": 2})
+
+        # 与逐项合并得到的字典顺序一致
+        self.assertEqual(list(self.build_contexts()[0]), list(self.contexts[0]))
+
+    def test_render(self):
+        engine = ConfigRenderEngine(pool_min_batch_size=0)
+        self.addCleanup(engine.discard_pool)
+        expected_results = engine.render_batch(self.sources, copy.deepcopy(self.contexts), processes=1)
+        origin_contexts = copy.deepcopy(self.contexts)
+
+        self.assertEqual(engine.render_batch(self.sources, self.build_contexts(), processes=1), expected_results)
+        self.assertEqual(engine.render_batch(self.sources, self.build_contexts(), processes=2), expected_results)
+        self.assertIn("'x': 1", expected_results[0][1][0])
+        self.assertEqual(expected_results[0][2][0], "None[]")
+        # 渲染（含 $for 及模板内的原地修改）不影响共享层及传入的主机数据
+        self.assertEqual(self.contexts, origin_contexts)
@@ -10,16 +10,22 @@ specific language governing permissions and limitations under the License.
 """
 import copy
 import logging
+import typing
+from functools import lru_cache
 
 import six
-from jinja2 import Template
+from jinja2 import Environment, Template, TemplateSyntaxError, meta
 
 """
 jinja2渲染相关的公共函数
 """
 logger = logging.getLogger("app")
 
-TEMPLATE_CACHE = {}
+# 已编译模板字符串的缓存上限，超出后淘汰最近最少使用的模板
+TEMPLATE_CACHE_MAXSIZE = 2048
+
+# 用于解析模板引用变量的环境，语法与 Template 默认环境保持一致
+PARSE_ENVIRONMENT = Environment()
 
 
 def find_element(element, dict_data):
@@ -36,6 +42,16 @@ def find_element(element, dict_data):
     return rv
 
 
+@lru_cache(maxsize=TEMPLATE_CACHE_MAXSIZE)
+def get_template(source: str) -> Template:
+    """
+    获取编译后的模板，编译失败时抛出异常且不缓存
+    :param source: 模板字符串
+    :return:
+    """
+    return Template(source)
+
+
 def nested_render_data(data, context):
     """
     递归渲染字典中的模板字符串
@@ -46,11 +62,9 @@ def nested_render_data(data, context):
             return data
         try:
             # 尝试渲染用户参数，一旦失败，立即返回原数据
-            template = TEMPLATE_CACHE.get(data)
-            if not template:
-                template = Template(data)
-                TEMPLATE_CACHE[data] = template
-            return template.render(context)
+            template = get_template(data)
+            # 仅传入模板引用的变量，避免 jinja 每次渲染复制整个上下文
+            return template.render({key: context[key] for key in get_template_variables(data) if key in context})
         except Exception as err:
             logger.exception(f"nested_render_data error: {err}")
             return data
@@ -77,3 +91,89 @@ def nested_render_data(data, context):
         for index, value in enumerate(data):
             data[index] = nested_render_data(value, context)
     return data
+
+
+@lru_cache(maxsize=4096)
+def get_template_variables(source: str) -> typing.FrozenSet[str]:
+    """
+    获取模板字符串引用的顶层变量
+    :param source: 模板字符串
+    :return:
+    """
+    if "{{" not in source:
+        # 与 nested_render_data 保持一致，无 jinja 占位符的字符串不渲染
+        return frozenset()
+    try:
+        return frozenset(meta.find_undeclared_variables(PARSE_ENVIRONMENT.parse(source)))
+    except TemplateSyntaxError:
+        # 语法错误的模板在 nested_render_data 中原样返回，渲染结果与上下文无关
+        return frozenset()
+
+
+def collect_referenced_variables(data, variables: typing.Set[str]) -> bool:
+    """
+    递归收集数据中模板字符串引用的顶层变量，与 nested_render_data 的渲染规则对应
+    :param data: 待渲染数据
+    :param variables: 收集结果，原地更新
+    :return: 数据是否包含需要渲染的内容，不包含时 nested_render_data 不会改变数据
+    """
+    if isinstance(data, six.string_types):
+        if "{{" not in data:
+            return False
+        variables.update(get_template_variables(data))
+        return True
+    elif isinstance(data, dict):
+        if "$for" in data and "$item" in data and "$body" in data:
+            # 循环动态变量依赖列表变量的顶层 key 及循环体
+            variables.add(str(data["$for"]).split(".")[0])
+            collect_referenced_variables(data["$body"], variables)
+            return True
+        has_template: bool = False
+        for value in data.values():
+            has_template = collect_referenced_variables(value, variables) or has_template
+        return has_template
+    elif isinstance(data, list):
+        has_template = False
+        for value in data:
+            has_template = collect_referenced_variables(value, variables) or has_template
+        return has_template
+    return False
+
+
+def get_referenced_variables(data) -> typing.Set[str]:
+    """
+    递归获取数据中模板字符串引用的顶层变量
+    :param data: 待渲染数据
+    :return:
+    """
+    variables: typing.Set[str] = set()
+    collect_referenced_variables(data, variables)
+    return variables
+
+
+def get_context_variable_closure(variables: typing.Iterable[str], context: typing.Dict) -> typing.Dict[str, bool]:
+    """
+    获取变量在上下文中的引用闭包
+    上下文会先渲染自身，被引用的变量又可能通过模板字符串引用上下文中的其他变量
+    :param variables: 直接引用的变量
+    :param context: 上下文
+    :return: 闭包内的变量 - 上下文中的值是否需要渲染
+    """
+    closure: typing.Dict[str, bool] = {variable: False for variable in variables}
+    # 上下文中同一对象可能挂载在多个变量下（如 cmdb_instance 与 target），按对象复用解析结果
+    value_id__references_map: typing.Dict[int, typing.Tuple[bool, typing.Set[str]]] = {}
+    pending_variables: typing.List[str] = list(closure)
+    while pending_variables:
+        variable: str = pending_variables.pop()
+        if variable not in context:
+            continue
+        value = context[variable]
+        if id(value) not in value_id__references_map:
+            sub_variables: typing.Set[str] = set()
+            value_id__references_map[id(value)] = (collect_referenced_variables(value, sub_variables), sub_variables)
+        closure[variable], sub_variables = value_id__references_map[id(value)]
+        for sub_variable in sub_variables:
+            if sub_variable not in closure:
+                closure[sub_variable] = False
+                pending_variables.append(sub_variable)
+    return closure
@@ -10,7 +10,9 @@ specific language governing permissions and limitations under the License.
 """
 
 import logging
-from collections import defaultdict
+import threading
+import typing
+from collections import OrderedDict, defaultdict
 from datetime import datetime
 
 from django.db.models import F, Q
@@ -49,6 +51,10 @@ PIPELINE_STATES_MAPPING = {
 }
 
 
+# 进程内缓存的已解析 pipeline 树数量上限
+PARSED_PIPELINE_TREE_CACHE_SIZE = 10000
+
+
 class ActType(object):
     SUB_PROCESS = "SubProcess"
     START = "EmptyStartEvent"
@@ -58,40 +64,48 @@ class ActType(object):
     SERVICE = "ServiceActivity"
 
 
+class PipelineIndex(object):
+    """
+    pipeline 树索引，一次遍历构建 outgoing -> target、id -> node 映射，使查找下一节点为 O(1)
+    """
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+        self.flow_target_map: typing.Dict[str, str] = {
+            flow_id: flow["target"] for flow_id, flow in pipeline["flows"].items()
+        }
+        # 与线性查找顺序保持一致：activities 优先于 gateways
+        self.node_map: typing.Dict[str, typing.Dict] = {**pipeline["gateways"], **pipeline["activities"]}
+
+    def get_next(self, outgoing):
+        if not outgoing:
+            return None
+        return self.node_map.get(self.flow_target_map[outgoing])
+
+
 def get_next(pipeline, outgoing):
     if not outgoing:
         return None
-    for flow in pipeline["flows"]:
-        if flow == outgoing:
-            target = pipeline["flows"][flow]["target"]
-            break
-
-    for act in pipeline["activities"]:
-        if act == target:
-            return pipeline["activities"][act]
-
-    for gt in pipeline["gateways"]:
-        if gt == target:
-            return pipeline["gateways"][gt]
+    return PipelineIndex(pipeline).get_next(outgoing)
 
 
-def parse_act(pipeline, act):
+def parse_act(index: PipelineIndex, act):
     if act["type"] == ActType.SERVICE:
         res = dict(id=act["id"], type=ActType.SERVICE, name=act["name"])
-        return res, get_next(pipeline, act["outgoing"])
+        return res, index.get_next(act["outgoing"])
 
     elif act["type"] == ActType.SUB_PROCESS:
         res = dict(id=act["id"], type=ActType.SUB_PROCESS, name=act["name"])
         res["children"] = parse_pipeline(act["pipeline"])
-        return res, get_next(pipeline, act["outgoing"])
+        return res, index.get_next(act["outgoing"])
 
 
-def parse_parallel(pipeline, con):
+def parse_parallel(index: PipelineIndex, con):
     acts = {}
     for out in con["outgoing"]:
-        nt = get_next(pipeline, out)
-        acts[nt["id"]], pg = parse_act(pipeline, nt)
-    return acts, get_next(pipeline, pg["outgoing"])
+        nt = index.get_next(out)
+        acts[nt["id"]], pg = parse_act(index, nt)
+    return acts, index.get_next(pg["outgoing"])
 
 
 def parse_pipeline(pipeline):
@@ -106,20 +120,57 @@ def parse_pipeline(pipeline):
     }
     """
     children = {}
-    nt = get_next(pipeline, pipeline["start_event"]["outgoing"])
+    pipeline_index = PipelineIndex(pipeline)
+    nt = pipeline_index.get_next(pipeline["start_event"]["outgoing"])
     index = 0
     while nt is not None:
         if nt["type"] == ActType.PARALLEL:
-            acts, a_nt = parse_parallel(pipeline, nt)
+            acts, a_nt = parse_parallel(pipeline_index, nt)
             children[nt["id"]] = dict(children=acts, type=ActType.PARALLEL)
         else:
-            children[nt["id"]], a_nt = parse_act(pipeline, nt)
+            children[nt["id"]], a_nt = parse_act(pipeline_index, nt)
         children[nt["id"]]["index"] = index
         nt = a_nt
         index += 1
     return children
 
 
+class ParsedPipelineTreeCache(object):
+    """
+    已解析 pipeline 树的进程内 LRU 缓存，按 pipeline 树 ID 索引
+    pipeline 树创建后不再变更，解析结果可在 PipelineParser 实例间复用，命中时无需再查询、解析 pipeline 树
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._cache: typing.Dict[str, typing.Dict] = OrderedDict()
+
+    def get_many(self, pipeline_ids: typing.Iterable[str]) -> typing.Dict[str, typing.Dict]:
+        hits: typing.Dict[str, typing.Dict] = {}
+        with self._lock:
+            for pipeline_id in pipeline_ids:
+                if pipeline_id in self._cache:
+                    self._cache.move_to_end(pipeline_id)
+                    hits[pipeline_id] = self._cache[pipeline_id]
+        return hits
+
+    def set_many(self, parsed_trees: typing.Dict[str, typing.Dict]):
+        with self._lock:
+            for pipeline_id, parsed_tree in parsed_trees.items():
+                self._cache[pipeline_id] = parsed_tree
+                self._cache.move_to_end(pipeline_id)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+parsed_pipeline_tree_cache = ParsedPipelineTreeCache(max_size=PARSED_PIPELINE_TREE_CACHE_SIZE)
+
+
 def check_running_records(records_queryset):
     """
     检查是否存在正在执行的记录
@@ -163,14 +214,27 @@ class PipelineParser(object):
     def sorted_pipeline_tree(self):
         if hasattr(self, "_sorted_pipeline_tree"):
             return self._sorted_pipeline_tree
-        sorted_pipeline_tree = {}
-        for pipeline_tree in self.pipeline_trees:
+        from apps.node_man.models import PipelineTree
+
+        # 解析结果只读，可直接复用缓存，仅查询、解析未命中的 pipeline 树
+        sorted_pipeline_tree = parsed_pipeline_tree_cache.get_many(self.pipeline_ids)
+        missing_pipeline_ids = set(self.pipeline_ids) - set(sorted_pipeline_tree.keys())
+        if hasattr(self, "_pipeline_trees"):
+            pipeline_trees = [tree for tree in self._pipeline_trees if tree.id in missing_pipeline_ids]
+        else:
+            pipeline_trees = PipelineTree.objects.filter(id__in=missing_pipeline_ids) if missing_pipeline_ids else []
+
+        parsed_trees = {}
+        for pipeline_tree in pipeline_trees:
             pipeline = pipeline_tree.tree
             if not pipeline:
                 continue
             single_sorted_pipeline_tree = parse_pipeline(pipeline)
 
-            sorted_pipeline_tree.update({pipeline["id"]: {"children": single_sorted_pipeline_tree}})
+            parsed_trees.update({pipeline["id"]: {"children": single_sorted_pipeline_tree}})
+        parsed_pipeline_tree_cache.set_many(parsed_trees)
+        sorted_pipeline_tree.update(parsed_trees)
+
         self._sorted_pipeline_tree = sorted_pipeline_tree
         return sorted_pipeline_tree
 
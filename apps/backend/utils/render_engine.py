@@ -0,0 +1,498 @@
+# -*- coding: utf-8 -*-
+"""
+TencentBlueKing is pleased to support the open source community by making 蓝鲸智云-节点管理(BlueKing-BK-NODEMAN) available.
+Copyright (C) 2017-2022 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at https://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+import copy
+import hashlib
+import logging
+import math
+import multiprocessing
+import os
+import threading
+import time
+import typing
+from collections import OrderedDict
+from collections.abc import Mapping, MutableMapping
+from multiprocessing.pool import Pool
+
+from django.conf import settings
+from jinja2 import Template
+
+from apps.backend.utils.data_renderer import (
+    get_context_variable_closure,
+    get_referenced_variables,
+    nested_render_data,
+)
+
+"""
+插件配置模板渲染引擎
+- 模板按内容及文件名的摘要预编译，编译结果保存在有界 LRU 中
+- 上下文自渲染仅处理模板引用（含间接引用）的变量，避免每次渲染整个上下文
+- 多台主机可按批次在常驻的进程池中渲染，共享的只读上下文随任务分发，主机上下文仅分发主机层
+- 主机上下文可由共享层与主机层叠加而成（CopyOnWriteContext），渲染前仅复制模板可访问的可变变量
+"""
+logger = logging.getLogger("app")
+
+# 编译模板缓存的默认最大条目数
+DEFAULT_COMPILED_CACHE_MAXSIZE = 256
+
+# 进程池单个任务渲染的主机数，过小时任务分发的开销占比高
+RENDER_CHUNK_SIZE = 20
+
+# 主机数低于该值时在当前进程渲染，任务分发的开销不划算
+POOL_MIN_BATCH_SIZE = 100
+
+# 每个进程平均分得的任务数，任务过少时负载不均，过多时共享上下文的序列化次数增加
+POOL_TASKS_PER_PROCESS = 4
+
+# 不可变的值，模板无法原地修改，渲染前无需复制
+IMMUTABLE_VALUE_TYPES = (str, bytes, int, float, bool, type(None))
+
+
+class TemplateRenderError(Exception):
+    def __init__(self, name: str, msg: str):
+        super().__init__(name, msg)
+        self.name = name
+        self.msg = msg
+
+
+class TemplateSource(typing.NamedTuple):
+    """模板渲染所需的最小信息，可在进程间传递"""
+
+    id: typing.Any
+    content: str
+    name: str
+
+    @classmethod
+    def from_config_template(cls, config_template) -> "TemplateSource":
+        return cls(id=config_template.id, content=config_template.content, name=config_template.name)
+
+    @property
+    def digest(self) -> str:
+        """模板内容及文件名的摘要，模板对象上的 md5 为对象级缓存，修改内容后不会更新，不能作为编译缓存的 key"""
+        md5 = hashlib.md5()
+        md5.update(self.content.encode())
+        md5.update(b"\0")
+        md5.update(self.name.encode())
+        return md5.hexdigest()
+
+
+class CopyOnWriteContext(MutableMapping):
+    """
+    写时复制的渲染上下文
+    - 共享层：多台主机共用的只读上下文，主机层的同名变量优先
+    - 主机层：主机独有的变量，传入的值同样视为只读，可能被多个上下文引用
+    - 写入及删除仅作用于当前上下文，原地修改变量前需通过 detach 复制
+    迭代顺序与先后 update 共享层、主机层得到的字典一致
+    """
+
+    def __init__(self, shared: Mapping, local: typing.Optional[typing.Dict] = None):
+        """
+        :param shared: 共享层
+        :param local: 主机层
+        """
+        self.shared = shared
+        self.local: typing.Dict = dict(local or {})
+        # 共享层中已删除的变量
+        self.deleted: typing.Set[str] = set()
+        # 已归当前上下文所有、可原地修改的变量
+        self.owned: typing.Set[str] = set()
+        # 复制时共用的 memo，保持变量间的引用关系（如 cmdb_instance 与 target 为同一对象）
+        self._memo: typing.Dict[int, typing.Any] = {}
+
+    def __getitem__(self, key):
+        if key in self.local:
+            return self.local[key]
+        if key in self.deleted:
+            raise KeyError(key)
+        return self.shared[key]
+
+    def __setitem__(self, key, value):
+        self.local[key] = value
+        self.owned.add(key)
+        self.deleted.discard(key)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self.local.pop(key, None)
+        self.owned.discard(key)
+        if key in self.shared:
+            self.deleted.add(key)
+
+    def __contains__(self, key) -> bool:
+        return key in self.local or (key in self.shared and key not in self.deleted)
+
+    def __iter__(self):
+        for key in self.shared:
+            if key not in self.deleted:
+                yield key
+        for key in self.local:
+            if key not in self.shared:
+                yield key
+
+    def __len__(self) -> int:
+        return sum(1 for __ in self)
+
+    def __getstate__(self) -> typing.Dict[str, typing.Any]:
+        # memo 以对象 id 为 key，跨进程后失效
+        return dict(self.__dict__, _memo={})
+
+    def detach(self, key):
+        """
+        获取可原地修改的变量，首次调用时复制
+        :param key: 变量名
+        :return:
+        """
+        if key not in self.owned:
+            self[key] = copy.deepcopy(self[key], self._memo)
+        return self.local[key]
+
+    def detach_mutable(self, keys: typing.Iterable[str]):
+        """
+        复制将暴露给模板的可变变量
+        模板可通过方法调用（如 {{ labels.update(...) }}）、过滤器、扩展等途径原地修改变量，无法静态识别，渲染前一律复制
+        :param keys: 变量名
+        :return:
+        """
+        for key in keys:
+            if key in self and key not in self.owned and not isinstance(self[key], IMMUTABLE_VALUE_TYPES):
+                self.detach(key)
+
+
+class CompiledTemplate:
+    def __init__(self, source: TemplateSource):
+        self.source = source
+        self.template: typing.Optional[Template] = self.compile(source.content)
+        # 文件名在模板渲染后使用同一上下文渲染，引用的变量同样需要自渲染
+        self.variables: typing.FrozenSet[str] = frozenset(
+            get_referenced_variables(source.content) | get_referenced_variables(source.name)
+        )
+
+    @staticmethod
+    def compile(content: str) -> typing.Optional[Template]:
+        if "{{" not in content:
+            # 与 nested_render_data 保持一致，无 jinja 占位符的内容不渲染
+            return None
+        try:
+            return Template(content)
+        except Exception as err:
+            logger.exception(f"[render_engine] compile template error: {err}")
+            return None
+
+    def self_render(self, context: typing.Dict) -> typing.Dict:
+        """
+        使用上下文渲染自身，仅处理模板引用的变量，模板可见部分与渲染整个上下文的结果一致
+        :param context: 上下文，原地修改
+        :return:
+        """
+        closure: typing.Dict[str, bool] = get_context_variable_closure(self.variables, context)
+        if isinstance(context, CopyOnWriteContext):
+            # 渲染会原地修改字典及列表，上下文中的模板也可访问闭包内的全部变量，需先复制，不影响共享的原始数据
+            context.detach_mutable(closure)
+        # 保持上下文原有顺序，先渲染的变量对后续变量可见；不含模板的变量渲染前后不变，无需处理
+        for key in [key for key in context if closure.get(key)]:
+            if key in context:
+                context[key] = nested_render_data(context[key], context)
+        return context
+
+    def render(self, context: typing.Dict) -> str:
+        if self.template is None:
+            return self.source.content
+        if isinstance(context, CopyOnWriteContext):
+            context.detach_mutable(self.variables)
+        render_context: typing.Dict = {key: context[key] for key in self.variables if key in context}
+        try:
+            return self.template.render(render_context)
+        except Exception as err:
+            # 与 nested_render_data 保持一致，渲染失败时返回原内容
+            logger.exception(f"[render_engine] render template -> {self.source.id} error: {err}")
+            return self.source.content
+
+
+def merge_context(
+    shared_context: typing.Optional[typing.Dict], context: typing.MutableMapping
+) -> typing.MutableMapping:
+    if not shared_context:
+        return context
+    if isinstance(context, CopyOnWriteContext) and context.shared is shared_context:
+        # 已叠加在共享上下文之上
+        return context
+    # 自渲染会原地修改上下文，共享部分作为写时复制上下文的共享层，仅复制模板可访问的可变变量
+    return CopyOnWriteContext(shared_context, dict(context))
+
+
+def split_host_context(
+    shared_context: typing.Optional[typing.Dict], context: typing.MutableMapping
+) -> typing.MutableMapping:
+    """
+    拆出叠加在共享上下文之上的主机层，与 merge_context 相对，分发到子进程时无需逐台序列化共享部分
+    :param shared_context: 共享上下文
+    :param context: 主机上下文
+    :return:
+    """
+    if (
+        shared_context
+        and isinstance(context, CopyOnWriteContext)
+        and context.shared is shared_context
+        and not context.deleted
+    ):
+        return context.local
+    return context
+
+
+class ConfigRenderEngine:
+    def __init__(
+        self,
+        maxsize: int = DEFAULT_COMPILED_CACHE_MAXSIZE,
+        pool_min_batch_size: int = POOL_MIN_BATCH_SIZE,
+        pool_timeout: typing.Optional[float] = None,
+    ):
+        """
+        :param maxsize: 编译模板缓存最大条目数
+        :param pool_min_batch_size: 使用进程池渲染的最小主机数
+        :param pool_timeout: 等待进程池渲染单个任务的最长时间（秒），为空时使用配置 CONFIG_RENDER_CHUNK_TIMEOUT
+        """
+        self.maxsize = maxsize
+        self.pool_min_batch_size = pool_min_batch_size
+        self.pool_timeout = pool_timeout
+        self._lock = threading.Lock()
+        self._compiled: OrderedDict = OrderedDict()
+
+        self._pool_lock = threading.Lock()
+        self._pool: typing.Optional[Pool] = None
+        self._pool_processes: int = 0
+        # 创建进程池的进程，fork 出的子进程不可使用父进程的进程池
+        self._pool_pid: typing.Optional[int] = None
+        # 无法创建进程池的进程，后续批次直接在当前进程渲染
+        self._pool_unavailable_pid: typing.Optional[int] = None
+
+    def compile(self, source: TemplateSource) -> CompiledTemplate:
+        key: str = source.digest
+        with self._lock:
+            compiled: typing.Optional[CompiledTemplate] = self._compiled.get(key)
+            if compiled is not None:
+                self._compiled.move_to_end(key)
+                return compiled
+
+        compiled = CompiledTemplate(source)
+        with self._lock:
+            self._compiled[key] = compiled
+            while len(self._compiled) > self.maxsize:
+                self._compiled.popitem(last=False)
+        return compiled
+
+    def render(self, sources: typing.List[TemplateSource], context: typing.Dict) -> typing.List[typing.Tuple[str, str]]:
+        """
+        按顺序渲染模板内容及文件名，渲染会修改上下文
+        :param sources: 模板列表
+        :param context: 上下文
+        :return: [(内容, 文件名)]
+        """
+        results: typing.List[typing.Tuple[str, str]] = []
+        for source in sources:
+            compiled: CompiledTemplate = self.compile(source)
+            try:
+                compiled.self_render(context)
+            except Exception as e:
+                raise TemplateRenderError(source.name, str(e))
+            results.append((compiled.render(context), nested_render_data(source.name, context)))
+        return results
+
+    def render_batch(
+        self,
+        sources: typing.List[TemplateSource],
+        contexts: typing.List[typing.Dict],
+        shared_context: typing.Optional[typing.Dict] = None,
+        processes: typing.Optional[int] = None,
+    ) -> typing.List[typing.List[typing.Tuple[str, str]]]:
+        """
+        批量渲染多台主机，主机数较多且配置了多进程时通过进程池并行渲染
+        :param sources: 模板列表
+        :param contexts: 各主机的上下文，与共享上下文合并后渲染，可为叠加在共享上下文之上的写时复制上下文
+        :param shared_context: 各主机共享的只读上下文
+        :param processes: 进程数，为空时使用配置 CONFIG_RENDER_PROCESSES，不大于 1 时在当前进程渲染
+        :return: 与 contexts 顺序一致的渲染结果
+        """
+        processes = settings.CONFIG_RENDER_PROCESSES if processes is None else processes
+        if processes > 1 and len(contexts) >= self.pool_min_batch_size:
+            results_list = self.render_batch_in_pool(sources, contexts, shared_context, processes)
+            if results_list is not None:
+                return results_list
+
+        return [self.render(sources, merge_context(shared_context, context)) for context in contexts]
+
+    def render_batch_in_pool(
+        self,
+        sources: typing.List[TemplateSource],
+        contexts: typing.List[typing.Dict],
+        shared_context: typing.Optional[typing.Dict],
+        processes: int,
+    ) -> typing.Optional[typing.List[typing.List[typing.Tuple[str, str]]]]:
+        """
+        在进程池中渲染，子进程渲染的是上下文的副本，不修改传入的上下文
+        :param sources: 模板列表
+        :param contexts: 各主机的上下文
+        :param shared_context: 各主机共享的只读上下文
+        :param processes: 进程数
+        :return: 与 contexts 顺序一致的渲染结果，进程池不可用、超时或任务无法分发时返回 None，由调用方在当前进程渲染
+        """
+        pool: typing.Optional[Pool] = self.get_pool(processes)
+        if pool is None:
+            return None
+
+        # 共享上下文随每个任务序列化一次，按进程数划分任务以摊薄开销
+        chunk_size: int = max(RENDER_CHUNK_SIZE, math.ceil(len(contexts) / (processes * POOL_TASKS_PER_PROCESS)))
+        host_contexts: typing.List[typing.MutableMapping] = [
+            split_host_context(shared_context, context) for context in contexts
+        ]
+        tasks: typing.List[typing.Tuple] = [
+            (sources, shared_context, host_contexts[begin : begin + chunk_size])
+            for begin in range(0, len(host_contexts), chunk_size)
+        ]
+        # 超时按任务计算，批次耗时随主机数增长，子进程卡住或异常退出时不会无限等待
+        pool_timeout: float = settings.CONFIG_RENDER_CHUNK_TIMEOUT if self.pool_timeout is None else self.pool_timeout
+        try:
+            chunk_results_iter = pool.imap(_render_chunk, tasks)
+            chunk_results_list = [chunk_results_iter.next(pool_timeout) for __ in range(len(tasks))]
+        except TemplateRenderError:
+            raise
+        except multiprocessing.TimeoutError:
+            logger.warning(
+                f"[render_engine] render chunk in process pool timeout after {pool_timeout}s, "
+                f"host_num -> {len(contexts)}, chunk_size -> {chunk_size}, fallback to render in process"
+            )
+            # 子进程可能已卡住或退出，终止进程池，下一批次重新创建
+            self.discard_pool(pool)
+            return None
+        except Exception as e:
+            # 上下文无法序列化等分发失败的情况，在当前进程渲染
+            logger.warning(f"[render_engine] render in process pool failed, fallback to render in process: {e}")
+            return None
+        return [results for chunk_results in chunk_results_list for results in chunk_results]
+
+    def get_pool(self, processes: int) -> typing.Optional[Pool]:
+        """
+        获取常驻进程池，首次使用时创建，后续批次复用，子进程内的编译缓存同样得以复用
+        子进程以 spawn 方式启动：多线程 worker（如 celery -P threads）中 fork 会复制其他线程持有的锁，子进程可能死锁
+        :param processes: 进程数
+        :return: 无法创建进程池时返回 None
+        """
+        pid: int = os.getpid()
+        with self._pool_lock:
+            if self._pool_unavailable_pid == pid:
+                return None
+            if self._pool is not None and self._pool_pid == pid and self._pool_processes == processes:
+                return self._pool
+
+            if self._pool is not None and self._pool_pid == pid:
+                self._pool.terminate()
+            self._pool = None
+            try:
+                self._pool = multiprocessing.get_context("spawn").Pool(processes)
+            except (AssertionError, ValueError, OSError) as e:
+                # 守护进程（如 prefork worker 的子进程）不允许创建子进程，降级为当前进程渲染
+                logger.warning(f"[render_engine] create process pool failed, fallback to render in process: {e}")
+                self._pool_unavailable_pid = pid
+                return None
+            self._pool_processes = processes
+            self._pool_pid = pid
+            return self._pool
+
+    def discard_pool(self, pool: typing.Optional[Pool] = None):
+        """
+        终止进程池，下一批次重新创建
+        :param pool: 待终止的进程池，为空时终止当前进程池；已被替换的进程池仅终止，不影响当前进程池
+        :return:
+        """
+        with self._pool_lock:
+            if pool is None or pool is self._pool:
+                pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.terminate()
+
+
+config_render_engine = ConfigRenderEngine()
+
+
+def _render_chunk(
+    task: typing.Tuple[typing.List[TemplateSource], typing.Optional[typing.Dict], typing.List[typing.Dict]]
+) -> typing.List[typing.List[typing.Tuple[str, str]]]:
+    sources, shared_context, contexts = task
+    return [config_render_engine.render(sources, merge_context(shared_context, context)) for context in contexts]
+
+
+def benchmark(
+    sources: typing.List[TemplateSource],
+    contexts: typing.List[typing.Dict],
+    processes_list: typing.List[int],
+    rounds: int = 3,
+) -> typing.List[typing.Dict[str, typing.Any]]:
+    """
+    对比渲染吞吐
+    - legacy：渲染整个上下文后渲染模板，即引擎接入前 PluginConfigTemplate.render 的方式
+    - engine：预编译模板，仅自渲染引用的变量
+    - engine xN：N 个进程并行渲染，进程池常驻复用，首轮包含进程池的创建耗时
+    :param sources: 模板列表
+    :param contexts: 各主机的上下文
+    :param processes_list: 需对比的进程数列表
+    :param rounds: 重复轮数，取最小耗时
+    :return: [{"name", "processes", "renders", "seconds", "renders_per_second", "renders_per_second_per_core"}]
+    """
+    engine: ConfigRenderEngine = ConfigRenderEngine(pool_min_batch_size=0)
+
+    def legacy_render_batch(_contexts: typing.List[typing.Dict]):
+        for context in _contexts:
+            for source in sources:
+                context = nested_render_data(context, context)
+                nested_render_data(source.content, context)
+                nested_render_data(source.name, context)
+
+    candidates: typing.List[typing.Tuple[str, int, typing.Callable]] = [
+        ("legacy", 1, legacy_render_batch),
+        ("engine", 1, lambda _contexts: engine.render_batch(sources, _contexts, processes=1)),
+    ]
+    for processes in processes_list:
+        if processes > 1:
+            candidates.append(
+                (
+                    f"engine x{processes}",
+                    processes,
+                    lambda _contexts, _processes=processes: engine.render_batch(
+                        sources, _contexts, processes=_processes
+                    ),
+                )
+            )
+
+    renders: int = len(sources) * len(contexts)
+    results: typing.List[typing.Dict[str, typing.Any]] = []
+    try:
+        for name, processes, render_batch_func in candidates:
+            seconds: float = float("inf")
+            for __ in range(rounds):
+                # 渲染会修改上下文，每轮使用新的副本，复制耗时不计入
+                round_contexts: typing.List[typing.Dict] = copy.deepcopy(contexts)
+                begin_at: float = time.perf_counter()
+                render_batch_func(round_contexts)
+                seconds = min(seconds, time.perf_counter() - begin_at)
+
+            renders_per_second: float = renders / seconds if seconds else 0
+            results.append(
+                {
+                    "name": name,
+                    "processes": processes,
+                    "renders": renders,
+                    "seconds": seconds,
+                    "renders_per_second": renders_per_second,
+                    "renders_per_second_per_core": renders_per_second / processes,
+                }
+            )
+    finally:
+        engine.discard_pool()
+    return results
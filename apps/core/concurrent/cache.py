@@ -9,7 +9,13 @@ an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express o
 specific language governing permissions and limitations under the License.
 """
 
+import contextlib
+import math
+import random
+import threading
+import time
 import typing
+from collections import OrderedDict
 
 import ujson as json
 import wrapt
@@ -21,18 +27,54 @@ from apps.prometheus.helper import observe
 from apps.utils.cache import format_cache_key
 from env.constants import CacheBackend
 
+from .lock import RedisLock
+
 DEFAULT_CACHE_TIME = 60 * 15
 
+# 单飞模式下，旧值的保留时间为缓存时间的倍数
+STALE_CACHE_TIME_MULTIPLIER = 2
+
+# 单飞模式下，未抢到锁的请求轮询缓存的间隔（秒）
+SINGLE_FLIGHT_POLL_INTERVAL = 0.1
+
+# 单飞模式下，计算锁的默认过期时间（秒），计算期间每 1/3 过期时间续期一次，持锁者异常退出后最迟在该时间后释放
+DEFAULT_SINGLE_FLIGHT_LOCK_EXPIRE = 30
+
+# 单飞模式下，未抢到锁且无旧值时的默认最长等待时间（秒），超时后自行计算
+DEFAULT_SINGLE_FLIGHT_WAIT_TIMEOUT = 60
+
+# 进程内最多记录计算耗时的缓存 key 数量
+FUNC_COMPUTE_DURATION_MAXSIZE = 1024
+
 
 class FuncCacheDecorator:
 
     cache_time: int = DEFAULT_CACHE_TIME
 
-    def __init__(self, cache_time: typing.Optional[int] = None):
+    def __init__(
+        self,
+        cache_time: typing.Optional[int] = None,
+        single_flight: bool = False,
+        single_flight_lock_expire: int = DEFAULT_SINGLE_FLIGHT_LOCK_EXPIRE,
+        single_flight_wait_timeout: float = DEFAULT_SINGLE_FLIGHT_WAIT_TIMEOUT,
+        early_refresh_beta: float = 0,
+    ):
         """
         :param cache_time: 缓存事件（秒）
+        :param single_flight: 是否开启单飞模式，缓存失效时仅有一个 worker（跨进程）重新计算，其他请求返回旧值或等待
+        :param single_flight_lock_expire: 单飞模式下，计算锁的过期时间（秒），计算期间自动续期
+        :param single_flight_wait_timeout: 单飞模式下，未抢到锁且无旧值时的最长等待时间（秒）
+        :param early_refresh_beta: 概率提前刷新系数，为 0 时不开启，越大越倾向于在过期前提前刷新
         """
         self.cache_time = cache_time or DEFAULT_CACHE_TIME
+        self.single_flight = single_flight
+        self.single_flight_lock_expire = single_flight_lock_expire
+        self.single_flight_wait_timeout = single_flight_wait_timeout
+        self.early_refresh_beta = early_refresh_beta
+
+        # 进程内记录的各缓存 key 最近一次计算耗时，用于概率提前刷新
+        self.compute_duration_map: OrderedDict = OrderedDict()
+        self._compute_duration_lock = threading.Lock()
 
     def get_from_cache(self, using: str, key: str) -> typing.Any:
         cache = caches[using]
@@ -44,11 +86,11 @@ class FuncCacheDecorator:
             return json.loads(func_result)
         return func_result
 
-    def set_to_cache(self, using: str, key: str, value: typing.Any):
+    def set_to_cache(self, using: str, key: str, value: typing.Any, cache_time: typing.Optional[int] = None):
         cache = caches[using]
         if using == CacheBackend.DB.value:
             value = json.dumps(value)
-        cache.set(key, value, self.cache_time)
+        cache.set(key, value, cache_time or self.cache_time)
 
     def ttl_from_cache(self, using: str, key: str) -> int:
         ttl: int = 0
@@ -58,6 +100,145 @@ class FuncCacheDecorator:
             pass
         return ttl
 
+    @staticmethod
+    def get_stale_cache_key(cache_key: str) -> str:
+        return f"{cache_key}:stale"
+
+    def get_single_flight_lock(self, cache_key: str) -> RedisLock:
+        return RedisLock(lock_name=f"cache_decorator:{cache_key}", lock_expire=self.single_flight_lock_expire)
+
+    @contextlib.contextmanager
+    def keep_lock_alive(self, lock: RedisLock, identifier: str):
+        """
+        计算期间在后台线程中续期计算锁，避免计算耗时超过锁过期时间后其他 worker 重复计算
+        """
+        stop_event: threading.Event = threading.Event()
+
+        def _renew():
+            while not stop_event.wait(lock.lock_expire / 3):
+                try:
+                    if not lock.renew_lock(lock.lock_name, identifier):
+                        return
+                except Exception:
+                    # 允许单次续期失败，下个周期重试
+                    continue
+
+        renew_thread: threading.Thread = threading.Thread(target=_renew, daemon=True)
+        renew_thread.start()
+        try:
+            yield
+        finally:
+            stop_event.set()
+            renew_thread.join()
+
+    def get_compute_duration(self, cache_key: str) -> typing.Optional[float]:
+        with self._compute_duration_lock:
+            return self.compute_duration_map.get(cache_key)
+
+    def set_compute_duration(self, cache_key: str, compute_duration: float):
+        with self._compute_duration_lock:
+            self.compute_duration_map[cache_key] = compute_duration
+            self.compute_duration_map.move_to_end(cache_key)
+            while len(self.compute_duration_map) > FUNC_COMPUTE_DURATION_MAXSIZE:
+                self.compute_duration_map.popitem(last=False)
+
+    def locked_call_and_set_to_cache(
+        self,
+        wrapped: typing.Callable,
+        args: typing.Tuple[typing.Any],
+        kwargs: typing.Dict[str, typing.Any],
+        cache_key: str,
+        labels: typing.Dict[str, str],
+        lock: RedisLock,
+        identifier: str,
+    ) -> typing.Any:
+        """
+        持有计算锁时执行函数并设置缓存，计算期间续期，结束后释放锁
+        """
+        try:
+            with self.keep_lock_alive(lock, identifier):
+                return self.call_and_set_to_cache(wrapped, args, kwargs, cache_key, labels)
+        finally:
+            lock.release_lock(lock.lock_name, identifier)
+
+    def call_and_set_to_cache(
+        self,
+        wrapped: typing.Callable,
+        args: typing.Tuple[typing.Any],
+        kwargs: typing.Dict[str, typing.Any],
+        cache_key: str,
+        labels: typing.Dict[str, str],
+    ) -> typing.Any:
+        """
+        执行函数得到结果，并设置缓存
+        单飞模式下额外保存一份保留时间更长的旧值，用于缓存失效、重新计算期间返回
+        """
+        begin_at: float = time.perf_counter()
+        func_result: typing.Any = wrapped(*args, **kwargs)
+        self.set_compute_duration(cache_key, time.perf_counter() - begin_at)
+
+        with observe(metrics.app_core_cache_decorator_set_duration_seconds, **labels):
+            self.set_to_cache(using=settings.CACHE_BACKEND, key=cache_key, value=func_result)
+            if self.single_flight:
+                self.set_to_cache(
+                    using=settings.CACHE_BACKEND,
+                    key=self.get_stale_cache_key(cache_key),
+                    value=func_result,
+                    cache_time=self.cache_time * STALE_CACHE_TIME_MULTIPLIER,
+                )
+        return func_result
+
+    def single_flight_call(
+        self,
+        wrapped: typing.Callable,
+        args: typing.Tuple[typing.Any],
+        kwargs: typing.Dict[str, typing.Any],
+        cache_key: str,
+        labels: typing.Dict[str, str],
+    ) -> typing.Any:
+        """
+        单飞模式：抢到计算锁的 worker 重新计算，其他 worker 优先返回旧值，无旧值时等待计算结果
+        """
+        lock: RedisLock = self.get_single_flight_lock(cache_key)
+        identifier: typing.Optional[str] = lock.acquire_lock_with_expire(lock.lock_name)
+        if identifier:
+            return self.locked_call_and_set_to_cache(wrapped, args, kwargs, cache_key, labels, lock, identifier)
+
+        stale_value: typing.Any = self.get_from_cache(
+            using=settings.CACHE_BACKEND, key=self.get_stale_cache_key(cache_key)
+        )
+        if stale_value is not None:
+            metrics.app_core_cache_decorator_waits_total.labels(result="stale", **labels).inc()
+            return stale_value
+
+        with observe(metrics.app_core_cache_decorator_wait_duration_seconds, **labels):
+            deadline: float = time.perf_counter() + self.single_flight_wait_timeout
+            while time.perf_counter() < deadline:
+                time.sleep(SINGLE_FLIGHT_POLL_INTERVAL)
+                func_result: typing.Any = self.get_from_cache(using=settings.CACHE_BACKEND, key=cache_key)
+                if func_result is not None:
+                    metrics.app_core_cache_decorator_waits_total.labels(result="hit", **labels).inc()
+                    return func_result
+                if not lock.is_locked(lock.lock_name):
+                    # 持锁者已释放锁但未写入缓存（计算异常），无需继续等待
+                    break
+
+        # 等待超时或持锁者计算失败，自行计算兜底
+        metrics.app_core_cache_decorator_waits_total.labels(result="timeout", **labels).inc()
+        return self.call_and_set_to_cache(wrapped, args, kwargs, cache_key, labels)
+
+    def should_early_refresh(self, cache_key: str) -> bool:
+        """
+        概率提前刷新（XFetch）：越接近过期、计算越耗时，提前刷新的概率越高，避免缓存集中失效
+        """
+        compute_duration: typing.Optional[float] = self.get_compute_duration(cache_key)
+        if not self.early_refresh_beta or not compute_duration:
+            return False
+        ttl: int = self.ttl_from_cache(using=settings.CACHE_BACKEND, key=cache_key)
+        if not ttl or ttl < 0:
+            return False
+        return -compute_duration * self.early_refresh_beta * math.log(1 - random.random()) >= ttl
+
     @wrapt.decorator
     def __call__(
         self,
@@ -98,12 +279,27 @@ class FuncCacheDecorator:
 
         if func_result is None:
             # 无需从缓存中获取数据或者缓存中没有数据，则执行函数得到结果，并设置缓存
-            func_result = wrapped(*args, **kwargs)
-            with observe(metrics.app_core_cache_decorator_set_duration_seconds, **master_labels):
-                self.set_to_cache(using=settings.CACHE_BACKEND, key=cache_key, value=func_result)
+            if get_cache or use_fast_cache:
+                metrics.app_core_cache_decorator_misses_total.labels(get_cache=get_cache, **master_labels).inc()
+            if (get_cache or use_fast_cache) and self.single_flight:
+                func_result = self.single_flight_call(wrapped, args, kwargs, cache_key, master_labels)
+            else:
+                func_result = self.call_and_set_to_cache(wrapped, args, kwargs, cache_key, master_labels)
         elif get_cache or use_fast_cache:
             # cache hit
             metrics.app_core_cache_decorator_hits_total.labels(get_cache=get_cache, **master_labels).inc()
+            if self.should_early_refresh(cache_key):
+                metrics.app_core_cache_decorator_early_refreshes_total.labels(**master_labels).inc()
+                if self.single_flight:
+                    # 提前刷新无需等待，抢不到计算锁时直接使用当前缓存
+                    lock: RedisLock = self.get_single_flight_lock(cache_key)
+                    identifier: typing.Optional[str] = lock.acquire_lock_with_expire(lock.lock_name)
+                    if identifier:
+                        func_result = self.locked_call_and_set_to_cache(
+                            wrapped, args, kwargs, cache_key, master_labels, lock, identifier
+                        )
+                else:
+                    func_result = self.call_and_set_to_cache(wrapped, args, kwargs, cache_key, master_labels)
 
         # 缓存预热
         if settings.CACHE_ENABLE_PREHEAT:
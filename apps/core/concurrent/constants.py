@@ -20,3 +20,6 @@ DEFAULT_CONCURRENT_CONTROL_CONFIG = {
 
 
 DEFAULT_LOCK_EXPIRE = 20
+
+# 阻塞获取锁时的重试间隔（秒）
+LOCK_RETRY_INTERVAL = 0.1
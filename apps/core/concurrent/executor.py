@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+TencentBlueKing is pleased to support the open source community by making 蓝鲸智云-节点管理(BlueKing-BK-NODEMAN) available.
+Copyright (C) 2017-2022 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at https://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+
+import atexit
+import os
+import threading
+import typing
+from concurrent.futures import Future, ThreadPoolExecutor
+from multiprocessing import get_context
+from multiprocessing.pool import Pool
+
+from django.conf import settings
+
+from apps.prometheus import metrics
+
+# 线程上下文：记录当前线程所属的执行器名称及嵌套层级，用于嵌套调用检测
+_local = threading.local()
+
+
+def get_executor_max_workers(name: str, depth: int = 0) -> int:
+    """
+    获取执行器的最大线程数，未单独配置的执行器使用全局并发数
+    :param name: 执行器名称
+    :param depth: 嵌套层级，嵌套执行器统一使用 CONCURRENT_EXECUTOR_NESTED_MAX_WORKERS
+    :return:
+    """
+    if depth:
+        return settings.CONCURRENT_EXECUTOR_NESTED_MAX_WORKERS
+    return settings.CONCURRENT_EXECUTOR_MAX_WORKERS.get(name) or settings.CONCURRENT_NUMBER
+
+
+def get_current_executor_name() -> typing.Optional[str]:
+    """获取当前线程所属的执行器名称，非执行器线程返回 None"""
+    return getattr(_local, "executor_name", None)
+
+
+def get_current_depth() -> int:
+    """获取当前线程的嵌套层级，非执行器线程为 0，任一执行器的工作线程为所属执行器层级 + 1"""
+    return getattr(_local, "executor_depth", 0)
+
+
+class ManagedExecutor:
+    """
+    进程级共享、命名的线程池执行器
+    - 跨调用复用线程，避免每次调用都创建 / 销毁线程池
+    - fork 后的子进程无法复用父进程的线程，按 pid 懒加载重建
+    - 上报排队任务数、活跃线程数指标
+    """
+
+    def __init__(self, name: str, max_workers: int, depth: int = 0):
+        self.name = name
+        self.max_workers = max_workers
+        self.depth = depth
+        self._lock = threading.Lock()
+        self._executor: typing.Optional[ThreadPoolExecutor] = None
+        self._pid: typing.Optional[int] = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        pid: int = os.getpid()
+        if self._executor is not None and self._pid == pid:
+            return self._executor
+        with self._lock:
+            if self._executor is None or self._pid != pid:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+                self._pid = pid
+                metrics.app_concurrent_executor_max_workers.labels(name=self.name).set(self.max_workers)
+        return self._executor
+
+    def in_worker_thread(self) -> bool:
+        """当前线程是否为该执行器的工作线程"""
+        return get_current_executor_name() == self.name
+
+    def _run(self, fn: typing.Callable, *args, **kwargs) -> typing.Any:
+        metrics.app_concurrent_executor_queue_depth.labels(name=self.name).dec()
+        metrics.app_concurrent_executor_active_threads.labels(name=self.name).inc()
+        outer_executor_name: typing.Optional[str] = get_current_executor_name()
+        outer_depth: int = get_current_depth()
+        _local.executor_name = self.name
+        _local.executor_depth = self.depth + 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _local.executor_name = outer_executor_name
+            _local.executor_depth = outer_depth
+            metrics.app_concurrent_executor_active_threads.labels(name=self.name).dec()
+
+    def _on_done(self, future: Future):
+        # 任务在执行前被取消，_run 未执行，需要在此处回收排队计数
+        if future.cancelled():
+            metrics.app_concurrent_executor_queue_depth.labels(name=self.name).dec()
+
+    def submit(self, fn: typing.Callable, *args, **kwargs) -> Future:
+        metrics.app_concurrent_executor_queue_depth.labels(name=self.name).inc()
+        metrics.app_concurrent_executor_submits_total.labels(name=self.name).inc()
+        future: Future = self.executor.submit(self._run, fn, *args, **kwargs)
+        future.add_done_callback(self._on_done)
+        return future
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+class ExecutorRegistry:
+    """执行器注册表，按名称管理进程内共享的线程池 / 进程池"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executors: typing.Dict[str, ManagedExecutor] = {}
+        self._process_pool: typing.Optional[Pool] = None
+        self._process_pool_pid: typing.Optional[int] = None
+
+    def get(self, name: str = "default", depth: int = 0) -> ManagedExecutor:
+        """
+        获取命名执行器，不存在时按配置创建
+        :param name: 执行器名称
+        :param depth: 嵌套层级，各层级使用独立的线程池
+        :return:
+        """
+        key: str = f"{name}.nested{depth}" if depth else name
+        executor: typing.Optional[ManagedExecutor] = self._executors.get(key)
+        if executor is not None:
+            return executor
+        with self._lock:
+            if key not in self._executors:
+                self._executors[key] = ManagedExecutor(
+                    name=key, max_workers=get_executor_max_workers(name, depth), depth=depth
+                )
+            return self._executors[key]
+
+    def get_for_call(self, name: str = "default") -> typing.Optional[ManagedExecutor]:
+        """
+        获取当前线程发起并发调用时应使用的执行器
+        - 非执行器线程：使用命名执行器
+        - 任一执行器的工作线程中嵌套调用：使用下一层级的独立执行器，
+          每层的任务只等待更深层级的任务，不会因外层任务占满线程池而互相等待导致死锁
+        - 嵌套层级超过 CONCURRENT_EXECUTOR_MAX_NESTED_DEPTH：返回 None，由调用方在当前线程串行执行
+        :param name: 执行器名称
+        :return:
+        """
+        depth: int = get_current_depth()
+        if depth > settings.CONCURRENT_EXECUTOR_MAX_NESTED_DEPTH:
+            metrics.app_concurrent_executor_nested_calls_total.labels(name=name, mode="serial").inc()
+            return None
+        if depth:
+            metrics.app_concurrent_executor_nested_calls_total.labels(name=name, mode="nested").inc()
+        return self.get(name, depth)
+
+    def get_process_pool(self) -> typing.Optional[Pool]:
+        """
+        获取进程级共享的进程池，仅支持 fork 模式
+        需通过 CONCURRENT_PROCESS_POOL_SIZE 显式开启，未开启时返回 None
+        在多线程进程（如 -P threads 的 worker）中 fork 可能使子进程继承其他线程持有的锁，不建议开启
+        :return:
+        """
+        if settings.CONCURRENT_PROCESS_POOL_SIZE <= 0:
+            return None
+        pid: int = os.getpid()
+        if self._process_pool is not None and self._process_pool_pid == pid:
+            return self._process_pool
+        with self._lock:
+            if self._process_pool is None or self._process_pool_pid != pid:
+                self._process_pool = get_context("fork").Pool(processes=settings.CONCURRENT_PROCESS_POOL_SIZE)
+                self._process_pool_pid = pid
+        return self._process_pool
+
+    def shutdown(self):
+        """关闭当前进程创建的线程池及进程池，fork 继承的实例不属于当前进程，不做处理"""
+        with self._lock:
+            executors: typing.List[ManagedExecutor] = list(self._executors.values())
+            process_pool, self._process_pool = self._process_pool, None
+            process_pool_pid, self._process_pool_pid = self._process_pool_pid, None
+        for executor in executors:
+            executor.shutdown()
+        if process_pool is not None and process_pool_pid == os.getpid():
+            # 进程退出时不再等待未完成的任务，避免卡住退出流程
+            process_pool.terminate()
+            process_pool.join()
+
+
+registry = ExecutorRegistry()
+atexit.register(registry.shutdown)
+
+
+def get_executor(name: str = "default") -> ManagedExecutor:
+    return registry.get(name)
+
+
+def get_executor_for_call(name: str = "default") -> typing.Optional[ManagedExecutor]:
+    return registry.get_for_call(name)
@@ -11,12 +11,15 @@ specific language governing permissions and limitations under the License.
 
 import logging
 import math
+import threading
+import time
 import typing
 import uuid
 
 from redis import StrictRedis
 
 from apps.backend.utils import redis
+from apps.prometheus import metrics
 
 from . import constants
 
@@ -26,10 +29,18 @@ logger = logging.getLogger("app")
 class RedisLock:
     redis_inst: StrictRedis = None
 
-    def __init__(self, lock_name: str, lock_expire: int = None, redis_inst: typing.Optional[StrictRedis] = None):
+    def __init__(
+        self,
+        lock_name: str,
+        lock_expire: int = None,
+        redis_inst: typing.Optional[StrictRedis] = None,
+        blocking_timeout: float = 0,
+    ):
         self.lock_name = lock_name
         self.lock_expire = lock_expire or constants.DEFAULT_LOCK_EXPIRE
         self.redis_inst = redis_inst or redis.RedisInstSingleTon.get_inst()
+        # 锁被持有时的最长等待时间，为 0 时不等待
+        self.blocking_timeout = blocking_timeout
 
     def __enter__(self):
         if self.lock_name is None:
@@ -52,11 +63,15 @@ class RedisLock:
         identifier = str(uuid.uuid4())
         lock_name = f"lock:{lock_name}"
         lock_timeout = int(math.ceil(self.lock_expire))
-        # 如果不存在这个锁则加锁并设置过期时间，避免死锁
-        if self.redis_inst.set(lock_name, identifier, ex=lock_timeout, nx=True):
-            return identifier
-        # 锁已存在并被持有，此时放弃排队竞争，直接返回None
-        return None
+        begin_time: float = time.monotonic()
+        while True:
+            # 如果不存在这个锁则加锁并设置过期时间，避免死锁
+            if self.redis_inst.set(lock_name, identifier, ex=lock_timeout, nx=True):
+                return identifier
+            # 锁已存在并被持有，超出等待时间后放弃排队竞争，直接返回None
+            if time.monotonic() - begin_time + constants.LOCK_RETRY_INTERVAL > self.blocking_timeout:
+                return None
+            time.sleep(constants.LOCK_RETRY_INTERVAL)
 
     def release_lock(self, lock_name, identifier):
         """
@@ -76,3 +91,203 @@ class RedisLock:
         unlock = self.redis_inst.register_script(unlock_script)
         result = unlock(keys=[lock_name], args=[identifier])
         return result
+
+    def renew_lock(self, lock_name, identifier):
+        """
+        续期锁，仅持有者可续期
+        :param lock_name: 锁的名称
+        :param identifier: 锁的标识
+        :return: 是否续期成功
+        """
+        renew_script = """
+        if redis.call("get",KEYS[1]) == ARGV[1] then
+            return redis.call("pexpire",KEYS[1],ARGV[2])
+        else
+            return 0
+        end
+        """
+        lock_name = f"lock:{lock_name}"
+        renew = self.redis_inst.register_script(renew_script)
+        return bool(renew(keys=[lock_name], args=[identifier, int(self.lock_expire * 1000)]))
+
+    def is_locked(self, lock_name) -> bool:
+        return bool(self.redis_inst.exists(f"lock:{lock_name}"))
+
+
+class RedisLease:
+    """
+    Redis 租约，用于常驻循环 / 周期任务的主备选举
+    - 持有者通过后台心跳线程续约，业务逻辑阻塞时租约也不会过期，租约时长可以设置得较短以实现秒级故障切换
+    - 每次获得租约分配单调递增的栅栏令牌，写入前通过 is_valid 校验，避免租约切换期间新旧持有者重复处理
+    - 支持带超时的阻塞获取
+    """
+
+    # 持有者续约并返回当前令牌，租约空闲时抢占并分配新令牌，否则返回 0
+    ACQUIRE_SCRIPT = """
+    if redis.call("get", KEYS[1]) == ARGV[1] then
+        redis.call("pexpire", KEYS[1], ARGV[2])
+        return tonumber(redis.call("get", KEYS[2]))
+    end
+    if redis.call("set", KEYS[1], ARGV[1], "px", ARGV[2], "nx") then
+        return redis.call("incr", KEYS[2])
+    end
+    return 0
+    """
+
+    RENEW_SCRIPT = """
+    if redis.call("get", KEYS[1]) == ARGV[1] then
+        return redis.call("pexpire", KEYS[1], ARGV[2])
+    end
+    return 0
+    """
+
+    # 仅持有者可释放
+    RELEASE_SCRIPT = """
+    if redis.call("get", KEYS[1]) == ARGV[1] then
+        return redis.call("del", KEYS[1])
+    end
+    return 0
+    """
+
+    # 校验仍为持有者且令牌未被新的持有者替换
+    VALIDATE_SCRIPT = """
+    if redis.call("get", KEYS[1]) == ARGV[1] and redis.call("get", KEYS[2]) == ARGV[2] then
+        return 1
+    end
+    return 0
+    """
+
+    def __init__(
+        self,
+        lease_name: str,
+        lease_expire: int = None,
+        redis_inst: typing.Optional[StrictRedis] = None,
+        blocking_timeout: float = 0,
+    ):
+        """
+        :param lease_name: 租约名称
+        :param lease_expire: 租约时长（秒），持有者异常退出后，其他实例最迟在该时间后接管
+        :param redis_inst: Redis 实例
+        :param blocking_timeout: 作为上下文管理器使用时，获取租约的最长等待时间
+        """
+        self.name = lease_name
+        # 租约及令牌使用相同的 hash tag，保证集群模式下位于同一 slot
+        self.lease_name = f"lease:{{{lease_name}}}"
+        self.token_name = f"lease:{{{lease_name}}}:fencing_token"
+        self.lease_expire = lease_expire or constants.DEFAULT_LOCK_EXPIRE
+        self.redis_inst = redis_inst or redis.RedisInstSingleTon.get_inst()
+        self.blocking_timeout = blocking_timeout
+        self.identifier = str(uuid.uuid4())
+
+        self.fencing_token: typing.Optional[int] = None
+        # 本地记录的租约到期时间，心跳续约成功后顺延
+        self._held_until: float = 0
+        self._heartbeat_stop_event: typing.Optional[threading.Event] = None
+        self._heartbeat_thread: typing.Optional[threading.Thread] = None
+
+    def __enter__(self) -> typing.Optional[int]:
+        return self.acquire(timeout=self.blocking_timeout)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.fencing_token is not None:
+            self.release()
+
+    def _run_script(self, script: str, args: typing.List) -> int:
+        return self.redis_inst.register_script(script)(keys=[self.lease_name, self.token_name], args=args)
+
+    def _set_held(self, fencing_token: typing.Optional[int]):
+        self.fencing_token = fencing_token
+        self._held_until = 0 if fencing_token is None else time.monotonic() + self.lease_expire
+        metrics.app_concurrent_lease_held.labels(name=self.name).set(int(fencing_token is not None))
+
+    def hold(self) -> bool:
+        """
+        非阻塞地获取或续约租约
+        :return: 当前实例是否持有租约
+        """
+        fencing_token: int = self._run_script(self.ACQUIRE_SCRIPT, [self.identifier, int(self.lease_expire * 1000)])
+        if not fencing_token:
+            self.stop_heartbeat()
+        self._set_held(fencing_token or None)
+        return self.fencing_token is not None
+
+    def acquire(self, timeout: float = 0, interval: typing.Optional[float] = None) -> typing.Optional[int]:
+        """
+        获取租约，获取成功后启动心跳续约
+        :param timeout: 最长等待时间，为 0 时仅尝试一次
+        :param interval: 重试间隔，默认为租约时长的 1/10
+        :return: 栅栏令牌，获取失败返回 None
+        """
+        begin_time: float = time.monotonic()
+        interval = interval or self.lease_expire / 10
+        while not self.hold():
+            if time.monotonic() - begin_time + interval > timeout:
+                metrics.app_concurrent_lease_acquire_duration_seconds.labels(name=self.name, result="timeout").observe(
+                    time.monotonic() - begin_time
+                )
+                return None
+            time.sleep(interval)
+
+        metrics.app_concurrent_lease_acquire_duration_seconds.labels(name=self.name, result="acquired").observe(
+            time.monotonic() - begin_time
+        )
+        self.start_heartbeat()
+        return self.fencing_token
+
+    def renew(self) -> bool:
+        if self._run_script(self.RENEW_SCRIPT, [self.identifier, int(self.lease_expire * 1000)]):
+            self._held_until = time.monotonic() + self.lease_expire
+            return True
+        return False
+
+    def _heartbeat(self, stop_event: threading.Event):
+        # 每 1/3 租约时长续约一次，允许单次续约失败
+        while not stop_event.wait(self.lease_expire / 3):
+            try:
+                if self.renew():
+                    continue
+            except Exception as e:
+                logger.warning(f"[RedisLease] renew failed: lease_name -> {self.lease_name}, error -> {e}")
+                continue
+
+            logger.warning(f"[RedisLease] lease lost: lease_name -> {self.lease_name}, identifier -> {self.identifier}")
+            metrics.app_concurrent_lease_lost_total.labels(name=self.name).inc()
+            # 标记心跳已停止，重新获得租约时需启动新的心跳线程
+            stop_event.set()
+            self._set_held(None)
+            return
+
+    def start_heartbeat(self):
+        if (
+            self._heartbeat_thread is not None
+            and self._heartbeat_thread.is_alive()
+            and not self._heartbeat_stop_event.is_set()
+        ):
+            return
+        self._heartbeat_stop_event = threading.Event()
+        self._heartbeat_thread = threading.Thread(
+            target=self._heartbeat, args=(self._heartbeat_stop_event,), name=f"lease-heartbeat-{self.name}", daemon=True
+        )
+        self._heartbeat_thread.start()
+
+    def stop_heartbeat(self):
+        if self._heartbeat_stop_event is not None:
+            self._heartbeat_stop_event.set()
+
+    def is_held(self) -> bool:
+        """本地判断是否持有租约，不访问 Redis"""
+        return self.fencing_token is not None and time.monotonic() < self._held_until
+
+    def is_valid(self) -> bool:
+        """
+        在 Redis 中校验栅栏令牌，用于写入前确认未发生租约切换
+        :return:
+        """
+        if not self.is_held():
+            return False
+        return bool(self._run_script(self.VALIDATE_SCRIPT, [self.identifier, self.fencing_token]))
+
+    def release(self) -> bool:
+        self.stop_heartbeat()
+        self._set_held(None)
+        return bool(self._run_script(self.RELEASE_SCRIPT, [self.identifier]))
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+TencentBlueKing is pleased to support the open source community by making 蓝鲸智云-节点管理(BlueKing-BK-NODEMAN) available.
+Copyright (C) 2017-2022 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at https://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+import time
+import typing
+
+from django.conf import settings
+
+from apps.utils.cache import format_cache_key
+from apps.utils.unittest import testcase
+
+from ..cache import FuncCacheDecorator
+from ..lock import RedisLock
+
+CALL_RECORDS: typing.List[int] = []
+
+cache_decorator = FuncCacheDecorator(
+    cache_time=60, single_flight=True, single_flight_lock_expire=1, single_flight_wait_timeout=1
+)
+
+
+def compute(number: int) -> typing.Dict[str, int]:
+    CALL_RECORDS.append(number)
+    return {"number": number}
+
+
+def slow_compute(number: int) -> typing.Dict[str, typing.Any]:
+    # 计算耗时超过计算锁过期时间，记录计算结束前锁是否仍被持有
+    time.sleep(1.5)
+    lock: RedisLock = cache_decorator.get_single_flight_lock(format_cache_key(slow_compute, number))
+    return {"number": number, "locked": lock.is_locked(lock.lock_name)}
+
+
+cached_compute = cache_decorator(compute)
+cached_slow_compute = cache_decorator(slow_compute)
+
+
+class SingleFlightTestCase(testcase.CustomBaseTestCase):
+    def setUp(self) -> None:
+        CALL_RECORDS.clear()
+        super().setUp()
+
+    def test_compute_and_set_stale(self):
+        self.assertEqual(cached_compute(1, get_cache=True), {"number": 1})
+        self.assertEqual(cached_compute(1, get_cache=True), {"number": 1})
+        self.assertEqual(CALL_RECORDS, [1])
+
+        cache_key: str = format_cache_key(compute, 1)
+        stale_value = cache_decorator.get_from_cache(
+            using=settings.CACHE_BACKEND, key=cache_decorator.get_stale_cache_key(cache_key)
+        )
+        self.assertEqual(stale_value, {"number": 1})
+
+    def test_return_stale_when_lock_held(self):
+        cache_key: str = format_cache_key(compute, 2)
+        cache_decorator.set_to_cache(
+            using=settings.CACHE_BACKEND, key=cache_decorator.get_stale_cache_key(cache_key), value={"number": -1}
+        )
+        with RedisLock(lock_name=f"cache_decorator:{cache_key}") as identifier:
+            self.assertIsNotNone(identifier)
+            self.assertEqual(cached_compute(2, get_cache=True), {"number": -1})
+        self.assertEqual(CALL_RECORDS, [])
+
+    def test_compute_after_wait_timeout(self):
+        cache_key: str = format_cache_key(compute, 3)
+        with RedisLock(lock_name=f"cache_decorator:{cache_key}"):
+            self.assertEqual(cached_compute(3, get_cache=True), {"number": 3})
+        self.assertEqual(CALL_RECORDS, [3])
+
+    def test_renew_lock_while_computing(self):
+        self.assertEqual(cached_slow_compute(4, get_cache=True), {"number": 4, "locked": True})
+        lock: RedisLock = cache_decorator.get_single_flight_lock(format_cache_key(slow_compute, 4))
+        self.assertFalse(lock.is_locked(lock.lock_name))
+
+    def test_lock_expire_independent_of_wait_timeout(self):
+        cache_key: str = format_cache_key(compute, 5)
+        with RedisLock(lock_name=f"cache_decorator:{cache_key}", lock_expire=10):
+            begin_at: float = time.perf_counter()
+            self.assertEqual(cached_compute(5, get_cache=True), {"number": 5})
+            self.assertLess(time.perf_counter() - begin_at, 5)
+        self.assertEqual(CALL_RECORDS, [5])
+
+    def test_compute_duration_per_cache_key(self):
+        cached_compute(6, get_cache=True)
+        cached_compute(7, get_cache=True)
+        self.assertIsNotNone(cache_decorator.get_compute_duration(format_cache_key(compute, 6)))
+        self.assertIsNotNone(cache_decorator.get_compute_duration(format_cache_key(compute, 7)))
+        self.assertIsNone(cache_decorator.get_compute_duration(format_cache_key(compute, 8)))
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+TencentBlueKing is pleased to support the open source community by making 蓝鲸智云-节点管理(BlueKing-BK-NODEMAN) available.
+Copyright (C) 2017-2022 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at https://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+import threading
+from typing import List
+
+from django.test import override_settings
+
+from apps.utils import batch_request, concurrent
+from apps.utils.unittest import testcase
+
+from .. import executor
+
+
+def current_thread_name(number: int) -> str:
+    return threading.current_thread().name
+
+
+def wait_barrier(barrier: threading.Barrier) -> str:
+    # 子任务未并发执行时屏障等待超时，抛出 BrokenBarrierError
+    barrier.wait(timeout=5)
+    return threading.current_thread().name
+
+
+def nested_batch_call(numbers: List[int]) -> List[str]:
+    barrier: threading.Barrier = threading.Barrier(len(numbers))
+    return concurrent.batch_call(
+        wait_barrier, params_list=[{"barrier": barrier} for __ in numbers], extend_result=False
+    )
+
+
+def nested_thread_names(numbers: List[int]) -> List[str]:
+    return concurrent.batch_call(
+        current_thread_name, params_list=[{"number": number} for number in numbers], extend_result=False
+    )
+
+
+class ExecutorTestCase(testcase.CustomBaseTestCase):
+    def test_reuse_executor(self):
+        executor_inst = executor.get_executor("default")
+        self.assertIs(executor_inst, executor.get_executor("default"))
+        self.assertIs(executor_inst.executor, executor.get_executor("default").executor)
+
+    def test_batch_call_in_shared_executor(self):
+        thread_names = concurrent.batch_call(current_thread_name, params_list=[{"number": i} for i in range(10)])
+        self.assertTrue(all(thread_name.startswith("default") for thread_name in thread_names))
+
+    @override_settings(CONCURRENT_EXECUTOR_MAX_WORKERS={"nested_test": 2})
+    def test_nested_batch_call(self):
+        # 嵌套调用提交到下一层级的独立执行器并发执行，外层任务占满线程池也不会死锁
+        results = concurrent.batch_call(
+            nested_batch_call,
+            params_list=[{"numbers": list(range(3))} for __ in range(2)],
+            extend_result=False,
+            executor_name="nested_test",
+        )
+        for thread_names in results:
+            self.assertEqual(len(set(thread_names)), 3)
+            self.assertTrue(all(thread_name.startswith("default.nested1") for thread_name in thread_names))
+        self.assertIsNone(executor.get_current_executor_name())
+
+    def test_nested_across_executors(self):
+        # 不同执行器之间的嵌套同样按层级隔离，batch_request 执行器中发起的 batch_call 使用嵌套执行器
+        results = list(
+            batch_request.iter_request_results(
+                lambda params: nested_thread_names(**params), [{"numbers": list(range(3))} for __ in range(2)]
+            )
+        )
+        for thread_names in results:
+            self.assertTrue(all(thread_name.startswith("default.nested1") for thread_name in thread_names))
+
+    @override_settings(CONCURRENT_EXECUTOR_MAX_NESTED_DEPTH=0)
+    def test_nested_batch_call_fallback_to_serial(self):
+        # 超过嵌套层级上限时在外层工作线程中串行执行
+        results = concurrent.batch_call(
+            nested_thread_names, params_list=[{"numbers": list(range(5))} for __ in range(3)], extend_result=False
+        )
+        for thread_names in results:
+            self.assertEqual(len(set(thread_names)), 1)
+            self.assertTrue(thread_names[0].startswith("default_"))
+
+    def test_process_pool_opt_in(self):
+        with override_settings(CONCURRENT_PROCESS_POOL_SIZE=0):
+            self.assertIsNone(executor.registry.get_process_pool())
+
+        registry = executor.ExecutorRegistry()
+        with override_settings(CONCURRENT_PROCESS_POOL_SIZE=1):
+            pool = registry.get_process_pool()
+            self.assertIs(registry.get_process_pool(), pool)
+            self.assertEqual(pool.apply_async(abs, (-1,)).get(timeout=10), 1)
+        registry.shutdown()
+        self.assertIsNone(registry._process_pool)
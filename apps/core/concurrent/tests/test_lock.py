@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+TencentBlueKing is pleased to support the open source community by making 蓝鲸智云-节点管理(BlueKing-BK-NODEMAN) available.
+Copyright (C) 2017-2022 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at https://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+import time
+import uuid
+
+from apps.utils.unittest import testcase
+
+from ..lock import RedisLease
+
+
+class RedisLeaseTestCase(testcase.CustomBaseTestCase):
+    def setUp(self) -> None:
+        self.lease_name = f"test_lease:{uuid.uuid4()}"
+        super().setUp()
+
+    def test_acquire_and_release(self):
+        leader = RedisLease(lease_name=self.lease_name, lease_expire=10)
+        follower = RedisLease(lease_name=self.lease_name, lease_expire=10)
+
+        fencing_token = leader.acquire()
+        self.assertIsNotNone(fencing_token)
+        self.assertTrue(leader.is_held())
+        self.assertTrue(leader.is_valid())
+        # 租约被持有时，等待超时后返回 None
+        self.assertIsNone(follower.acquire(timeout=0.2, interval=0.1))
+        self.assertFalse(follower.is_held())
+
+        self.assertTrue(leader.release())
+        self.assertFalse(leader.is_valid())
+        # 重新获得租约时，栅栏令牌单调递增
+        self.assertEqual(follower.acquire(), fencing_token + 1)
+        follower.release()
+
+    def test_fencing_token(self):
+        leader = RedisLease(lease_name=self.lease_name, lease_expire=10)
+        follower = RedisLease(lease_name=self.lease_name, lease_expire=10)
+        leader.acquire()
+        leader.stop_heartbeat()
+
+        # 模拟旧持有者租约过期后被新实例接管，旧持有者写入前的校验应失败
+        leader.redis_inst.delete(leader.lease_name)
+        self.assertIsNotNone(follower.acquire())
+        self.assertTrue(leader.is_held())
+        self.assertFalse(leader.is_valid())
+        self.assertTrue(follower.is_valid())
+        follower.release()
+
+    def test_context_manager(self):
+        with RedisLease(lease_name=self.lease_name, lease_expire=10) as fencing_token:
+            self.assertIsNotNone(fencing_token)
+            with RedisLease(lease_name=self.lease_name, lease_expire=10) as other_fencing_token:
+                self.assertIsNone(other_fencing_token)
+
+        lease = RedisLease(lease_name=self.lease_name, lease_expire=10)
+        self.assertIsNotNone(lease.acquire())
+        lease.release()
+
+    def test_reacquire_after_lease_lost(self):
+        lease = RedisLease(lease_name=self.lease_name, lease_expire=0.6)
+        self.assertIsNotNone(lease.acquire())
+
+        # 模拟租约被外部删除，心跳续约失败后标记租约丢失并停止心跳
+        lease.redis_inst.delete(lease.lease_name)
+        time.sleep(0.5)
+        self.assertFalse(lease.is_held())
+        self.assertFalse(lease._heartbeat_thread.is_alive())
+
+        # 重新获得租约后启动新的心跳线程，超过租约时长后仍持有租约
+        self.assertIsNotNone(lease.acquire())
+        self.assertTrue(lease._heartbeat_thread.is_alive())
+        time.sleep(1.2)
+        self.assertTrue(lease.is_held())
+        self.assertTrue(lease.is_valid())
+        lease.release()
@@ -223,3 +223,13 @@ class BaseStorage(StorageFileOverwriteMixin, BkJobMixin, Storage, ABC):
 
     def get_file_md5(self, file_name: str) -> str:
         raise NotImplementedError
+
+    def copy(self, name: str, target_name: str) -> str:
+        """
+        在存储内复制文件，默认从存储读取后写入，子类可重写为存储侧的复制或链接
+        :param name: 源文件路径
+        :param target_name: 目标文件路径
+        :return: 实际保存的目标文件路径
+        """
+        with self.open(name, mode="rb") as fs:
+            return self.save(target_name, fs)
@@ -8,7 +8,9 @@ Unless required by applicable law or agreed to in writing, software distributed
 an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
 specific language governing permissions and limitations under the License.
 """
+import logging
 import os
+import shutil
 from typing import Any, Callable, Dict, List, Optional
 
 from bkstorages.backends import bkrepo
@@ -24,6 +26,11 @@ from . import constants
 from .base import BaseStorage
 from .file_source import BkJobFileSourceManager
 
+logger = logging.getLogger("app")
+
+# 制品库节点操作接口的请求超时时间（秒）
+BKREPO_NODE_API_TIMEOUT = 30
+
 
 @deconstructible
 class CustomBKRepoStorage(BaseStorage, bkrepo.BKRepoStorage):
@@ -80,6 +87,38 @@ class CustomBKRepoStorage(BaseStorage, bkrepo.BKRepoStorage):
         file_md5 = file_metadata["X-Checksum-Md5"]
         return file_md5
 
+    def copy(self, name: str, target_name: str) -> str:
+        """
+        通过制品库节点复制接口在服务端复制文件，无需下载后重新上传，接口调用失败时退化为读取后写入
+        """
+        target_name = self.get_available_name(target_name)
+        src_key: str = self._full_path(name)
+        dst_key: str = self._full_path(target_name)
+        try:
+            resp = self.client.get_client().post(
+                f"{self.endpoint_url.rstrip('/')}/repository/api/node/copy",
+                json={
+                    "srcProjectId": self.project_id,
+                    "srcRepoName": self.bucket,
+                    "srcFullPath": f"/{src_key.lstrip('/')}",
+                    "destProjectId": self.project_id,
+                    "destRepoName": self.bucket,
+                    "destFullPath": f"/{dst_key.lstrip('/')}",
+                    "overwrite": bool(self.file_overwrite),
+                },
+                timeout=BKREPO_NODE_API_TIMEOUT,
+            )
+            resp.raise_for_status()
+            result: Dict[str, Any] = resp.json()
+            if result.get("code") != 0:
+                raise ValueError(f"code -> {result.get('code')}, message -> {result.get('message')}")
+        except Exception:
+            logger.exception(
+                f"[CustomBKRepoStorage] copy {src_key} -> {dst_key} by node api failed, fallback to upload"
+            )
+            return super().copy(name, target_name)
+        return dst_key
+
     def _handle_file_source_list(
         self, file_source_list: List[Dict[str, Any]], extra_transfer_file_params: Dict[str, Any]
     ) -> List[Dict[str, Any]]:
@@ -164,6 +203,22 @@ class AdminFileSystemStorage(BaseStorage, FileSystemStorage):
             self.delete(name)
         return super()._save(name, content)
 
+    def copy(self, name: str, target_name: str) -> str:
+        """
+        本地文件系统优先使用硬链接，跨设备等无法链接时退化为复制
+        覆盖写入时会先删除原文件，链接双方不会互相影响
+        """
+        target_name = self.get_available_name(target_name)
+        target_path: str = self.path(target_name)
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        if self.file_overwrite:
+            self.delete(target_name)
+        try:
+            os.link(self.path(name), target_path)
+        except OSError:
+            shutil.copyfile(self.path(name), target_path)
+        return target_name
+
     def _handle_file_source_list(
         self, file_source_list: List[Dict[str, Any]], extra_transfer_file_params: Dict[str, Any]
     ) -> List[Dict[str, Any]]:
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+TencentBlueKing is pleased to support the open source community by making 蓝鲸智云-节点管理(BlueKing-BK-NODEMAN) available.
+Copyright (C) 2017-2022 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at https://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+import mock
+
+from apps.utils.unittest.testcase import CustomBaseTestCase
+
+from ..storage import CustomBKRepoStorage
+
+
+class CustomBKRepoStorageTestCase(CustomBaseTestCase):
+    def setUp(self):
+        self.storage = CustomBKRepoStorage(
+            root_path="",
+            username="username",
+            password="password",
+            project_id="project",
+            bucket="private",
+            endpoint_url="http://127.0.0.1/",
+            file_overwrite=True,
+        )
+        self.session = mock.MagicMock()
+        mock.patch.object(self.storage.client, "get_client", return_value=self.session).start()
+        super().setUp()
+
+    def tearDown(self):
+        mock.patch.stopall()
+        super().tearDown()
+
+    def test_copy_by_node_api(self):
+        self.session.post.return_value.json.return_value = {"code": 0, "data": None}
+        with mock.patch.object(self.storage, "save") as save:
+            target_name = self.storage.copy("agent/linux/x86_64/gse_agent-2.0.0.tgz", "agent/linux/x86_64/stable.tgz")
+
+        # 服务端复制，不再下载后重新上传
+        save.assert_not_called()
+        self.assertEqual(target_name, self.storage._full_path("agent/linux/x86_64/stable.tgz"))
+        url, kwargs = self.session.post.call_args[0][0], self.session.post.call_args[1]
+        self.assertEqual(url, "http://127.0.0.1/repository/api/node/copy")
+        self.assertEqual(
+            kwargs["json"],
+            {
+                "srcProjectId": "project",
+                "srcRepoName": "private",
+                "srcFullPath": "/agent/linux/x86_64/gse_agent-2.0.0.tgz",
+                "destProjectId": "project",
+                "destRepoName": "private",
+                "destFullPath": "/agent/linux/x86_64/stable.tgz",
+                "overwrite": True,
+            },
+        )
+
+    def test_copy_fallback_to_upload(self):
+        self.session.post.return_value.json.return_value = {"code": 250, "message": "not supported"}
+        with mock.patch.object(self.storage, "open", mock.mock_open(read_data=b"pkg")), mock.patch.object(
+            self.storage, "save", return_value="agent/linux/x86_64/stable.tgz"
+        ) as save:
+            self.storage.copy("agent/linux/x86_64/gse_agent-2.0.0.tgz", "agent/linux/x86_64/stable.tgz")
+        save.assert_called_once()
+        self.assertEqual(save.call_args[0][0], "agent/linux/x86_64/stable.tgz")
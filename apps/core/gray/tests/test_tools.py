@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+TencentBlueKing is pleased to support the open source community by making 蓝鲸智云-节点管理(BlueKing-BK-NODEMAN) available.
+Copyright (C) 2017-2022 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at https://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+from django.test import override_settings
+
+from apps.node_man import constants
+from apps.utils.unittest import testcase
+from env.constants import GseVersion
+
+from ..tools import GrayTools
+
+
+class GrayToolsTestCase(testcase.CustomBaseTestCase):
+    GRAY_BK_BIZ_ID: int = 1
+    NOT_GRAY_BK_BIZ_ID: int = 2
+
+    @override_settings(BKAPP_ENABLE_DHCP=True)
+    def test_group_hosts_by_gse_version(self):
+        gray_tools: GrayTools = GrayTools()
+        gray_tools.gse2_gray_scope_set = {self.GRAY_BK_BIZ_ID}
+        hosts = [
+            {
+                "bk_host_id": bk_host_id,
+                "bk_biz_id": bk_biz_id,
+                "ap_id": constants.DEFAULT_AP_ID,
+                "bk_cloud_id": constants.DEFAULT_CLOUD,
+                "inner_ip": f"127.0.0.{bk_host_id}",
+                "inner_ipv6": "",
+                "bk_agent_id": f"agent-{bk_host_id}",
+            }
+            for bk_host_id, bk_biz_id in [
+                (1, self.GRAY_BK_BIZ_ID),
+                (2, self.NOT_GRAY_BK_BIZ_ID),
+                (3, self.GRAY_BK_BIZ_ID),
+            ]
+        ]
+
+        gse_version__hosts_map = gray_tools.group_hosts_by_gse_version(hosts)
+        self.assertEqual(
+            {
+                gse_version: [(host["bk_host_id"], host["gse_version"], host["agent_id"]) for host in gse_version_hosts]
+                for gse_version, gse_version_hosts in gse_version__hosts_map.items()
+            },
+            {
+                # 灰度业务使用 2.0 AgentID，非灰度业务使用 云区域:IP
+                GseVersion.V2.value: [(1, GseVersion.V2.value, "agent-1"), (3, GseVersion.V2.value, "agent-3")],
+                GseVersion.V1.value: [(2, GseVersion.V1.value, f"{constants.DEFAULT_CLOUD}:127.0.0.2")],
+            },
+        )
+
+    def test_get_gse_version_map(self):
+        gray_tools: GrayTools = GrayTools()
+        gray_tools.gse2_gray_scope_set = {self.GRAY_BK_BIZ_ID}
+        self.assertEqual(
+            gray_tools.get_gse_version_map(
+                [
+                    (self.GRAY_BK_BIZ_ID, constants.DEFAULT_AP_ID, False),
+                    (self.NOT_GRAY_BK_BIZ_ID, constants.DEFAULT_AP_ID, False),
+                    (self.GRAY_BK_BIZ_ID, constants.DEFAULT_AP_ID, False),
+                ]
+            ),
+            {
+                (self.GRAY_BK_BIZ_ID, constants.DEFAULT_AP_ID, False): GseVersion.V2.value,
+                (self.NOT_GRAY_BK_BIZ_ID, constants.DEFAULT_AP_ID, False): GseVersion.V1.value,
+            },
+        )
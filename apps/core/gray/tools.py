@@ -9,9 +9,11 @@ an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express o
 specific language governing permissions and limitations under the License.
 """
 import typing
+from collections import defaultdict
 
 from django.utils.translation import ugettext_lazy as _
 
+from apps.adapters.api.gse import GseApiBaseHelper, get_gse_api_helper
 from apps.core.concurrent.cache import FuncCacheDecorator
 from apps.exceptions import ApiError
 from apps.node_man import constants as node_man_constants
@@ -66,6 +68,49 @@ class GrayTools:
             gse_version: str = self.ap_id_obj_map[ap_id].gse_version
         return gse_version
 
+    def get_gse_version_map(
+        self, biz_ap_pairs: typing.Iterable[typing.Tuple[typing.Any, int, bool]]
+    ) -> typing.Dict[typing.Tuple[typing.Any, int, bool], str]:
+        """
+        批量解析 (业务, 接入点, 是否安装额外 Agent) 对应的 GSE 版本，每个组合仅解析一次
+        :param biz_ap_pairs: (业务 ID, 接入点 ID, 是否安装额外 Agent) 列表，可重复
+        :return: (业务 ID, 接入点 ID, 是否安装额外 Agent) - GSE 版本
+        """
+        return {
+            (bk_biz_id, ap_id, is_install_other_agent): self.get_host_ap_gse_version(
+                bk_biz_id, ap_id, is_install_other_agent
+            )
+            for bk_biz_id, ap_id, is_install_other_agent in set(biz_ap_pairs)
+        }
+
+    def group_hosts_by_gse_version(
+        self, hosts: typing.List[typing.Dict[str, typing.Any]]
+    ) -> typing.Dict[str, typing.List[typing.Dict[str, typing.Any]]]:
+        """
+        按主机应使用的 GSE 版本分组，并计算各主机的 Agent ID
+        GSE 版本按 (业务, 接入点) 预先解析，ApiHelper 按版本复用，避免逐台主机解析
+        :param hosts: 主机信息列表，需包含 bk_biz_id, ap_id, bk_cloud_id, inner_ip, inner_ipv6, bk_agent_id
+        :return: GSE 版本 - 主机信息列表，主机信息额外携带 gse_version & agent_id
+        """
+        gse_version_map: typing.Dict[typing.Tuple[typing.Any, int, bool], str] = self.get_gse_version_map(
+            (host["bk_biz_id"], host["ap_id"], False) for host in hosts
+        )
+        gse_version__api_helper_map: typing.Dict[str, GseApiBaseHelper] = {
+            gse_version: get_gse_api_helper(gse_version) for gse_version in set(gse_version_map.values())
+        }
+
+        gse_version__hosts_map: typing.Dict[str, typing.List[typing.Dict[str, typing.Any]]] = defaultdict(list)
+        for host in hosts:
+            gse_version: str = gse_version_map[(host["bk_biz_id"], host["ap_id"], False)]
+            gse_version__hosts_map[gse_version].append(
+                {
+                    **host,
+                    "gse_version": gse_version,
+                    "agent_id": gse_version__api_helper_map[gse_version].get_agent_id(host),
+                }
+            )
+        return gse_version__hosts_map
+
     def inject_meta_to_instances(
         self, instances: typing.Dict[str, typing.Dict[str, typing.Union[typing.Dict, typing.Any]]]
     ):
@@ -91,24 +136,31 @@ class GrayTools:
         for host_info in host_infos:
             host_id__ap_id_map[host_info["bk_host_id"]] = host_info["ap_id"]
 
+        instance_id__gse_version_key_map: typing.Dict[str, typing.Tuple[typing.Any, typing.Optional[int], bool]] = {}
         for instance_id, instance_info in instances.items():
             host_info = instance_info["host"]
             # 优先取 host_info 中的 ap_id，用于 Agent 操作场景下确定 ap
             ap_id: typing.Optional[int] = host_info.get("ap_id") or host_id__ap_id_map.get(host_info.get("bk_host_id"))
+            instance_id__gse_version_key_map[instance_id] = (
+                host_info.get("bk_biz_id"),
+                ap_id,
+                bool(host_info.get("is_need_inject_ap_id")),
+            )
+        # 相同 (业务, 接入点) 的实例共用解析结果
+        gse_version_map: typing.Dict[typing.Tuple[typing.Any, int, bool], str] = self.get_gse_version_map(
+            instance_id__gse_version_key_map.values()
+        )
+
+        for instance_id, instance_info in instances.items():
+            bk_biz_id, ap_id, is_install_other_agent = instance_id__gse_version_key_map[instance_id]
             meta: typing.Dict[str, typing.Any] = {}
-            if host_info.get("is_need_inject_ap_id"):
+            if is_install_other_agent:
                 # 双如果为安装额外Agent 将ap_id 注入 meta
                 meta["AP_ID"] = ap_id
-            bk_biz_id = host_info.get("bk_biz_id")
             if bk_biz_id in biz_ids_list:
                 meta["SCOPE_ID"] = bk_biz_id
                 meta["SCOPE_TYPE"] = node_man_constants.BkJobScopeType.BIZ.value
-            gse_version: str = self.get_host_ap_gse_version(
-                bk_biz_id=bk_biz_id,
-                ap_id=ap_id,
-                is_install_other_agent=host_info.get("is_need_inject_ap_id"),
-            )
-            meta["GSE_VERSION"] = gse_version
+            meta["GSE_VERSION"] = gse_version_map[instance_id__gse_version_key_map[instance_id]]
             instance_info["meta"] = meta
 
     @classmethod
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+TencentBlueKing is pleased to support the open source community by making 蓝鲸智云-节点管理(BlueKing-BK-NODEMAN) available.
+Copyright (C) 2017-2022 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at https://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+from apps.core.ipchooser.tools.topo_index import TopoIndex
+from apps.utils.unittest.testcase import CustomBaseTestCase
+
+
+def build_node(bk_obj_id, bk_inst_id, child=None):
+    return {
+        "bk_obj_id": bk_obj_id,
+        "bk_obj_name": bk_obj_id,
+        "bk_inst_id": bk_inst_id,
+        "bk_inst_name": f"{bk_obj_id}-{bk_inst_id}",
+        "child": child or [],
+    }
+
+
+class TopoIndexTestCase(CustomBaseTestCase):
+    def setUp(self):
+        # 业务 -> 自定义层级 -> 集群 -> 模块，主机 3 同时位于两个模块，主机 5 未缓存
+        self.topo_tree = build_node(
+            "biz",
+            1,
+            [
+                build_node(
+                    "city", 10, [build_node("set", 100, [build_node("module", 1000), build_node("module", 1001)])]
+                ),
+                build_node("set", 101, [build_node("module", 1010)]),
+            ],
+        )
+        host_topo_relations = [
+            {"bk_host_id": 1, "bk_set_id": 100, "bk_module_id": 1000},
+            {"bk_host_id": 2, "bk_set_id": 100, "bk_module_id": 1001},
+            {"bk_host_id": 3, "bk_set_id": 100, "bk_module_id": 1000},
+            {"bk_host_id": 3, "bk_set_id": 100, "bk_module_id": 1001},
+            {"bk_host_id": 4, "bk_set_id": 101, "bk_module_id": 1010},
+            {"bk_host_id": 5, "bk_set_id": 101, "bk_module_id": 1010},
+        ]
+        self.topo_index = TopoIndex(
+            bk_biz_id=1,
+            version=0,
+            topo_tree=self.topo_tree,
+            host_topo_relations=host_topo_relations,
+            cache_host_ids={1, 2, 3, 4},
+        )
+
+    def test_get_path(self):
+        path = self.topo_index.get_path("module", 1001)
+        self.assertEqual(
+            [(node["bk_obj_id"], node["bk_inst_id"]) for node in path],
+            [
+                ("biz", 1),
+                ("city", 10),
+                ("set", 100),
+                ("module", 1001),
+            ],
+        )
+        self.assertIsNone(self.topo_index.get_path("module", 9999))
+
+    def test_get_count(self):
+        self.assertEqual(self.topo_index.get_count("biz", 1), 4)
+        self.assertEqual(self.topo_index.get_count("city", 10), 3)
+        self.assertEqual(self.topo_index.get_count("module", 1001), 2)
+        self.assertEqual(self.topo_index.get_count("set", 101), 1)
+        self.assertEqual(self.topo_index.get_count("set", 9999), 0)
+        self.assertEqual(self.topo_index.get_host_ids("city", 10), {1, 2, 3})
+
+    def test_to_tree(self):
+        topo_tree = self.topo_index.to_tree()
+        self.assertEqual(topo_tree["count"], 4)
+        self.assertEqual([child["bk_inst_id"] for child in topo_tree["child"]], [10, 101])
+        self.assertEqual(topo_tree["child"][0]["child"][0]["child"][1]["count"], 2)
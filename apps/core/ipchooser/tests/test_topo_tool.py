@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+TencentBlueKing is pleased to support the open source community by making 蓝鲸智云-节点管理(BlueKing-BK-NODEMAN) available.
+Copyright (C) 2017-2022 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at https://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+import copy
+import typing
+
+from mock import patch
+
+from apps.core.ipchooser.tests.test_topo_index import build_node
+from apps.core.ipchooser.tools.topo_index import TopoIndex, TopoIndexTools
+from apps.core.ipchooser.tools.topo_tool import TopoTool
+from apps.mock_data.common_unit.host import HOST_MODEL_DATA, PROCESS_STATUS_MODEL_DATA
+from apps.node_man import constants, models
+from apps.utils.unittest.testcase import CustomBaseTestCase
+
+
+class AgentStatisticsTestCase(CustomBaseTestCase):
+    BK_BIZ_ID = 1
+    OTHER_BK_BIZ_ID = 2
+
+    # 主机 ID - (业务 ID, Agent 状态)
+    HOST_ID__BIZ_STATUS_MAP: typing.Dict[int, typing.Tuple[int, str]] = {
+        1: (BK_BIZ_ID, constants.ProcStateType.RUNNING),
+        2: (BK_BIZ_ID, constants.ProcStateType.TERMINATED),
+        3: (BK_BIZ_ID, constants.ProcStateType.NOT_INSTALLED),
+        4: (BK_BIZ_ID, constants.ProcStateType.RUNNING),
+        5: (OTHER_BK_BIZ_ID, constants.ProcStateType.RUNNING),
+        6: (OTHER_BK_BIZ_ID, constants.ProcStateType.UNKNOWN),
+    }
+
+    def setUp(self):
+        super().setUp()
+        for bk_host_id, (bk_biz_id, status) in self.HOST_ID__BIZ_STATUS_MAP.items():
+            host_data: typing.Dict[str, typing.Any] = copy.deepcopy(HOST_MODEL_DATA)
+            host_data.update(bk_host_id=bk_host_id, bk_biz_id=bk_biz_id, inner_ip=f"127.0.0.{bk_host_id}")
+            models.Host.objects.create(**host_data)
+            models.ProcessStatus.objects.create(
+                **{**PROCESS_STATUS_MODEL_DATA, "bk_host_id": bk_host_id, "status": status}
+            )
+
+        # 业务 1：集群 10 -> 模块 100（主机 1、2）、模块 101（主机 3），集群 11 -> 模块 110（主机 4）
+        # 业务 2：集群 20 -> 模块 200（主机 5、6）
+        self.biz_id__topo_index_map: typing.Dict[int, TopoIndex] = {
+            self.BK_BIZ_ID: TopoIndex(
+                bk_biz_id=self.BK_BIZ_ID,
+                version=0,
+                topo_tree=build_node(
+                    "biz",
+                    self.BK_BIZ_ID,
+                    [
+                        build_node("set", 10, [build_node("module", 100), build_node("module", 101)]),
+                        build_node("set", 11, [build_node("module", 110)]),
+                    ],
+                ),
+                host_topo_relations=[
+                    {"bk_host_id": 1, "bk_set_id": 10, "bk_module_id": 100},
+                    {"bk_host_id": 2, "bk_set_id": 10, "bk_module_id": 100},
+                    {"bk_host_id": 3, "bk_set_id": 10, "bk_module_id": 101},
+                    {"bk_host_id": 4, "bk_set_id": 11, "bk_module_id": 110},
+                ],
+                cache_host_ids={1, 2, 3, 4},
+            ),
+            self.OTHER_BK_BIZ_ID: TopoIndex(
+                bk_biz_id=self.OTHER_BK_BIZ_ID,
+                version=0,
+                topo_tree=build_node("biz", self.OTHER_BK_BIZ_ID, [build_node("set", 20, [build_node("module", 200)])]),
+                host_topo_relations=[
+                    {"bk_host_id": 5, "bk_set_id": 20, "bk_module_id": 200},
+                    {"bk_host_id": 6, "bk_set_id": 20, "bk_module_id": 200},
+                ],
+                cache_host_ids={5, 6},
+            ),
+        }
+
+    def get_topo_indexes(self, bk_biz_ids: typing.Iterable[int]) -> typing.Dict[int, TopoIndex]:
+        return {bk_biz_id: self.biz_id__topo_index_map[bk_biz_id] for bk_biz_id in bk_biz_ids}
+
+    def test_build_agent_status_count_sql(self):
+        host_table: str = models.Host._meta.db_table
+        proc_table: str = models.ProcessStatus._meta.db_table
+
+        sql, params = TopoTool.build_agent_status_count_sql(
+            bk_biz_ids=[self.BK_BIZ_ID, self.OTHER_BK_BIZ_ID], whole_bk_biz_ids=[self.BK_BIZ_ID], bk_host_ids=[5, 6]
+        )
+        biz_sql, host_sql = sql.split(" UNION ALL ")
+        # 业务节点按 业务、状态 聚合，不返回逐台主机
+        self.assertIn(f"GROUP BY `{host_table}`.`bk_biz_id`, `{proc_table}`.`status`", biz_sql)
+        self.assertNotIn(f"`{host_table}`.`bk_host_id` IN", biz_sql)
+        # 仅非业务节点的主机并集按主机聚合
+        self.assertIn(
+            f"GROUP BY `{host_table}`.`bk_biz_id`, `{host_table}`.`bk_host_id`, `{proc_table}`.`status`", host_sql
+        )
+        self.assertEqual(sql.count("%s"), len(params))
+        self.assertEqual(params[-2:], [5, 6])
+
+        # 仅包含业务节点时不查询主机明细
+        sql, params = TopoTool.build_agent_status_count_sql(
+            bk_biz_ids=[self.BK_BIZ_ID], whole_bk_biz_ids=[self.BK_BIZ_ID], bk_host_ids=[]
+        )
+        self.assertNotIn("UNION ALL", sql)
+        self.assertNotIn(f"`{host_table}`.`bk_host_id` IN", sql)
+        self.assertEqual(sql.count("%s"), len(params))
+
+    def test_fetch_agent_statistics_infos(self):
+        node_list: typing.List[typing.Dict[str, typing.Any]] = [
+            {"bk_biz_id": self.BK_BIZ_ID, "bk_obj_id": "biz", "bk_inst_id": self.BK_BIZ_ID},
+            {"bk_biz_id": self.BK_BIZ_ID, "bk_obj_id": "set", "bk_inst_id": 10},
+            {"bk_biz_id": self.BK_BIZ_ID, "bk_obj_id": "module", "bk_inst_id": 110},
+            {"bk_biz_id": self.OTHER_BK_BIZ_ID, "bk_obj_id": "module", "bk_inst_id": 200},
+        ]
+        with patch.object(TopoIndexTools, "get_topo_indexes", side_effect=self.get_topo_indexes):
+            node_agent_statistics_infos = TopoTool.fetch_agent_statistics_infos(node_list)
+
+        self.assertEqual(
+            [info["agent_statistics"] for info in node_agent_statistics_infos],
+            [
+                # 业务节点统计业务下全部主机
+                {
+                    "total": 4,
+                    constants.ProcStateType.RUNNING: 2,
+                    constants.ProcStateType.NOT_INSTALLED: 1,
+                    constants.ProcStateType.TERMINATED: 1,
+                },
+                {
+                    "total": 3,
+                    constants.ProcStateType.RUNNING: 1,
+                    constants.ProcStateType.NOT_INSTALLED: 1,
+                    constants.ProcStateType.TERMINATED: 1,
+                },
+                {
+                    "total": 1,
+                    constants.ProcStateType.RUNNING: 1,
+                    constants.ProcStateType.NOT_INSTALLED: 0,
+                    constants.ProcStateType.TERMINATED: 0,
+                },
+                # 其他业务的模块节点，其主机不计入业务 1 的业务节点
+                {
+                    "total": 2,
+                    constants.ProcStateType.RUNNING: 1,
+                    constants.ProcStateType.NOT_INSTALLED: 0,
+                    constants.ProcStateType.TERMINATED: 1,
+                },
+            ],
+        )
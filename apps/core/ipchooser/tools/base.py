@@ -522,10 +522,16 @@ class HostQueryHelper:
         """
         # 按 status group by
         statuses: typing.List[str] = list(host_queryset.values_list("status", flat=True))
+        return HostQueryHelper.format_agent_statistics(dict(Counter(statuses)))
 
-        total: int = len(statuses)
-        status__count_map: typing.Dict[str, int] = dict(Counter(statuses))
-
+    @staticmethod
+    def format_agent_statistics(status__count_map: typing.Dict[str, int]) -> typing.Dict:
+        """
+        将 Agent 状态计数转为统计信息
+        :param status__count_map: Agent 状态 - 主机数
+        :return: Agent 状态统计信息
+        """
+        total: int = sum(status__count_map.values())
         # 转为可读格式
         running_count: int = status__count_map.get(node_man_constants.ProcStateType.RUNNING, 0)
         not_install_count: int = status__count_map.get(node_man_constants.ProcStateType.NOT_INSTALLED, 0)
@@ -13,7 +13,12 @@ import typing
 from apps.node_man.constants import QUERY_AGENT_STATUS_HOST_LENS
 from apps.node_man.models import Host
 from apps.node_man.periodic_tasks.sync_agent_status_task import (
-    update_or_create_host_agent_status,
+    HOST_AGENT_STATUS_FIELDS,
+    get_agent_id__host_map,
+    get_agent_state_cache_config,
+    get_agent_status_display,
+    query_agent_state_infos_through_cache,
+    schedule_write_back_host_agent_status,
 )
 from common.log import logger
 
@@ -23,6 +28,7 @@ class HostTool:
     def fill_agent_state_info_to_hosts(cls, host_infos: typing.List[typing.Dict[str, typing.Any]]):
         """
         实时查询 Agent 状态，并填充到主机信息列表中
+        Agent 状态经短时缓存读取，DB 回写通过防抖的异步任务完成，页面请求只读
         :param host_infos: 主机信息列表
         :return:
         """
@@ -32,15 +38,36 @@ class HostTool:
         bk_host_ids: typing.List[int] = [host_info["bk_host_id"] for host_info in host_infos]
 
         try:
-            host_id__agent_state_info: typing.Dict[int, str] = update_or_create_host_agent_status(
-                task_id="[fill_agent_state_info_to_hosts]",
-                host_queryset=Host.objects.filter(bk_host_id__in=bk_host_ids),
+            config: typing.Dict[str, typing.Any] = get_agent_state_cache_config()
+            agent_id__host_map: typing.Dict[str, typing.Dict] = get_agent_id__host_map(
+                list(Host.objects.filter(bk_host_id__in=bk_host_ids).values(*HOST_AGENT_STATUS_FIELDS))
+            )
+            agent_id__agent_state_info_map: typing.Dict[str, typing.Dict] = query_agent_state_infos_through_cache(
+                agent_id__host_map, config
             )
         except Exception as e:
             # 获取主机状态信息失败，跳过填充步骤
             logger.error(f"fill_agent_state_info_to_hosts error: {e}")
             return
 
+        host_id__agent_state_info: typing.Dict[int, typing.Dict[str, typing.Any]] = {}
+        for agent_id, agent_state_info in agent_id__agent_state_info_map.items():
+            host: typing.Dict[str, typing.Any] = agent_id__host_map[agent_id]
+            host_id__agent_state_info[host["bk_host_id"]] = {
+                "status_display": get_agent_status_display(agent_state_info, host["node_from"]),
+                "version": agent_state_info["version"],
+            }
+
+        try:
+            schedule_write_back_host_agent_status(
+                task_id="[fill_agent_state_info_to_hosts]",
+                bk_host_ids=list(host_id__agent_state_info.keys()),
+                debounce=config["write_back_debounce"],
+            )
+        except Exception as e:
+            # 回写失败不影响展示，由周期任务兜底同步
+            logger.error(f"fill_agent_state_info_to_hosts write back error: {e}")
+
         for host_info in host_infos:
             try:
                 bk_host_id: int = host_info["bk_host_id"]
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""
+TencentBlueKing is pleased to support the open source community by making 蓝鲸智云-节点管理(BlueKing-BK-NODEMAN) available.
+Copyright (C) 2017-2022 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at https://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+import logging
+import threading
+import time
+import typing
+from collections import OrderedDict, defaultdict
+
+from apps.backend.utils.redis import REDIS_INST
+from apps.node_man import constants as node_man_constants
+from apps.node_man import models as node_man_models
+from apps.utils import concurrent
+
+from .. import constants, types
+from ..query import resource
+
+logger = logging.getLogger("app")
+
+
+class TopoIndex:
+    """
+    业务拓扑索引
+    - 拓扑树按先序展开为节点数组，通过父节点下标回溯路径，路径查询为 O(depth)
+    - 各节点的主机集合由模块 -> 集群 -> 业务上卷预计算，主机数查询为 O(1)
+    """
+
+    # 展开后的节点保留的字段
+    NODE_FIELDS: typing.List[str] = ["bk_obj_id", "bk_obj_name", "bk_inst_id", "bk_inst_name"]
+
+    def __init__(
+        self,
+        bk_biz_id: int,
+        version: int,
+        topo_tree: types.TreeNode,
+        host_topo_relations: typing.List[typing.Dict],
+        cache_host_ids: typing.Set[int],
+    ):
+        self.bk_biz_id = bk_biz_id
+        self.version = version
+        self.build_time: float = time.time()
+
+        # 先序展开的节点数组，父节点下标总是小于子节点
+        self.nodes: typing.List[types.TreeNode] = []
+        self.parent_indexes: typing.List[int] = []
+        self.child_indexes: typing.List[typing.List[int]] = []
+        self.inst_key__index_map: typing.Dict[str, int] = {}
+
+        topo_tree_stack: typing.List[typing.Tuple[types.TreeNode, int]] = [(topo_tree, -1)]
+        while topo_tree_stack:
+            topo_node, parent_index = topo_tree_stack.pop()
+            index: int = len(self.nodes)
+            self.nodes.append({field: topo_node.get(field) for field in self.NODE_FIELDS})
+            self.parent_indexes.append(parent_index)
+            self.child_indexes.append([])
+            self.inst_key__index_map[self.get_inst_key(topo_node["bk_obj_id"], topo_node["bk_inst_id"])] = index
+            if parent_index != -1:
+                self.child_indexes[parent_index].append(index)
+            # 逆序入栈，保证展开后兄弟节点的顺序与给定拓扑一致
+            topo_tree_stack.extend([(child_node, index) for child_node in reversed(topo_node.get("child") or [])])
+
+        # 模块 - 主机 ID 集合，暂不统计非缓存数据，遇到不一致的情况需要触发缓存更新
+        self.host_ids_gby_module_id: typing.Dict[int, typing.Set[int]] = defaultdict(set)
+        for host_topo_relation in host_topo_relations:
+            if host_topo_relation["bk_host_id"] in cache_host_ids:
+                self.host_ids_gby_module_id[host_topo_relation["bk_module_id"]].add(host_topo_relation["bk_host_id"])
+
+        # 逆先序遍历即可保证子节点先于父节点完成上卷
+        self.host_ids_list: typing.List[typing.FrozenSet[int]] = [frozenset()] * len(self.nodes)
+        for index in range(len(self.nodes) - 1, -1, -1):
+            node: types.TreeNode = self.nodes[index]
+            if node["bk_obj_id"] == constants.ObjectType.MODULE.value:
+                host_ids: typing.Set[int] = self.host_ids_gby_module_id.get(node["bk_inst_id"], set())
+            else:
+                host_ids: typing.Set[int] = set().union(
+                    *[self.host_ids_list[child_index] for child_index in self.child_indexes[index]]
+                )
+            self.host_ids_list[index] = frozenset(host_ids)
+        self.counts: typing.List[int] = [len(host_ids) for host_ids in self.host_ids_list]
+
+    @staticmethod
+    def get_inst_key(bk_obj_id: str, bk_inst_id: int) -> str:
+        return f"{bk_obj_id}-{bk_inst_id}"
+
+    def get_index(self, bk_obj_id: str, bk_inst_id: int) -> typing.Optional[int]:
+        return self.inst_key__index_map.get(self.get_inst_key(bk_obj_id, bk_inst_id))
+
+    def get_path(self, bk_obj_id: str, bk_inst_id: int) -> typing.Optional[typing.List[types.TreeNode]]:
+        """
+        获取从业务节点到指定节点的路径
+        :param bk_obj_id: 节点类型
+        :param bk_inst_id: 节点实例 ID
+        :return: 节点路径，节点不存在时返回 None
+        """
+        index: typing.Optional[int] = self.get_index(bk_obj_id, bk_inst_id)
+        if index is None:
+            return None
+        path: typing.List[types.TreeNode] = []
+        while index != -1:
+            # 返回副本，避免调用方修改共享的索引数据
+            path.append(dict(self.nodes[index]))
+            index = self.parent_indexes[index]
+        path.reverse()
+        return path
+
+    def get_count(self, bk_obj_id: str, bk_inst_id: int) -> int:
+        index: typing.Optional[int] = self.get_index(bk_obj_id, bk_inst_id)
+        return 0 if index is None else self.counts[index]
+
+    def get_host_ids(self, bk_obj_id: str, bk_inst_id: int) -> typing.FrozenSet[int]:
+        index: typing.Optional[int] = self.get_index(bk_obj_id, bk_inst_id)
+        return frozenset() if index is None else self.host_ids_list[index]
+
+    def to_tree(self) -> types.TreeNode:
+        """
+        还原带主机数的拓扑树
+        :return:
+        """
+        tree_nodes: typing.List[types.TreeNode] = []
+        for index, node in enumerate(self.nodes):
+            tree_node: types.TreeNode = {**node, "count": self.counts[index], "child": []}
+            tree_nodes.append(tree_node)
+            if self.parent_indexes[index] != -1:
+                tree_nodes[self.parent_indexes[index]]["child"].append(tree_node)
+        return tree_nodes[0]
+
+
+class TopoIndexTools:
+    """
+    拓扑索引管理，按业务进程内缓存
+    业务拓扑版本号存储于 Redis，由主机关系事件递增，版本号变化或超过最长使用时间后重建索引
+    """
+
+    _lock = threading.Lock()
+    # 业务 ID - 拓扑索引，按最近使用排序
+    _biz_id__index_map: OrderedDict = OrderedDict()
+
+    @staticmethod
+    def get_version_key(bk_biz_id: int) -> str:
+        return node_man_constants.REDIS_TOPO_INDEX_VERSION_KEY_TPL.format(bk_biz_id=bk_biz_id)
+
+    @classmethod
+    def get_versions(cls, bk_biz_ids: typing.List[int]) -> typing.Dict[int, int]:
+        pipeline = REDIS_INST.pipeline(transaction=False)
+        for bk_biz_id in bk_biz_ids:
+            pipeline.get(cls.get_version_key(bk_biz_id))
+        return {bk_biz_id: int(version or 0) for bk_biz_id, version in zip(bk_biz_ids, pipeline.execute())}
+
+    @classmethod
+    def invalidate(cls, bk_biz_ids: typing.Iterable[int]):
+        """
+        递增业务拓扑版本号，使各进程的拓扑索引失效
+        :param bk_biz_ids: 业务 ID 列表
+        :return:
+        """
+        pipeline = REDIS_INST.pipeline(transaction=False)
+        for bk_biz_id in set(bk_biz_ids):
+            pipeline.incr(cls.get_version_key(bk_biz_id))
+        pipeline.execute()
+
+    @classmethod
+    def build(cls, bk_biz_id: int, version: int) -> TopoIndex:
+        topo_tree: types.TreeNode = resource.ResourceQueryHelper.get_topo_tree(bk_biz_id)
+        host_topo_relations: typing.List[typing.Dict] = resource.ResourceQueryHelper.fetch_host_topo_relations(
+            bk_biz_id
+        )
+        cache_host_ids: typing.Set[int] = set(
+            node_man_models.Host.objects.filter(bk_biz_id=bk_biz_id).values_list("bk_host_id", flat=True)
+        )
+        topo_index: TopoIndex = TopoIndex(bk_biz_id, version, topo_tree, host_topo_relations, cache_host_ids)
+        logger.info(
+            f"[TopoIndexTools] build topo index: bk_biz_id -> {bk_biz_id}, version -> {version}, "
+            f"node_count -> {len(topo_index.nodes)}"
+        )
+        return topo_index
+
+    @classmethod
+    def get_topo_indexes(cls, bk_biz_ids: typing.Iterable[int]) -> typing.Dict[int, TopoIndex]:
+        """
+        批量获取业务拓扑索引，版本号一次读取，失效的索引并发重建
+        :param bk_biz_ids: 业务 ID 列表
+        :return: 业务 ID - 拓扑索引
+        """
+        bk_biz_ids: typing.List[int] = list(set(bk_biz_ids))
+        if not bk_biz_ids:
+            return {}
+
+        now: float = time.time()
+        biz_id__version_map: typing.Dict[int, int] = cls.get_versions(bk_biz_ids)
+        biz_id__index_map: typing.Dict[int, TopoIndex] = {}
+        params_list: typing.List[typing.Dict[str, int]] = []
+        with cls._lock:
+            for bk_biz_id in bk_biz_ids:
+                topo_index: typing.Optional[TopoIndex] = cls._biz_id__index_map.get(bk_biz_id)
+                if (
+                    topo_index is not None
+                    and topo_index.version == biz_id__version_map[bk_biz_id]
+                    and now - topo_index.build_time < node_man_constants.TOPO_INDEX_MAX_AGE
+                ):
+                    biz_id__index_map[bk_biz_id] = topo_index
+                else:
+                    params_list.append({"bk_biz_id": bk_biz_id, "version": biz_id__version_map[bk_biz_id]})
+
+        for topo_index in concurrent.batch_call(func=cls.build, params_list=params_list):
+            biz_id__index_map[topo_index.bk_biz_id] = topo_index
+
+        with cls._lock:
+            for bk_biz_id, topo_index in biz_id__index_map.items():
+                cls._biz_id__index_map[bk_biz_id] = topo_index
+                cls._biz_id__index_map.move_to_end(bk_biz_id)
+            # 超出缓存上限时，淘汰最久未使用的业务
+            while len(cls._biz_id__index_map) > node_man_constants.TOPO_INDEX_MAX_BIZ_NUM:
+                cls._biz_id__index_map.popitem(last=False)
+
+        return biz_id__index_map
+
+    @classmethod
+    def get_topo_index(cls, bk_biz_id: int) -> TopoIndex:
+        return cls.get_topo_indexes([bk_biz_id])[bk_biz_id]
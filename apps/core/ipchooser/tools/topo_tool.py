@@ -12,16 +12,16 @@ specific language governing permissions and limitations under the License.
 import logging
 import typing
 from collections import defaultdict
-from copy import deepcopy
 
-from django.db.models import Count, QuerySet
+from django.db import connection
+from django.db.models import Count
 
+from apps.node_man import constants as node_man_constants
 from apps.node_man import models as node_man_models
-from apps.utils import concurrent
 
 from .. import constants, types
-from ..query import resource
 from . import base
+from .topo_index import TopoIndex, TopoIndexTools
 
 logger = logging.getLogger("app")
 
@@ -29,28 +29,13 @@ logger = logging.getLogger("app")
 class TopoTool:
     @staticmethod
     def find_topo_node_paths(bk_biz_id: int, node_list: typing.List[types.TreeNode]):
-        def _find_topo_node_paths(
-            _cur_node: types.TreeNode, _cur_path: typing.List[types.TreeNode], _hit_inst_keys: typing.Set[str]
-        ):
-            _inst_key: str = f"{_cur_node['bk_obj_id']}-{_cur_node['bk_inst_id']}"
-            if _inst_key in inst_key__node_map:
-                inst_key__node_map[_inst_key]["bk_path"] = deepcopy(_cur_path)
-                _hit_inst_keys.add(_inst_key)
-                # 全部命中后提前返回
-                if len(_hit_inst_keys) == len(inst_key__node_map.keys()):
-                    return
-
-            for _child_node in _cur_node.get("child") or []:
-                _cur_path.append(_child_node)
-                _find_topo_node_paths(_child_node, _cur_path, _hit_inst_keys)
-                # 以 del 代替 [:-1]，防止后者产生 list 对象导致路径重复压栈
-                del _cur_path[-1]
-
-        topo_tree: types.TreeNode = resource.ResourceQueryHelper.get_topo_tree(bk_biz_id)
-        inst_key__node_map: typing.Dict[str, types.TreeNode] = {
-            f"{bk_node['bk_obj_id']}-{bk_node['bk_inst_id']}": bk_node for bk_node in node_list
-        }
-        _find_topo_node_paths(topo_tree, [topo_tree], set())
+        topo_index: TopoIndex = TopoIndexTools.get_topo_index(bk_biz_id)
+        for bk_node in node_list:
+            bk_path: typing.Optional[typing.List[types.TreeNode]] = topo_index.get_path(
+                bk_node["bk_obj_id"], bk_node["bk_inst_id"]
+            )
+            if bk_path is not None:
+                bk_node["bk_path"] = bk_path
         return node_list
 
     @staticmethod
@@ -69,55 +54,168 @@ class TopoTool:
         return biz_id__host_count_map
 
     @classmethod
-    def fill_host_count_to_tree(
-        cls, nodes: typing.List[types.TreeNode], host_ids_gby_module_id: typing.Dict[int, typing.List[int]]
-    ) -> typing.Set[int]:
-        total_host_ids: typing.Set[int] = set()
-        for node in nodes:
-            bk_host_ids: typing.Set[int] = set()
-            if node.get("bk_obj_id") == constants.ObjectType.MODULE.value:
-                bk_host_ids = bk_host_ids | set(host_ids_gby_module_id.get(node["bk_inst_id"], set()))
-            else:
-                bk_host_ids = cls.fill_host_count_to_tree(node.get("child", []), host_ids_gby_module_id)
-            node["count"] = len(bk_host_ids)
-            total_host_ids = bk_host_ids | total_host_ids
-        return total_host_ids
+    def get_topo_tree_with_count(cls, bk_biz_id: int) -> types.TreeNode:
+        return TopoIndexTools.get_topo_index(bk_biz_id).to_tree()
+
+    @staticmethod
+    def get_node_key(bk_biz_id: int, bk_obj_id: str, bk_inst_id: int) -> str:
+        return f"{bk_biz_id}-{bk_obj_id}-{bk_inst_id}"
 
     @classmethod
-    def get_topo_tree_with_count(cls, bk_biz_id: int) -> types.TreeNode:
-        topo_tree: types.TreeNode = resource.ResourceQueryHelper.get_topo_tree(bk_biz_id)
-        host_topo_relations: typing.List[typing.Dict] = resource.ResourceQueryHelper.fetch_host_topo_relations(
-            bk_biz_id
-        )
-        cache_host_ids: typing.Set[int] = set(
-            node_man_models.Host.objects.filter(bk_biz_id=bk_biz_id).values_list("bk_host_id", flat=True)
-        )
-        host_ids_gby_module_id: typing.Dict[int, typing.List[int]] = defaultdict(list)
-        for host_topo_relation in host_topo_relations:
-            bk_host_id: int = host_topo_relation["bk_host_id"]
-            # 暂不统计非缓存数据，遇到不一致的情况需要触发缓存更新
-            if bk_host_id not in cache_host_ids:
-                continue
-            host_ids_gby_module_id[host_topo_relation["bk_module_id"]].append(bk_host_id)
-        cls.fill_host_count_to_tree([topo_tree], host_ids_gby_module_id)
-        return topo_tree
+    def fetch_node_host_ids_map(
+        cls, node_list: typing.List[types.TreeNode]
+    ) -> typing.Dict[str, typing.Optional[typing.FrozenSet[int]]]:
+        """
+        通过业务拓扑索引解析各节点的主机 ID 集合
+        :param node_list: 拓扑节点列表
+        :return: 节点标识 - 主机 ID 集合，业务节点为 None，表示业务下的全部主机
+        """
+        node_key__host_ids_map: typing.Dict[str, typing.Optional[typing.FrozenSet[int]]] = {}
+        # 业务节点无需计算主机 ID 列表，直接按业务统计
+        bk_biz_ids: typing.Set[int] = {
+            node["bk_biz_id"] for node in node_list if node["bk_obj_id"] != constants.ObjectType.BIZ.value
+        }
+        biz_id__topo_index_map: typing.Dict[int, TopoIndex] = TopoIndexTools.get_topo_indexes(bk_biz_ids)
+        for node in node_list:
+            node_key: str = cls.get_node_key(node["bk_biz_id"], node["bk_obj_id"], node["bk_inst_id"])
+            if node["bk_obj_id"] == constants.ObjectType.BIZ.value:
+                node_key__host_ids_map[node_key] = None
+            else:
+                node_key__host_ids_map[node_key] = biz_id__topo_index_map[node["bk_biz_id"]].get_host_ids(
+                    node["bk_obj_id"], node["bk_inst_id"]
+                )
+        return node_key__host_ids_map
+
+    @staticmethod
+    def build_agent_status_count_sql(
+        bk_biz_ids: typing.Iterable[int], whole_bk_biz_ids: typing.Iterable[int], bk_host_ids: typing.Iterable[int]
+    ) -> typing.Tuple[str, typing.List]:
+        """
+        构造 Agent 状态分组计数的参数化 SQL，过滤条件与 multiple_cond_sql 保持一致
+        - 业务节点统计业务下全部主机，按 业务、Agent 状态 分组，主机 ID 列为 NULL
+        - 其余节点仅对主机 ID 并集按 业务、主机、Agent 状态 分组，以便在内存中归属到各节点
+        两部分通过 UNION ALL 合并为一次查询
+        :param bk_biz_ids: 业务范围
+        :param whole_bk_biz_ids: 统计全部主机的业务 ID 列表
+        :param bk_host_ids: 主机 ID 列表
+        :return: SQL, 参数
+        """
+        host_table: str = node_man_models.Host._meta.db_table
+        proc_table: str = node_man_models.ProcessStatus._meta.db_table
+        node_types: typing.List[str] = [
+            node_man_constants.NodeType.AGENT,
+            node_man_constants.NodeType.PAGENT,
+            node_man_constants.NodeType.PROXY,
+        ]
+
+        def _in_condition(col: str, values: typing.List) -> str:
+            return f"`{host_table}`.`{col}` IN ({', '.join(['%s'] * len(values))})"
+
+        def _build_sub_sql(
+            scope_conditions: typing.List[typing.Tuple[str, typing.List]], select_cols: typing.List[str]
+        ) -> typing.Tuple[str, typing.List]:
+            where_conditions: typing.List[str] = [
+                _in_condition("node_type", node_types),
+                f"`{proc_table}`.`proc_type` = %s",
+                f"`{proc_table}`.`source_type` = %s",
+            ]
+            sub_params: typing.List[typing.Any] = [
+                *node_types,
+                node_man_constants.ProcType.AGENT,
+                node_man_models.ProcessStatus.SourceType.DEFAULT,
+            ]
+            for col, values in scope_conditions:
+                where_conditions.append(_in_condition(col, values))
+                sub_params.extend(values)
+            group_by_cols: typing.List[str] = [col for col in select_cols if col != "NULL"]
+            sub_sql: str = (
+                f"SELECT {', '.join(select_cols)}, COUNT(*) "
+                f"FROM `{host_table}` JOIN `{proc_table}` ON `{host_table}`.`bk_host_id` = `{proc_table}`.`bk_host_id` "
+                f"WHERE {' AND '.join(where_conditions)} "
+                f"GROUP BY {', '.join(group_by_cols)}"
+            )
+            return sub_sql, sub_params
+
+        sub_sqls: typing.List[str] = []
+        params: typing.List[typing.Any] = []
+        whole_bk_biz_ids: typing.List[int] = list(whole_bk_biz_ids)
+        if whole_bk_biz_ids:
+            sub_sql, sub_params = _build_sub_sql(
+                scope_conditions=[("bk_biz_id", whole_bk_biz_ids)],
+                select_cols=[f"`{host_table}`.`bk_biz_id`", "NULL", f"`{proc_table}`.`status`"],
+            )
+            sub_sqls.append(sub_sql)
+            params.extend(sub_params)
+
+        bk_host_ids: typing.List[int] = list(bk_host_ids)
+        if bk_host_ids:
+            # 主机需落在所属节点的业务范围内
+            sub_sql, sub_params = _build_sub_sql(
+                scope_conditions=[("bk_biz_id", list(bk_biz_ids)), ("bk_host_id", bk_host_ids)],
+                select_cols=[f"`{host_table}`.`bk_biz_id`", f"`{host_table}`.`bk_host_id`", f"`{proc_table}`.`status`"],
+            )
+            sub_sqls.append(sub_sql)
+            params.extend(sub_params)
+
+        return " UNION ALL ".join(sub_sqls), params
 
     @classmethod
     def fetch_agent_statistics_infos(cls, node_list: typing.List[types.TreeNode]) -> typing.List[typing.Dict]:
         """
         获取各节点 Agent 状态统计信息
+        通过业务拓扑索引解析全部节点的主机集合，业务节点按业务分组计数，其余节点对主机并集分组计数，两者合并为一次查询，
+        再在内存中将计数归属到各节点
         :param node_list:
         :return:
         """
+        nodes_gby_biz_id: typing.Dict[int, typing.List[types.TreeNode]] = defaultdict(list)
+        for node in node_list:
+            nodes_gby_biz_id[node["bk_biz_id"]].append(node)
+
+        node_key__host_ids_map: typing.Dict[str, typing.Optional[typing.FrozenSet[int]]] = cls.fetch_node_host_ids_map(
+            node_list
+        )
 
-        def _get_node_agent_statistics_info_base(_node: types.TreeNode) -> typing.Dict:
-            """为了并发封装的一个原子函数，用于获取单节点 Agent 状态信息"""
-            _host_queryset: QuerySet = base.HostQueryHelper.query_hosts_base(node_list=[_node], conditions=[])
-            return {"node": _node, "agent_statistics": base.HostQueryHelper.get_agent_statistics(_host_queryset)}
+        whole_bk_biz_ids: typing.Set[int] = set()
+        bk_host_ids: typing.Set[int] = set()
+        for node in node_list:
+            host_ids: typing.Optional[typing.FrozenSet[int]] = node_key__host_ids_map[
+                cls.get_node_key(node["bk_biz_id"], node["bk_obj_id"], node["bk_inst_id"])
+            ]
+            if host_ids is None:
+                whole_bk_biz_ids.add(node["bk_biz_id"])
+            else:
+                bk_host_ids |= host_ids
 
-        # 多线程请求，提高处理效率
-        params_list: typing.List[typing.Dict] = [{"_node": node} for node in node_list]
-        node_agent_statistics_infos = concurrent.batch_call(
-            func=_get_node_agent_statistics_info_base, params_list=params_list
+        # (业务 ID, 主机 ID) - Agent 状态 - 进程记录数，仅包含非业务节点的主机
+        host_status__count_map: typing.Dict[typing.Tuple[int, int], typing.Dict[str, int]] = defaultdict(
+            lambda: defaultdict(int)
         )
+        # 业务 ID - Agent 状态 - 进程记录数，仅包含业务节点
+        biz_status__count_map: typing.Dict[int, typing.Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        if whole_bk_biz_ids or bk_host_ids:
+            sql, params = cls.build_agent_status_count_sql(nodes_gby_biz_id.keys(), whole_bk_biz_ids, bk_host_ids)
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                for bk_biz_id, bk_host_id, status, count in cursor.fetchall():
+                    if bk_host_id is None:
+                        biz_status__count_map[bk_biz_id][status] += count
+                    else:
+                        host_status__count_map[(bk_biz_id, bk_host_id)][status] += count
+
+        node_agent_statistics_infos: typing.List[typing.Dict] = []
+        for node in node_list:
+            host_ids: typing.Optional[typing.FrozenSet[int]] = node_key__host_ids_map[
+                cls.get_node_key(node["bk_biz_id"], node["bk_obj_id"], node["bk_inst_id"])
+            ]
+            if host_ids is None:
+                status__count_map: typing.Dict[str, int] = biz_status__count_map.get(node["bk_biz_id"]) or {}
+            else:
+                status__count_map: typing.Dict[str, int] = defaultdict(int)
+                for bk_host_id in host_ids:
+                    for status, count in host_status__count_map.get((node["bk_biz_id"], bk_host_id), {}).items():
+                        status__count_map[status] += count
+            node_agent_statistics_infos.append(
+                {"node": node, "agent_statistics": base.HostQueryHelper.format_agent_statistics(status__count_map)}
+            )
         return node_agent_statistics_infos
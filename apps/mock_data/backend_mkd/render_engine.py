@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+TencentBlueKing is pleased to support the open source community by making 蓝鲸智云-节点管理(BlueKing-BK-NODEMAN) available.
+Copyright (C) 2017-2022 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at https://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+import typing
+
+SYNTHETIC_TEMPLATE_CONTENT = """
+dataid: {{ dataid }}
+tasks:
+  - task_id: {{ task_id }}
+    bk_biz_id: {{ bk_biz_id }}
+    period: {{ period }}s
+    timeout: {{ timeout | default(60, true) }}s
+    module:
+      hosts: ["{{ metric_url }}"]
+      namespace: {{ config_name }}
+    {% if labels %}labels:
+    {% for lb in labels %}{% for key, value in lb.items() %}{{ "-" if loop.first else " "  }} {{ key }}: "{{ value }}"
+    {% endfor %}{% endfor %}
+    {% endif %}
+"""
+
+
+def build_synthetic_contexts(host_num: int) -> typing.List[typing.Dict[str, typing.Any]]:
+    """
+    构造与订阅步骤上下文结构相近的主机上下文
+    :param host_num: 主机数量
+    :return:
+    """
+    contexts: typing.List[typing.Dict[str, typing.Any]] = []
+    for index in range(host_num):
+        cmdb_instance: typing.Dict[str, typing.Any] = {
+            "host": {
+                "bk_host_id": index + 1,
+                "bk_biz_id": 2,
+                "bk_cloud_id": 0,
+                "bk_host_innerip": f"10.0.{index // 256}.{index % 256}",
+                "bk_host_name": f"host-{index}",
+            },
+            "scope": [{"bk_obj_id": "module", "bk_inst_id": 10 + module_index} for module_index in range(3)],
+            "service": {"id": index + 1, "labels": {"CMDB_LABEL_1": "something"}},
+        }
+        control_info: typing.Dict[str, typing.Any] = {"listen_port": 7000 + index % 100, "setup_path": "/usr/local/gse"}
+        contexts.append(
+            {
+                "dataid": "1577712",
+                "task_id": "76",
+                "bk_biz_id": "2",
+                "period": "60",
+                "config_name": "exporter",
+                "metric_url": "{{ cmdb_instance.host.bk_host_innerip }}:{{ control_info.listen_port }}/metrics",
+                "labels": {
+                    "$for": "cmdb_instance.scope",
+                    "$item": "scope",
+                    "$body": {
+                        "bk_target_ip": "{{ cmdb_instance.host.bk_host_innerip }}",
+                        "bk_target_topo_id": "{{ scope.bk_inst_id }}",
+                        "bk_target_service_instance_id": "{{ cmdb_instance.service.id }}",
+                    },
+                },
+                "control_info": control_info,
+                "cmdb_instance": cmdb_instance,
+                "target": cmdb_instance,
+                "step_data": {"exporter": {"control_info": control_info, "context": {"unused": "{{ task_id }}"}}},
+                "plugin_path": {"setup_path": "/usr/local/gse", "log_path": "/var/log/gse"},
+                "nodeman": {"host": {"bk_host_id": index + 1, "inner_ip": cmdb_instance["host"]["bk_host_innerip"]}},
+            }
+        )
+    return contexts
@@ -59,6 +59,8 @@ GSE_SVR_DISCOVERY_INTERVAL = 1 * TimeUnit.MINUTE
 COLLECT_AUTO_TRIGGER_JOB_INTERVAL = 5 * TimeUnit.MINUTE
 SYNC_CMDB_CLOUD_AREA_INTERVAL = 10 * TimeUnit.SECOND
 SYNC_AGENT_STATUS_TASK_INTERVAL = 10 * TimeUnit.MINUTE
+# Agent 状态指纹最长有效期，指纹整体失效后进行全量比对，以此限定外部修改 DB 状态后被纠正的最大延迟
+AGENT_STATUS_FINGERPRINT_MAX_EXPIRE = 2 * SYNC_AGENT_STATUS_TASK_INTERVAL
 SYNC_PROC_STATUS_TASK_INTERVAL = settings.SYNC_PROC_STATUS_TASK_INTERVAL
 SYNC_BIZ_TO_GRAY_SCOPE_LIST_INTERVAL = 30 * TimeUnit.MINUTE
 
@@ -584,7 +586,7 @@ BIZ_CUSTOM_PROPERTY_CACHE_SUFFIX = "_property_cache"
 JOB_MAX_VALUE = 100000
 
 # 监听资源类型
-RESOURCE_TUPLE = ("host", "host_relation", "process")
+RESOURCE_TUPLE = ("host", "host_relation", "process", "set", "module")
 RESOURCE_CHOICES = tuple_choices(RESOURCE_TUPLE)
 ResourceType = choices_to_namedtuple(RESOURCE_CHOICES)
 
@@ -597,8 +599,47 @@ DEFAULT_PLUGIN_PROC_START_CHECK_SECS = 9
 LIST_SERVICE_INSTANCE_DETAIL_LIMIT = 1000
 LIST_SERVICE_INSTANCE_DETAIL_INTERVAL = 0.2
 
+# 过滤条件维度索引过期时间，兜底同步任务未触发刷新的情况
+CONDITION_FACET_EXPIRE = 20 * TimeUnit.MINUTE
+# 过滤条件维度索引刷新防抖时间
+CONDITION_FACET_REFRESH_DEBOUNCE = 30
+
+# 资源监听：租约时长，由心跳线程续约，持有者异常退出后，其他实例最迟在该时间后接管
+RESOURCE_WATCH_LEASE_EXPIRE = 15
+# 资源监听：未持有租约时，单次阻塞获取租约的最长等待时间
+RESOURCE_WATCH_LEASE_RETRY_INTERVAL = 5
+# 资源监听：单次拉取的事件数不少于该值时视为突发变更，继续拉取并合并写入
+RESOURCE_WATCH_BURST_EVENT_NUM = 50
+# 资源监听：事件微批写入的最大事件数
+RESOURCE_WATCH_BATCH_SIZE = 2000
+# 资源监听：事件微批最长等待时间（秒）
+RESOURCE_WATCH_BATCH_WINDOW = 2
+
+# 拓扑索引进程内最长使用时间，兜底未产生主机关系、集群、模块事件的拓扑变更（如自定义层级变更）
+TOPO_INDEX_MAX_AGE = 5 * TimeUnit.MINUTE
+# 拓扑索引进程内最多缓存的业务数
+TOPO_INDEX_MAX_BIZ_NUM = 200
+
 # redis键名模板
 REDIS_NEED_DELETE_HOST_IDS_KEY_TPL = f"{settings.APP_CODE}:node_man:need_delete_host_ids:list"
+# Agent 状态增量同步：主机状态指纹，按业务分 HASH 存储
+REDIS_AGENT_STATUS_FINGERPRINT_KEY_TPL = f"{settings.APP_CODE}:node_man:agent_status_fingerprint:{{bk_biz_id}}:hash"
+# Agent 状态增量同步：业务上次同步以来状态变更的主机数
+REDIS_AGENT_STATUS_BIZ_CHURN_KEY = f"{settings.APP_CODE}:node_man:agent_status_biz_churn:hash"
+# Agent 状态增量同步：业务自适应同步周期，值为 "跳过周期数:已跳过周期数"
+REDIS_AGENT_STATUS_BIZ_SCHEDULE_KEY = f"{settings.APP_CODE}:node_man:agent_status_biz_schedule:hash"
+# Agent 状态读缓存：Agent 实时状态
+REDIS_AGENT_STATE_CACHE_KEY_TPL = f"{settings.APP_CODE}:node_man:agent_state:{{agent_id}}:str"
+# Agent 状态读缓存：查询锁，用于合并同一 Agent 的并发查询
+REDIS_AGENT_STATE_QUERY_LOCK_KEY_TPL = f"{settings.APP_CODE}:node_man:agent_state_query_lock:{{agent_id}}:str"
+# Agent 状态读缓存：DB 回写防抖标记
+REDIS_AGENT_STATE_WRITE_BACK_KEY_TPL = f"{settings.APP_CODE}:node_man:agent_state_write_back:{{bk_host_id}}:str"
+# 过滤条件维度索引：按业务存储各维度值的主机数
+REDIS_CONDITION_FACET_KEY_TPL = f"{settings.APP_CODE}:node_man:condition_facet:{{facet_type}}:{{bk_biz_id}}:hash"
+# 过滤条件维度索引：刷新防抖标记
+REDIS_CONDITION_FACET_REFRESH_KEY_TPL = f"{settings.APP_CODE}:node_man:condition_facet_refresh:{{bk_biz_id}}:str"
+# 拓扑索引：业务拓扑版本号，主机关系变更时递增
+REDIS_TOPO_INDEX_VERSION_KEY_TPL = f"{settings.APP_CODE}:node_man:topo_index_version:{{bk_biz_id}}:str"
 # 从redis中读取bk_host_ids最大长度
 MAX_HOST_IDS_LENGTH = 5000
 # 操作系统对应账户名
@@ -31,6 +31,7 @@ from apps.node_man.models import (
     Subscription,
     SubscriptionInstanceRecord,
     SubscriptionInstanceStatusDetail,
+    SubscriptionInstanceStatusDetailLog,
     SubscriptionStep,
     SubscriptionTask,
 )
@@ -223,14 +224,31 @@ class DebugHandler(APIModel):
         time_scope_instance_ids = SubscriptionInstanceRecord.objects.filter(
             create_time__range=(start_time, end_time)
         ).values_list("id", flat=True)
-        instance_detaile_query = [Q(log__contains=keyword) for keyword in keyword_list]
-
-        instance_detaile_records = SubscriptionInstanceStatusDetail.objects.filter(*instance_detaile_query).filter(
-            subscription_instance_record_id__in=time_scope_instance_ids,
-            create_time__range=(start_time, end_time),
-        )
-
-        match_regex_instance_ids = [record.subscription_instance_record_id for record in instance_detaile_records]
+        # 日志由状态详情及追加写入的日志分块组成，每个关键词在任一部分命中即可，各关键词均需命中
+        match_regex_instance_ids = None
+        for keyword in keyword_list:
+            keyword_instance_ids = set(
+                SubscriptionInstanceStatusDetail.objects.filter(
+                    log__contains=keyword,
+                    subscription_instance_record_id__in=time_scope_instance_ids,
+                    create_time__range=(start_time, end_time),
+                ).values_list("subscription_instance_record_id", flat=True)
+            ) | set(
+                # 日志分块在缓冲区刷新时才落库，写入时间可能晚于 end_time，仅按订阅实例过滤
+                SubscriptionInstanceStatusDetailLog.objects.filter(
+                    log__contains=keyword,
+                    subscription_instance_record_id__in=time_scope_instance_ids,
+                ).values_list("subscription_instance_record_id", flat=True)
+            )
+            if match_regex_instance_ids is None:
+                match_regex_instance_ids = keyword_instance_ids
+            else:
+                match_regex_instance_ids &= keyword_instance_ids
+        if match_regex_instance_ids is None:
+            match_regex_instance_ids = SubscriptionInstanceStatusDetail.objects.filter(
+                subscription_instance_record_id__in=time_scope_instance_ids,
+                create_time__range=(start_time, end_time),
+            ).values_list("subscription_instance_record_id", flat=True)
         match_regex_instance_ids = list(set(match_regex_instance_ids))
 
         # 将匹配到的 instance_id 通过 SubscriptionInstanceRecord 的 id 找到对应的记录，并且通过其中的 instance_info 转换为具体的主机
@@ -9,19 +9,18 @@ an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express o
 specific language governing permissions and limitations under the License.
 """
 import re
-from collections import ChainMap
-from typing import Any, Callable, Dict, Tuple
+from collections import ChainMap, defaultdict
+from typing import Any, Callable, Dict, List, Tuple
 
 from django.conf import settings
-from django.db import connection
 from django.utils.translation import ugettext as _
 
-from apps.core.concurrent.cache import FuncCacheDecorator
 from apps.node_man import constants, models, tools
 from apps.node_man.handlers.cloud import CloudHandler
 from apps.node_man.handlers.cmdb import CmdbHandler
 from apps.node_man.handlers.install_channel import InstallChannelHandler
-from apps.node_man.tools import JobTools
+from apps.node_man.tools import ConditionFacetTools, JobTools
+from apps.node_man.tools.condition_facet import ConditionFacetType
 from apps.utils import APIModel
 
 
@@ -80,64 +79,6 @@ class MetaHandler(APIModel):
 
         return [item[0] for item in sorted(sort_map.items(), key=lambda item: item[1])]
 
-    @FuncCacheDecorator(cache_time=20 * constants.TimeUnit.MINUTE)
-    def fetch_host_process_unique_col(
-        self,
-        biz_permission: list,
-        col_list: list,
-        node_types: list,
-        name: str = models.ProcessStatus.GSE_AGENT_PROCESS_NAME,
-        proc_type: str = "AGENT",
-        is_latest: bool = False,
-    ):
-        """
-        返回Host和process_status中指定列的唯一值
-        :param biz_permission: 用户有权限的业务
-        :param col_list: 指定列
-        :param node_types: 节点类型
-        :param name: process 名
-        :param proc_type: 进程类型
-        :param is_latest: 是否是最新记录
-        :return: 列的唯一值，数组
-        """
-
-        node_type = "'" + "','".join(node_types) + "'"
-        biz_permission = ", ".join(str(biz) for biz in biz_permission)
-        if not biz_permission:
-            biz_permission = "''"
-        select_sql = "SELECT distinct "
-        select_conditions = []
-        for col in col_list:
-            if col in ["version", "status"]:
-                select_conditions.append(f"{models.ProcessStatus._meta.db_table}.{col} AS `{col}`")
-            else:
-                select_conditions.append(f"{models.Host._meta.db_table}.{col} AS `{col}`")
-        select_sql += ",".join(select_conditions)
-        cursor = connection.cursor()
-        if is_latest:
-            cursor.execute(
-                f"{select_sql} "
-                f"FROM `{models.Host._meta.db_table}` join `{models.ProcessStatus._meta.db_table}` "
-                f"on `{models.Host._meta.db_table}`.bk_host_id = `{models.ProcessStatus._meta.db_table}`.bk_host_id "
-                f"WHERE (`{models.Host._meta.db_table}`.`node_type` IN ({node_type}) "
-                f"AND `{models.Host._meta.db_table}`.`bk_biz_id` IN ({biz_permission}) "
-                f"AND `{models.ProcessStatus._meta.db_table}`.`proc_type` = '{proc_type}' "
-                f"AND `{models.ProcessStatus._meta.db_table}`.`is_latest` = {is_latest} "
-                f"AND `{models.ProcessStatus._meta.db_table}`.`name` = '{name}');"
-            )
-        else:
-            cursor.execute(
-                f"{select_sql} "
-                f"FROM `{models.Host._meta.db_table}` join `{models.ProcessStatus._meta.db_table}` "
-                f"on `{models.Host._meta.db_table}`.bk_host_id = `{models.ProcessStatus._meta.db_table}`.bk_host_id "
-                f"WHERE (`{models.Host._meta.db_table}`.`node_type` IN ({node_type}) "
-                f"AND `{models.Host._meta.db_table}`.`bk_biz_id` IN ({biz_permission}) "
-                f"AND `{models.ProcessStatus._meta.db_table}`.`proc_type` = '{proc_type}' "
-                f"AND `{models.ProcessStatus._meta.db_table}`.`name` = '{name}');"
-            )
-
-        return list(cursor)
-
     def fetch_host_condition(self, params):
         """
         获取Host接口的条件
@@ -158,32 +99,38 @@ class MetaHandler(APIModel):
                 {"name": _("主机名称"), "id": "bk_host_name"},
             ]
 
-        bk_cloud_ids = set()
-        os_types = set()
-        is_manuals = set()
-        statuses = set()
-        versions = set()
-        dept_names = set()
-
-        col_map = [bk_cloud_ids, os_types, is_manuals, statuses, versions, dept_names]
-        # 获得数据
-        col_list = ["bk_cloud_id", "os_type", "is_manual", "status", "version", "dept_name"]
-        col_data = self.fetch_host_process_unique_col(
-            biz_permission, col_list, [constants.NodeType.AGENT, constants.NodeType.PAGENT]
-        )
-        for sublist in col_data:
-            for index, item in enumerate(sublist):
-                col_map[index].add(item)
+        # 从过滤条件维度索引中读取各列的唯一值
+        facets: Dict[str, Dict[Any, int]] = ConditionFacetTools.get_facets(ConditionFacetType.HOST, biz_permission)
+        bk_cloud_ids = set(facets["bk_cloud_id"])
+        os_types = set(facets["os_type"])
+        is_manuals = set(facets["is_manual"])
+        statuses = set(facets["status"])
+        versions = set(facets["version"])
+        dept_names = set(facets["dept_name"])
 
         os_types_children = self.fetch_os_type_children(tuple(os_types))
+        # 维度索引中的主机数随筛选项一并返回
         statuses_children = [
-            {"name": constants.PROC_STATUS_CHN.get(status, status), "id": status} for status in statuses if status != ""
+            {"name": constants.PROC_STATUS_CHN.get(status, status), "id": status, "count": facets["status"][status]}
+            for status in statuses
+            if status != ""
+        ]
+        versions_children = [
+            {"name": version, "id": version, "count": facets["version"][version]}
+            for version in versions
+            if version != ""
+        ]
+        is_manual_children = [
+            {"name": _("手动") if is_manual else _("远程"), "id": is_manual, "count": facets["is_manual"][is_manual]}
+            for is_manual in is_manuals
         ]
-        versions_children = [{"name": version, "id": version} for version in versions if version != ""]
-        is_manual_children = [{"name": _("手动") if is_manual else _("远程"), "id": is_manual} for is_manual in is_manuals]
         bk_cloud_names = CloudHandler().list_cloud_info(bk_cloud_ids)
         bk_cloud_ids_children = [
-            {"name": bk_cloud_names.get(bk_cloud_id, {}).get("bk_cloud_name", bk_cloud_id), "id": bk_cloud_id}
+            {
+                "name": bk_cloud_names.get(bk_cloud_id, {}).get("bk_cloud_name", bk_cloud_id),
+                "id": bk_cloud_id,
+                "count": facets["bk_cloud_id"][bk_cloud_id],
+            }
             for bk_cloud_id in bk_cloud_ids
         ]
         install_channel_children = [
@@ -336,11 +283,13 @@ class MetaHandler(APIModel):
         plugin_names = tools.PluginV2Tools.fetch_head_plugins()
         plugin_result = {}
 
-        # 获得数据
-        bk_cloud_tuple = self.fetch_host_process_unique_col(
-            biz_permission, ["bk_cloud_id"], [constants.NodeType.AGENT, constants.NodeType.PAGENT]
-        )
-        bk_cloud_ids = [bk_cloud[0] for bk_cloud in bk_cloud_tuple]
+        # 从过滤条件维度索引中读取各列的唯一值
+        host_facets: Dict[str, Dict[Any, int]] = ConditionFacetTools.get_facets(ConditionFacetType.HOST, biz_permission)
+        plugin_version_facet: Dict[Tuple[str, str], int] = ConditionFacetTools.get_facets(
+            ConditionFacetType.PLUGIN_VERSION, biz_permission
+        )["plugin_version"]
+
+        bk_cloud_ids = list(host_facets["bk_cloud_id"])
         bk_cloud_names = CloudHandler().list_cloud_info(bk_cloud_ids)
         plugin_result["bk_cloud_id"] = {
             "name": _("管控区域"),
@@ -350,28 +299,19 @@ class MetaHandler(APIModel):
             ],
         }
 
-        os_type_tuple = self.fetch_host_process_unique_col(
-            biz_permission, ["os_type"], [constants.NodeType.AGENT, constants.NodeType.PAGENT]
-        )
-        os_types = [os_type[0] for os_type in os_type_tuple]
+        os_types = list(host_facets["os_type"])
         plugin_result["os_type"] = {
             "name": _("操作系统"),
             "value": [{"name": constants.OS_CHN.get(os, os), "id": os} for os in os_types if os != ""],
         }
 
-        agent_version_tuple = self.fetch_host_process_unique_col(
-            biz_permission, ["version"], [constants.NodeType.AGENT, constants.NodeType.PAGENT]
-        )
-        versions = self.regular_agent_version([version[0] for version in agent_version_tuple])
+        versions = self.regular_agent_version(list(host_facets["version"]))
         plugin_result[models.ProcessStatus.GSE_AGENT_PROCESS_NAME] = {
             "name": _("Agent版本"),
             "value": [{"name": version, "id": version} for version in versions if version != ""],
         }
 
-        status_tuple = self.fetch_host_process_unique_col(
-            biz_permission, ["status"], [constants.NodeType.AGENT, constants.NodeType.PAGENT]
-        )
-        statuses = [statuse[0] for statuse in status_tuple]
+        statuses = list(host_facets["status"])
         plugin_result["status"] = {
             "name": _("Agent状态"),
             "value": [
@@ -382,15 +322,10 @@ class MetaHandler(APIModel):
         }
 
         # 各个插件的版本
+        plugin_name__versions_map: Dict[str, List[str]] = defaultdict(list)
+        for name, version in plugin_version_facet:
+            plugin_name__versions_map[name].append(version)
         for plugin_name in plugin_names:
-            plugin_version_tuple = self.fetch_host_process_unique_col(
-                biz_permission,
-                ["version"],
-                [constants.NodeType.AGENT, constants.NodeType.PAGENT, constants.NodeType.PROXY],
-                name=plugin_name,
-                proc_type=constants.ProcType.PLUGIN,
-            )
-            plugin_versions = [plugin_version[0] for plugin_version in plugin_version_tuple]
             plugin_result[plugin_name] = {"name": plugin_name, "value": [{"name": _("无版本"), "id": -1}]}
             plugin_result["{}_status".format(plugin_name)] = {
                 "name": _("{}状态").format(plugin_name),
@@ -400,7 +335,7 @@ class MetaHandler(APIModel):
                     {"name": _("未注册"), "id": constants.ProcStateType.UNREGISTER},
                 ],
             }
-            for plugin_version in plugin_versions:
+            for plugin_version in plugin_name__versions_map[plugin_name]:
                 if plugin_version:
                     plugin_result[plugin_name]["value"].append({"name": plugin_version, "id": plugin_version})
 
@@ -431,10 +366,7 @@ class MetaHandler(APIModel):
                 {"name": _("管控区域ID:IP"), "id": "bk_cloud_ip"},
                 {"name": _("主机名称"), "id": "bk_host_name"},
             ]
-        bk_cloud_ids_tuple = self.fetch_host_process_unique_col(
-            biz_permission, ["bk_cloud_id"], [constants.NodeType.AGENT, constants.NodeType.PAGENT]
-        )
-        bk_cloud_ids = [bk_cloud_id[0] for bk_cloud_id in bk_cloud_ids_tuple]
+        bk_cloud_ids = list(ConditionFacetTools.get_facets(ConditionFacetType.HOST, biz_permission)["bk_cloud_id"])
         bk_cloud_names = CloudHandler().list_cloud_info(bk_cloud_ids)
         bk_cloud_ids_children = [
             {"name": bk_cloud_names.get(bk_cloud_id, {}).get("bk_cloud_name", bk_cloud_id), "id": bk_cloud_id}
@@ -516,21 +448,14 @@ class MetaHandler(APIModel):
 
         plugin_versions = []
         plugin_names = tools.PluginV2Tools.fetch_head_plugins()
-        for name in plugin_names:
-            col_data = self.fetch_host_process_unique_col(
-                biz_permission,
-                ["version"],
-                [constants.NodeType.AGENT, constants.NodeType.PAGENT, constants.NodeType.PROXY],
-                name=name,
-                proc_type=constants.ProcType.PLUGIN,
-                is_latest=True,
-                get_cache=True,
-            )
-
-            for sublist in col_data:
-                # 过滤掉版本号为""的插件
-                if not sublist[0] == "":
-                    plugin_versions.append({"name": name, "version": sublist[0]})
+        plugin_name_set = set(plugin_names)
+        plugin_version_facet: Dict[Tuple[str, str], int] = ConditionFacetTools.get_facets(
+            ConditionFacetType.PLUGIN_VERSION, biz_permission
+        )["plugin_version"]
+        for name, version in plugin_version_facet:
+            # 过滤掉版本号为""的插件
+            if name in plugin_name_set and version != "":
+                plugin_versions.append({"name": name, "version": version})
 
         agent_versions = (
             models.ProcessStatus.objects.filter(
@@ -620,6 +545,8 @@ class MetaHandler(APIModel):
             return self.fetch_job_list_condition("proxy_job")
         elif category == "plugin_job":
             return self.fetch_job_list_condition("plugin_job")
+        elif category == "plugin":
+            return self.fetch_plugin_list_condition()
         elif category == "plugin_version":
             ret = self.fetch_plugin_version_condition(params=params)
             return ret
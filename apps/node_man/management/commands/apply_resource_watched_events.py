@@ -16,5 +16,9 @@ from apps.node_man.periodic_tasks.resource_watch_task import (
 
 
 class Command(BaseCommand):
+    def add_arguments(self, parser):
+        parser.add_argument("--shard_index", type=int, default=0, help="事件分片序号，按业务 ID 取模分片")
+        parser.add_argument("--shard_num", type=int, default=1, help="事件分片数，各分片分别部署以水平扩展消费能力")
+
     def handle(self, **kwargs):
-        apply_resource_watched_events()
+        apply_resource_watched_events(shard_index=kwargs["shard_index"], shard_num=kwargs["shard_num"])
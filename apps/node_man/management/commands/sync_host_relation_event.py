@@ -8,13 +8,23 @@ Unless required by applicable law or agreed to in writing, software distributed
 an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
 specific language governing permissions and limitations under the License.
 """
+import threading
+
 from django.core.management.base import BaseCommand
 
 from apps.node_man.periodic_tasks.resource_watch_task import (
+    run_resource_watch_forever,
     sync_resource_watch_host_relation_event,
+    sync_resource_watch_module_event,
+    sync_resource_watch_set_event,
 )
 
 
 class Command(BaseCommand):
     def handle(self, **kwargs):
+        # 集群、模块事件与主机关系事件同属业务拓扑变更，在同一进程的后台线程中监听
+        for watch_func in [sync_resource_watch_set_event, sync_resource_watch_module_event]:
+            threading.Thread(
+                target=run_resource_watch_forever, args=(watch_func,), name=watch_func.__name__, daemon=True
+            ).start()
         sync_resource_watch_host_relation_event()
@@ -44,6 +44,7 @@ from jinja2 import Template
 from apps.backend.subscription.errors import PipelineExecuteFailed, SubscriptionNotExist
 from apps.backend.subscription.render_functions import get_hosts_by_node
 from apps.backend.utils.data_renderer import nested_render_data
+from apps.backend.utils.render_engine import TemplateSource, config_render_engine
 from apps.core.concurrent.cache import FuncCacheDecorator
 from apps.core.files.storage import get_storage
 from apps.exceptions import ValidationError
@@ -168,6 +169,10 @@ class GlobalSettings(models.Model):
         AUTO_SELECT_INSTALL_CHANNEL_ONLY_DIRECT_AREA = "AUTO_SELECT_INSTALL_CHANNEL_ONLY_DIRECT_AREA"
         # 安装通道ID与网段列表映射
         INSTALL_CHANNEL_ID_NETWORK_SEGMENT = "INSTALL_CHANNEL_ID_NETWORK_SEGMENT"
+        # Agent 状态增量同步配置，配置样例：{"enable": true, "max_skip_rounds": 5}
+        SYNC_AGENT_STATUS_INCREMENTAL_CONFIG = "SYNC_AGENT_STATUS_INCREMENTAL_CONFIG"
+        # Agent 状态读缓存配置，配置样例：{"ttl": 30, "coalesce_timeout": 5, "write_back_debounce": 10}
+        AGENT_STATE_CACHE_CONFIG = "AGENT_STATE_CACHE_CONFIG"
 
     key = models.CharField(_("键"), max_length=255, db_index=True, primary_key=True)
     v_json = JSONField(_("值"))
@@ -486,6 +491,7 @@ class ProcessStatus(models.Model):
     )
 
     configs = JSONField(_("配置文件"), default=list)
+    config_fingerprint = models.CharField(_("配置渲染指纹"), max_length=32, default="", blank=True)
     listen_ip = models.CharField(_("监听IP"), max_length=45, null=True)
     listen_port = models.IntegerField(_("监听端口"), null=True)
 
@@ -1677,13 +1683,15 @@ class PluginConfigTemplate(models.Model):
         return instance
 
     def render(self, context):
-        # 先用context渲染自己，把内部参数都渲染上
-        context = nested_render_data(context, context)
+        compiled_template = config_render_engine.compile(TemplateSource.from_config_template(self))
+
+        # 先用context渲染自己，把模板引用的内部参数都渲染上
+        context = compiled_template.self_render(context)
 
         # 如果是拨测或远程采集，需要渲染ip，此时需要注入函数
         context = self.render_function(context)
 
-        rendered_config = nested_render_data(self.content, context)
+        rendered_config = compiled_template.render(context)
         return rendered_config
 
     def render_function(self, context):
@@ -2392,6 +2400,43 @@ class SubscriptionInstanceStatusDetail(models.Model):
         ]
 
 
+class SubscriptionInstanceStatusDetailLog(models.Model):
+    """
+    订阅实例执行日志分块，仅追加写入，避免日志增长时反复改写 SubscriptionInstanceStatusDetail.log
+    完整日志为 SubscriptionInstanceStatusDetail.log 与按 ID 顺序拼接的日志分块
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    subscription_instance_record_id = models.BigIntegerField(_("订阅实例ID"))
+    node_id = models.CharField(_("Pipeline原子ID"), max_length=50, default="", blank=True)
+    log = models.TextField(_("日志内容"))
+    create_time = models.DateTimeField(_("创建时间"), default=timezone.now)
+
+    @classmethod
+    def get_node_inst__log_map(cls, sub_inst_ids: List[int]) -> Dict[str, str]:
+        """
+        获取订阅实例各原子的分块日志
+        :param sub_inst_ids: 订阅实例ID列表
+        :return: f"{node_id}-{subscription_instance_record_id}" - 拼接后的分块日志
+        """
+        node_inst__log_chunks_map: Dict[str, List[str]] = defaultdict(list)
+        log_chunks = (
+            cls.objects.filter(subscription_instance_record_id__in=sub_inst_ids)
+            .order_by("id")
+            .values_list("node_id", "subscription_instance_record_id", "log")
+        )
+        for node_id, sub_inst_id, log in log_chunks:
+            node_inst__log_chunks_map[f"{node_id}-{sub_inst_id}"].append(log)
+        return {node_inst: "".join(log_chunks) for node_inst, log_chunks in node_inst__log_chunks_map.items()}
+
+    class Meta:
+        verbose_name = _("订阅实例日志分块")
+        verbose_name_plural = _("订阅实例日志分块")
+        index_together = [
+            ["subscription_instance_record_id", "node_id"],
+        ]
+
+
 class CmdbEventRecord(models.Model):
     """记录CMDB事件回调"""
 
@@ -2444,6 +2489,7 @@ class ResourceWatchEvent(models.Model):
     bk_event_type = models.CharField(_("事件类型"), max_length=32, choices=EVENT_TYPE_CHOICE)
     bk_resource = models.CharField(_("资源"), max_length=32)
     bk_detail = JSONField(_("事件详情"), default=dict)
+    bk_biz_id = models.IntegerField(_("业务ID"), null=True, db_index=True)
     create_time = models.DateTimeField(_("创建时间"), auto_now_add=True)
 
     class Meta:
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+TencentBlueKing is pleased to support the open source community by making 蓝鲸智云-节点管理(BlueKing-BK-NODEMAN) available.
+Copyright (C) 2017-2022 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at https://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+import typing
+
+from celery.task import task
+
+from apps.backend.utils.redis import REDIS_INST
+from apps.node_man import constants
+from apps.node_man.tools.condition_facet import ConditionFacetTools
+from common.log import logger
+
+
+@task(queue="default", ignore_result=True)
+def refresh_condition_facets(bk_biz_ids: typing.List[int]):
+    """
+    刷新业务的过滤条件维度索引
+    :param bk_biz_ids: 业务 ID 列表
+    :return:
+    """
+    for facet_type in ConditionFacetTools.FACET_CONFIG:
+        ConditionFacetTools.refresh(facet_type, bk_biz_ids)
+    logger.info(f"[refresh_condition_facets] complete: bk_biz_ids -> {bk_biz_ids}")
+
+
+def schedule_refresh_condition_facets(bk_biz_ids: typing.Iterable[int]):
+    """
+    防抖调度维度索引刷新，防抖窗口内已调度过的业务不再重复调度
+    :param bk_biz_ids: 业务 ID 列表
+    :return:
+    """
+    bk_biz_ids: typing.List[int] = list(set(bk_biz_ids))
+    if not bk_biz_ids:
+        return
+
+    pipeline = REDIS_INST.pipeline(transaction=False)
+    for bk_biz_id in bk_biz_ids:
+        pipeline.set(
+            constants.REDIS_CONDITION_FACET_REFRESH_KEY_TPL.format(bk_biz_id=bk_biz_id),
+            1,
+            nx=True,
+            ex=constants.CONDITION_FACET_REFRESH_DEBOUNCE,
+        )
+    to_be_refreshed_bk_biz_ids: typing.List[int] = [
+        bk_biz_id for bk_biz_id, is_scheduled in zip(bk_biz_ids, pipeline.execute()) if is_scheduled
+    ]
+    if to_be_refreshed_bk_biz_ids:
+        refresh_condition_facets.apply_async(
+            (to_be_refreshed_bk_biz_ids,), countdown=constants.CONDITION_FACET_REFRESH_DEBOUNCE
+        )
@@ -9,7 +9,6 @@ an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express o
 specific language governing permissions and limitations under the License.
 """
 import logging
-import random
 import time
 import typing
 from functools import wraps
@@ -17,23 +16,28 @@ from functools import wraps
 from django.conf import settings
 from django.core.cache import cache
 from django.db.models import Q
-from django.db.utils import IntegrityError
+from django.db.models.functions import Coalesce, Mod
 
 from apps.backend.subscription.tools import (
     by_biz_dispatch_task_queue,
     get_biz_ids_gby_queue,
 )
 from apps.component.esbclient import client_v2
+from apps.core.concurrent.lock import RedisLease
+from apps.core.ipchooser.tools.topo_index import TopoIndexTools
 from apps.node_man import constants
 from apps.node_man.models import GlobalSettings, Host, ResourceWatchEvent, Subscription
 from apps.prometheus import metrics
 from apps.utils.cache import format_cache_key
+from common.api import CCApi
 
 logger = logging.getLogger("app")
 
 RESOURCE_WATCH_HOST_CURSOR_KEY = "resource_watch_host_cursor"
 RESOURCE_WATCH_HOST_RELATION_CURSOR_KEY = "resource_watch_host_relation_cursor"
 RESOURCE_WATCH_PROCESS_CURSOR_KEY = "resource_watch_process_cursor"
+RESOURCE_WATCH_SET_CURSOR_KEY = "resource_watch_set_cursor"
+RESOURCE_WATCH_MODULE_CURSOR_KEY = "resource_watch_module_cursor"
 APPLY_RESOURCE_WATCHED_EVENTS_KEY = "apply_resource_watched_events"
 
 
@@ -114,106 +118,143 @@ RESOURCE_TYPE__EVENT_HELPER_MAP: typing.Dict[str, typing.Type[BaseEventPreproces
     constants.ResourceType.host: HostEventPreprocessHelper,
     constants.ResourceType.process: BaseEventPreprocessHelper,
     constants.ResourceType.host_relation: BaseEventPreprocessHelper,
+    constants.ResourceType.set: BaseEventPreprocessHelper,
+    constants.ResourceType.module: BaseEventPreprocessHelper,
 }
 
+# 影响业务拓扑的资源类型，事件仅用于使拓扑索引等缓存失效，不触发主机同步
+TOPO_RESOURCE_TYPES: typing.Set[str] = {constants.ResourceType.set, constants.ResourceType.module}
 
-def set_cursor(data, cursor_key):
-    new_cursor = data["bk_events"][-1]["bk_cursor"]
-    cache.set(cursor_key, new_cursor, 120)
 
-
-def random_key():
-    return "{}{}{}".format(
-        int(time.time()), random.randint(10000, 99999), "".join(random.sample(str(int(time.time())), 5))
-    )
+def set_cursor(bk_cursor: str, cursor_key: str):
+    cache.set(cursor_key, bk_cursor, 120)
 
 
-def is_lock(config_key, id_key):
+class WatchedEventBatch:
     """
-    此函数用于多机部署时标识当前是否是自己在跑
-    :param config_key: 数据库记录相关信息的键
-    :param id_key: 标识自己的key
+    资源监听事件微批
+    - 批次内按 scope 收敛，写入前即完成去重，减少存储及下游消费的事件数
+    - 突发变更（如批量转移主机）时连续拉取多页事件后一次写入
     """
-    current_time = int(time.time())
-    config = GlobalSettings.get_config(key=config_key, default={})
-    if not config.get("key"):
-        # 没有key开始抢占
-        try:
-            GlobalSettings.set_config(key=config_key, value={"key": id_key, "time": current_time})
-        except IntegrityError:
-            # 说明已被其它进程设置本进程不处理
-            return False
-    elif current_time - config["time"] > 60:
-        # 说明key过期开始抢占
-        # 先删除等待70s后创建以消除多机部署的时间差
-        try:
-            GlobalSettings.objects.get(key=config_key).delete()
-        except GlobalSettings.DoesNotExist:
-            pass
-
-        # 防止同一进程瞬间创建
-        time.sleep(70)
 
-        try:
-            GlobalSettings.set_config(key=config_key, value={"key": id_key, "time": int(time.time())})
-        except IntegrityError:
-            return False
-    elif config["key"] != id_key:
-        # 说明不是自己
-        return False
+    def __init__(self, event_helper: typing.Type[BaseEventPreprocessHelper]):
+        self.event_helper = event_helper
+        self.scope__event_map: typing.Dict[typing.Any, typing.Dict] = {}
+        self.received_count: int = 0
+        self.first_receive_time: typing.Optional[float] = None
 
-    else:
-        # 说明为自己更新key
-        GlobalSettings.update_config(key=config_key, value={"key": id_key, "time": current_time})
+    def is_empty(self) -> bool:
+        return not self.received_count
 
-    return True
-
-
-def _resource_watch(cursor_key, kwargs):
-    # 用于标识自己
-    id_key = random_key()
-
-    logger.info(f"[{cursor_key}] start: id_key -> {id_key}")
-
-    while True:
-        if not is_lock(cursor_key, id_key):
-            logger.error(f"[{cursor_key}] failed to get lock: id_key -> {id_key}")
-            time.sleep(60)
-            logger.info(f"[{cursor_key}] will try to acquire the lock, if there is no error output, it means listening")
-            continue
+    def add(self, events: typing.List[typing.Dict]):
+        if self.first_receive_time is None:
+            self.first_receive_time = time.time()
+        self.received_count += len(events)
+        for event in self.event_helper.do_preprocess(events):
+            # 批次内相同 scope 的事件仅保留最新一则
+            self.scope__event_map[self.event_helper.get_scope_from_event(event)] = event
 
-        bk_cursor = cache.get(cursor_key)
-        if bk_cursor:
-            kwargs["bk_cursor"] = bk_cursor
-
-        data = client_v2.cc.resource_watch(kwargs)
-        if not data["bk_watched"]:
-            # 记录最新cursor
-            set_cursor(data, cursor_key)
-            continue
+    def is_ready(self, last_received_count: int) -> bool:
+        """
+        判断批次是否需要写入
+        :param last_received_count: 最近一次拉取的事件数
+        :return:
+        """
+        if self.is_empty():
+            return False
+        # 最近一次拉取的事件数较少，说明积压已拉取完毕，无需继续等待
+        if last_received_count < constants.RESOURCE_WATCH_BURST_EVENT_NUM:
+            return True
+        return (
+            self.received_count >= constants.RESOURCE_WATCH_BATCH_SIZE
+            or time.time() - self.first_receive_time >= constants.RESOURCE_WATCH_BATCH_WINDOW
+        )
 
-        event_helper: typing.Type[BaseEventPreprocessHelper] = RESOURCE_TYPE__EVENT_HELPER_MAP[kwargs["bk_resource"]]
+    def clear(self):
+        self.scope__event_map = {}
+        self.received_count = 0
+        self.first_receive_time = None
 
+    def flush(self) -> int:
+        """
+        写入收敛后的事件
+        :return: 写入事件数
+        """
         objs = [
             ResourceWatchEvent(
                 bk_cursor=event["bk_cursor"],
                 bk_event_type=event["bk_event_type"],
                 bk_resource=event["bk_resource"],
                 bk_detail=event["bk_detail"],
+                bk_biz_id=scope,
             )
-            for event in event_helper.do_preprocess(data["bk_events"])
+            for scope, event in self.scope__event_map.items()
         ]
-        ResourceWatchEvent.objects.bulk_create(objs)
+        # 租约切换期间可能重复拉取同一游标的事件，忽略主键冲突
+        ResourceWatchEvent.objects.bulk_create(objs, ignore_conflicts=True)
 
         for obj in objs:
             metrics.app_resource_watch_events_total.labels(
                 type="producer", bk_resource=obj.bk_resource, bk_event_type=obj.bk_event_type
             ).inc()
 
-        logger.info(f"[{cursor_key}] receive new resource watch event: count -> {len(objs)}")
+        received_count: int = self.received_count
+        self.clear()
+        return received_count
+
 
-        # 记录最新cursor
-        set_cursor(data, cursor_key)
+def _resource_watch(cursor_key, kwargs):
+    lease: RedisLease = RedisLease(lease_name=cursor_key, lease_expire=constants.RESOURCE_WATCH_LEASE_EXPIRE)
+    event_helper: typing.Type[BaseEventPreprocessHelper] = RESOURCE_TYPE__EVENT_HELPER_MAP[kwargs["bk_resource"]]
+    batch: WatchedEventBatch = WatchedEventBatch(event_helper)
+    # 已拉取的最新游标，批次写入后才持久化，保证异常退出时可从未写入的事件处重新拉取
+    bk_cursor: typing.Optional[str] = None
+
+    logger.info(f"[{cursor_key}] start: lease_id -> {lease.identifier}")
+
+    try:
+        while True:
+            if not lease.is_held():
+                # 租约丢失或由其他实例持有，丢弃未写入的批次，获得租约后从已持久化的游标继续拉取
+                batch.clear()
+                bk_cursor = None
+                if lease.acquire(timeout=constants.RESOURCE_WATCH_LEASE_RETRY_INTERVAL) is None:
+                    logger.info(f"[{cursor_key}] lease is held by others: lease_id -> {lease.identifier}")
+                    continue
+                logger.info(f"[{cursor_key}] lease acquired: fencing_token -> {lease.fencing_token}")
+
+            bk_cursor = bk_cursor or cache.get(cursor_key)
+            if bk_cursor:
+                kwargs["bk_cursor"] = bk_cursor
+
+            data = client_v2.cc.resource_watch(kwargs)
+            bk_cursor = data["bk_events"][-1]["bk_cursor"]
+            received_count: int = 0
+            if data["bk_watched"]:
+                received_count = len(data["bk_events"])
+                batch.add(data["bk_events"])
+
+            if batch.is_empty():
+                # 记录最新cursor
+                set_cursor(bk_cursor, cursor_key)
+                continue
+
+            if not batch.is_ready(received_count):
+                continue
+
+            # 写入前校验栅栏令牌，避免租约切换期间新旧实例重复写入
+            if not lease.is_valid():
+                continue
+
+            flushed_count: int = batch.flush()
+            logger.info(f"[{cursor_key}] receive new resource watch event: count -> {flushed_count}")
+
+            # 记录最新cursor
+            set_cursor(bk_cursor, cursor_key)
+
+    finally:
+        # 监听异常退出时释放租约，其他实例或重新拉起的监听无需等待租约过期
+        lease.release()
 
 
 def sync_resource_watch_host_event():
@@ -245,7 +286,46 @@ def sync_resource_watch_process_event():
     _resource_watch(RESOURCE_WATCH_PROCESS_CURSOR_KEY, kwargs)
 
 
-def apply_resource_watched_events():
+def sync_resource_watch_set_event():
+    """
+    拉取集群事件
+    """
+    kwargs = {"bk_resource": constants.ResourceType.set, "bk_fields": ["bk_biz_id", "bk_set_id", "bk_set_name"]}
+    _resource_watch(RESOURCE_WATCH_SET_CURSOR_KEY, kwargs)
+
+
+def sync_resource_watch_module_event():
+    """
+    拉取模块事件
+    """
+    kwargs = {
+        "bk_resource": constants.ResourceType.module,
+        "bk_fields": ["bk_biz_id", "bk_set_id", "bk_module_id", "bk_module_name", "default"],
+    }
+    _resource_watch(RESOURCE_WATCH_MODULE_CURSOR_KEY, kwargs)
+
+
+def run_resource_watch_forever(watch_func: typing.Callable[[], None]):
+    """
+    在后台线程中持续执行资源监听，异常退出后重新拉起
+    :param watch_func: 资源监听函数
+    :return:
+    """
+    while True:
+        try:
+            watch_func()
+        except Exception as e:
+            logger.exception(f"[run_resource_watch_forever] {watch_func.__name__} failed: error -> {e}")
+            time.sleep(constants.RESOURCE_WATCH_LEASE_RETRY_INTERVAL)
+
+
+def apply_resource_watched_events(shard_index: int = 0, shard_num: int = 1):
+    """
+    消费资源监听事件，事件按业务分片，多个分片可分别部署以水平扩展
+    :param shard_index: 分片序号
+    :param shard_num: 分片数
+    """
+
     def _get_event_str(_event):
         return "<Event({bk_cursor}) info -> [{bk_event_type}|{bk_resource}|{bk_biz_id}]>".format(
             bk_cursor=_event["bk_cursor"],
@@ -254,24 +334,33 @@ def apply_resource_watched_events():
             bk_biz_id=event["bk_detail"].get("bk_biz_id"),
         )
 
-    id_key = random_key()
     config_key = APPLY_RESOURCE_WATCHED_EVENTS_KEY
+    if shard_num > 1:
+        config_key = f"{config_key}:{shard_index}/{shard_num}"
+    lease: RedisLease = RedisLease(lease_name=config_key, lease_expire=constants.RESOURCE_WATCH_LEASE_EXPIRE)
+
+    event_queryset = ResourceWatchEvent.objects.all()
+    if shard_num > 1:
+        # 无业务 ID 的事件归属 0 号分片
+        event_queryset = event_queryset.annotate(shard=Mod(Coalesce("bk_biz_id", 0), shard_num)).filter(
+            shard=shard_index
+        )
 
-    logger.info(f"[{config_key}] start: id_key -> {id_key}")
+    logger.info(f"[{config_key}] start: lease_id -> {lease.identifier}")
 
     while True:
 
-        if not is_lock(config_key, id_key):
-            logger.error(f"[{config_key}] failed to get lock: id_key -> {id_key}")
-            time.sleep(60)
-            logger.info(f"[{config_key}] will try to acquire the lock, if there is no error output, it means listening")
-            continue
+        if not lease.is_held():
+            if lease.acquire(timeout=constants.RESOURCE_WATCH_LEASE_RETRY_INTERVAL) is None:
+                logger.info(f"[{config_key}] lease is held by others: lease_id -> {lease.identifier}")
+                continue
+            logger.info(f"[{config_key}] lease acquired: fencing_token -> {lease.fencing_token}")
 
         apply_resource_watched_events_controller = GlobalSettings.get_config(
             GlobalSettings.KeyEnum.APPLY_RESOURCE_WATCHED_EVENTS_CONTROLLER_KEY.value
         )
         if not apply_resource_watched_events_controller:
-            apply_resource_watched_events_controller = {"limit": 10, "seconds_to_wait_for_no_events": 10}
+            apply_resource_watched_events_controller = {"limit": 100, "seconds_to_wait_for_no_events": 10}
             GlobalSettings.set_config(
                 GlobalSettings.KeyEnum.APPLY_RESOURCE_WATCHED_EVENTS_CONTROLLER_KEY.value,
                 apply_resource_watched_events_controller,
@@ -279,14 +368,45 @@ def apply_resource_watched_events():
 
         logger.info(f"[{config_key}] load events_controller -> {apply_resource_watched_events_controller}")
 
-        events = ResourceWatchEvent.objects.order_by("create_time")[
-            0 : apply_resource_watched_events_controller["limit"]
-        ].values()
+        events = event_queryset.order_by("create_time")[0 : apply_resource_watched_events_controller["limit"]].values(
+            "bk_cursor", "bk_event_type", "bk_resource", "bk_detail"
+        )
         if not events:
             time.sleep(apply_resource_watched_events_controller["seconds_to_wait_for_no_events"])
             continue
 
-        events_after_convergence = HostEventPreprocessHelper.event_convergence(events)
+        # 主机关系、集群、模块变更会改变业务拓扑，在事件收敛前使对应业务的拓扑索引失效
+        topo_changed_bk_biz_ids: typing.Set[int] = {
+            event["bk_detail"].get("bk_biz_id")
+            for event in events
+            if (
+                event["bk_resource"] == constants.ResourceType.host_relation
+                or event["bk_resource"] in TOPO_RESOURCE_TYPES
+            )
+            and event["bk_detail"].get("bk_biz_id")
+        }
+        if topo_changed_bk_biz_ids:
+            try:
+                TopoIndexTools.invalidate(topo_changed_bk_biz_ids)
+            except Exception as e:
+                logger.exception(f"[{config_key}] invalidate topo index failed: error -> {e}")
+
+        # 业务内部模块（空闲机池）仅随集群、模块变更，按业务使对应的接口缓存失效
+        internal_module_changed_bk_biz_ids: typing.Set[int] = {
+            event["bk_detail"].get("bk_biz_id")
+            for event in events
+            if event["bk_resource"] in TOPO_RESOURCE_TYPES and event["bk_detail"].get("bk_biz_id")
+        }
+        for bk_biz_id in internal_module_changed_bk_biz_ids:
+            try:
+                CCApi.get_biz_internal_module.invalidate_cache(scope=bk_biz_id)
+            except Exception as e:
+                logger.exception(f"[{config_key}] invalidate api cache failed: bk_biz_id -> {bk_biz_id}, error -> {e}")
+
+        # 集群、模块事件仅使缓存失效，不参与主机同步及订阅触发
+        events_after_convergence = HostEventPreprocessHelper.event_convergence(
+            [event for event in events if event["bk_resource"] not in TOPO_RESOURCE_TYPES]
+        )
 
         logger.info(f"[{config_key}] length of events_after_convergence -> {len(events_after_convergence)}")
         for event in events_after_convergence:
@@ -8,7 +8,10 @@ Unless required by applicable law or agreed to in writing, software distributed
 an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
 specific language governing permissions and limitations under the License.
 """
+import json
+import time
 import typing
+import uuid
 from collections import defaultdict
 
 from celery.task import periodic_task, task
@@ -17,50 +20,220 @@ from django.db.models import QuerySet
 from django.db.transaction import atomic
 
 from apps.adapters.api.gse import get_gse_api_helper
+from apps.backend.utils.redis import REDIS_INST
 from apps.core.gray.tools import GrayTools
 from apps.node_man import constants
-from apps.node_man.models import Host, ProcessStatus
+from apps.node_man.models import GlobalSettings, Host, ProcessStatus
+from apps.node_man.periodic_tasks.refresh_condition_facet import (
+    schedule_refresh_condition_facets,
+)
 from apps.node_man.periodic_tasks.utils import query_bk_biz_ids
+from apps.prometheus import metrics
 from apps.utils.periodic_task import calculate_countdown
 from common.log import logger
 
+# 查询 Agent 状态所需的主机字段
+HOST_AGENT_STATUS_FIELDS: typing.Tuple[str, ...] = (
+    "bk_host_id",
+    "bk_agent_id",
+    "bk_cloud_id",
+    "inner_ip",
+    "inner_ipv6",
+    "node_from",
+    "ap_id",
+    "bk_biz_id",
+)
 
-@task(queue="default", ignore_result=True)
-def update_or_create_host_agent_status(task_id: int, host_queryset: QuerySet):
+# 等待其他请求写入 Agent 状态缓存的轮询间隔
+AGENT_STATE_COALESCE_POLL_INTERVAL = 0.1
+
+# 仅释放本次请求持有的查询锁，避免锁过期后被其他请求重新抢占时误删
+RELEASE_AGENT_STATE_QUERY_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+def get_incremental_sync_config() -> typing.Dict[str, typing.Any]:
     """
-    更新 Agent 状态
-    :param task_id: 任务 ID
-    :param host_queryset: 主机查询条件
+    获取 Agent 状态增量同步配置
+    enable - 是否开启增量同步
+    max_skip_rounds - 无变更业务最多跳过的同步周期数
+    churn_ratio_threshold - 变更主机占比超过该阈值时，业务恢复每个周期同步
+    fingerprint_expire - 主机状态指纹过期时间，过期后该业务会进行一次全量比对，不超过 AGENT_STATUS_FINGERPRINT_MAX_EXPIRE
     :return:
     """
-    hosts: typing.List[typing.Dict[str, typing.Any]] = list(
-        host_queryset.values(
-            "bk_host_id", "bk_agent_id", "bk_cloud_id", "inner_ip", "inner_ipv6", "node_from", "ap_id", "bk_biz_id"
-        )
+    config: typing.Dict[str, typing.Any] = {
+        "enable": False,
+        "max_skip_rounds": 5,
+        "churn_ratio_threshold": 0.01,
+        "fingerprint_expire": constants.AGENT_STATUS_FINGERPRINT_MAX_EXPIRE,
+    }
+    config.update(
+        GlobalSettings.get_config(key=GlobalSettings.KeyEnum.SYNC_AGENT_STATUS_INCREMENTAL_CONFIG.value, default={})
     )
-    if not hosts:
-        # 结束递归
-        return
+    # 指纹有效期内外部对 DB 的修改不会被纠正，限制其上限避免状态长时间不一致
+    config["fingerprint_expire"] = min(config["fingerprint_expire"], constants.AGENT_STATUS_FINGERPRINT_MAX_EXPIRE)
+    return config
 
-    logger.info(
-        f"{task_id} | sync_agent_status_task: Start updating agent status, "
-        f"start Host ID -> {hosts[0]['bk_host_id']}, count -> {len(hosts)}"
-    )
 
-    # 通过管控区域：内网形式对应bk_host_id&node_from
-    agent_id__host_id_map: typing.Dict[str, int] = {}
-    agent_id__node_from_map: typing.Dict[str, str] = {}
+def get_host_agent_status_fingerprint(status: str, version: str, node_from: str) -> str:
+    return f"{status}|{version}|{node_from}"
+
+
+def fetch_changed_host_ids(host_id__fingerprint_map: typing.Dict[int, str], host_id__biz_id_map: typing.Dict[int, int]):
+    """
+    对比主机状态指纹，返回状态发生变化（或指纹缺失）的主机 ID
+    :param host_id__fingerprint_map: 主机 ID - 本次同步的状态指纹
+    :param host_id__biz_id_map: 主机 ID - 业务 ID
+    :return:
+    """
+    biz_id__host_ids_map: typing.Dict[int, typing.List[int]] = defaultdict(list)
+    for bk_host_id in host_id__fingerprint_map:
+        biz_id__host_ids_map[host_id__biz_id_map[bk_host_id]].append(bk_host_id)
+
+    pipeline = REDIS_INST.pipeline(transaction=False)
+    for bk_biz_id, bk_host_ids in biz_id__host_ids_map.items():
+        pipeline.hmget(constants.REDIS_AGENT_STATUS_FINGERPRINT_KEY_TPL.format(bk_biz_id=bk_biz_id), bk_host_ids)
+
+    changed_host_ids: typing.Set[int] = set()
+    for bk_host_ids, fingerprints in zip(biz_id__host_ids_map.values(), pipeline.execute()):
+        for bk_host_id, fingerprint in zip(bk_host_ids, fingerprints):
+            if fingerprint is None or fingerprint.decode() != host_id__fingerprint_map[bk_host_id]:
+                changed_host_ids.add(bk_host_id)
+    return changed_host_ids
+
+
+def save_host_fingerprints_and_churn(
+    host_id__fingerprint_map: typing.Dict[int, str],
+    host_id__biz_id_map: typing.Dict[int, int],
+    churned_host_ids: typing.Iterable[int],
+    fingerprint_expire: int,
+):
+    """
+    保存主机状态指纹，并累计各业务发生状态变更的主机数，用于调整业务的同步频率
+    :param host_id__fingerprint_map: 需要保存的主机 ID - 状态指纹
+    :param host_id__biz_id_map: 主机 ID - 业务 ID
+    :param churned_host_ids: DB 状态实际发生变更的主机 ID
+    :param fingerprint_expire: 指纹过期时间
+    :return:
+    """
+    biz_id__fingerprint_map: typing.Dict[int, typing.Dict[int, str]] = defaultdict(dict)
+    for bk_host_id, fingerprint in host_id__fingerprint_map.items():
+        biz_id__fingerprint_map[host_id__biz_id_map[bk_host_id]][bk_host_id] = fingerprint
+
+    biz_id__churn_count_map: typing.Dict[int, int] = defaultdict(int)
+    for bk_host_id in churned_host_ids:
+        biz_id__churn_count_map[host_id__biz_id_map[bk_host_id]] += 1
+
+    pipeline = REDIS_INST.pipeline(transaction=False)
+    for bk_biz_id, fingerprint_map in biz_id__fingerprint_map.items():
+        name: str = constants.REDIS_AGENT_STATUS_FINGERPRINT_KEY_TPL.format(bk_biz_id=bk_biz_id)
+        pipeline.hset(name, mapping=fingerprint_map)
+        pipeline.ttl(name)
+    ttls: typing.List[int] = pipeline.execute()[1::2]
+
+    pipeline = REDIS_INST.pipeline(transaction=False)
+    for bk_biz_id, ttl in zip(biz_id__fingerprint_map.keys(), ttls):
+        # 仅在首次写入时设置过期时间，保证指纹定期整体失效，触发全量比对以兜底外部对 DB 的修改
+        if ttl < 0:
+            pipeline.expire(
+                constants.REDIS_AGENT_STATUS_FINGERPRINT_KEY_TPL.format(bk_biz_id=bk_biz_id), fingerprint_expire
+            )
+    for bk_biz_id, churn_count in biz_id__churn_count_map.items():
+        pipeline.hincrby(constants.REDIS_AGENT_STATUS_BIZ_CHURN_KEY, bk_biz_id, churn_count)
+    pipeline.execute()
+
 
-    # 生成查询参数host弄表
-    # 需要区分 GSE 版本，(区分方式：灰度业务 or 灰度接入点) -> 使用 V2 API，其他情况 -> 使用 V1 API
-    gray_tools_instance: GrayTools = GrayTools()
+def should_sync_biz(bk_biz_id: int, host_count: int, config: typing.Dict[str, typing.Any]) -> bool:
+    """
+    根据业务近期的状态变更情况，自适应调整业务的同步频率
+    - 上次同步以来无变更：跳过的周期数翻倍，直至 max_skip_rounds
+    - 变更主机占比超过阈值：恢复每个周期同步
+    - 少量变更：跳过的周期数减半
+    :param bk_biz_id: 业务 ID
+    :param host_count: 业务主机数量
+    :param config: 增量同步配置
+    :return: 本周期是否需要同步
+    """
+    schedule_key: str = constants.REDIS_AGENT_STATUS_BIZ_SCHEDULE_KEY
+    schedule: typing.Optional[bytes] = REDIS_INST.hget(schedule_key, bk_biz_id)
+    skip_rounds, skipped_rounds = (0, 0) if schedule is None else map(int, schedule.decode().split(":"))
+
+    if skipped_rounds < skip_rounds:
+        REDIS_INST.hset(schedule_key, bk_biz_id, f"{skip_rounds}:{skipped_rounds + 1}")
+        return False
+
+    # 读取并重置上次同步以来的变更主机数
+    pipeline = REDIS_INST.pipeline(transaction=True)
+    pipeline.hget(constants.REDIS_AGENT_STATUS_BIZ_CHURN_KEY, bk_biz_id)
+    pipeline.hdel(constants.REDIS_AGENT_STATUS_BIZ_CHURN_KEY, bk_biz_id)
+    churn_count: int = int(pipeline.execute()[0] or 0)
+
+    if schedule is None or churn_count / host_count > config["churn_ratio_threshold"]:
+        skip_rounds = 0
+    elif churn_count == 0:
+        skip_rounds = min(max(skip_rounds * 2, 1), config["max_skip_rounds"])
+    else:
+        skip_rounds = skip_rounds // 2
+
+    REDIS_INST.hset(schedule_key, bk_biz_id, f"{skip_rounds}:0")
+    return True
+
+
+def get_agent_state_cache_config() -> typing.Dict[str, typing.Any]:
+    """
+    获取 Agent 状态读缓存配置
+    ttl - 实时状态缓存时间，缓存期内的页面请求不再查询 GSE
+    coalesce_timeout - 等待其他请求查询同一 Agent 的最长时间，超时后自行查询
+    write_back_debounce - 状态回写 DB 的防抖时间，窗口内同一主机仅回写一次
+    :return:
+    """
+    config: typing.Dict[str, typing.Any] = {
+        "ttl": 30,
+        "coalesce_timeout": 5,
+        "write_back_debounce": 10,
+    }
+    config.update(GlobalSettings.get_config(key=GlobalSettings.KeyEnum.AGENT_STATE_CACHE_CONFIG.value, default={}))
+    return config
+
+
+def get_agent_id__host_map(hosts: typing.List[typing.Dict[str, typing.Any]]) -> typing.Dict[str, typing.Dict]:
+    """
+    计算主机的 Agent ID，并记录主机所使用的 GSE 版本
+    需要区分 GSE 版本，(区分方式：灰度业务 or 灰度接入点) -> 使用 V2 API，其他情况 -> 使用 V1 API
+    :param hosts: 主机信息列表，字段见 HOST_AGENT_STATUS_FIELDS
+    :return: Agent ID - 主机信息
+    """
+    agent_id__host_map: typing.Dict[str, typing.Dict] = {}
+    for gse_version_hosts in GrayTools().group_hosts_by_gse_version(hosts).values():
+        for host in gse_version_hosts:
+            agent_id__host_map[host.pop("agent_id")] = host
+    return agent_id__host_map
+
+
+def get_agent_status_display(agent_state_info: typing.Dict[str, typing.Any], node_from: str) -> str:
+    if agent_state_info["bk_agent_alive"] == constants.BkAgentStatus.ALIVE.value:
+        return constants.ProcStateType.RUNNING
+    # Agent 未存活时，细分异常状态
+    if node_from == constants.NodeFrom.CMDB:
+        # 主机来源于 CMDB，标记为未安装
+        return constants.ProcStateType.NOT_INSTALLED
+    # 主机来源于自身，标记为终止
+    return constants.ProcStateType.TERMINATED
+
+
+def query_agent_state_infos(agent_id__host_map: typing.Dict[str, typing.Dict]) -> typing.Dict[str, typing.Dict]:
+    """
+    按 GSE 版本分组，各版本的查询通过 batch_call 在共享的 "gse" 执行器上并发
+    :param agent_id__host_map: Agent ID - 主机信息
+    :return: Agent ID - Agent 状态信息
+    """
     gse_version__query_hosts_map: typing.Dict[str, typing.List[typing.Dict]] = defaultdict(list)
-    for host in hosts:
-        gse_version = gray_tools_instance.get_host_ap_gse_version(host["bk_biz_id"], host["ap_id"])
-        agent_id = get_gse_api_helper(gse_version).get_agent_id(host)
-        agent_id__host_id_map[agent_id] = host["bk_host_id"]
-        agent_id__node_from_map[agent_id] = host["node_from"]
-        gse_version__query_hosts_map[gse_version].append(
+    for host in agent_id__host_map.values():
+        gse_version__query_hosts_map[host["gse_version"]].append(
             {
                 "ip": host["inner_ip"] or host["inner_ipv6"],
                 "bk_cloud_id": host["bk_cloud_id"],
@@ -72,11 +245,131 @@ def update_or_create_host_agent_status(task_id: int, host_queryset: QuerySet):
     for gse_version, query_hosts in gse_version__query_hosts_map.items():
         gse_api_helper = get_gse_api_helper(gse_version)
         agent_id__agent_state_info_map.update(gse_api_helper.list_agent_state(query_hosts))
+    return agent_id__agent_state_info_map
+
+
+def get_cached_agent_state_infos(agent_ids: typing.Iterable[str]) -> typing.Dict[str, typing.Optional[typing.Dict]]:
+    """
+    读取缓存的 Agent 状态，缓存值为空字典表示 GSE 未返回该 Agent 的状态
+    :param agent_ids: Agent ID 列表
+    :return: 命中缓存的 Agent ID - Agent 状态信息
+    """
+    agent_ids: typing.List[str] = list(agent_ids)
+    pipeline = REDIS_INST.pipeline(transaction=False)
+    for agent_id in agent_ids:
+        pipeline.get(constants.REDIS_AGENT_STATE_CACHE_KEY_TPL.format(agent_id=agent_id))
+    return {
+        agent_id: json.loads(cached_value) or None
+        for agent_id, cached_value in zip(agent_ids, pipeline.execute())
+        if cached_value is not None
+    }
+
+
+def query_agent_state_infos_through_cache(
+    agent_id__host_map: typing.Dict[str, typing.Dict], config: typing.Dict[str, typing.Any]
+) -> typing.Dict[str, typing.Dict]:
+    """
+    读穿透缓存查询 Agent 状态，并合并并发请求
+    - 命中缓存的 Agent 直接返回
+    - 未命中的 Agent 抢占查询锁，仅抢到锁的请求查询 GSE 并写入缓存
+    - 未抢到锁的 Agent 等待其他请求写入缓存，超时后自行查询
+    :param agent_id__host_map: Agent ID - 主机信息
+    :param config: 读缓存配置
+    :return: Agent ID - Agent 状态信息
+    """
+    agent_id__agent_state_info_map: typing.Dict[str, typing.Optional[typing.Dict]] = get_cached_agent_state_infos(
+        agent_id__host_map.keys()
+    )
+    missed_agent_ids: typing.List[str] = [
+        agent_id for agent_id in agent_id__host_map if agent_id not in agent_id__agent_state_info_map
+    ]
+    metrics.app_agent_state_cache_requests_total.labels(result="hit").inc(
+        len(agent_id__host_map) - len(missed_agent_ids)
+    )
+    metrics.app_agent_state_cache_requests_total.labels(result="miss").inc(len(missed_agent_ids))
+
+    # 查询锁的值为本次请求的令牌，释放时比对令牌
+    lock_token: str = uuid.uuid4().hex
+    pipeline = REDIS_INST.pipeline(transaction=False)
+    for agent_id in missed_agent_ids:
+        pipeline.set(
+            constants.REDIS_AGENT_STATE_QUERY_LOCK_KEY_TPL.format(agent_id=agent_id),
+            lock_token,
+            nx=True,
+            ex=config["coalesce_timeout"],
+        )
+    locked_agent_ids: typing.List[str] = []
+    waiting_agent_ids: typing.List[str] = []
+    for agent_id, is_locked in zip(missed_agent_ids, pipeline.execute()):
+        (locked_agent_ids if is_locked else waiting_agent_ids).append(agent_id)
+
+    def _query_and_set_to_cache(_agent_ids: typing.List[str]):
+        if not _agent_ids:
+            return
+        _agent_id__agent_state_info_map: typing.Dict[str, typing.Dict] = query_agent_state_infos(
+            {agent_id: agent_id__host_map[agent_id] for agent_id in _agent_ids}
+        )
+        _pipeline = REDIS_INST.pipeline(transaction=False)
+        for agent_id in _agent_ids:
+            agent_state_info: typing.Dict = _agent_id__agent_state_info_map.get(agent_id) or {}
+            agent_id__agent_state_info_map[agent_id] = agent_state_info or None
+            _pipeline.set(
+                constants.REDIS_AGENT_STATE_CACHE_KEY_TPL.format(agent_id=agent_id),
+                json.dumps(agent_state_info),
+                ex=config["ttl"],
+            )
+        _pipeline.execute()
 
+    try:
+        _query_and_set_to_cache(locked_agent_ids)
+    finally:
+        # 无论查询成功与否，仅释放本次请求抢到的查询锁，查询失败时其他请求无需空等
+        # 逐个 Key 执行脚本，兼容集群模式下 Key 分布在不同 slot
+        release_lock = REDIS_INST.register_script(RELEASE_AGENT_STATE_QUERY_LOCK_SCRIPT)
+        pipeline = REDIS_INST.pipeline(transaction=False)
+        for agent_id in locked_agent_ids:
+            release_lock(
+                keys=[constants.REDIS_AGENT_STATE_QUERY_LOCK_KEY_TPL.format(agent_id=agent_id)],
+                args=[lock_token],
+                client=pipeline,
+            )
+        pipeline.execute()
+
+    deadline: float = time.time() + config["coalesce_timeout"]
+    while waiting_agent_ids and time.time() < deadline:
+        time.sleep(AGENT_STATE_COALESCE_POLL_INTERVAL)
+        agent_id__agent_state_info_map.update(get_cached_agent_state_infos(waiting_agent_ids))
+        waiting_agent_ids = [
+            agent_id for agent_id in waiting_agent_ids if agent_id not in agent_id__agent_state_info_map
+        ]
+    metrics.app_agent_state_cache_requests_total.labels(result="coalesce_timeout").inc(len(waiting_agent_ids))
+    _query_and_set_to_cache(waiting_agent_ids)
+
+    return {
+        agent_id: agent_state_info
+        for agent_id, agent_state_info in agent_id__agent_state_info_map.items()
+        if agent_state_info is not None
+    }
+
+
+def save_host_agent_status(
+    task_id: typing.Any,
+    agent_id__host_map: typing.Dict[str, typing.Dict],
+    agent_id__agent_state_info_map: typing.Dict[str, typing.Dict],
+    changed_host_ids: typing.Set[int],
+) -> typing.List[int]:
+    """
+    将 Agent 状态写入 ProcessStatus
+    :param task_id: 任务 ID
+    :param agent_id__host_map: Agent ID - 主机信息
+    :param agent_id__agent_state_info_map: Agent ID - Agent 状态信息（需包含 status_display）
+    :param changed_host_ids: 需要读写 DB 的主机 ID
+    :return: DB 状态实际发生变更的主机 ID
+    """
     # 查询需要更新主机的ProcessStatus对象
     process_status_infos: typing.List[typing.Dict[str, typing.Any]] = ProcessStatus.objects.filter(
         name=ProcessStatus.GSE_AGENT_PROCESS_NAME,
-        bk_host_id__in=agent_id__host_id_map.values(),
+        bk_host_id__in=changed_host_ids,
         source_type=ProcessStatus.SourceType.DEFAULT,
     ).values("bk_host_id", "id", "status", "version")
 
@@ -98,40 +391,32 @@ def update_or_create_host_agent_status(task_id: int, host_queryset: QuerySet):
 
     # 对查询回来的数据进行分类
     not_need_to_be_updated_process_status_count: int = 0
+    churned_host_ids: typing.List[int] = []
     to_be_updated_node_from_host_objs: typing.List[Host] = []
     to_be_updated_process_status_objs: typing.List[ProcessStatus] = []
     to_be_created_process_status_objs: typing.List[ProcessStatus] = []
-    host_id__agent_state_info: typing.Dict[int, typing.Dict[str, int]] = {}
     for agent_id, agent_state_info in agent_id__agent_state_info_map.items():
+        bk_host_id: int = agent_id__host_map[agent_id]["bk_host_id"]
+        if bk_host_id not in changed_host_ids:
+            continue
+
         process_status_info: typing.Optional[typing.Dict[str, typing.Any]] = host_id__process_status_info_map.get(
-            agent_id__host_id_map[agent_id]
+            bk_host_id
         )
-        is_running: bool = agent_state_info["bk_agent_alive"] == constants.BkAgentStatus.ALIVE.value
+        status: str = agent_state_info["status_display"]
         version: str = agent_state_info["version"]
 
-        if is_running:
-            status = constants.ProcStateType.RUNNING
-            if agent_id__node_from_map[agent_id] == constants.NodeFrom.CMDB:
-                # Agent 状态正常的情况下，节点管控权划至节点管理
-                to_be_updated_node_from_host_objs.append(
-                    Host(bk_host_id=agent_id__host_id_map[agent_id], node_from=constants.NodeFrom.NODE_MAN)
-                )
-        else:
-            # Agent 未存活时，细分异常状态
-            if agent_id__node_from_map[agent_id] == constants.NodeFrom.CMDB:
-                # 主机来源于 CMDB，标记为未安装
-                status = constants.ProcStateType.NOT_INSTALLED
-            else:
-                # 主机来源于自身，标记为终止
-                status = constants.ProcStateType.TERMINATED
-
-        agent_state_info["status_display"] = status
-        host_id__agent_state_info[agent_id__host_id_map[agent_id]] = agent_state_info
+        if (
+            status == constants.ProcStateType.RUNNING
+            and agent_id__host_map[agent_id]["node_from"] == constants.NodeFrom.CMDB
+        ):
+            # Agent 状态正常的情况下，节点管控权划至节点管理
+            to_be_updated_node_from_host_objs.append(Host(bk_host_id=bk_host_id, node_from=constants.NodeFrom.NODE_MAN))
 
         if not process_status_info:
             # 如果不存在 ProcessStatus 对象需要创建
             to_be_created_process_status_objs.append(
-                ProcessStatus(bk_host_id=agent_id__host_id_map[agent_id], status=status, version=version)
+                ProcessStatus(bk_host_id=bk_host_id, status=status, version=version)
             )
         else:
             if status == process_status_info["status"] and version == process_status_info["version"]:
@@ -142,6 +427,7 @@ def update_or_create_host_agent_status(task_id: int, host_queryset: QuerySet):
             to_be_updated_process_status_objs.append(
                 ProcessStatus(id=process_status_info["id"], status=status, version=version)
             )
+        churned_host_ids.append(bk_host_id)
 
     logger.info(
         f"{task_id} | sync_agent_status_task: Not need to update record "
@@ -161,6 +447,75 @@ def update_or_create_host_agent_status(task_id: int, host_queryset: QuerySet):
         if to_be_delete_process_status_ids:
             __, delete_row_count = ProcessStatus.objects.filter(id__in=to_be_delete_process_status_ids).delete()
             logger.info(f"{task_id} | sync_agent_status_task: Deleted {delete_row_count} duplicate records")
+
+    # Agent 状态、版本或节点来源发生变更的业务，需刷新过滤条件维度索引
+    host_id__biz_id_map: typing.Dict[int, int] = {
+        host["bk_host_id"]: host["bk_biz_id"] for host in agent_id__host_map.values()
+    }
+    schedule_refresh_condition_facets([host_id__biz_id_map[bk_host_id] for bk_host_id in churned_host_ids])
+
+    return churned_host_ids
+
+
+@task(queue="default", ignore_result=True)
+def update_or_create_host_agent_status(task_id: int, host_queryset: QuerySet, incremental: bool = False):
+    """
+    更新 Agent 状态
+    :param task_id: 任务 ID
+    :param host_queryset: 主机查询条件
+    :param incremental: 是否增量同步，开启后跳过状态指纹未变化主机的 DB 读写
+    :return:
+    """
+    hosts: typing.List[typing.Dict[str, typing.Any]] = list(host_queryset.values(*HOST_AGENT_STATUS_FIELDS))
+    if not hosts:
+        # 结束递归
+        return
+
+    logger.info(
+        f"{task_id} | sync_agent_status_task: Start updating agent status, "
+        f"start Host ID -> {hosts[0]['bk_host_id']}, count -> {len(hosts)}"
+    )
+
+    host_id__biz_id_map: typing.Dict[int, int] = {host["bk_host_id"]: host["bk_biz_id"] for host in hosts}
+    agent_id__host_map: typing.Dict[str, typing.Dict] = get_agent_id__host_map(hosts)
+    agent_id__agent_state_info_map: typing.Dict[str, typing.Dict] = query_agent_state_infos(agent_id__host_map)
+
+    # 计算主机最新的 Agent 状态及状态指纹
+    host_id__agent_state_info: typing.Dict[int, typing.Dict[str, int]] = {}
+    host_id__fingerprint_map: typing.Dict[int, str] = {}
+    for agent_id, agent_state_info in agent_id__agent_state_info_map.items():
+        host: typing.Dict[str, typing.Any] = agent_id__host_map[agent_id]
+        status: str = get_agent_status_display(agent_state_info, host["node_from"])
+        agent_state_info["status_display"] = status
+        host_id__agent_state_info[host["bk_host_id"]] = agent_state_info
+        host_id__fingerprint_map[host["bk_host_id"]] = get_host_agent_status_fingerprint(
+            status=status, version=agent_state_info["version"], node_from=host["node_from"]
+        )
+
+    if incremental:
+        # 增量模式下，状态指纹未变化的主机无需读写 DB
+        changed_host_ids: typing.Set[int] = fetch_changed_host_ids(host_id__fingerprint_map, host_id__biz_id_map)
+        logger.info(
+            f"{task_id} | sync_agent_status_task: Fingerprint unchanged, skip "
+            f"count -> {len(host_id__fingerprint_map) - len(changed_host_ids)}"
+        )
+    else:
+        changed_host_ids: typing.Set[int] = set(host_id__fingerprint_map.keys())
+
+    churned_host_ids: typing.List[int] = save_host_agent_status(
+        task_id, agent_id__host_map, agent_id__agent_state_info_map, changed_host_ids
+    )
+
+    if incremental:
+        save_host_fingerprints_and_churn(
+            host_id__fingerprint_map={
+                bk_host_id: host_id__fingerprint_map[bk_host_id] for bk_host_id in changed_host_ids
+            },
+            host_id__biz_id_map=host_id__biz_id_map,
+            churned_host_ids=churned_host_ids,
+            fingerprint_expire=get_incremental_sync_config()["fingerprint_expire"],
+        )
+
     logger.info(
         f"{task_id} | sync_agent_status_task: Complete agent status update, "
         f"start Host ID -> {hosts[0]['bk_host_id']}, count -> {len(hosts)}"
@@ -169,6 +524,56 @@ def update_or_create_host_agent_status(task_id: int, host_queryset: QuerySet):
     return host_id__agent_state_info
 
 
+@task(queue="default", ignore_result=True)
+def write_back_host_agent_status(task_id: typing.Any, bk_host_ids: typing.List[int]):
+    """
+    将页面实时查询并缓存的 Agent 状态防抖回写到 DB，不再重复查询 GSE
+    :param task_id: 任务 ID
+    :param bk_host_ids: 主机 ID 列表
+    :return:
+    """
+    hosts: typing.List[typing.Dict[str, typing.Any]] = list(
+        Host.objects.filter(bk_host_id__in=bk_host_ids).values(*HOST_AGENT_STATUS_FIELDS)
+    )
+    agent_id__host_map: typing.Dict[str, typing.Dict] = get_agent_id__host_map(hosts)
+    agent_id__agent_state_info_map: typing.Dict[str, typing.Dict] = {}
+    for agent_id, agent_state_info in get_cached_agent_state_infos(agent_id__host_map.keys()).items():
+        # 缓存已过期或 GSE 未返回状态的主机，交由周期任务同步
+        if not agent_state_info:
+            continue
+        agent_state_info["status_display"] = get_agent_status_display(
+            agent_state_info, agent_id__host_map[agent_id]["node_from"]
+        )
+        agent_id__agent_state_info_map[agent_id] = agent_state_info
+
+    save_host_agent_status(
+        task_id,
+        agent_id__host_map,
+        agent_id__agent_state_info_map,
+        changed_host_ids={agent_id__host_map[agent_id]["bk_host_id"] for agent_id in agent_id__agent_state_info_map},
+    )
+
+
+def schedule_write_back_host_agent_status(task_id: typing.Any, bk_host_ids: typing.List[int], debounce: int):
+    """
+    防抖调度 Agent 状态回写，防抖窗口内已调度过的主机不再重复调度
+    :param task_id: 任务 ID
+    :param bk_host_ids: 主机 ID 列表
+    :param debounce: 防抖时间
+    :return:
+    """
+    pipeline = REDIS_INST.pipeline(transaction=False)
+    for bk_host_id in bk_host_ids:
+        pipeline.set(
+            constants.REDIS_AGENT_STATE_WRITE_BACK_KEY_TPL.format(bk_host_id=bk_host_id), 1, nx=True, ex=debounce
+        )
+    to_be_write_back_host_ids: typing.List[int] = [
+        bk_host_id for bk_host_id, is_scheduled in zip(bk_host_ids, pipeline.execute()) if is_scheduled
+    ]
+    if to_be_write_back_host_ids:
+        write_back_host_agent_status.apply_async((task_id, to_be_write_back_host_ids), countdown=debounce)
+
+
 @periodic_task(
     queue="default",
     options={"queue": "default"},
@@ -186,6 +591,9 @@ def sync_agent_status_periodic_task():
     # 若没有指定业务时，也同步资源池主机
     bk_biz_ids.append(settings.BK_CMDB_RESOURCE_POOL_BIZ_ID)
 
+    incremental_sync_config: typing.Dict[str, typing.Any] = get_incremental_sync_config()
+    incremental: bool = incremental_sync_config["enable"]
+
     for bk_biz_id in bk_biz_ids:
 
         host_queryset = Host.objects.filter(bk_biz_id=bk_biz_id)
@@ -195,6 +603,13 @@ def sync_agent_status_periodic_task():
             logger.info(f"{task_id} | sync_agent_status_task: bk_biz_id -> {bk_biz_id}, host_count -> {count}, skip")
             continue
 
+        if incremental and not should_sync_biz(bk_biz_id, count, incremental_sync_config):
+            logger.info(
+                f"{task_id} | sync_agent_status_task: bk_biz_id -> {bk_biz_id}, host_count -> {count}, "
+                f"skip by adaptive polling"
+            )
+            continue
+
         logger.info(
             f"{task_id} | sync_agent_status_task: start to sync bk_biz_id -> {bk_biz_id}, host_count -> {count}"
         )
@@ -208,7 +623,8 @@ def sync_agent_status_periodic_task():
             )
             logger.info(f"{task_id} | sync_agent_status_task: bk_biz_id -> {bk_biz_id}, sync after {countdown} seconds")
             update_or_create_host_agent_status.apply_async(
-                (task_id, host_queryset[start : start + constants.QUERY_AGENT_STATUS_HOST_LENS]), countdown=countdown
+                (task_id, host_queryset[start : start + constants.QUERY_AGENT_STATUS_HOST_LENS], incremental),
+                countdown=countdown,
             )
 
         logger.info(f"{task_id} | sync_agent_status_task: sync agent status complete")
@@ -8,7 +8,6 @@ Unless required by applicable law or agreed to in writing, software distributed
 an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
 specific language governing permissions and limitations under the License.
 """
-import math
 import typing
 
 from celery.schedules import crontab
@@ -21,15 +20,23 @@ from apps.backend.utils.redis import REDIS_INST
 from apps.component.esbclient import client_v2
 from apps.core.concurrent import controller
 from apps.core.gray.tools import GrayTools
+from apps.core.ipchooser.tools.topo_index import TopoIndexTools
 from apps.exceptions import ComponentCallError
 from apps.node_man import constants, models, tools
+from apps.node_man.periodic_tasks.refresh_condition_facet import (
+    schedule_refresh_condition_facets,
+)
 from apps.node_man.periodic_tasks.utils import (
     SyncHostApMapConfig,
     get_host_ap_id,
     get_sync_host_ap_map_config,
     query_bk_biz_ids,
 )
-from apps.utils.batch_request import batch_request
+from apps.utils.batch_request import (
+    batch_request,
+    batch_request_iter,
+    iter_request_results,
+)
 from apps.utils.concurrent import batch_call, batch_call_serial
 from common.log import logger
 
@@ -62,14 +69,8 @@ def query_biz_hosts(bk_biz_id: int, bk_host_ids: typing.List[int]) -> typing.Lis
     return hosts
 
 
-def _list_biz_hosts(biz_id: int, start: int) -> dict:
-    biz_hosts = client_v2.cc.list_biz_hosts(
-        {
-            "bk_biz_id": biz_id,
-            "fields": constants.CC_HOST_FIELDS,
-            "page": {"start": start, "limit": constants.QUERY_CMDB_LIMIT, "sort": "bk_host_id"},
-        }
-    )
+def _list_biz_hosts(params: typing.Dict[str, typing.Any]) -> dict:
+    biz_hosts = client_v2.cc.list_biz_hosts(params)
     # 去除内网IP为空的主机
     biz_hosts["info"] = [
         host for host in biz_hosts["info"] if host.get("bk_host_innerip") or host.get("bk_host_innerip_v6")
@@ -77,14 +78,9 @@ def _list_biz_hosts(biz_id: int, start: int) -> dict:
     return biz_hosts
 
 
-def _list_resource_pool_hosts(start):
+def _list_resource_pool_hosts(params: typing.Dict[str, typing.Any]) -> dict:
     try:
-        result = client_v2.cc.list_resource_pool_hosts(
-            {
-                "page": {"start": start, "limit": constants.QUERY_CMDB_LIMIT, "sort": "bk_host_id"},
-                "fields": constants.CC_HOST_FIELDS,
-            }
-        )
+        result = client_v2.cc.list_resource_pool_hosts(params)
         return result
     except ComponentCallError:
         return {"info": []}
@@ -197,14 +193,12 @@ def _generate_host(biz_id, host, ap_id, is_os_type_priority=False, is_sync_cmdb_
 
 def find_host_biz_relations(find_host_biz_ids):
     host_biz_relation = {}
-    for count in range(math.ceil(len(find_host_biz_ids) / constants.QUERY_CMDB_LIMIT)):
-        cc_host_biz_relations = client_v2.cc.find_host_biz_relations(
-            {
-                "bk_host_id": find_host_biz_ids[
-                    count * constants.QUERY_CMDB_LIMIT : (count + 1) * constants.QUERY_CMDB_LIMIT
-                ]
-            }
-        )
+    params_list: typing.List[typing.Dict[str, typing.List[int]]] = [
+        {"bk_host_id": find_host_biz_ids[start : start + constants.QUERY_CMDB_LIMIT]}
+        for start in range(0, len(find_host_biz_ids), constants.QUERY_CMDB_LIMIT)
+    ]
+    # 分批结果按顺序流式返回，处理已返回的批次时后续批次仍在请求中
+    for cc_host_biz_relations in iter_request_results(client_v2.cc.find_host_biz_relations, params_list):
         for _host_biz in cc_host_biz_relations:
             host_biz_relation[_host_biz["bk_host_id"]] = _host_biz["bk_biz_id"]
 
@@ -430,27 +424,25 @@ def bulk_differential_sync_biz_hosts(expected_bk_host_ids_gby_bk_biz_id: typing.
     batch_call(func=sync_biz_incremental_hosts, params_list=params_list)
 
 
-def _update_or_create_host(biz_id, ap_map_config: SyncHostApMapConfig, is_gse2_gray=False, start=0, task_id=None):
+def _update_or_create_host(biz_id, ap_map_config: SyncHostApMapConfig, is_gse2_gray=False, task_id=None):
     if biz_id == settings.BK_CMDB_RESOURCE_POOL_BIZ_ID:
-        cc_result = _list_resource_pool_hosts(start)
+        query_hosts_func = _list_resource_pool_hosts
+        query_params = {"fields": constants.CC_HOST_FIELDS}
     else:
-        cc_result = _list_biz_hosts(biz_id, start)
-
-    host_data = cc_result.get("info") or []
-    host_count = cc_result.get("count", 0)
+        query_hosts_func = _list_biz_hosts
+        query_params = {"bk_biz_id": biz_id, "fields": constants.CC_HOST_FIELDS}
 
-    logger.info(
-        f"[sync_cmdb_host] update_or_create_host: task_id -> {task_id}, bk_biz_id -> {biz_id}, "
-        f"host_count -> {host_count}, range -> {start}-{start + constants.QUERY_CMDB_LIMIT}"
-    )
-
-    bk_host_ids = update_or_create_host_base(biz_id, ap_map_config, is_gse2_gray, task_id, host_data)
-
-    # 递归
-    if host_count > start + constants.QUERY_CMDB_LIMIT:
-        bk_host_ids += _update_or_create_host(
-            biz_id, ap_map_config, is_gse2_gray, start + constants.QUERY_CMDB_LIMIT, task_id=task_id
+    bk_host_ids = []
+    # 分页流式拉取，当前页写入 DB 时，后续分页仍在请求中
+    for page_index, host_data in enumerate(
+        batch_request_iter(query_hosts_func, query_params, get_count=lambda x: x.get("count", 0), sort="bk_host_id")
+    ):
+        start = page_index * constants.QUERY_CMDB_LIMIT
+        logger.info(
+            f"[sync_cmdb_host] update_or_create_host: task_id -> {task_id}, bk_biz_id -> {biz_id}, "
+            f"page_host_count -> {len(host_data)}, range -> {start}-{start + constants.QUERY_CMDB_LIMIT}"
         )
+        bk_host_ids += update_or_create_host_base(biz_id, ap_map_config, is_gse2_gray, task_id, host_data)
 
     return bk_host_ids
 
@@ -515,6 +507,11 @@ def sync_cmdb_host(bk_biz_id=None, task_id=None):
                 )
             )
 
+    # 主机属性（管控区域、操作系统、运维部门等）可能变更，刷新过滤条件维度索引
+    schedule_refresh_condition_facets(bk_biz_ids)
+    # 拓扑索引仅统计已缓存的主机，主机缓存变更后需要重建
+    TopoIndexTools.invalidate(bk_biz_ids)
+
     logger.info("[sync_cmdb_host] complete: task_id -> %s, bk_biz_ids -> %s" % (task_id, bk_biz_ids))
 
 
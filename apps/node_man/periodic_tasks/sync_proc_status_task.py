@@ -20,6 +20,9 @@ from apps.adapters.api.gse import get_gse_api_helper
 from apps.core.gray.tools import GrayTools
 from apps.node_man import constants, tools
 from apps.node_man.models import Host, ProcessStatus
+from apps.node_man.periodic_tasks.refresh_condition_facet import (
+    schedule_refresh_condition_facets,
+)
 from apps.node_man.periodic_tasks.utils import query_bk_biz_ids
 from apps.utils.basic import chunk_lists
 from apps.utils.periodic_task import calculate_countdown
@@ -48,38 +51,44 @@ def update_or_create_proc_status(
     if proc_names is None:
         proc_names = tools.PluginV2Tools.fetch_head_plugins()
 
-    gray_tools_instance: GrayTools = GrayTools()
     agent_id__host_id_map: typing.Dict[str, int] = {}
     # 需要区分 GSE 版本，(区分方式：灰度业务 or 灰度接入点) -> 使用 V2 API，其他情况 -> 使用 V1 API
     gse_version__query_hosts_map: typing.Dict[str, typing.List[typing.Dict]] = defaultdict(list)
-    for host in hosts:
-        gse_version = gray_tools_instance.get_host_ap_gse_version(host["bk_biz_id"], host["ap_id"])
-        agent_id = get_gse_api_helper(gse_version).get_agent_id(host)
-        agent_id__host_id_map[agent_id] = host["bk_host_id"]
-        gse_version__query_hosts_map[gse_version].append(
-            {
-                "ip": host["inner_ip"] or host["inner_ipv6"],
-                "bk_cloud_id": host["bk_cloud_id"],
-                "bk_agent_id": host["bk_agent_id"],
-            }
+    for gse_version, gse_version_hosts in GrayTools().group_hosts_by_gse_version(hosts).items():
+        for host in gse_version_hosts:
+            agent_id__host_id_map[host["agent_id"]] = host["bk_host_id"]
+            gse_version__query_hosts_map[gse_version].append(
+                {
+                    "ip": host["inner_ip"] or host["inner_ipv6"],
+                    "bk_cloud_id": host["bk_cloud_id"],
+                    "bk_agent_id": host["bk_agent_id"],
+                }
+            )
+
+    # 所有插件 × 主机分片的进程状态查询一次性并发完成，避免按插件逐个往返
+    proc_name__agent_id__readable_proc_status_map: typing.Dict[
+        str, typing.Dict[str, typing.Dict[str, typing.Any]]
+    ] = defaultdict(dict)
+    for gse_version, query_hosts in gse_version__query_hosts_map.items():
+        gse_api_helper = get_gse_api_helper(gse_version)
+        proc_name__agent_id__proc_status_map = gse_api_helper.list_proc_states(
+            namespace=constants.GSE_NAMESPACE,
+            proc_names=proc_names,
+            host_info_list=query_hosts,
+            extra_meta_data={},
         )
+        for proc_name, agent_id__proc_status_map in proc_name__agent_id__proc_status_map.items():
+            proc_name__agent_id__readable_proc_status_map[proc_name].update(agent_id__proc_status_map)
 
+    # 插件版本或进程记录数发生变更时，需刷新过滤条件维度索引
+    is_proc_version_changed: bool = False
     for proc_name in proc_names:
 
         logger.info(f"{task_id} | sync_proc_status_task: Start updating {proc_name} status")
 
-        agent_id__readable_proc_status_map: typing.Dict[str, typing.Dict[str, typing.Any]] = {}
-        for gse_version, query_hosts in gse_version__query_hosts_map.items():
-            gse_api_helper = get_gse_api_helper(gse_version)
-            agent_id__readable_proc_status_map.update(
-                gse_api_helper.list_proc_state(
-                    namespace=constants.GSE_NAMESPACE,
-                    proc_name=proc_name,
-                    labels={"proc_name": proc_name},
-                    host_info_list=query_hosts,
-                    extra_meta_data={},
-                )
-            )
+        agent_id__readable_proc_status_map: typing.Dict[
+            str, typing.Dict[str, typing.Any]
+        ] = proc_name__agent_id__readable_proc_status_map[proc_name]
 
         process_status_infos = ProcessStatus.objects.filter(
             name=proc_name,
@@ -137,6 +146,7 @@ def update_or_create_proc_status(
                     continue
 
                 # need update
+                is_proc_version_changed |= readable_proc_status["version"] != db_proc_status_info["version"]
                 obj = ProcessStatus(
                     pk=db_proc_status_info["id"],
                     status=readable_proc_status["status"],
@@ -182,8 +192,12 @@ def update_or_create_proc_status(
                 __, delete_row_count = ProcessStatus.objects.filter(id__in=to_be_delete_process_status_ids).delete()
                 logger.info(f"{task_id} | sync_proc_status_task: Deleted {delete_row_count} duplicate records")
 
+        is_proc_version_changed |= bool(to_be_created_process_status_objs or to_be_delete_process_status_ids)
         logger.info(f"{task_id} | sync_proc_status_task: Complete [{proc_name}] status update")
 
+    if is_proc_version_changed:
+        schedule_refresh_condition_facets([host["bk_biz_id"] for host in hosts])
+
     logger.info(
         f"{task_id} | sync_proc_status_task: Complete proc status update, "
         f"start Host ID -> {hosts[0]['bk_host_id']}, count -> {len(hosts)}"
@@ -14,7 +14,7 @@ import os
 import time
 from collections import defaultdict
 from json import JSONDecodeError
-from typing import Dict, List, Union
+from typing import Any, Dict, List, Union
 
 from celery.schedules import crontab
 from celery.task import periodic_task
@@ -59,38 +59,31 @@ def update_proxy_files():
     if not total_update_hosts_queryset.exists():
         return
 
-    gray_tools_instance: GrayTools = GrayTools()
-    gse_version__total_update_hosts_map: Dict[str, List[Dict[str, Union[str, int]]]] = defaultdict(list)
-    for host_info in total_update_hosts_queryset.values("inner_ip", "bk_cloud_id", "bk_agent_id", "bk_biz_id", "ap_id"):
-        gse_version = gray_tools_instance.get_host_ap_gse_version(host_info["bk_biz_id"], host_info["ap_id"])
-        gse_version__total_update_hosts_map[gse_version].append(
-            {
-                "ip": host_info["inner_ip"],
-                "bk_cloud_id": host_info["bk_cloud_id"],
-                "bk_agent_id": host_info["bk_agent_id"],
-            }
+    gse_version__total_update_hosts_map: Dict[str, List[Dict[str, Any]]] = GrayTools().group_hosts_by_gse_version(
+        list(
+            total_update_hosts_queryset.values(
+                "bk_host_id", "inner_ip", "inner_ipv6", "bk_cloud_id", "bk_agent_id", "bk_biz_id", "ap_id"
+            )
         )
+    )
 
     # 实时查询主机状态
     # 根据 Proxy 机器的灰度情况，选择相应版本的 gse_api_helper
-    agent_statuses: Dict[str, Dict] = {}
     for gse_version, total_update_hosts in gse_version__total_update_hosts_map.items():
         gse_api_helper = get_gse_api_helper(gse_version)
-        agent_statuses.update(gse_api_helper.list_agent_state(total_update_hosts))
-
-    for update_host_obj in total_update_hosts_queryset:
-        gse_version = gray_tools_instance.get_host_ap_gse_version(update_host_obj.bk_biz_id, update_host_obj.ap_id)
-        agent_id = get_gse_api_helper(gse_version).get_agent_id(update_host_obj)
-        agent_state_info = agent_statuses.get(agent_id, {"version": "", "bk_agent_alive": None})
-        agent_status = constants.PROC_STATUS_DICT.get(agent_state_info["bk_agent_alive"], None)
-        if agent_status == constants.ProcStateType.RUNNING:
-            alive_hosts.append(
-                {
-                    "ip": update_host_obj.inner_ip,
-                    "bk_cloud_id": update_host_obj.bk_cloud_id,
-                    "bk_host_id": update_host_obj.bk_host_id,
-                }
-            )
+        agent_statuses: Dict[str, Dict] = gse_api_helper.list_agent_state(
+            [
+                {"ip": host["inner_ip"], "bk_cloud_id": host["bk_cloud_id"], "bk_agent_id": host["bk_agent_id"]}
+                for host in total_update_hosts
+            ]
+        )
+        for host in total_update_hosts:
+            agent_state_info = agent_statuses.get(host["agent_id"], {"version": "", "bk_agent_alive": None})
+            agent_status = constants.PROC_STATUS_DICT.get(agent_state_info["bk_agent_alive"], None)
+            if agent_status == constants.ProcStateType.RUNNING:
+                alive_hosts.append(
+                    {"ip": host["inner_ip"], "bk_cloud_id": host["bk_cloud_id"], "bk_host_id": host["bk_host_id"]}
+                )
 
     if not alive_hosts:
         return
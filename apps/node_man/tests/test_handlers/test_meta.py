@@ -16,6 +16,7 @@ from django.conf import settings
 from django.test import override_settings
 from django.utils.translation import ugettext as _
 
+from apps.backend.utils.redis import REDIS_INST
 from apps.node_man import constants as const
 from apps.node_man import tools
 from apps.node_man.handlers.meta import MetaHandler
@@ -34,6 +35,14 @@ FILTER_CONDITION_JOB_COUNT_FOR_TEST = int(os.environ.get("FILTER_CONDITION_JOB_C
 
 
 class TestMeta(testcase.CustomAPITestCase):
+    def setUp(self):
+        super().setUp()
+        # 过滤条件维度索引存储于 Redis，不随用例事务回滚，需清理避免用例间相互影响
+        for key in REDIS_INST.scan_iter(
+            match=const.REDIS_CONDITION_FACET_KEY_TPL.format(facet_type="*", bk_biz_id="*")
+        ):
+            REDIS_INST.delete(key)
+
     def fetch_host_unique_col_count(self, col):
         """
         返回Host中指定列的唯一值
@@ -166,7 +175,11 @@ class TestMeta(testcase.CustomAPITestCase):
         self.assertEqual(api_statuses, statuses)
 
     @patch("apps.node_man.handlers.cmdb.client_v2", MockClient)
-    def test_fetch_plugin_list_condition(self):
+    @patch(
+        "apps.node_man.handlers.cmdb.CmdbHandler.biz_id_name",
+        return_value={biz["bk_biz_id"]: biz["bk_biz_name"] for biz in SEARCH_BUSINESS},
+    )
+    def test_fetch_plugin_list_condition(self, *args, **kwargs):
         # 插件表头接口
         number = 100
         create_cloud_area(number)
@@ -181,10 +194,26 @@ class TestMeta(testcase.CustomAPITestCase):
                     version=f"{random.randint(1, 10)}",
                     name=settings.HEAD_PLUGINS[random.randint(0, len(settings.HEAD_PLUGINS) - 1)],
                     status="RUNNING",
+                    is_latest=True,
                 )
             )
+        ProcessStatus.objects.bulk_create(process_to_create)
         # 测试
-        MetaHandler().filter_condition("plugin")
+        result = MetaHandler().filter_condition("plugin")
+        id__filter_item_map = {filter_item["id"]: filter_item for filter_item in result}
+        self.assertEqual(result[0], {"name": "IP", "id": "ip"})
+        self.assertEqual(
+            {child["id"] for child in id__filter_item_map["status"]["children"]}, {const.ProcStateType.RUNNING}
+        )
+        self.assertLessEqual({child["id"] for child in id__filter_item_map["bk_cloud_id"]["children"]}, {0, 1})
+
+        # 各插件的版本取自插件版本维度索引
+        for plugin_name in tools.PluginV2Tools.fetch_head_plugins():
+            expected_versions = {process.version for process in process_to_create if process.name == plugin_name}
+            self.assertEqual(
+                {child["id"] for child in id__filter_item_map[plugin_name]["children"]}, {-1} | expected_versions
+            )
+            self.assertEqual(len(id__filter_item_map[f"{plugin_name}_status"]["children"]), 3)
 
     @patch("apps.node_man.handlers.cmdb.CmdbHandler.cmdb_or_cache_biz", cmdb_or_cache_biz)
     @patch("apps.node_man.handlers.cmdb.client_v2", MockClient)
@@ -207,6 +236,19 @@ class TestMeta(testcase.CustomAPITestCase):
                 )
             )
 
+        ProcessStatus.objects.bulk_create(process_to_create)
+
+        # 无业务权限时，插件表头仅返回 IP 及各插件的版本、状态
+        with patch("apps.node_man.handlers.cmdb.CmdbHandler.biz_id_name", return_value={}):
+            result = MetaHandler().filter_condition("plugin")
+        plugin_names = tools.PluginV2Tools.fetch_head_plugins()
+        self.assertEqual(
+            [filter_item["id"] for filter_item in result],
+            ["ip"] + [plugin_id for name in plugin_names for plugin_id in [name, f"{name}_status"]],
+        )
+        for plugin_name in plugin_names:
+            self.assertEqual(result[1 + plugin_names.index(plugin_name) * 2]["children"], [{"name": "无版本", "id": -1}])
+
         # 验证不传业务ID的情况；即返回用户所有权限的筛选项key
         result = MetaHandler().filter_condition("plugin_host", params={"bk_biz_ids": []})
         self.assertEqual(result[0], {"name": "IP", "id": "ip"})
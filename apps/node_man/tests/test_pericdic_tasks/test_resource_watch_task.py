@@ -15,12 +15,15 @@ from unittest.mock import MagicMock, patch
 
 from django.core.cache import cache
 
-from apps.node_man.models import Host
+from apps.core.ipchooser.tools.topo_index import TopoIndexTools
+from apps.node_man.models import Host, ResourceWatchEvent
 from apps.node_man.periodic_tasks.resource_watch_task import (
     apply_resource_watched_events,
     sync_resource_watch_host_event,
     sync_resource_watch_host_relation_event,
+    sync_resource_watch_module_event,
     sync_resource_watch_process_event,
+    sync_resource_watch_set_event,
 )
 from apps.utils.unittest.testcase import CustomBaseTestCase
 
@@ -44,11 +47,17 @@ class TestResourceWatchTask(CustomBaseTestCase):
         Host.objects.get_or_create(**mock_data.MOCK_HOST)
 
     @exception_handler
-    def _apply_resource_watched_events(self):
-        apply_resource_watched_events()
-
-    # mock掉GlobalSettings.update_config是为了让循环函数只执行一次
-    @patch("apps.node_man.periodic_tasks.resource_watch_task.GlobalSettings.update_config", InterruptedError)
+    def _apply_resource_watched_events(self, **kwargs):
+        # 第二轮循环获取租约时抛出异常，让循环函数只执行一次
+        with patch(
+            "apps.node_man.periodic_tasks.resource_watch_task.RedisLease.is_held", MagicMock(return_value=False)
+        ), patch("apps.node_man.periodic_tasks.resource_watch_task.RedisLease.acquire", side_effect=[1, TypeError]):
+            apply_resource_watched_events(**kwargs)
+
+    # 写入事件后记录游标时抛出异常，让循环函数只执行一次
+    @patch("apps.node_man.periodic_tasks.resource_watch_task.set_cursor", MagicMock(side_effect=TypeError))
+    @patch("apps.node_man.periodic_tasks.resource_watch_task.RedisLease.is_held", MagicMock(return_value=True))
+    @patch("apps.node_man.periodic_tasks.resource_watch_task.RedisLease.is_valid", MagicMock(return_value=True))
     @patch("apps.node_man.periodic_tasks.resource_watch_task.client_v2", MockClient)
     def test_sync_resource_watch_host_event(self):
         self.init_db()
@@ -60,9 +69,12 @@ class TestResourceWatchTask(CustomBaseTestCase):
         _sync_resource_watch_host_event()
         self._apply_resource_watched_events()
 
-    @patch("apps.node_man.periodic_tasks.resource_watch_task.GlobalSettings.update_config", InterruptedError)
+    @patch("apps.node_man.periodic_tasks.resource_watch_task.set_cursor", MagicMock(side_effect=TypeError))
+    @patch("apps.node_man.periodic_tasks.resource_watch_task.RedisLease.is_held", MagicMock(return_value=True))
+    @patch("apps.node_man.periodic_tasks.resource_watch_task.RedisLease.is_valid", MagicMock(return_value=True))
     @patch("apps.node_man.periodic_tasks.resource_watch_task.client_v2", MockClient)
     @patch("apps.node_man.periodic_tasks.resource_watch_task.trigger_sync_cmdb_host", MagicMock())
+    @patch("apps.node_man.periodic_tasks.resource_watch_task.CCApi", MagicMock())
     def test_sync_resource_watch_host_relation_event(self):
         @exception_handler
         def _sync_resource_watch_host_relation_event():
@@ -71,12 +83,43 @@ class TestResourceWatchTask(CustomBaseTestCase):
         _sync_resource_watch_host_relation_event()
         self._apply_resource_watched_events()
         from apps.node_man.periodic_tasks.resource_watch_task import (
+            CCApi,
             trigger_sync_cmdb_host,
         )
 
         trigger_sync_cmdb_host.assert_has_calls([mock.call(bk_biz_id=999)])
+        # 主机关系变更不影响业务内部模块，无需使接口缓存失效
+        CCApi.get_biz_internal_module.invalidate_cache.assert_not_called()
 
-    @patch("apps.node_man.periodic_tasks.resource_watch_task.GlobalSettings.update_config", InterruptedError)
+    @patch("apps.node_man.periodic_tasks.resource_watch_task.set_cursor", MagicMock(side_effect=TypeError))
+    @patch("apps.node_man.periodic_tasks.resource_watch_task.RedisLease.is_held", MagicMock(return_value=True))
+    @patch("apps.node_man.periodic_tasks.resource_watch_task.RedisLease.is_valid", MagicMock(return_value=True))
+    @patch("apps.node_man.periodic_tasks.resource_watch_task.client_v2", MockClient)
+    @patch("apps.node_man.periodic_tasks.resource_watch_task.trigger_sync_cmdb_host", MagicMock())
+    def test_apply_resource_watched_events_by_shard(self):
+        @exception_handler
+        def _sync_resource_watch_host_relation_event():
+            sync_resource_watch_host_relation_event()
+
+        _sync_resource_watch_host_relation_event()
+        self.assertEqual(ResourceWatchEvent.objects.filter(bk_biz_id=999).count(), 1)
+
+        from apps.node_man.periodic_tasks.resource_watch_task import (
+            trigger_sync_cmdb_host,
+        )
+
+        # 业务 999 不属于 0 号分片，事件保留给 1 号分片消费
+        self._apply_resource_watched_events(shard_index=0, shard_num=2)
+        trigger_sync_cmdb_host.assert_not_called()
+        self.assertEqual(ResourceWatchEvent.objects.count(), 1)
+
+        self._apply_resource_watched_events(shard_index=1, shard_num=2)
+        trigger_sync_cmdb_host.assert_has_calls([mock.call(bk_biz_id=999)])
+        self.assertEqual(ResourceWatchEvent.objects.count(), 0)
+
+    @patch("apps.node_man.periodic_tasks.resource_watch_task.set_cursor", MagicMock(side_effect=TypeError))
+    @patch("apps.node_man.periodic_tasks.resource_watch_task.RedisLease.is_held", MagicMock(return_value=True))
+    @patch("apps.node_man.periodic_tasks.resource_watch_task.RedisLease.is_valid", MagicMock(return_value=True))
     @patch("apps.node_man.periodic_tasks.resource_watch_task.client_v2", MockClient)
     def test_sync_resource_watch_process_event(self):
         @exception_handler
@@ -89,3 +132,28 @@ class TestResourceWatchTask(CustomBaseTestCase):
         # 验证是否触发了订阅，从而证明是否监视进程改变
         debounce_window_key = "debounce_window__trigger_nodeman_subscription_404407a5290c409be67c50f4494f5f9f"
         self.assertEqual(bool(cache.get(debounce_window_key)), True)
+
+    @patch("apps.node_man.periodic_tasks.resource_watch_task.set_cursor", MagicMock(side_effect=TypeError))
+    @patch("apps.node_man.periodic_tasks.resource_watch_task.RedisLease.is_held", MagicMock(return_value=True))
+    @patch("apps.node_man.periodic_tasks.resource_watch_task.RedisLease.is_valid", MagicMock(return_value=True))
+    @patch("apps.node_man.periodic_tasks.resource_watch_task.client_v2", MockClient)
+    @patch("apps.node_man.periodic_tasks.resource_watch_task.trigger_sync_cmdb_host", MagicMock())
+    @patch("apps.node_man.periodic_tasks.resource_watch_task.CCApi", MagicMock())
+    def test_sync_resource_watch_topo_event(self):
+        from apps.node_man.periodic_tasks.resource_watch_task import (
+            CCApi,
+            trigger_sync_cmdb_host,
+        )
+
+        for sync_func in [sync_resource_watch_set_event, sync_resource_watch_module_event]:
+            version: int = TopoIndexTools.get_versions([999])[999]
+            exception_handler(sync_func)()
+            self.assertEqual(ResourceWatchEvent.objects.filter(bk_biz_id=999).count(), 1)
+
+            # 集群、模块事件递增拓扑版本号，但不触发主机同步
+            self._apply_resource_watched_events()
+            self.assertEqual(TopoIndexTools.get_versions([999])[999], version + 1)
+            self.assertEqual(ResourceWatchEvent.objects.count(), 0)
+            trigger_sync_cmdb_host.assert_not_called()
+            # 仅使变更业务的内部模块接口缓存失效
+            CCApi.get_biz_internal_module.invalidate_cache.assert_called_with(scope=999)
@@ -13,6 +13,7 @@ from unittest.mock import patch
 from django.conf import settings
 from django.test import override_settings
 
+from apps.backend.utils.redis import REDIS_INST
 from apps.mock_data.api_mkd.gse.unit import GSE_PROCESS_VERSION
 from apps.mock_data.api_mkd.gse.utils import GseApiMockClient, get_gse_api_helper
 from apps.mock_data.common_unit.host import (
@@ -20,10 +21,16 @@ from apps.mock_data.common_unit.host import (
     HOST_MODEL_DATA_WITH_AGENT_ID,
 )
 from apps.node_man import constants
-from apps.node_man.models import Host, ProcessStatus
+from apps.node_man.models import GlobalSettings, Host, ProcessStatus
 from apps.node_man.periodic_tasks.sync_agent_status_task import (
+    HOST_AGENT_STATUS_FIELDS,
+    get_agent_id__host_map,
+    get_incremental_sync_config,
+    query_agent_state_infos_through_cache,
+    should_sync_biz,
     sync_agent_status_periodic_task,
     update_or_create_host_agent_status,
+    write_back_host_agent_status,
 )
 from apps.node_man.tests.test_pericdic_tasks.utils import MockClient
 from apps.utils.unittest.testcase import CustomBaseTestCase
@@ -101,3 +108,114 @@ class TestSyncAgentStatus(CustomBaseTestCase):
         update_or_create_host_agent_status(None, Host.objects.all())
         process_status = ProcessStatus.objects.get(bk_host_id=host.bk_host_id)
         self.assertEqual(process_status.status, constants.ProcStateType.NOT_INSTALLED)
+
+    @patch(
+        "apps.node_man.periodic_tasks.sync_agent_status_task.get_gse_api_helper",
+        get_gse_api_helper(settings.GSE_VERSION, GseApiMockClient()),
+    )
+    def test_update_or_create_host_agent_status_incremental(self):
+        host = Host.objects.create(**HOST_MODEL_DATA)
+        REDIS_INST.delete(constants.REDIS_AGENT_STATUS_FINGERPRINT_KEY_TPL.format(bk_biz_id=host.bk_biz_id))
+
+        update_or_create_host_agent_status(None, Host.objects.all(), incremental=True)
+        self.assertEqual(ProcessStatus.objects.get(bk_host_id=host.bk_host_id).status, constants.ProcStateType.RUNNING)
+
+        # 节点管控权变更后指纹变化，再同步一次后指纹稳定
+        update_or_create_host_agent_status(None, Host.objects.all(), incremental=True)
+
+        # 指纹未变化时跳过 DB 读写，指纹有效期内 DB 的外部修改暂不覆盖
+        ProcessStatus.objects.filter(bk_host_id=host.bk_host_id).update(status=constants.ProcStateType.TERMINATED)
+        update_or_create_host_agent_status(None, Host.objects.all(), incremental=True)
+        self.assertEqual(
+            ProcessStatus.objects.get(bk_host_id=host.bk_host_id).status, constants.ProcStateType.TERMINATED
+        )
+
+        # 指纹有效期受上限约束，过期后外部修改会被纠正
+        fingerprint_key = constants.REDIS_AGENT_STATUS_FINGERPRINT_KEY_TPL.format(bk_biz_id=host.bk_biz_id)
+        self.assertTrue(0 < REDIS_INST.ttl(fingerprint_key) <= constants.AGENT_STATUS_FINGERPRINT_MAX_EXPIRE)
+        REDIS_INST.delete(fingerprint_key)
+        update_or_create_host_agent_status(None, Host.objects.all(), incremental=True)
+        self.assertEqual(ProcessStatus.objects.get(bk_host_id=host.bk_host_id).status, constants.ProcStateType.RUNNING)
+
+        # 全量同步不受指纹影响
+        ProcessStatus.objects.filter(bk_host_id=host.bk_host_id).update(status=constants.ProcStateType.TERMINATED)
+        update_or_create_host_agent_status(None, Host.objects.all())
+        self.assertEqual(ProcessStatus.objects.get(bk_host_id=host.bk_host_id).status, constants.ProcStateType.RUNNING)
+
+    def test_get_incremental_sync_config__bound_fingerprint_expire(self):
+        GlobalSettings.set_config(
+            key=GlobalSettings.KeyEnum.SYNC_AGENT_STATUS_INCREMENTAL_CONFIG.value,
+            value={"enable": True, "fingerprint_expire": constants.TimeUnit.DAY},
+        )
+        config = get_incremental_sync_config()
+        self.assertTrue(config["enable"])
+        self.assertEqual(config["fingerprint_expire"], constants.AGENT_STATUS_FINGERPRINT_MAX_EXPIRE)
+
+    def test_should_sync_biz(self):
+        bk_biz_id = HOST_MODEL_DATA["bk_biz_id"]
+        config = {"max_skip_rounds": 4, "churn_ratio_threshold": 0.1}
+        REDIS_INST.hdel(constants.REDIS_AGENT_STATUS_BIZ_SCHEDULE_KEY, bk_biz_id)
+        REDIS_INST.hdel(constants.REDIS_AGENT_STATUS_BIZ_CHURN_KEY, bk_biz_id)
+
+        # 首次同步，随后无变更的业务逐步降低同步频率：跳过 1 -> 2 -> 4 个周期
+        sync_rounds = [should_sync_biz(bk_biz_id, 100, config) for __ in range(12)]
+        self.assertEqual(sync_rounds, [True, True, False, True, False, False, True, False, False, False, False, True])
+
+        # 变更占比超过阈值，恢复每个周期同步
+        REDIS_INST.hincrby(constants.REDIS_AGENT_STATUS_BIZ_CHURN_KEY, bk_biz_id, 50)
+        while not should_sync_biz(bk_biz_id, 100, config):
+            pass
+        self.assertTrue(should_sync_biz(bk_biz_id, 100, config))
+
+    @patch(
+        "apps.node_man.periodic_tasks.sync_agent_status_task.get_gse_api_helper",
+        get_gse_api_helper(settings.GSE_VERSION, GseApiMockClient()),
+    )
+    def test_query_agent_state_infos_through_cache(self):
+        host = Host.objects.create(**HOST_MODEL_DATA)
+        agent_id__host_map = get_agent_id__host_map(list(Host.objects.values(*HOST_AGENT_STATUS_FIELDS)))
+        agent_id = list(agent_id__host_map.keys())[0]
+        REDIS_INST.delete(constants.REDIS_AGENT_STATE_CACHE_KEY_TPL.format(agent_id=agent_id))
+        config = {"ttl": 30, "coalesce_timeout": 1}
+
+        agent_id__agent_state_info_map = query_agent_state_infos_through_cache(agent_id__host_map, config)
+        self.assertEqual(agent_id__agent_state_info_map[agent_id]["version"], GSE_PROCESS_VERSION)
+
+        # 缓存期内不再查询 GSE，页面读取不写 DB
+        with patch(
+            "apps.node_man.periodic_tasks.sync_agent_status_task.query_agent_state_infos"
+        ) as query_agent_state_infos:
+            self.assertEqual(
+                query_agent_state_infos_through_cache(agent_id__host_map, config), agent_id__agent_state_info_map
+            )
+            query_agent_state_infos.assert_not_called()
+        self.assertFalse(ProcessStatus.objects.filter(bk_host_id=host.bk_host_id).exists())
+
+        # 防抖回写使用缓存中的状态
+        write_back_host_agent_status(None, [host.bk_host_id])
+        self.assertEqual(ProcessStatus.objects.get(bk_host_id=host.bk_host_id).status, constants.ProcStateType.RUNNING)
+
+    @patch(
+        "apps.node_man.periodic_tasks.sync_agent_status_task.get_gse_api_helper",
+        get_gse_api_helper(settings.GSE_VERSION, GseApiMockClient()),
+    )
+    def test_query_agent_state_infos_through_cache__release_own_lock(self):
+        Host.objects.create(**HOST_MODEL_DATA)
+        agent_id__host_map = get_agent_id__host_map(list(Host.objects.values(*HOST_AGENT_STATUS_FIELDS)))
+        agent_id = list(agent_id__host_map.keys())[0]
+        cache_key: str = constants.REDIS_AGENT_STATE_CACHE_KEY_TPL.format(agent_id=agent_id)
+        lock_key: str = constants.REDIS_AGENT_STATE_QUERY_LOCK_KEY_TPL.format(agent_id=agent_id)
+        config = {"ttl": 30, "coalesce_timeout": 1}
+
+        # 抢到的查询锁在查询后释放
+        REDIS_INST.delete(cache_key, lock_key)
+        query_agent_state_infos_through_cache(agent_id__host_map, config)
+        self.assertFalse(REDIS_INST.exists(lock_key))
+
+        # 其他请求持有的查询锁在等待超时自行查询后仍然保留
+        REDIS_INST.delete(cache_key)
+        REDIS_INST.set(lock_key, "other_token", ex=10)
+        agent_id__agent_state_info_map = query_agent_state_infos_through_cache(agent_id__host_map, config)
+        self.assertEqual(agent_id__agent_state_info_map[agent_id]["version"], GSE_PROCESS_VERSION)
+        self.assertEqual(REDIS_INST.get(lock_key), b"other_token")
+        REDIS_INST.delete(lock_key)
@@ -83,6 +83,12 @@ class MockClient(object):
                 bk_event_type = "create"
             elif bk_resource == constants.ResourceType.process:
                 bk_detail["bk_biz_id"] = 999
+            elif bk_resource == constants.ResourceType.set:
+                bk_detail = {"bk_biz_id": 999, "bk_set_id": 1, "bk_set_name": "set"}
+                bk_event_type = "create"
+            elif bk_resource == constants.ResourceType.module:
+                bk_detail = {"bk_biz_id": 999, "bk_set_id": 1, "bk_module_id": 1, "bk_module_name": "module"}
+                bk_event_type = "create"
 
             bk_event = {
                 "bk_event_type": bk_event_type,
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+TencentBlueKing is pleased to support the open source community by making 蓝鲸智云-节点管理(BlueKing-BK-NODEMAN) available.
+Copyright (C) 2017-2022 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at https://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+from apps.backend.utils.redis import REDIS_INST
+from apps.node_man import constants
+from apps.node_man.models import Host, ProcessStatus
+from apps.node_man.tools.condition_facet import ConditionFacetTools, ConditionFacetType
+from apps.utils.unittest.testcase import CustomBaseTestCase
+
+
+class ConditionFacetToolsTestCase(CustomBaseTestCase):
+    BK_BIZ_ID = 99990001
+
+    def setUp(self):
+        super().setUp()
+        for facet_type in ConditionFacetTools.FACET_CONFIG:
+            REDIS_INST.delete(ConditionFacetTools.get_facet_key(facet_type, self.BK_BIZ_ID))
+        for bk_host_id, os_type, version in [(1, "LINUX", "1.0"), (2, "LINUX", "2.0"), (3, "WINDOWS", "2.0")]:
+            Host.objects.create(
+                bk_host_id=bk_host_id,
+                bk_biz_id=self.BK_BIZ_ID,
+                bk_cloud_id=0,
+                inner_ip=f"127.0.0.{bk_host_id}",
+                node_type=constants.NodeType.AGENT,
+                os_type=os_type,
+            )
+            ProcessStatus.objects.create(
+                bk_host_id=bk_host_id, proc_type=constants.ProcType.AGENT, version=version, status="RUNNING"
+            )
+            ProcessStatus.objects.create(
+                bk_host_id=bk_host_id,
+                name="basereport",
+                proc_type=constants.ProcType.PLUGIN,
+                version=version,
+                status="RUNNING",
+                is_latest=True,
+            )
+
+    def test_get_facets(self):
+        facets = ConditionFacetTools.get_facets(ConditionFacetType.HOST, [self.BK_BIZ_ID])
+        self.assertEqual(dict(facets["os_type"]), {"LINUX": 2, "WINDOWS": 1})
+        self.assertEqual(dict(facets["version"]), {"1.0": 1, "2.0": 2})
+        self.assertEqual(dict(facets["bk_cloud_id"]), {0: 3})
+
+        plugin_version_facets = ConditionFacetTools.get_facets(ConditionFacetType.PLUGIN_VERSION, [self.BK_BIZ_ID])
+        self.assertEqual(
+            dict(plugin_version_facets["plugin_version"]), {("basereport", "1.0"): 1, ("basereport", "2.0"): 2}
+        )
+
+    def test_refresh(self):
+        ConditionFacetTools.get_facets(ConditionFacetType.HOST, [self.BK_BIZ_ID])
+        ProcessStatus.objects.filter(bk_host_id=1, proc_type=constants.ProcType.AGENT).update(version="2.0")
+
+        # 索引未刷新前读取已有索引，刷新后与 DB 一致
+        facets = ConditionFacetTools.get_facets(ConditionFacetType.HOST, [self.BK_BIZ_ID])
+        self.assertEqual(dict(facets["version"]), {"1.0": 1, "2.0": 2})
+        ConditionFacetTools.refresh(ConditionFacetType.HOST, [self.BK_BIZ_ID])
+        facets = ConditionFacetTools.get_facets(ConditionFacetType.HOST, [self.BK_BIZ_ID])
+        self.assertEqual(dict(facets["version"]), {"2.0": 3})
+
+        # 无数据的业务同样记录索引，避免重复计算
+        Host.objects.filter(bk_biz_id=self.BK_BIZ_ID).delete()
+        ConditionFacetTools.refresh(ConditionFacetType.HOST, [self.BK_BIZ_ID])
+        self.assertTrue(REDIS_INST.exists(ConditionFacetTools.get_facet_key(ConditionFacetType.HOST, self.BK_BIZ_ID)))
+        self.assertEqual(ConditionFacetTools.get_facets(ConditionFacetType.HOST, [self.BK_BIZ_ID]), {})
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+TencentBlueKing is pleased to support the open source community by making 蓝鲸智云-节点管理(BlueKing-BK-NODEMAN) available.
+Copyright (C) 2017-2022 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at https://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+import json
+import time
+import typing
+from collections import defaultdict
+
+from django.db import connection
+
+from apps.backend.utils.redis import REDIS_INST
+from apps.node_man import constants, models
+
+# 业务 ID - 维度名 - 维度值 - 主机数
+BizFacets = typing.Dict[int, typing.Dict[str, typing.Dict[typing.Any, int]]]
+
+
+class ConditionFacetType:
+    # Agent 主机过滤条件
+    HOST = "host"
+    # 插件版本过滤条件
+    PLUGIN_VERSION = "plugin_version"
+
+
+class ConditionFacetTools:
+    """
+    过滤条件维度索引：按业务预计算 Host ⋈ ProcessStatus 各列的唯一值及主机数，
+    由主机 / Agent / 插件状态同步任务维护，过滤面板按业务读取合并，无需实时 DISTINCT 联表
+    """
+
+    # 索引刷新时间标记字段，同时用于区分「业务无数据」与「索引不存在」
+    REFRESH_TIME_FIELD = "__refresh_time__"
+
+    # 位于 ProcessStatus 表的列，其余列位于 Host 表
+    PROC_COLS: typing.Set[str] = {"name", "status", "version"}
+
+    # 维度索引配置
+    # facets - 维度名 - 维度列，多列维度以元组作为维度值
+    # node_types - 主机节点类型
+    # proc_filters - 进程过滤条件
+    FACET_CONFIG: typing.Dict[str, typing.Dict[str, typing.Any]] = {
+        ConditionFacetType.HOST: {
+            "facets": {
+                "bk_cloud_id": ["bk_cloud_id"],
+                "os_type": ["os_type"],
+                "is_manual": ["is_manual"],
+                "status": ["status"],
+                "version": ["version"],
+                "dept_name": ["dept_name"],
+            },
+            "node_types": [constants.NodeType.AGENT, constants.NodeType.PAGENT],
+            "proc_filters": {"proc_type": "AGENT", "name": models.ProcessStatus.GSE_AGENT_PROCESS_NAME},
+        },
+        ConditionFacetType.PLUGIN_VERSION: {
+            "facets": {"plugin_version": ["name", "version"]},
+            "node_types": [constants.NodeType.AGENT, constants.NodeType.PAGENT, constants.NodeType.PROXY],
+            "proc_filters": {"proc_type": constants.ProcType.PLUGIN, "is_latest": True},
+        },
+    }
+
+    @classmethod
+    def get_facet_key(cls, facet_type: str, bk_biz_id: int) -> str:
+        return constants.REDIS_CONDITION_FACET_KEY_TPL.format(facet_type=facet_type, bk_biz_id=bk_biz_id)
+
+    @classmethod
+    def get_facet_cols(cls, facet_type: str) -> typing.List[str]:
+        """获取维度索引涉及的全部列，按配置顺序去重"""
+        cols: typing.List[str] = []
+        for facet_cols in cls.FACET_CONFIG[facet_type]["facets"].values():
+            cols.extend([col for col in facet_cols if col not in cols])
+        return cols
+
+    @classmethod
+    def build_facet_sql(cls, facet_type: str, bk_biz_ids: typing.List[int]) -> typing.Tuple[str, typing.List]:
+        """
+        构造按业务及维度列分组计数的参数化 SQL
+        :param facet_type: 维度索引类型
+        :param bk_biz_ids: 业务 ID 列表
+        :return: SQL, 参数
+        """
+        host_table: str = models.Host._meta.db_table
+        proc_table: str = models.ProcessStatus._meta.db_table
+        facet_config: typing.Dict[str, typing.Any] = cls.FACET_CONFIG[facet_type]
+
+        select_cols: typing.List[str] = [f"`{host_table}`.`bk_biz_id`"]
+        for col in cls.get_facet_cols(facet_type):
+            table: str = proc_table if col in cls.PROC_COLS else host_table
+            select_cols.append(f"`{table}`.`{col}`")
+
+        where_conditions: typing.List[str] = [
+            f"`{host_table}`.`bk_biz_id` IN ({', '.join(['%s'] * len(bk_biz_ids))})",
+            f"`{host_table}`.`node_type` IN ({', '.join(['%s'] * len(facet_config['node_types']))})",
+        ]
+        params: typing.List[typing.Any] = [*bk_biz_ids, *facet_config["node_types"]]
+        for col, value in facet_config["proc_filters"].items():
+            where_conditions.append(f"`{proc_table}`.`{col}` = %s")
+            params.append(value)
+
+        sql: str = (
+            f"SELECT {', '.join(select_cols)}, COUNT(*) "
+            f"FROM `{host_table}` JOIN `{proc_table}` ON `{host_table}`.`bk_host_id` = `{proc_table}`.`bk_host_id` "
+            f"WHERE {' AND '.join(where_conditions)} "
+            f"GROUP BY {', '.join(select_cols)}"
+        )
+        return sql, params
+
+    @classmethod
+    def compute_biz_facets(cls, facet_type: str, bk_biz_ids: typing.List[int]) -> BizFacets:
+        """
+        从 DB 计算业务的维度索引
+        :param facet_type: 维度索引类型
+        :param bk_biz_ids: 业务 ID 列表
+        :return:
+        """
+        cols: typing.List[str] = cls.get_facet_cols(facet_type)
+        facet_name__cols_map: typing.Dict[str, typing.List[str]] = cls.FACET_CONFIG[facet_type]["facets"]
+        biz_facets: BizFacets = {bk_biz_id: defaultdict(lambda: defaultdict(int)) for bk_biz_id in bk_biz_ids}
+        if not bk_biz_ids:
+            return biz_facets
+
+        sql, params = cls.build_facet_sql(facet_type, bk_biz_ids)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            for row in cursor.fetchall():
+                bk_biz_id, count = row[0], row[-1]
+                col__value_map: typing.Dict[str, typing.Any] = dict(zip(cols, row[1:-1]))
+                for facet_name, facet_cols in facet_name__cols_map.items():
+                    # 多列维度以元组作为维度值，如插件名称 + 版本
+                    value = (
+                        col__value_map[facet_cols[0]]
+                        if len(facet_cols) == 1
+                        else tuple(col__value_map[col] for col in facet_cols)
+                    )
+                    biz_facets[bk_biz_id][facet_name][value] += count
+        return biz_facets
+
+    @classmethod
+    def refresh(cls, facet_type: str, bk_biz_ids: typing.List[int]) -> BizFacets:
+        """
+        重新计算并保存业务的维度索引
+        :param facet_type: 维度索引类型
+        :param bk_biz_ids: 业务 ID 列表
+        :return:
+        """
+        biz_facets: BizFacets = cls.compute_biz_facets(facet_type, bk_biz_ids)
+        refresh_time: int = int(time.time())
+
+        pipeline = REDIS_INST.pipeline(transaction=False)
+        for bk_biz_id, facets in biz_facets.items():
+            mapping: typing.Dict[str, typing.Any] = {cls.REFRESH_TIME_FIELD: refresh_time}
+            for facet_name, value__count_map in facets.items():
+                for value, count in value__count_map.items():
+                    mapping[json.dumps([facet_name, value])] = count
+            key: str = cls.get_facet_key(facet_type, bk_biz_id)
+            pipeline.delete(key)
+            pipeline.hset(key, mapping=mapping)
+            # 兜底过期时间，保证索引在同步任务异常时也能定期重建
+            pipeline.expire(key, constants.CONDITION_FACET_EXPIRE)
+        pipeline.execute()
+        return biz_facets
+
+    @classmethod
+    def get_biz_facets(cls, facet_type: str, bk_biz_ids: typing.List[int]) -> BizFacets:
+        """
+        读取业务的维度索引，索引不存在的业务实时计算
+        :param facet_type: 维度索引类型
+        :param bk_biz_ids: 业务 ID 列表
+        :return:
+        """
+        bk_biz_ids = list(set(bk_biz_ids))
+        pipeline = REDIS_INST.pipeline(transaction=False)
+        for bk_biz_id in bk_biz_ids:
+            pipeline.hgetall(cls.get_facet_key(facet_type, bk_biz_id))
+
+        biz_facets: BizFacets = {}
+        missing_bk_biz_ids: typing.List[int] = []
+        for bk_biz_id, field__count_map in zip(bk_biz_ids, pipeline.execute()):
+            if not field__count_map:
+                missing_bk_biz_ids.append(bk_biz_id)
+                continue
+            facets: typing.Dict[str, typing.Dict[typing.Any, int]] = defaultdict(dict)
+            for field, count in field__count_map.items():
+                field: str = field.decode()
+                if field == cls.REFRESH_TIME_FIELD:
+                    continue
+                facet_name, value = json.loads(field)
+                facets[facet_name][tuple(value) if isinstance(value, list) else value] = int(count)
+            biz_facets[bk_biz_id] = facets
+
+        if missing_bk_biz_ids:
+            biz_facets.update(cls.refresh(facet_type, missing_bk_biz_ids))
+        return biz_facets
+
+    @classmethod
+    def get_facets(
+        cls, facet_type: str, bk_biz_ids: typing.List[int]
+    ) -> typing.Dict[str, typing.Dict[typing.Any, int]]:
+        """
+        合并多个业务的维度索引
+        :param facet_type: 维度索引类型
+        :param bk_biz_ids: 业务 ID 列表
+        :return: 维度名 - 维度值 - 主机数
+        """
+        facets: typing.Dict[str, typing.Dict[typing.Any, int]] = defaultdict(lambda: defaultdict(int))
+        for biz_facet in cls.get_biz_facets(facet_type, bk_biz_ids).values():
+            for facet_name, value__count_map in biz_facet.items():
+                for value, count in value__count_map.items():
+                    facets[facet_name][value] += count
+        return facets
@@ -101,6 +101,24 @@ app_task_get_instances_by_scope_duration_seconds = Histogram(
     labelnames=["node_type", "object_type", "source"],
 )
 
+app_task_cache_scope_instances_total = Gauge(
+    name="app_task_cache_scope_instances_total",
+    documentation="Number of subscriptions and distinct scopes per type in the last cache scope instances round.",
+    labelnames=["type"],
+)
+
+app_task_cache_scope_instances_dedup_ratio = Gauge(
+    name="app_task_cache_scope_instances_dedup_ratio",
+    documentation="Ratio of subscriptions skipped by scope deduplication in the last cache scope instances round.",
+)
+
+app_task_cache_scope_instances_duration_seconds = Histogram(
+    name="app_task_cache_scope_instances_duration_seconds",
+    documentation="Histogram of the time (in seconds) each distinct scope computed per node_type, per object_type",
+    buckets=get_histogram_buckets_from_env("BKAPP_MONITOR_METRICS_ENGINE_BUCKETS"),
+    labelnames=["node_type", "object_type"],
+)
+
 app_task_engine_running_executes_info = Gauge(
     name="app_task_engine_running_executes",
     documentation="Number of engine running executes per code.",
@@ -173,6 +191,12 @@ app_plugin_render_configs_total = Counter(
     labelnames=["plugin_name", "name", "os", "cpu_arch", "source", "type"],
 )
 
+app_plugin_config_fingerprint_total = Counter(
+    name="app_plugin_config_fingerprint_total",
+    documentation="Cumulative count of plugin config render fingerprint checks per plugin_name, per result.",
+    labelnames=["plugin_name", "result"],
+)
+
 app_core_remote_connects_total = Counter(
     name="app_core_remote_connects_total",
     documentation="Cumulative count of remote connects per method,"
@@ -213,6 +237,12 @@ app_core_remote_install_exceptions_total = Counter(
     labelnames=["step", "os_type", "node_type"],
 )
 
+app_agent_state_cache_requests_total = Counter(
+    name="app_agent_state_cache_requests_total",
+    documentation="Cumulative count of agent state cache lookups per result.",
+    labelnames=["result"],
+)
+
 app_core_cache_decorator_requests_total = Counter(
     name="app_core_cache_decorator_requests_total",
     documentation="Cumulative count of cache decorator requests per type, per backend, per method, per get_cache.",
@@ -225,6 +255,33 @@ app_core_cache_decorator_hits_total = Counter(
     labelnames=["type", "backend", "method", "get_cache"],
 )
 
+app_core_cache_decorator_misses_total = Counter(
+    name="app_core_cache_decorator_misses_total",
+    documentation="Cumulative count of cache decorator misses per type, per backend, per method, per get_cache",
+    labelnames=["type", "backend", "method", "get_cache"],
+)
+
+app_core_cache_decorator_waits_total = Counter(
+    name="app_core_cache_decorator_waits_total",
+    documentation="Cumulative count of cache decorator single flight waits "
+    "per type, per backend, per method, per result.",
+    labelnames=["type", "backend", "method", "result"],
+)
+
+app_core_cache_decorator_wait_duration_seconds = Histogram(
+    name="app_core_cache_decorator_wait_duration_seconds",
+    documentation="Histogram of the time (in seconds) each decorator single flight wait per type, per backend, "
+    "per method.",
+    buckets=get_histogram_buckets_from_env("BKAPP_MONITOR_METRICS_CORE_BUCKETS"),
+    labelnames=["type", "backend", "method"],
+)
+
+app_core_cache_decorator_early_refreshes_total = Counter(
+    name="app_core_cache_decorator_early_refreshes_total",
+    documentation="Cumulative count of cache decorator early refreshes per type, per backend, per method.",
+    labelnames=["type", "backend", "method"],
+)
+
 app_core_cache_decorator_get_duration_seconds = Histogram(
     name="app_core_cache_decorator_get_duration_seconds",
     documentation="Histogram of the time (in seconds) each decorator get cache per type, per backend, per method.",
@@ -246,6 +303,56 @@ app_core_password_requests_total = Counter(
 )
 
 
+app_concurrent_executor_max_workers = Gauge(
+    name="app_concurrent_executor_max_workers",
+    documentation="Max workers of shared concurrent executor per name.",
+    labelnames=["name"],
+)
+
+app_concurrent_executor_queue_depth = Gauge(
+    name="app_concurrent_executor_queue_depth",
+    documentation="Number of tasks waiting in shared concurrent executor per name.",
+    labelnames=["name"],
+)
+
+app_concurrent_executor_active_threads = Gauge(
+    name="app_concurrent_executor_active_threads",
+    documentation="Number of active threads of shared concurrent executor per name.",
+    labelnames=["name"],
+)
+
+app_concurrent_executor_submits_total = Counter(
+    name="app_concurrent_executor_submits_total",
+    documentation="Cumulative count of tasks submitted to shared concurrent executor per name.",
+    labelnames=["name"],
+)
+
+app_concurrent_executor_nested_calls_total = Counter(
+    name="app_concurrent_executor_nested_calls_total",
+    documentation="Cumulative count of nested calls in shared concurrent executor per name, per mode.",
+    labelnames=["name", "mode"],
+)
+
+app_concurrent_lease_held = Gauge(
+    name="app_concurrent_lease_held",
+    documentation="Whether the current process holds the redis lease per name.",
+    labelnames=["name"],
+)
+
+app_concurrent_lease_acquire_duration_seconds = Histogram(
+    name="app_concurrent_lease_acquire_duration_seconds",
+    documentation="Histogram of the time (in seconds) each redis lease acquire per name, per result.",
+    buckets=get_histogram_buckets_from_env("BKAPP_MONITOR_METRICS_CORE_BUCKETS"),
+    labelnames=["name", "result"],
+)
+
+app_concurrent_lease_lost_total = Counter(
+    name="app_concurrent_lease_lost_total",
+    documentation="Cumulative count of redis lease lost on heartbeat renewal per name.",
+    labelnames=["name"],
+)
+
+
 app_common_method_requests_total = Counter(
     name="app_common_method_requests_total",
     documentation="Cumulative count of method requests per method, per source.",
@@ -265,6 +372,24 @@ app_common_api_call_exceptions_total = Counter(
     labelnames=["module", "api", "code"],
 )
 
+app_common_api_session_requests_total = Counter(
+    name="app_common_api_session_requests_total",
+    documentation="Cumulative count of requests sent through pooled api sessions per module, per host.",
+    labelnames=["module", "host"],
+)
+
+app_common_api_session_connections_total = Counter(
+    name="app_common_api_session_connections_total",
+    documentation="Cumulative count of new connections created by pooled api sessions per module, per host.",
+    labelnames=["module", "host"],
+)
+
+app_common_api_cache_requests_total = Counter(
+    name="app_common_api_cache_requests_total",
+    documentation="Cumulative count of cached api lookups per api, per result.",
+    labelnames=["api", "result"],
+)
+
 app_resource_watch_events_total = Counter(
     name="app_resource_watch_events_total",
     documentation="Cumulative count of resource watch events per type, per bk_resource, per bk_event_type.",
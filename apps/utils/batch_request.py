@@ -9,19 +9,21 @@ an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express o
 specific language governing permissions and limitations under the License.
 """
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import deque
+from concurrent.futures import Future, as_completed
 from copy import deepcopy
-from multiprocessing.pool import ThreadPool
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional
 
 from django.conf import settings
 from django.utils.translation import get_language
 
+from apps.core.concurrent.executor import ManagedExecutor, get_executor_for_call
 from apps.exceptions import AppBaseException
 from apps.node_man import constants
 from apps.utils.local import get_request
 
 from . import translation
-from .concurrent import inject_request
+from .concurrent import batch_call_serial, inject_request
 
 
 def format_params(params, get_count, func):
@@ -45,7 +47,58 @@ def format_params(params, get_count, func):
     return request_params
 
 
-def batch_request(
+def iter_request_results(
+    func: Callable,
+    params_iter: Iterable[Dict],
+    get_data: Callable = lambda x: x,
+    window: Optional[int] = None,
+    executor_name: str = "batch_request",
+) -> Iterator[Any]:
+    """
+    按参数顺序流式返回请求结果，同一时刻最多有 window 个请求在途
+    调用方可以在后续请求仍在途时处理已返回的结果，避免所有结果同时驻留内存
+    :param func: 请求方法，接收单个位置参数
+    :param params_iter: 请求参数迭代器，按需惰性生成
+    :param get_data: 获取数据函数
+    :param window: 在途请求窗口大小，默认为 settings.BATCH_REQUEST_WINDOW_SIZE
+    :param executor_name: 共享执行器名称
+    :return: 按提交顺序返回的请求结果
+    """
+    # 在执行器的工作线程中嵌套调用时使用下一层级的独立执行器，超过嵌套层级上限时串行请求
+    executor: Optional[ManagedExecutor] = get_executor_for_call(executor_name)
+    if executor is None:
+        for params in params_iter:
+            yield get_data(func(params))
+        return
+
+    window = max(window or settings.BATCH_REQUEST_WINDOW_SIZE, 1)
+    wrapped_func: Callable = translation.RespectsLanguage(language=get_language())(inject_request(func))
+
+    params_iter = iter(params_iter)
+    futures: Deque[Future] = deque()
+
+    def _fill_window():
+        while len(futures) < window:
+            try:
+                params = next(params_iter)
+            except StopIteration:
+                return
+            futures.append(executor.submit(wrapped_func, params))
+
+    try:
+        _fill_window()
+        while futures:
+            result = futures.popleft().result()
+            # 先补充窗口再交出结果，让调用方处理数据时后续请求仍在途
+            _fill_window()
+            yield get_data(result)
+    finally:
+        # 调用方提前结束迭代或出现异常时，取消尚未开始的请求
+        for future in futures:
+            future.cancel()
+
+
+def batch_request_iter(
     func,
     params,
     get_data=lambda x: x["info"],
@@ -54,9 +107,10 @@ def batch_request(
     sort=None,
     split_params=False,
     interval=0,
-):
+    window=None,
+) -> Iterator[List]:
     """
-    异步并发请求接口
+    流式分页请求接口，按页顺序返回每一页的数据
     :param func: 请求方法
     :param params: 请求参数
     :param get_data: 获取数据函数
@@ -65,80 +119,120 @@ def batch_request(
     :param sort: 排序
     :param split_params: 是否拆分参数
     :param interval: 任务提交间隔
-    :return: 请求结果
+    :param window: 在途分页窗口大小
+    :return: 分页数据迭代器
     """
 
     # 如果该接口没有返回count参数，只能同步请求
     if not get_count:
-        return sync_batch_request(func, params, get_data, limit)
+        yield from sync_batch_request_iter(func, params, get_data, limit)
+        return
 
     start = 0
-    data = []
     if not split_params:
         request_params = dict(page={"start": 0, "limit": limit}, **params)
         if sort:
             request_params["page"]["sort"] = sort
         query_res = func(request_params)
         final_request_params = [{"count": get_count(query_res), "params": params}]
-        data = get_data(query_res) or []
+        yield get_data(query_res) or []
         # 如果count小于等于limit，直接返回
         if final_request_params[0]["count"] <= limit:
-            return data
+            return
 
         start = limit
     else:
         final_request_params = format_params(params, get_count, func)
 
-    # 根据请求总数并发请求
-    pool = ThreadPool(20)
-    futures = []
-
-    for idx, req in enumerate(final_request_params):
-        while start < req["count"]:
-            if idx != 0 and interval:
-                time.sleep(interval)
-            request_params = {"page": {"limit": limit, "start": start}}
-            if sort:
-                request_params["page"]["sort"] = sort
-            request_params.update(req["params"])
-            futures.append(pool.apply_async(inject_request(func), args=(request_params,)))
+    def _iter_page_params():
+        page_start = start
+        for idx, req in enumerate(final_request_params):
+            while page_start < req["count"]:
+                if idx != 0 and interval:
+                    time.sleep(interval)
+                page_params = {"page": {"limit": limit, "start": page_start}}
+                if sort:
+                    page_params["page"]["sort"] = sort
+                page_params.update(req["params"])
+                yield page_params
 
-            start += limit
+                page_start += limit
 
-    pool.close()
-    pool.join()
+    # 根据请求总数并发请求
+    yield from iter_request_results(func, _iter_page_params(), get_data=get_data, window=window)
 
-    # 取值
-    for future in futures:
-        data.extend(get_data(future.get()))
 
+def batch_request(
+    func,
+    params,
+    get_data=lambda x: x["info"],
+    get_count=lambda x: x["count"],
+    limit=constants.QUERY_CMDB_LIMIT,
+    sort=None,
+    split_params=False,
+    interval=0,
+):
+    """
+    异步并发请求接口
+    :param func: 请求方法
+    :param params: 请求参数
+    :param get_data: 获取数据函数
+    :param get_count: 获取总数函数
+    :param limit: 一次请求数量
+    :param sort: 排序
+    :param split_params: 是否拆分参数
+    :param interval: 任务提交间隔
+    :return: 请求结果
+    """
+    data = []
+    for page_data in batch_request_iter(
+        func,
+        params,
+        get_data=get_data,
+        get_count=get_count,
+        limit=limit,
+        sort=sort,
+        split_params=split_params,
+        interval=interval,
+    ):
+        data.extend(page_data)
     return data
 
 
-def sync_batch_request(func, params, get_data=lambda x: x["info"], limit=500):
+def sync_batch_request_iter(func, params, get_data=lambda x: x["info"], limit=500) -> Iterator[List]:
     """
-    同步请求接口
+    同步流式请求接口
     :param func: 请求方法
     :param params: 请求参数
     :param get_data: 获取数据函数
     :param limit: 一次请求数量
-    :return: 请求结果
+    :return: 分页数据迭代器
     """
-    # 如果该接口没有返回count参数，只能同步请求
-    data = []
     start = 0
-
-    # 根据请求总数并发请求
     while True:
         request_params = {"page": {"limit": limit, "start": start}}
         request_params.update(params)
         result = get_data(func(request_params))
-        data.extend(result)
+        yield result
         if len(result) < limit:
             break
         else:
             start += limit
 
+
+def sync_batch_request(func, params, get_data=lambda x: x["info"], limit=500):
+    """
+    同步请求接口
+    :param func: 请求方法
+    :param params: 请求参数
+    :param get_data: 获取数据函数
+    :param limit: 一次请求数量
+    :return: 请求结果
+    """
+    # 如果该接口没有返回count参数，只能同步请求
+    data = []
+    for result in sync_batch_request_iter(func, params, get_data, limit):
+        data.extend(result)
     return data
 
 
@@ -161,11 +255,15 @@ def request_multi_thread(func, params_list, get_data=lambda x: []):
             if "params" in params:
                 params["params"]["_request"] = _request
 
+    # 在执行器的工作线程中嵌套调用时使用下一层级的独立执行器，超过嵌套层级上限时串行请求
+    executor: Optional[ManagedExecutor] = get_executor_for_call()
+    if executor is None:
+        return batch_call_serial(func, params_list, get_data=get_data, extend_result=True)
+
     result = []
-    with ThreadPoolExecutor(max_workers=settings.CONCURRENT_NUMBER) as ex:
-        tasks = [
-            ex.submit(translation.RespectsLanguage(language=get_language())(func), **params) for params in params_list
-        ]
+    tasks = [
+        executor.submit(translation.RespectsLanguage(language=get_language())(func), **params) for params in params_list
+    ]
     for future in as_completed(tasks):
         result.extend(get_data(future.result()))
     return result
@@ -13,14 +13,15 @@ import inspect
 import sys
 import time
 from concurrent.futures import as_completed
-from concurrent.futures.thread import ThreadPoolExecutor
 from multiprocessing import cpu_count, get_context
-from typing import Callable, Coroutine, Dict, List
+from multiprocessing.pool import Pool
+from typing import Callable, Coroutine, Dict, List, Optional
 
 from asgiref.sync import async_to_sync
-from django.conf import settings
 from django.utils.translation import get_language
 
+from apps.core.concurrent.executor import ManagedExecutor, get_executor_for_call
+from apps.core.concurrent.executor import registry as executor_registry
 from apps.exceptions import AppBaseException
 from apps.utils import local
 
@@ -48,6 +49,7 @@ def batch_call(
     get_data=lambda x: x,
     extend_result: bool = False,
     interval: float = 0,
+    executor_name: str = "default",
     **kwargs
 ) -> List:
     """
@@ -58,6 +60,7 @@ def batch_call(
     :param get_data: 获取数据函数
     :param extend_result: 是否展开结果
     :param interval: 任务提交间隔
+    :param executor_name: 共享执行器名称
     :return: 请求结果累计
     """
 
@@ -71,17 +74,21 @@ def batch_call(
     if len(params_list) == 1:
         return batch_call_serial(func, params_list, get_data, extend_result, interval, **kwargs)
 
+    # 在执行器的工作线程中嵌套调用时使用下一层级的独立执行器，超过嵌套层级上限时串行执行
+    executor: Optional[ManagedExecutor] = get_executor_for_call(executor_name)
+    if executor is None:
+        return batch_call_serial(func, params_list, get_data, extend_result, interval, **kwargs)
+
     if inspect.iscoroutinefunction(func):
         func = async_to_sync(func)
 
-    with ThreadPoolExecutor(max_workers=settings.CONCURRENT_NUMBER) as ex:
-        tasks = []
-        for idx, params in enumerate(params_list):
-            if idx != 0 and interval:
-                time.sleep(interval)
-            tasks.append(
-                ex.submit(translation.RespectsLanguage(language=get_language())(inject_request(func)), **params)
-            )
+    tasks = []
+    for idx, params in enumerate(params_list):
+        if idx != 0 and interval:
+            time.sleep(interval)
+        tasks.append(
+            executor.submit(translation.RespectsLanguage(language=get_language())(inject_request(func)), **params)
+        )
 
     for future in as_completed(tasks):
         if extend_result:
@@ -164,22 +171,25 @@ def batch_call_multi_proc(
     """
     if sys.platform in ["win32", "cygwim", "msys"]:
         return batch_call(func, params_list, get_data, extend_result)
-    else:
-        ctx = get_context("fork")
 
     result = []
 
-    pool = ctx.Pool(processes=cpu_count())
-    futures = [pool.apply_async(func=inject_request(func), kwds=params) for params in params_list]
-
-    pool.close()
-    pool.join()
-
-    # 取值
-    for future in futures:
-        if extend_result:
-            result.extend(get_data(future.get()))
-        else:
-            result.append(get_data(future.get()))
+    # 开启 CONCURRENT_PROCESS_POOL_SIZE 时复用进程级共享的进程池，否则每次调用创建并关闭进程池
+    # 任务函数需可被序列化，不能是闭包
+    shared_pool: Optional[Pool] = executor_registry.get_process_pool()
+    pool: Pool = shared_pool or get_context("fork").Pool(processes=cpu_count())
+    try:
+        futures = [pool.apply_async(func=func, kwds=params) for params in params_list]
+
+        # 取值
+        for future in futures:
+            if extend_result:
+                result.extend(get_data(future.get()))
+            else:
+                result.append(get_data(future.get()))
+    finally:
+        if shared_pool is None:
+            pool.close()
+            pool.join()
 
     return result
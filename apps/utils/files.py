@@ -89,13 +89,63 @@ def md5sum(name: str = None, file_obj: Optional[IO[Any]] = None, mode: str = "rb
     return hash_md5.hexdigest()
 
 
+class MD5Writer:
+    """
+    写入代理，写入文件的同时计算 md5 及写入字节数，避免写入后重新读取文件计算
+    """
+
+    def __init__(self, file_obj: IO[Any]):
+        """
+        :param file_obj: 已以二进制写模式 open 的文件
+        """
+        self.file_obj = file_obj
+        self.hash_md5 = hashlib.md5()
+        self.size: int = 0
+
+    @property
+    def name(self) -> str:
+        return getattr(self.file_obj, "name", "")
+
+    def write(self, data: bytes) -> int:
+        self.hash_md5.update(data)
+        self.size += len(data)
+        return self.file_obj.write(data)
+
+    def flush(self):
+        self.file_obj.flush()
+
+    def hexdigest(self) -> str:
+        return self.hash_md5.hexdigest()
+
+
+def dir_content_md5(path: str) -> str:
+    """
+    计算目录内容的 md5，覆盖目录结构、文件权限及文件内容，用于判断目录内容是否变更
+    :param path: 目录路径
+    :return: md5 str
+    """
+    hash_md5 = hashlib.md5()
+    for dir_path, dir_names, file_names in os.walk(path):
+        # 保证遍历顺序稳定
+        dir_names.sort()
+        for name in sorted(dir_names + file_names):
+            abs_path: str = os.path.join(dir_path, name)
+            stat_result: os.stat_result = os.lstat(abs_path)
+            hash_md5.update(f"{os.path.relpath(abs_path, path)}:{stat.S_IMODE(stat_result.st_mode)}".encode())
+            if stat.S_ISLNK(stat_result.st_mode):
+                hash_md5.update(os.readlink(abs_path).encode())
+            elif stat.S_ISREG(stat_result.st_mode):
+                hash_md5.update(md5sum(name=abs_path).encode())
+    return hash_md5.hexdigest()
+
+
 def download_file(
     url: str,
     name: str = None,
     file_obj: Optional[IO[Any]] = None,
     mode: str = "wb",
     closed: bool = True,
-) -> None:
+) -> str:
 
     """
     下载文件
@@ -104,16 +154,19 @@ def download_file(
     :param file_obj: 已打开的写入目标文件对象
     :param mode: 文件打开模式，具体参考 open docstring，默认 rb
     :param closed: 是否返回时关闭文件对象，安全起见默认关闭
-    :return: None
+    :return: 下载文件的 md5，写入时同步计算，无需下载后重新读取
     """
 
+    hash_md5 = hashlib.md5()
     # request 的 stream=True 没有起作用，采用 urlopen 进行流式下载，避免 OOM
     with urlopen(url=url) as rfs:
         with FileOpen(name=name, file_obj=file_obj, mode=mode, closed=closed) as local_fs:
             for chunk in iter(lambda: rfs.read(8192), b""):
                 if not chunk:
                     continue
+                hash_md5.update(chunk)
                 local_fs.write(chunk)
+    return hash_md5.hexdigest()
 
 
 def mk_and_return_tmpdir() -> str:
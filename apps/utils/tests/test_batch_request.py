@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+TencentBlueKing is pleased to support the open source community by making 蓝鲸智云-节点管理(BlueKing-BK-NODEMAN) available.
+Copyright (C) 2017-2022 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at https://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+import random
+import threading
+import time
+
+from apps.utils import batch_request
+from apps.utils.unittest.testcase import CustomBaseTestCase
+
+
+class TestBatchRequest(CustomBaseTestCase):
+    TOTAL = 1050
+    LIMIT = 100
+
+    def setUp(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        super().setUp()
+
+    def list_hosts(self, params):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        # 打乱完成顺序，验证按页顺序返回
+        time.sleep(random.random() / 100)
+        start, limit = params["page"]["start"], params["page"]["limit"]
+        with self.lock:
+            self.in_flight -= 1
+        return {"count": self.TOTAL, "info": list(range(start, min(start + limit, self.TOTAL)))}
+
+    def test_batch_request(self):
+        data = batch_request.batch_request(self.list_hosts, {}, limit=self.LIMIT)
+        self.assertEqual(data, list(range(self.TOTAL)))
+
+    def test_batch_request_iter(self):
+        pages = list(batch_request.batch_request_iter(self.list_hosts, {}, limit=self.LIMIT, window=3))
+        self.assertEqual(len(pages), 11)
+        self.assertEqual([host for page in pages for host in page], list(range(self.TOTAL)))
+        self.assertLessEqual(self.max_in_flight, 3)
+
+    def test_batch_request_iter_early_stop(self):
+        pages_iter = batch_request.batch_request_iter(self.list_hosts, {}, limit=self.LIMIT, window=2)
+        self.assertEqual(next(pages_iter), list(range(self.LIMIT)))
+        self.assertEqual(next(pages_iter), list(range(self.LIMIT, self.LIMIT * 2)))
+        pages_iter.close()
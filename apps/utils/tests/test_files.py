@@ -21,6 +21,37 @@ class TestFiles(CustomBaseTestCase):
     def test_md5sum(self):
         self.assertEqual(files.md5sum(file_obj=io.BytesIO(b"this is a string")), "b37e16c620c055cf8207b999e3270e9b")
 
+    def test_md5_writer(self):
+        buffer = io.BytesIO()
+        md5_writer = files.MD5Writer(buffer)
+        md5_writer.write(b"this is ")
+        md5_writer.write(b"a string")
+        self.assertEqual(md5_writer.hexdigest(), files.md5sum(file_obj=io.BytesIO(buffer.getvalue())))
+        self.assertEqual(md5_writer.size, len(b"this is a string"))
+
+    def test_download_file(self):
+        tmp_dir = files.mk_and_return_tmpdir()
+        src_path = os.path.join(tmp_dir, "src")
+        with open(src_path, mode="wb") as fs:
+            fs.write(os.urandom(20000))
+
+        with open(os.path.join(tmp_dir, "dst"), mode="wb+") as fs:
+            md5 = files.download_file(url=f"file://{src_path}", file_obj=fs, closed=False)
+            # 下载时计算的 md5 与重新读取计算一致，且文件指针已复位
+            self.assertEqual(md5, files.md5sum(name=src_path))
+            self.assertEqual(md5, files.md5sum(file_obj=fs, closed=False))
+
+    def test_dir_content_md5(self):
+        tmp_dir = files.mk_and_return_tmpdir()
+        with open(os.path.join(tmp_dir, "VERSION"), mode="w") as fs:
+            fs.write("1.0.0")
+        content_md5 = files.dir_content_md5(tmp_dir)
+        self.assertEqual(content_md5, files.dir_content_md5(tmp_dir))
+
+        with open(os.path.join(tmp_dir, "VERSION"), mode="w") as fs:
+            fs.write("1.0.1")
+        self.assertNotEqual(content_md5, files.dir_content_md5(tmp_dir))
+
     def test_path_handler(self):
         windows_join_path = "C:\\gse\\external_plugins"
         not_windows_join_path = "/usr/local/gse/external_plugins"
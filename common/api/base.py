@@ -18,7 +18,6 @@ from urllib import parse
 
 import requests
 from django.conf import settings
-from django.core.cache import cache
 from django.utils import translation
 from django.utils.module_loading import import_string
 from django.utils.translation import ugettext as _
@@ -31,7 +30,14 @@ from apps.utils.local import get_request, get_request_id, get_request_username
 from apps.utils.time_handler import timestamp_to_datetime
 
 from .exception import DataAPIException
+from .utils.cache import (
+    DEFAULT_LOCAL_CACHE_MAXSIZE,
+    DEFAULT_LOCAL_CACHE_TIME,
+    MISSING,
+    ApiResponseCache,
+)
 from .utils.params import add_esb_info_before_request
+from .utils.session import get_module_options, session_pool
 
 logger = logging.getLogger("component")
 API_AUTH_KEYS = [
@@ -153,6 +159,9 @@ class DataAPI(object):
         cache_time=0,
         default_timeout=300,
         api_name="",
+        local_cache_time=DEFAULT_LOCAL_CACHE_TIME,
+        local_cache_maxsize=DEFAULT_LOCAL_CACHE_MAXSIZE,
+        cache_scope_param="",
     ):
         """
         初始化一个请求句柄
@@ -170,6 +179,9 @@ class DataAPI(object):
         @param {array.<string>} url_keys 请求地址中存在未赋值的 KEYS
         @param {int} cache_time 缓存时间
         @param {int} default_timeout 默认超时时间
+        @param {int} local_cache_time 进程内缓存时间，不超过 cache_time，为 0 时仅使用共享缓存
+        @param {int} local_cache_maxsize 进程内缓存最大条目数
+        @param {string} cache_scope_param 划分缓存范围的请求参数（如 bk_biz_id），用于按范围使缓存失效
         """
         self.url = url
         self.simple_module = simple_module
@@ -192,6 +204,16 @@ class DataAPI(object):
         self.cache_time = cache_time
         self.default_timeout = default_timeout
         self.api_name = api_name
+        self.cache_scope_param = cache_scope_param
+
+        self.response_cache = None
+        if self.cache_time:
+            self.response_cache = ApiResponseCache(
+                api_key=f"{self.simple_module}:{self.api_name or self.url}",
+                cache_time=self.cache_time,
+                local_cache_time=local_cache_time,
+                local_cache_maxsize=local_cache_maxsize,
+            )
 
     def __call__(
         self,
@@ -213,7 +235,7 @@ class DataAPI(object):
             params = {}
         if headers is None:
             headers = {}
-        self.timeout = timeout or self.default_timeout
+        self.timeout = timeout or get_module_options(self.simple_module)["timeout"] or self.default_timeout
         self.request_id = get_request_id()
         self.data = data
 
@@ -269,16 +291,26 @@ class DataAPI(object):
             return DataResponse(self.default_return_value, self.request_id)
 
         # 缓存
+        cache_key = None
+        cache_scope = self._get_cache_scope(params)
         try:
             cache_key = self._build_cache_key(params)
             if self.cache_time:
-                result = self._get_cache(cache_key)
-                if result is not None:
+                result = self._get_cache(cache_key, cache_scope)
+                if result is not MISSING:
                     # 有缓存时返回
                     return DataResponse(result, self.request_id)
         except (TypeError, AttributeError):
             pass
 
+        if self.cache_time and cache_key:
+            # 缓存未命中时，进程内相同的请求仅发出一次
+            return self.response_cache.load(
+                cache_key, lambda: self._request(params, headers, use_admin, cache_key, cache_scope)
+            )
+        return self._request(params, headers, use_admin, cache_key)
+
+    def _request(self, params, headers, use_admin=False, cache_key=None, cache_scope=None):
         response = None
         error_message = ""
 
@@ -340,8 +372,8 @@ class DataAPI(object):
                         serializer.is_valid(raise_exception=True)
                         response_result = serializer.validated_data
 
-                if self.cache_time and "cache_key" in locals():
-                    self._set_cache(locals()["cache_key"], response_result)
+                if self.cache_time and cache_key:
+                    self._set_cache(cache_key, response_result, cache_scope)
 
                 response = DataResponse(response_result, self.request_id)
                 return response
@@ -416,13 +448,14 @@ class DataAPI(object):
         cache_key = hash_md5.hexdigest()
         return cache_key
 
-    def _set_cache(self, cache_key, data):
+    def _set_cache(self, cache_key, data, cache_scope=None):
         """
-        获取缓存
+        设置缓存
         :param cache_key:
+        :param cache_scope: 缓存范围
         :return:
         """
-        cache.set(cache_key, data, self.cache_time)
+        self.response_cache.set(cache_key, data, cache_scope)
 
     def _send(self, params: Dict, headers: Dict, use_admin: bool = False):
         """
@@ -431,10 +464,10 @@ class DataAPI(object):
         @return: requests response
         """
 
+        # 会话在进程内共享，请求头及 Cookie 仅作用于本次请求
+        request_headers: Dict[str, str] = dict(headers)
         # 增加request id
-        session = requests.session()
-        session.headers.update(headers)
-        session.headers.update(
+        request_headers.update(
             {
                 "X-Bkapi-Request-Id": self.request_id,
                 "X-Bkapi-App-Code": params.get("bk_app_code"),
@@ -453,34 +486,43 @@ class DataAPI(object):
         except AppBaseException:
             local_request = None
 
+        cookies: Dict[str, str] = {}
         if local_request and local_request.COOKIES and not use_admin:
-            session.cookies.update(local_request.COOKIES)
+            cookies.update(local_request.COOKIES)
             # 用于跨服务调用透传国际化设置
-            session.cookies.set("blueking_language", translation.get_language())
+            cookies["blueking_language"] = translation.get_language()
 
         url = self.build_actual_url(params)
 
         # headers 申明重载请求方法
         if self.method_override is not None:
-            session.headers.update({"X-METHOD-OVERRIDE": self.method_override})
+            request_headers["X-METHOD-OVERRIDE"] = self.method_override
 
         # headers 增加api认证数据
         api_auth_params: dict = fetch_and_clean_auth_info(params, url)
-        session.headers.update({"X-Bkapi-Authorization": get_request_api_headers(api_auth_params)})
+        request_headers["X-Bkapi-Authorization"] = get_request_api_headers(api_auth_params)
+
+        session: requests.Session = session_pool.get(self.simple_module, url)
+        request_kwargs: Dict[str, typing.Any] = {
+            "method": self.method,
+            "url": url,
+            "headers": request_headers,
+            "cookies": cookies,
+            "verify": False,
+            "timeout": self.timeout,
+        }
 
         # 发出请求并返回结果
         non_file_data, file_data = self._split_file_data(params)
         request_method = self.method.upper()
         if request_method == "GET":
-            result = session.request(method=self.method, url=url, params=params, verify=False, timeout=self.timeout)
+            result = session.request(params=params, **request_kwargs)
         elif request_method == "DELETE":
-            session.headers.update({"Content-Type": "application/json; charset=utf-8"})
-            result = session.request(
-                method=self.method, url=url, data=json.dumps(non_file_data), verify=False, timeout=self.timeout
-            )
+            request_headers["Content-Type"] = "application/json; charset=utf-8"
+            result = session.request(data=json.dumps(non_file_data), **request_kwargs)
         elif request_method in ["PUT", "PATCH", "POST"]:
             if not file_data:
-                session.headers.update({"Content-Type": "application/json; charset=utf-8"})
+                request_headers["Content-Type"] = "application/json; charset=utf-8"
                 params = json.dumps(non_file_data)
             else:
                 params = non_file_data
@@ -488,11 +530,9 @@ class DataAPI(object):
             # PUT 方法上传文件时，data需作为
             if request_method == "PUT" and file_data:
                 data = list(file_data.values())[0]
-                result = session.request(method=self.method, url=url, data=data, verify=False, timeout=self.timeout)
+                result = session.request(data=data, **request_kwargs)
             else:
-                result = session.request(
-                    method=self.method, url=url, data=params, files=file_data, verify=False, timeout=self.timeout
-                )
+                result = session.request(data=params, files=file_data, **request_kwargs)
         else:
             raise ApiRequestError("异常请求方式，{method}".format(method=self.method))
 
@@ -525,15 +565,33 @@ class DataAPI(object):
                 non_file_data[key] = value
         return non_file_data, file_data
 
-    @staticmethod
-    def _get_cache(cache_key):
+    def _get_cache(self, cache_key, cache_scope=None):
         """
         获取缓存
         :param cache_key:
+        :param cache_scope: 缓存范围
+        :return: 未命中时返回 MISSING，以区分缓存的空结果
+        """
+        return self.response_cache.get(cache_key, cache_scope)
+
+    def _get_cache_scope(self, params):
+        """
+        获取请求所属的缓存范围
+        :param params:
+        :return: 未配置 cache_scope_param 或请求参数中不存在时返回 None
+        """
+        if not self.cache_scope_param or not isinstance(params, dict):
+            return None
+        return params.get(self.cache_scope_param)
+
+    def invalidate_cache(self, scope=None):
+        """
+        使接口的缓存失效，用于资源变更事件等场景主动刷新
+        :param scope: 缓存范围，即 cache_scope_param 对应的参数值，为 None 时使接口的全部缓存失效
         :return:
         """
-        if cache.get(cache_key):
-            return cache.get(cache_key)
+        if self.cache_time:
+            self.response_cache.invalidate(scope)
 
 
 DRF_DATAAPI_CONFIG = [
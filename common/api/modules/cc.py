@@ -29,6 +29,7 @@ class _CCApi(BaseApi):
             description="查询业务列表",
             before_request=add_esb_info_before_request,
             api_name="search_business",
+            cache_time=60,
         )
         self.search_cloud_area = DataAPI(
             method="POST",
@@ -38,6 +39,7 @@ class _CCApi(BaseApi):
             description="查询管控区域",
             before_request=add_esb_info_before_request,
             api_name="search_cloud_area",
+            cache_time=60,
         )
         self.search_biz_inst_topo = DataAPI(
             method="POST",
@@ -56,6 +58,8 @@ class _CCApi(BaseApi):
             description="根据业务ID获取业务空闲机, 故障机和待回收模块",
             before_request=add_esb_info_before_request,
             api_name="get_biz_internal_module",
+            cache_time=60,
+            cache_scope_param="bk_biz_id",
         )
         self.find_topo_node_paths = DataAPI(
             method="POST",
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+TencentBlueKing is pleased to support the open source community by making 蓝鲸智云-节点管理(BlueKing-BK-NODEMAN) available.
+Copyright (C) 2017-2022 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at https://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+import threading
+import time
+import typing
+import uuid
+
+import mock
+
+from apps.utils.unittest.testcase import CustomBaseTestCase
+from common.api.utils import cache
+
+
+class LocalLRUCacheTestCase(CustomBaseTestCase):
+    def test_evict_least_recently_used(self):
+        local_cache = cache.LocalLRUCache(maxsize=2)
+        local_cache.set("a", 1, generation="0", cache_time=10)
+        local_cache.set("b", 2, generation="0", cache_time=10)
+        # 读取后 a 成为最近使用的条目，超出容量时淘汰 b
+        self.assertEqual(local_cache.get("a", generation="0"), 1)
+        local_cache.set("c", 3, generation="0", cache_time=10)
+
+        self.assertIs(local_cache.get("b", generation="0"), cache.MISSING)
+        self.assertEqual(local_cache.get("a", generation="0"), 1)
+        self.assertEqual(local_cache.get("c", generation="0"), 3)
+
+    def test_expire_and_generation(self):
+        local_cache = cache.LocalLRUCache(maxsize=2)
+        local_cache.set("a", 1, generation="0", cache_time=10)
+        # 失效代数变更后不再命中
+        self.assertIs(local_cache.get("a", generation="1"), cache.MISSING)
+
+        local_cache.set("b", 2, generation="0", cache_time=0)
+        self.assertIs(local_cache.get("b", generation="0"), cache.MISSING)
+
+    def test_return_copy(self):
+        local_cache = cache.LocalLRUCache(maxsize=2)
+        local_cache.set("a", {"list": [1]}, generation="0", cache_time=10)
+        local_cache.get("a", generation="0")["list"].append(2)
+        self.assertEqual(local_cache.get("a", generation="0"), {"list": [1]})
+
+
+class SingleFlightTestCase(CustomBaseTestCase):
+    THREAD_NUM = 5
+
+    def run_concurrently(
+        self, single_flight: cache.SingleFlight, func: typing.Callable[[], typing.Any], release_event: threading.Event
+    ):
+        """并发调用，待其余调用均进入等待后放行实际执行者"""
+        results: typing.List[typing.Any] = []
+        exceptions: typing.List[BaseException] = []
+        waiter_count: typing.List[int] = []
+
+        class CountingEvent(threading.Event):
+            def wait(self, timeout=None):
+                waiter_count.append(1)
+                return super().wait(timeout)
+
+        class CountingCall(cache.SingleFlight.Call):
+            def __init__(self):
+                super().__init__()
+                self.event = CountingEvent()
+
+        def _do():
+            try:
+                results.append(single_flight.do("key", func))
+            except Exception as e:
+                exceptions.append(e)
+
+        with mock.patch.object(single_flight, "Call", CountingCall):
+            threads: typing.List[threading.Thread] = [threading.Thread(target=_do) for __ in range(self.THREAD_NUM)]
+            for thread in threads:
+                thread.start()
+            while len(waiter_count) < self.THREAD_NUM - 1:
+                time.sleep(0.01)
+            release_event.set()
+            for thread in threads:
+                thread.join()
+        return results, exceptions
+
+    def test_coalesce(self):
+        single_flight = cache.SingleFlight()
+        release_event = threading.Event()
+        call_count: typing.List[int] = []
+
+        def _func():
+            call_count.append(1)
+            release_event.wait(5)
+            return "result"
+
+        results, exceptions = self.run_concurrently(single_flight, _func, release_event)
+
+        # 并发的相同调用仅执行一次，且仅有一个实际执行者
+        self.assertEqual(len(call_count), 1)
+        self.assertEqual(exceptions, [])
+        self.assertEqual([result for result, __ in results], ["result"] * self.THREAD_NUM)
+        self.assertEqual(len([is_leader for __, is_leader in results if is_leader]), 1)
+
+        # 调用结束后重新执行
+        self.assertEqual(single_flight.do("key", lambda: "next"), ("next", True))
+
+    def test_exception(self):
+        single_flight = cache.SingleFlight()
+        release_event = threading.Event()
+
+        def _func():
+            release_event.wait(5)
+            raise ValueError("failed")
+
+        results, exceptions = self.run_concurrently(single_flight, _func, release_event)
+
+        # 执行异常时，等待者获得相同的异常
+        self.assertEqual(results, [])
+        self.assertEqual(len(exceptions), self.THREAD_NUM)
+        self.assertTrue(all(isinstance(e, ValueError) for e in exceptions))
+        # 异常后不残留调用记录
+        self.assertEqual(single_flight.do("key", lambda: "next"), ("next", True))
+
+
+class ApiResponseCacheTestCase(CustomBaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.api_key = f"test_api:{uuid.uuid4()}"
+
+    def build_response_cache(self) -> cache.ApiResponseCache:
+        return cache.ApiResponseCache(api_key=self.api_key, cache_time=60, local_cache_time=10, local_cache_maxsize=10)
+
+    def test_empty_result(self):
+        response_cache: cache.ApiResponseCache = self.build_response_cache()
+        self.assertIs(response_cache.get("key"), cache.MISSING)
+
+        # 缓存的空结果视为命中
+        for value in [[], {}, None]:
+            response_cache.set("key", value)
+            self.assertEqual(response_cache.get("key"), value)
+            response_cache.local_cache.clear()
+            self.assertEqual(response_cache.get("key"), value)
+
+    def test_invalidate(self):
+        response_cache: cache.ApiResponseCache = self.build_response_cache()
+        response_cache.set("key", "value")
+        self.assertEqual(response_cache.get("key"), "value")
+
+        response_cache.invalidate()
+        self.assertIs(response_cache.get("key"), cache.MISSING)
+
+    def test_invalidate_scope(self):
+        response_cache: cache.ApiResponseCache = self.build_response_cache()
+        response_cache.set("key", "value", scope=1)
+        response_cache.set("other_key", "other_value", scope=2)
+
+        # 仅使指定范围的缓存失效
+        response_cache.invalidate(scope=1)
+        self.assertIs(response_cache.get("key", scope=1), cache.MISSING)
+        self.assertEqual(response_cache.get("other_key", scope=2), "other_value")
+
+        # 全局失效对全部范围生效
+        response_cache.invalidate()
+        self.assertIs(response_cache.get("other_key", scope=2), cache.MISSING)
+
+    def test_invalidate_from_other_process(self):
+        # 仅使用共享缓存，验证本地的失效代数刷新
+        response_cache = cache.ApiResponseCache(
+            api_key=self.api_key, cache_time=60, local_cache_time=0, local_cache_maxsize=10
+        )
+        other_response_cache: cache.ApiResponseCache = self.build_response_cache()
+        response_cache.set("key", "value", scope=1)
+
+        # 其他进程触发失效后，本进程最迟在失效代数刷新间隔后不再命中
+        other_response_cache.invalidate(scope=1)
+        self.assertEqual(response_cache.get("key", scope=1), "value")
+        monotonic: float = cache.time.monotonic() + cache.GENERATION_REFRESH_INTERVAL
+        with mock.patch.object(cache.time, "monotonic", return_value=monotonic):
+            self.assertIs(response_cache.get("key", scope=1), cache.MISSING)
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+TencentBlueKing is pleased to support the open source community by making 蓝鲸智云-节点管理(BlueKing-BK-NODEMAN) available.
+Copyright (C) 2017-2022 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at https://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+import json
+import socketserver
+import threading
+import typing
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import requests
+
+from apps.utils.unittest.testcase import CustomBaseTestCase
+from common.api.utils.session import SessionPool
+
+
+class EchoHandler(BaseHTTPRequestHandler):
+    """回显请求头，并在响应中下发 Cookie"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body: bytes = json.dumps(dict(self.headers.items())).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Set-Cookie", "sessionid=from-server; Path=/")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class SessionPoolTestCase(CustomBaseTestCase):
+    SIMPLE_MODULE = "cc"
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), EchoHandler)
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        self.session_pool = SessionPool()
+
+    def tearDown(self):
+        self.session_pool.clear()
+        super().tearDown()
+
+    def request(self, **kwargs) -> typing.Dict[str, str]:
+        session: requests.Session = self.session_pool.get(self.SIMPLE_MODULE, f"{self.url}/echo/")
+        return session.request(method="GET", url=f"{self.url}/echo/", timeout=5, **kwargs).json()
+
+    def test_reuse_session_by_host(self):
+        session: requests.Session = self.session_pool.get(self.SIMPLE_MODULE, "http://a.example.com/api/c/compapi/")
+        # 同一模块、同一域名复用会话
+        self.assertIs(self.session_pool.get(self.SIMPLE_MODULE, "http://a.example.com/api/v2/"), session)
+        # 域名、协议或模块不同时使用独立会话
+        self.assertIsNot(self.session_pool.get(self.SIMPLE_MODULE, "http://b.example.com/api/c/compapi/"), session)
+        self.assertIsNot(self.session_pool.get(self.SIMPLE_MODULE, "https://a.example.com/api/c/compapi/"), session)
+        self.assertIsNot(self.session_pool.get("job", "http://a.example.com/api/c/compapi/"), session)
+
+        # fork 后的子进程重建会话
+        self.session_pool._pid = -1
+        self.assertIsNot(self.session_pool.get(self.SIMPLE_MODULE, "http://a.example.com/api/c/compapi/"), session)
+
+    def test_block_response_cookies(self):
+        self.request(cookies={"bk_token": "user-a"})
+
+        # 响应下发的 Cookie 不保存到共享会话，后续请求不携带
+        session: requests.Session = self.session_pool.get(self.SIMPLE_MODULE, self.url)
+        self.assertEqual(len(session.cookies), 0)
+        self.assertNotIn("Cookie", self.request())
+
+    def test_request_cookies_and_headers_not_leak(self):
+        echo_headers: typing.Dict[str, str] = self.request(
+            headers={"X-Bkapi-Authorization": "user-a"}, cookies={"bk_token": "user-a"}
+        )
+        self.assertEqual(echo_headers["X-Bkapi-Authorization"], "user-a")
+        self.assertEqual(echo_headers["Cookie"], "bk_token=user-a")
+
+        # 单次请求的请求头及 Cookie 不写入共享会话，其他用户的请求不会串用
+        session: requests.Session = self.session_pool.get(self.SIMPLE_MODULE, self.url)
+        self.assertNotIn("X-Bkapi-Authorization", session.headers)
+        self.assertEqual(len(session.cookies), 0)
+
+        echo_headers = self.request(headers={"X-Bkapi-Authorization": "user-b"}, cookies={"bk_token": "user-b"})
+        self.assertEqual(echo_headers["X-Bkapi-Authorization"], "user-b")
+        self.assertEqual(echo_headers["Cookie"], "bk_token=user-b")
+        echo_headers = self.request()
+        self.assertNotIn("X-Bkapi-Authorization", echo_headers)
+        self.assertNotIn("Cookie", echo_headers)
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+TencentBlueKing is pleased to support the open source community by making 蓝鲸智云-节点管理(BlueKing-BK-NODEMAN) available.
+Copyright (C) 2017-2022 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at https://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+import copy
+import pickle
+import threading
+import time
+import typing
+from collections import OrderedDict
+
+from django.core.cache import cache
+
+from apps.prometheus import metrics
+
+# 进程内缓存的默认最长保留时间（秒），同时受限于接口的共享缓存时间
+DEFAULT_LOCAL_CACHE_TIME = 10
+
+# 进程内缓存的默认最大条目数
+DEFAULT_LOCAL_CACHE_MAXSIZE = 256
+
+# 进程内缓存的失效代数刷新间隔（秒），即其他进程触发失效后，本进程缓存的最长滞后时间
+GENERATION_REFRESH_INTERVAL = 5
+
+# 缓存未命中的标记，用于区分未命中与缓存的空结果（如 []、{}、None）
+MISSING = object()
+
+
+class LocalLRUCache:
+    """进程内 LRU 缓存，值以 pickle 形式保存，读取时反序列化，避免调用方修改共享对象"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        # key - (过期时间, 失效代数, 序列化值)
+        self._entries: OrderedDict = OrderedDict()
+
+    def get(self, key: str, generation: str) -> typing.Any:
+        with self._lock:
+            entry: typing.Optional[typing.Tuple[float, str, bytes]] = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            expire_at, entry_generation, value = entry
+            if entry_generation != generation or expire_at <= time.monotonic():
+                self._entries.pop(key, None)
+                return MISSING
+            self._entries.move_to_end(key)
+        return pickle.loads(value)
+
+    def set(self, key: str, value: typing.Any, generation: str, cache_time: float):
+        entry: typing.Tuple[float, str, bytes] = (time.monotonic() + cache_time, generation, pickle.dumps(value))
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SingleFlight:
+    """进程内单飞：相同 key 的并发调用仅执行一次，其余调用等待并共享结果"""
+
+    class Call:
+        def __init__(self):
+            self.event = threading.Event()
+            self.result: typing.Any = None
+            self.exception: typing.Optional[BaseException] = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: typing.Dict[str, "SingleFlight.Call"] = {}
+
+    def do(self, key: str, func: typing.Callable[[], typing.Any]) -> typing.Tuple[typing.Any, bool]:
+        """
+        :param key: 调用标识
+        :param func: 实际执行的函数
+        :return: 执行结果, 是否为实际执行者
+        """
+        with self._lock:
+            call: typing.Optional[SingleFlight.Call] = self._calls.get(key)
+            is_leader: bool = call is None
+            if is_leader:
+                call = self._calls[key] = self.Call()
+
+        if not is_leader:
+            call.event.wait()
+            if call.exception is not None:
+                raise call.exception
+            return call.result, False
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.exception = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+        return call.result, True
+
+
+class ApiResponseCache:
+    """
+    接口返回两级缓存
+    - L1：进程内 LRU，按接口配置保留时间及最大条目数
+    - L2：共享缓存（Django cache），跨进程共享
+    - 失效：递增接口的失效代数，L2 缓存 key 携带代数即刻失效，各进程 L1 最迟在 GENERATION_REFRESH_INTERVAL 后失效
+    - 范围失效：缓存可按范围（如业务 ID）划分，每个范围另有独立的失效代数，仅使该范围的缓存失效
+    """
+
+    def __init__(self, api_key: str, cache_time: int, local_cache_time: float, local_cache_maxsize: int):
+        """
+        :param api_key: 接口唯一标识
+        :param cache_time: 共享缓存时间，为 0 时不缓存
+        :param local_cache_time: 进程内缓存时间，为 0 时不启用进程内缓存
+        :param local_cache_maxsize: 进程内缓存最大条目数
+        """
+        self.api_key = api_key
+        self.cache_time = cache_time
+        self.local_cache_time = min(local_cache_time, cache_time)
+        self.local_cache = LocalLRUCache(maxsize=local_cache_maxsize)
+        self.single_flight = SingleFlight()
+
+        self._generation_lock = threading.Lock()
+        # 失效代数 key - (代数, 本地过期时间)，范围为 None 时即接口全局的失效代数
+        self._generation_key__generation_map: typing.Dict[str, typing.Tuple[int, float]] = {}
+
+    def get_generation_key(self, scope: typing.Any = None) -> str:
+        if scope is None:
+            return f"data_api:{self.api_key}:generation"
+        return f"data_api:{self.api_key}:generation:{scope}"
+
+    def _get_generation(self, generation_key: str) -> int:
+        now: float = time.monotonic()
+        generation, expire_at = self._generation_key__generation_map.get(generation_key) or (0, 0)
+        if now >= expire_at:
+            generation = int(cache.get(generation_key) or 0)
+            with self._generation_lock:
+                self._generation_key__generation_map[generation_key] = (generation, now + GENERATION_REFRESH_INTERVAL)
+        return generation
+
+    def get_generation(self, scope: typing.Any = None) -> str:
+        """
+        获取缓存的失效代数，由接口全局代数及范围代数组成
+        :param scope: 缓存范围
+        :return:
+        """
+        generation: str = str(self._get_generation(self.get_generation_key()))
+        if scope is None:
+            return generation
+        return f"{generation}.{self._get_generation(self.get_generation_key(scope))}"
+
+    def get_shared_cache_key(self, cache_key: str, generation: str) -> str:
+        return f"{cache_key}:{generation}"
+
+    def get(self, cache_key: str, scope: typing.Any = None) -> typing.Any:
+        """
+        获取缓存
+        :param cache_key: 缓存 key
+        :param scope: 缓存范围
+        :return: 未命中时返回 MISSING
+        """
+        generation: str = self.get_generation(scope)
+        if self.local_cache_time:
+            result: typing.Any = self.local_cache.get(cache_key, generation)
+            if result is not MISSING:
+                metrics.app_common_api_cache_requests_total.labels(api=self.api_key, result="local_hit").inc()
+                return result
+
+        result: typing.Any = cache.get(self.get_shared_cache_key(cache_key, generation), MISSING)
+        if result is MISSING:
+            metrics.app_common_api_cache_requests_total.labels(api=self.api_key, result="miss").inc()
+            return MISSING
+
+        metrics.app_common_api_cache_requests_total.labels(api=self.api_key, result="shared_hit").inc()
+        if self.local_cache_time:
+            self.local_cache.set(cache_key, result, generation, self.local_cache_time)
+        return result
+
+    def set(self, cache_key: str, value: typing.Any, scope: typing.Any = None):
+        generation: str = self.get_generation(scope)
+        cache.set(self.get_shared_cache_key(cache_key, generation), value, self.cache_time)
+        if self.local_cache_time:
+            self.local_cache.set(cache_key, value, generation, self.local_cache_time)
+
+    def load(self, cache_key: str, loader: typing.Callable[[], typing.Any]) -> typing.Any:
+        """
+        缓存未命中时加载，进程内相同请求仅加载一次，等待者获得结果的副本
+        :param cache_key: 缓存 key
+        :param loader: 加载函数
+        :return:
+        """
+        result, is_leader = self.single_flight.do(cache_key, loader)
+        if is_leader:
+            return result
+        metrics.app_common_api_cache_requests_total.labels(api=self.api_key, result="coalesced").inc()
+        return copy.deepcopy(result)
+
+    def invalidate(self, scope: typing.Any = None):
+        """
+        使缓存失效
+        :param scope: 缓存范围，为 None 时使接口的全部缓存失效
+        :return:
+        """
+        generation_key: str = self.get_generation_key(scope)
+        try:
+            cache.incr(generation_key)
+        except ValueError:
+            # 代数不存在时初始化，并发初始化由 add 保证仅一次生效
+            cache.add(generation_key, 0, None)
+            cache.incr(generation_key)
+        with self._generation_lock:
+            self._generation_key__generation_map.pop(generation_key, None)
+        if scope is None:
+            self.local_cache.clear()
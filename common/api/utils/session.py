@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+TencentBlueKing is pleased to support the open source community by making 蓝鲸智云-节点管理(BlueKing-BK-NODEMAN) available.
+Copyright (C) 2017-2022 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at https://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+import os
+import threading
+import typing
+from http import cookiejar
+from urllib import parse
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+from apps.prometheus import metrics
+
+
+class BlockAllCookiePolicy(cookiejar.DefaultCookiePolicy):
+    """拒绝保存响应下发的 Cookie，避免共享会话在不同用户的请求间串用 Cookie"""
+
+    def set_ok(self, cookie, request):
+        return False
+
+
+def get_module_options(simple_module: str) -> typing.Dict[str, typing.Any]:
+    """
+    获取模块的接口配置，未配置项使用全局默认值
+    :param simple_module: 模块简称
+    :return: timeout - 超时时间，retries - 连接重试次数，pool_maxsize - 连接池大小
+    """
+    options: typing.Dict[str, typing.Any] = {
+        "timeout": None,
+        "retries": settings.API_CONNECT_RETRIES,
+        "pool_maxsize": settings.API_POOL_MAXSIZE,
+    }
+    options.update(settings.API_MODULE_OPTIONS.get(simple_module) or {})
+    return options
+
+
+class ObservedHTTPAdapter(HTTPAdapter):
+    """上报请求数及新建连接数，两者之差即为连接复用次数"""
+
+    def __init__(self, simple_module: str, *args, **kwargs):
+        self.simple_module = simple_module
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        simple_module: str = self.simple_module
+
+        class ObservedHTTPConnectionPool(HTTPConnectionPool):
+            def _new_conn(self):
+                metrics.app_common_api_session_connections_total.labels(module=simple_module, host=self.host).inc()
+                return super()._new_conn()
+
+        class ObservedHTTPSConnectionPool(HTTPSConnectionPool):
+            def _new_conn(self):
+                metrics.app_common_api_session_connections_total.labels(module=simple_module, host=self.host).inc()
+                return super()._new_conn()
+
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": ObservedHTTPConnectionPool,
+            "https": ObservedHTTPSConnectionPool,
+        }
+
+    def send(self, request, *args, **kwargs):
+        metrics.app_common_api_session_requests_total.labels(
+            module=self.simple_module, host=parse.urlsplit(request.url).hostname
+        ).inc()
+        return super().send(request, *args, **kwargs)
+
+
+class SessionPool:
+    """
+    进程级共享的 HTTP 会话池，按 (模块, scheme, 域名) 复用 keep-alive 连接
+    - 会话仅承载连接池，请求头及 Cookie 需在每次请求时传入，保证多线程共享安全
+    - fork 后的子进程不复用父进程的连接，按 pid 懒加载重建
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions: typing.Dict[typing.Tuple[str, str, str], requests.Session] = {}
+        self._pid: typing.Optional[int] = None
+
+    @staticmethod
+    def create_session(simple_module: str) -> requests.Session:
+        options: typing.Dict[str, typing.Any] = get_module_options(simple_module)
+        session: requests.Session = requests.Session()
+        session.cookies.set_policy(BlockAllCookiePolicy())
+        # 仅重试建立连接阶段的失败，请求已发出后不重试，避免非幂等接口重复执行
+        max_retries: Retry = Retry(
+            total=options["retries"], connect=options["retries"], read=0, redirect=0, status=0, backoff_factor=0.1
+        )
+        adapter: ObservedHTTPAdapter = ObservedHTTPAdapter(
+            simple_module=simple_module,
+            pool_connections=1,
+            pool_maxsize=options["pool_maxsize"],
+            max_retries=max_retries,
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def get(self, simple_module: str, url: str) -> requests.Session:
+        """
+        获取请求地址对应的共享会话
+        :param simple_module: 模块简称
+        :param url: 请求地址
+        :return:
+        """
+        split_result: parse.SplitResult = parse.urlsplit(url)
+        key: typing.Tuple[str, str, str] = (simple_module, split_result.scheme, split_result.netloc)
+        pid: int = os.getpid()
+        session: typing.Optional[requests.Session] = self._sessions.get(key)
+        if session is not None and self._pid == pid:
+            return session
+
+        with self._lock:
+            if self._pid != pid:
+                self._sessions = {}
+                self._pid = pid
+            if key not in self._sessions:
+                self._sessions[key] = self.create_session(simple_module)
+            return self._sessions[key]
+
+    def clear(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions = {}
+
+
+session_pool = SessionPool()
@@ -8,6 +8,7 @@ Unless required by applicable law or agreed to in writing, software distributed
 an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
 specific language governing permissions and limitations under the License.
 """
+import json
 import sys
 from enum import Enum
 from typing import Dict, Optional
@@ -354,6 +355,35 @@ SHOW_EXCEPTION_DETAIL = False
 
 # 并发数
 CONCURRENT_NUMBER = int(os.getenv("CONCURRENT_NUMBER", 50) or 50)
+# 分页请求共享线程池大小
+BATCH_REQUEST_CONCURRENT_NUMBER = int(os.getenv("BATCH_REQUEST_CONCURRENT_NUMBER", 20) or 20)
+# 分页请求在途页窗口大小，限制同时驻留内存的分页数量
+BATCH_REQUEST_WINDOW_SIZE = int(os.getenv("BATCH_REQUEST_WINDOW_SIZE", 20) or 20)
+# GSE 状态查询共享执行器（gse）的并发上限
+GSE_QUERY_CONCURRENT_NUMBER = int(os.getenv("GSE_QUERY_CONCURRENT_NUMBER", 20) or 20)
+# 进程级共享执行器的最大线程数，按执行器名称配置，未配置的执行器使用 CONCURRENT_NUMBER
+CONCURRENT_EXECUTOR_MAX_WORKERS = {
+    "default": CONCURRENT_NUMBER,
+    "batch_request": BATCH_REQUEST_CONCURRENT_NUMBER,
+    "gse": GSE_QUERY_CONCURRENT_NUMBER,
+}
+# 执行器工作线程中嵌套并发调用时，每个嵌套层级使用独立的线程池，该值为嵌套线程池的最大线程数
+CONCURRENT_EXECUTOR_NESTED_MAX_WORKERS = get_type_env(
+    key="BKAPP_CONCURRENT_EXECUTOR_NESTED_MAX_WORKERS", default=20, _type=int
+)
+# 嵌套并发调用的最大层级，超过后在当前线程串行执行
+CONCURRENT_EXECUTOR_MAX_NESTED_DEPTH = get_type_env(
+    key="BKAPP_CONCURRENT_EXECUTOR_MAX_NESTED_DEPTH", default=2, _type=int
+)
+# 进程级共享进程池大小，为 0 时不共享，每次多进程调用时创建并关闭进程池
+# 多线程进程（如 -P threads 的 worker）中 fork 可能使子进程继承其他线程持有的锁，不建议开启
+CONCURRENT_PROCESS_POOL_SIZE = get_type_env(key="BKAPP_CONCURRENT_PROCESS_POOL_SIZE", default=0, _type=int)
+# 第三方接口连接池：按模块、按域名在进程内共享 keep-alive 连接，单个连接池的最大连接数
+API_POOL_MAXSIZE = int(os.getenv("BKAPP_API_POOL_MAXSIZE", CONCURRENT_NUMBER) or CONCURRENT_NUMBER)
+# 第三方接口建立连接失败时的重试次数
+API_CONNECT_RETRIES = int(os.getenv("BKAPP_API_CONNECT_RETRIES", 2) or 0)
+# 第三方接口按模块覆盖的配置，例如 {"cc": {"timeout": 60, "retries": 3, "pool_maxsize": 100}}
+API_MODULE_OPTIONS = json.loads(os.getenv("BKAPP_API_MODULE_OPTIONS") or "{}")
 
 # 插件进程状态同步周期
 SYNC_PROC_STATUS_TASK_INTERVAL = env.BKAPP_SYNC_PROC_STATUS_TASK_INTERVAL
@@ -574,6 +604,17 @@ BK_SCRIPTS_PATH = os.path.join(PROJECT_ROOT, "script_tools")
 
 PIPELINE_DATA_BACKEND = "pipeline.engine.core.data.mysql_backend.MySQLDataBackend"
 PIPELINE_END_HANDLER = "apps.backend.agent.signals.pipeline_end_handler"
+# 运行时数据编解码器，为空时保持历史格式（zlib 压缩的 pickle），切换前需确保所有实例已升级
+PIPELINE_DATA_CODEC = os.getenv("BKAPP_PIPELINE_DATA_CODEC", "")
+PIPELINE_DATA_CODEC_LEVEL = get_type_env(key="BKAPP_PIPELINE_DATA_CODEC_LEVEL", default=None, _type=int)
+PIPELINE_DATA_CODEC_DICT_PATH = os.getenv("BKAPP_PIPELINE_DATA_CODEC_DICT_PATH", "")
+# 插件配置批量渲染的进程数，不大于 1 时在当前进程渲染
+# 进程池在进程内常驻复用，子进程以 spawn 方式启动：fork 在多线程 worker（如 celery -P threads）中不安全，
+# 会复制其他线程持有的锁导致子进程死锁；线程池 worker 的各线程共用同一进程池，总进程数不随并发线程数增加
+# prefork 的子进程为守护进程，无法创建进程池，将在当前进程渲染
+CONFIG_RENDER_PROCESSES = get_type_env(key="BKAPP_CONFIG_RENDER_PROCESSES", default=0, _type=int)
+# 进程池渲染单个任务（一组主机）的超时时间（秒），超时后终止进程池并在当前进程渲染整个批次
+CONFIG_RENDER_CHUNK_TIMEOUT = get_type_env(key="BKAPP_CONFIG_RENDER_CHUNK_TIMEOUT", default=30, _type=int)
 ENGINE_ZOMBIE_PROCESS_DOCTORS = [
     {
         "class": "pipeline.engine.health.zombie.doctors.RunningNodeZombieDoctor",
@@ -17,6 +17,7 @@ import traceback
 import redis
 from django.apps import AppConfig
 from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 from redis.sentinel import Sentinel
 from rediscluster import RedisCluster
 
@@ -81,10 +82,17 @@ class PipelineConfig(AppConfig):
         from pipeline.signals.handlers import (  # noqa
             pipeline_template_post_save_handler,
         )
+        from pipeline.utils import codec
         from pipeline.validators.handlers import (  # noqa
             post_new_end_event_register_handler,
         )
 
+        # 编解码器配置不可用时启动失败，避免写入与配置不符的数据格式
+        try:
+            codec.check_codec_settings()
+        except codec.CodecError as e:
+            raise ImproperlyConfigured(str(e))
+
         # init redis pool
         if hasattr(settings, "REDIS"):
             mode = settings.REDIS.get("mode") or "single"
@@ -38,6 +38,12 @@ PIPELINE_DATA_CANDIDATE_BACKEND = getattr(settings, "PIPELINE_DATA_BACKEND", Non
 PIPELINE_END_HANDLER = getattr(
     settings, "PIPELINE_END_HANDLER", "pipeline.engine.signals.handlers.pipeline_end_handler"
 )
+# 运行时数据（IOField / RedisDataBackend）的编解码器，可选 pickle / zlib / zstd，为空时保持历史格式
+PIPELINE_DATA_CODEC = getattr(settings, "PIPELINE_DATA_CODEC", "")
+# 编解码器压缩级别，为空时使用编解码器的默认级别
+PIPELINE_DATA_CODEC_LEVEL = getattr(settings, "PIPELINE_DATA_CODEC_LEVEL", None)
+# zstd 训练字典路径，可通过 pipeline.utils.codec.train_zstd_dict 生成
+PIPELINE_DATA_CODEC_DICT_PATH = getattr(settings, "PIPELINE_DATA_CODEC_DICT_PATH", "")
 PIPELINE_WORKER_STATUS_CACHE_EXPIRES = getattr(settings, "PIPELINE_WORKER_STATUS_CACHE_EXPIRES", 30)
 PIPELINE_RERUN_MAX_TIMES = getattr(settings, "PIPELINE_RERUN_MAX_TIMES", 0)
 PIPELINE_RERUN_INDEX_OFFSET = getattr(settings, "PIPELINE_RERUN_INDEX_OFFSET", -1)
@@ -15,26 +15,27 @@ import pickle
 
 from pipeline.conf import settings
 from pipeline.engine.core.data.base_backend import BaseDataBackend
+from pipeline.utils import codec
 
 
 class RedisDataBackend(BaseDataBackend):
     def set_object(self, key, obj):
-        return settings.redis_inst.set(key, pickle.dumps(obj))
+        return settings.redis_inst.set(key, codec.encode(obj, legacy_dumps=pickle.dumps))
 
     def get_object(self, key):
         pickle_str = settings.redis_inst.get(key)
         if not pickle_str:
             return None
-        return pickle.loads(pickle_str)
+        return codec.decode(pickle_str, legacy_loads=pickle.loads)
 
     def del_object(self, key):
         return settings.redis_inst.delete(key)
 
     def expire_cache(self, key, value, expires):
-        settings.redis_inst.set(key, pickle.dumps(value))
+        settings.redis_inst.set(key, codec.encode(value, legacy_dumps=pickle.dumps))
         settings.redis_inst.expire(key, expires)
         return True
 
     def cache_for(self, key):
         cache = settings.redis_inst.get(key)
-        return pickle.loads(cache) if cache else cache
+        return codec.decode(cache, legacy_loads=pickle.loads) if cache else cache
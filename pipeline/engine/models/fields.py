@@ -17,6 +17,7 @@ import zlib
 
 from django.db import models
 
+from pipeline.utils import codec
 from pipeline.utils.utils import convert_bytes_to_str
 
 
@@ -25,14 +26,21 @@ class IOField(models.BinaryField):
         super(IOField, self).__init__(*args, **kwargs)
         self.compress_level = compress_level
 
+    def _legacy_dumps(self, value):
+        return zlib.compress(pickle.dumps(value), self.compress_level)
+
+    @staticmethod
+    def _legacy_loads(value):
+        return pickle.loads(zlib.decompress(value))
+
     def get_prep_value(self, value):
         value = super(IOField, self).get_prep_value(value)
-        return zlib.compress(pickle.dumps(value), self.compress_level)
+        return codec.encode(value, legacy_dumps=self._legacy_dumps)
 
     def to_python(self, value):
         try:
             value = super(IOField, self).to_python(value)
-            return pickle.loads(zlib.decompress(value))
+            return codec.decode(value, legacy_loads=self._legacy_loads)
         except UnicodeDecodeError:
             # py2 pickle data process
             return convert_bytes_to_str(pickle.loads(zlib.decompress(value), encoding="bytes"))
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云PaaS平台社区版 (BlueKing PaaS Community
+Edition) available.
+Copyright (C) 2017-2019 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+
+import pickle
+import zlib
+
+import mock
+from django.test import TestCase, override_settings
+
+from pipeline.engine.models.fields import IOField
+from pipeline.utils import codec
+
+
+class CodecTestCase(TestCase):
+    def setUp(self):
+        self.obj = {"instance_info": {"host": {"bk_host_id": 1, "bk_host_innerip": "127.0.0.1"}}, "list": [4, 5, 6]}
+        self.registry = codec.CodecRegistry()
+
+    def test_encode_and_decode(self):
+        for codec_name in codec.CODEC_CLASSES:
+            if codec_name == codec.ZstdCodec.name and codec.zstandard is None:
+                continue
+            data = self.registry.encode(self.obj, codec_name=codec_name)
+            self.assertEqual(data[:1], codec.MAGIC)
+            self.assertEqual(self.registry.decode(data), self.obj)
+
+    def test_legacy_format(self):
+        # 未配置编解码器时写入历史格式，历史数据按 legacy_loads 读取
+        data = self.registry.encode(self.obj, legacy_dumps=pickle.dumps)
+        self.assertEqual(data, pickle.dumps(self.obj))
+        self.assertEqual(self.registry.decode(data, legacy_loads=pickle.loads), self.obj)
+
+    def test_unknown_codec(self):
+        self.assertRaises(codec.CodecError, self.registry.encode, self.obj, codec_name="unknown")
+        self.assertRaises(codec.CodecError, self.registry.decode, codec.MAGIC + bytes([255]))
+
+    def test_io_field(self):
+        field = IOField()
+        legacy_data = zlib.compress(pickle.dumps(self.obj), 6)
+        self.assertEqual(field.get_prep_value(self.obj), legacy_data)
+        self.assertEqual(field.to_python(legacy_data), self.obj)
+
+        with override_settings(PIPELINE_DATA_CODEC=codec.ZlibCodec.name):
+            data = field.get_prep_value(self.obj)
+        self.assertEqual(data[:2], codec.MAGIC + bytes([codec.ZlibCodec.codec_id]))
+        # 切换回历史格式后，仍可读取新格式数据
+        self.assertEqual(field.to_python(data), self.obj)
+
+    def test_check_codec_settings(self):
+        with override_settings(PIPELINE_DATA_CODEC=""):
+            codec.check_codec_settings()
+        with override_settings(PIPELINE_DATA_CODEC="unknown"):
+            self.assertRaises(codec.CodecError, codec.check_codec_settings)
+        # 配置 zstd 但未安装 zstandard 时启动失败，而不是静默回退到历史格式
+        with override_settings(PIPELINE_DATA_CODEC=codec.ZstdCodec.name), mock.patch.object(codec, "zstandard", None):
+            self.assertRaises(codec.CodecError, codec.check_codec_settings)
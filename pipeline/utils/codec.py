@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云PaaS平台社区版 (BlueKing PaaS Community
+Edition) available.
+Copyright (C) 2017-2019 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+
+可插拔的二进制编解码层，用于 IOField 及数据后端的对象序列化
+
+编码格式：MAGIC(1 byte) + 编解码器 ID(1 byte) + 负载
+- 历史数据（zlib 压缩的 pickle 或裸 pickle）首字节不可能为 MAGIC，读取时交由调用方的 legacy_loads 处理，保证向后兼容
+- 未配置编解码器时保持历史写入格式，便于灰度及回滚
+"""
+
+import pickle
+import threading
+import time
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+MAGIC = b"\xff"
+HEADER_SIZE = 2
+
+
+class CodecError(Exception):
+    pass
+
+
+class BaseCodec(object):
+    # 写入格式头的编解码器 ID，注册后不可变更
+    codec_id = None
+    name = None
+
+    def compress(self, data):
+        raise NotImplementedError
+
+    def decompress(self, data):
+        raise NotImplementedError
+
+    def encode(self, obj):
+        return MAGIC + bytes([self.codec_id]) + self.compress(pickle.dumps(obj))
+
+    def decode(self, data):
+        return pickle.loads(self.decompress(data[HEADER_SIZE:]))
+
+
+class PickleCodec(BaseCodec):
+    codec_id = 1
+    name = "pickle"
+
+    def compress(self, data):
+        return data
+
+    def decompress(self, data):
+        return data
+
+
+class ZlibCodec(BaseCodec):
+    codec_id = 2
+    name = "zlib"
+
+    def __init__(self, level=6, **kwargs):
+        self.level = level
+
+    def compress(self, data):
+        return zlib.compress(data, self.level)
+
+    def decompress(self, data):
+        return zlib.decompress(data)
+
+
+class ZstdCodec(BaseCodec):
+    """
+    zstd 压缩，压缩 / 解压速度明显优于 zlib
+    配置训练字典后，重复度高的小对象（如订阅实例的 instance_info）可获得更高的压缩率
+    字典 ID 记录在 zstd 帧头中，解压时按帧头校验，更换字典后需保留旧字典直至历史数据过期
+    """
+
+    codec_id = 3
+    name = "zstd"
+
+    def __init__(self, level=3, dict_data=None, **kwargs):
+        if zstandard is None:
+            raise CodecError("zstd codec requires zstandard, please install it first")
+        self.level = level
+        self.dict_data = zstandard.ZstdCompressionDict(dict_data) if dict_data else None
+        # 压缩 / 解压上下文非线程安全，按线程复用
+        self._local = threading.local()
+
+    def _get_compressor(self):
+        compressor = getattr(self._local, "compressor", None)
+        if compressor is None:
+            compressor = self._local.compressor = zstandard.ZstdCompressor(level=self.level, dict_data=self.dict_data)
+        return compressor
+
+    def _get_decompressor(self):
+        decompressor = getattr(self._local, "decompressor", None)
+        if decompressor is None:
+            decompressor = self._local.decompressor = zstandard.ZstdDecompressor(dict_data=self.dict_data)
+        return decompressor
+
+    def compress(self, data):
+        return self._get_compressor().compress(data)
+
+    def decompress(self, data):
+        return self._get_decompressor().decompress(data)
+
+
+CODEC_CLASSES = {codec_class.name: codec_class for codec_class in [PickleCodec, ZlibCodec, ZstdCodec]}
+CODEC_ID__NAME_MAP = {codec_class.codec_id: codec_class.name for codec_class in CODEC_CLASSES.values()}
+
+
+def train_zstd_dict(samples, dict_size=64 * 1024):
+    """
+    基于样本对象训练 zstd 字典
+    :param samples: 样本对象列表，建议取线上有代表性的快照
+    :param dict_size: 字典大小（bytes）
+    :return: 字典二进制数据，可写入文件后通过 PIPELINE_DATA_CODEC_DICT_PATH 配置
+    """
+    if zstandard is None:
+        raise CodecError("zstd codec requires zstandard, please install it first")
+    return zstandard.train_dictionary(dict_size, [pickle.dumps(sample) for sample in samples]).as_bytes()
+
+
+class CodecRegistry(object):
+    """编解码器注册表，按配置懒加载，解码时按格式头选择编解码器"""
+
+    def __init__(self, options=None):
+        # 编解码器名称 - 初始化参数
+        self.options = options or {}
+        self._codecs = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        codec = self._codecs.get(name)
+        if codec is not None:
+            return codec
+        if name not in CODEC_CLASSES:
+            raise CodecError("unsupported codec -> {}, options -> {}".format(name, list(CODEC_CLASSES)))
+        with self._lock:
+            if name not in self._codecs:
+                self._codecs[name] = CODEC_CLASSES[name](**self.options.get(name, {}))
+        return self._codecs[name]
+
+    def encode(self, obj, codec_name=None, legacy_dumps=None):
+        """
+        编码对象
+        :param obj: 待编码对象
+        :param codec_name: 编解码器名称，为空时使用 legacy_dumps 写入历史格式
+        :param legacy_dumps: 历史格式的序列化方法
+        :return:
+        """
+        if not codec_name:
+            return legacy_dumps(obj)
+        return self.get(codec_name).encode(obj)
+
+    def decode(self, data, legacy_loads=None):
+        """
+        解码数据，不带格式头的数据视为历史格式
+        :param data: 待解码数据
+        :param legacy_loads: 历史格式的反序列化方法
+        :return:
+        """
+        if data[:1] != MAGIC:
+            return legacy_loads(data)
+        codec_name = CODEC_ID__NAME_MAP.get(data[1])
+        if codec_name is None:
+            raise CodecError("unknown codec id -> {}".format(data[1]))
+        return self.get(codec_name).decode(data)
+
+
+def get_codec_options():
+    from pipeline.conf import settings
+
+    options = {
+        ZlibCodec.name: {"level": settings.PIPELINE_DATA_CODEC_LEVEL or 6},
+        ZstdCodec.name: {"level": settings.PIPELINE_DATA_CODEC_LEVEL or 3},
+    }
+    if settings.PIPELINE_DATA_CODEC_DICT_PATH:
+        with open(settings.PIPELINE_DATA_CODEC_DICT_PATH, "rb") as dict_file:
+            options[ZstdCodec.name]["dict_data"] = dict_file.read()
+    return options
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = CodecRegistry(options=get_codec_options())
+    return _registry
+
+
+def check_codec_settings():
+    """
+    校验编解码器配置，在启动时调用，配置不可用时直接报错，避免运行期静默回退到历史格式
+    """
+    from pipeline.conf import settings
+
+    codec_name = settings.PIPELINE_DATA_CODEC
+    if not codec_name:
+        return
+    if codec_name not in CODEC_CLASSES:
+        raise CodecError("unsupported PIPELINE_DATA_CODEC -> {}, options -> {}".format(codec_name, list(CODEC_CLASSES)))
+    if codec_name == ZstdCodec.name and zstandard is None:
+        raise CodecError("PIPELINE_DATA_CODEC is zstd but zstandard is not installed, please install it first")
+
+
+def get_codec_name():
+    from pipeline.conf import settings
+
+    return settings.PIPELINE_DATA_CODEC
+
+
+def encode(obj, legacy_dumps):
+    return get_registry().encode(obj, codec_name=get_codec_name(), legacy_dumps=legacy_dumps)
+
+
+def decode(data, legacy_loads):
+    return get_registry().decode(data, legacy_loads=legacy_loads)
+
+
+def benchmark(objs, codecs, legacy_dumps=None, legacy_loads=None, rounds=3):
+    """
+    对比各编解码器在给定对象上的 CPU 耗时及编码大小
+    :param objs: 样本对象列表
+    :param codecs: 编解码器名称 - 编解码器实例
+    :param legacy_dumps: 历史格式的序列化方法，提供时一并作为基线对比
+    :param legacy_loads: 历史格式的反序列化方法
+    :param rounds: 重复轮数，取最小耗时
+    :return: [{"name", "bytes", "ratio", "encode_seconds", "decode_seconds"}]
+    """
+    raw_size = sum(len(pickle.dumps(obj)) for obj in objs)
+    candidates = list(codecs.items())
+    if legacy_dumps and legacy_loads:
+        candidates.insert(0, ("legacy", None))
+
+    results = []
+    for name, codec in candidates:
+        dumps = legacy_dumps if codec is None else codec.encode
+        loads = legacy_loads if codec is None else codec.decode
+        encode_seconds = decode_seconds = float("inf")
+        for __ in range(rounds):
+            begin_at = time.perf_counter()
+            encoded_list = [dumps(obj) for obj in objs]
+            encode_seconds = min(encode_seconds, time.perf_counter() - begin_at)
+
+            begin_at = time.perf_counter()
+            for encoded in encoded_list:
+                loads(encoded)
+            decode_seconds = min(decode_seconds, time.perf_counter() - begin_at)
+
+        encoded_size = sum(len(encoded) for encoded in encoded_list)
+        results.append(
+            {
+                "name": name,
+                "bytes": encoded_size,
+                "ratio": encoded_size / raw_size if raw_size else 0,
+                "encode_seconds": encode_seconds,
+                "decode_seconds": decode_seconds,
+            }
+        )
+    return results
@@ -10,7 +10,7 @@ COVERAGE_OMIT_PATH="*/test/*,*/virtualenv/*,*/venv/*,*/migrations/*,*/mock_data/
 # 删除coverage历史归档文件
 coverage erase
 
-TEST_LOGS=$(coverage run --include "$COVERAGE_INCLUDE_MODULES" --omit "$COVERAGE_OMIT_PATH" ./manage.py test apps.core apps.node_man apps.backend apps.utils apps.iam 2>&1)
+TEST_LOGS=$(coverage run --include "$COVERAGE_INCLUDE_MODULES" --omit "$COVERAGE_OMIT_PATH" ./manage.py test apps.core apps.node_man apps.backend apps.utils apps.iam common.api 2>&1)
 echo "${TEST_LOGS}"
 TEST_RESULT=$(echo "${TEST_LOGS}" | grep -Ev "'errors'" | grep -E "Ran|OK|failures|errors")
 TEST_TIME=''